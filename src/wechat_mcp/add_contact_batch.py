@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .logging_config import logger
+from .state_store import load_state, save_state
+
+STATE_NAME = "add_contacts_checkpoint"
+
+# Options a batch entry may set for its own ID, overriding the defaults
+# passed to the batch tool.
+OPTION_NAMES: tuple[str, ...] = (
+    "friending_msg",
+    "remark",
+    "tags",
+    "privacy",
+    "hide_my_posts",
+    "hide_their_posts",
+)
+
+
+@dataclass
+class AddContactRequest:
+    index: int
+    wechat_id: str
+    options: dict[str, Any]
+
+
+def normalize_add_contact_requests(
+    contacts: list[str | dict[str, Any]], defaults: dict[str, Any]
+) -> list[AddContactRequest]:
+    """
+    Turn the loosely typed `contacts` argument of the batch tool into
+    AddContactRequest objects.
+
+    Each entry is either a WeChat ID or a dict with a "wechat_id" key and
+    any of OPTION_NAMES overriding `defaults` for that ID. Duplicate IDs
+    are rejected, since the second request could only fail.
+    """
+    requests: list[AddContactRequest] = []
+    seen: set[str] = set()
+    for index, item in enumerate(contacts):
+        overrides: dict[str, Any] = {}
+        if isinstance(item, str):
+            wechat_id = item
+        elif isinstance(item, dict):
+            wechat_id = item.get("wechat_id")
+            unknown = set(item) - set(OPTION_NAMES) - {"wechat_id"}
+            if unknown:
+                raise ValueError(
+                    f"Contact entry at index {index} has unknown keys: "
+                    f"{sorted(unknown)}"
+                )
+            overrides = {key: item[key] for key in OPTION_NAMES if key in item}
+        else:
+            raise ValueError(f"Unsupported contact entry at index {index}: {item!r}")
+
+        if not isinstance(wechat_id, str) or not wechat_id.strip():
+            raise ValueError(f"Contact entry at index {index} has no wechat_id")
+        wechat_id = wechat_id.strip()
+        if wechat_id in seen:
+            raise ValueError(f"Duplicate wechat_id {wechat_id!r} at index {index}")
+        seen.add(wechat_id)
+
+        options = {key: defaults.get(key) for key in OPTION_NAMES}
+        options.update(overrides)
+        options["hide_my_posts"] = bool(options["hide_my_posts"])
+        options["hide_their_posts"] = bool(options["hide_their_posts"])
+        requests.append(AddContactRequest(index, wechat_id, options))
+    return requests
+
+
+def batch_key(requests: list[AddContactRequest]) -> str:
+    """
+    Identify a batch by its ordered IDs and their options, so that
+    calling the tool again with the same list picks up the same
+    checkpoint, while changing a message or remark starts a new batch.
+    """
+    entries = json.dumps(
+        [[request.wechat_id, request.options] for request in requests],
+        sort_keys=True,
+    )
+    return hashlib.sha1(entries.encode("utf-8")).hexdigest()[:16]
+
+
+class AddContactCheckpoint:
+    """
+    Record which IDs of a batch already got their friend request, so an
+    interrupted batch can be resumed without sending requests twice.
+
+    Only successful results are recorded; failed IDs are retried on the
+    next run. The checkpoint of a batch is written to the state
+    directory after every completed ID and removed once the whole batch
+    has succeeded. At most `max_batches` unfinished batches are kept,
+    dropping the least recently updated.
+    """
+
+    def __init__(
+        self,
+        max_batches: int = 10,
+        clock: Callable[[], float] = time.time,
+        persist: bool = True,
+    ) -> None:
+        self.max_batches = max_batches
+        self._clock = clock
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._batches: dict[str, dict[str, Any]] = {}
+        if persist:
+            data = load_state(STATE_NAME, {})
+            if isinstance(data, dict):
+                self._batches = {
+                    key: batch
+                    for key, batch in data.items()
+                    if isinstance(batch, dict)
+                    and isinstance(batch.get("results"), dict)
+                }
+
+    def completed(self, key: str) -> dict[str, dict[str, Any]]:
+        """
+        Return the recorded results of `key`, by WeChat ID.
+        """
+        with self._lock:
+            batch = self._batches.get(key)
+            return dict(batch["results"]) if batch else {}
+
+    def record(self, key: str, wechat_id: str, result: dict[str, Any]) -> None:
+        with self._lock:
+            batch = self._batches.setdefault(key, {"results": {}})
+            batch["results"][wechat_id] = result
+            batch["updated"] = self._clock()
+            while len(self._batches) > self.max_batches:
+                oldest = min(
+                    self._batches, key=lambda k: self._batches[k].get("updated", 0)
+                )
+                del self._batches[oldest]
+            self._save_locked()
+
+    def finish(self, key: str) -> None:
+        with self._lock:
+            if self._batches.pop(key, None) is not None:
+                self._save_locked()
+
+    def _save_locked(self) -> None:
+        if not self._persist:
+            return
+        try:
+            save_state(STATE_NAME, self._batches)
+        except OSError as exc:
+            logger.warning("Could not save add-contacts checkpoint: %s", exc)
+
+
+add_contact_checkpoint = AddContactCheckpoint()
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-import time
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
 
-from ApplicationServices import (
-    AXUIElementSetAttributeValue,
+from .add_contact_batch import AddContactCheckpoint, AddContactRequest, batch_key
+from .ax_calls import ax_set_attribute
+from .ax_constants import (
     kAXButtonRole,
     kAXCheckBoxRole,
     kAXChildrenAttribute,
@@ -15,50 +16,65 @@ from ApplicationServices import (
     kAXTextFieldRole,
     kAXValueAttribute,
 )
-
+from .cancellation import OperationCancelled, raise_if_cancelled
+from .driver import get_driver, pause
 from .logging_config import logger
+from .perf_stats import timed
+from .stage_machine import Stage, StageFailed, StageMachine
 from .wechat_accessibility import (
-    _wait_for_window,
+    _close_window,
     _collect_search_entries,
+    _find_window_by_title,
+    _wait_for_element,
+    _wait_for_window,
+    _wait_for_window_closed,
     ax_get,
     axvalue_to_point,
     click_element_center,
     dfs,
-    focus_and_type_search,
     get_search_list,
     get_wechat_ax_app,
+    type_search_query,
 )
 
 
-def _click_more_card_by_title(ax_app: Any, label: str) -> bool:
+@timed("add_contact.click_search_card")
+def _click_more_card_by_title(ax_app: Any, label: str, timeout: float = 2.0) -> bool:
     """
     Click a card with the given label in the global search results list.
 
     This reuses the same search-entry collection logic as
     _select_contact_from_search_results but targets entries by their
-    visible text only (e.g. a card labeled "Search WeChat ID").
+    visible text only (e.g. a card labeled "Search WeChat ID"). The
+    results are re-read until the card shows up or `timeout` expires.
     """
     search_list = get_search_list(ax_app)
-    entries = _collect_search_entries(search_list)
-
     target = label.strip()
-    for entry in entries:
-        text = entry.text
-        if not text:
-            continue
-        if text == target or text.startswith(f"{target}:"):
-            logger.info("Clicking %r entry in search results", text)
-            click_element_center(entry.element)
-            time.sleep(0.4)
-            return True
+    end = get_driver().monotonic() + timeout
+    while True:
+        raise_if_cancelled()
+        for entry in _collect_search_entries(search_list):
+            text = entry.text
+            if not text:
+                continue
+            if text == target or text.startswith(f"{target}:"):
+                logger.info("Clicking %r entry in search results", text)
+                click_element_center(entry.element)
+                return True
+        if get_driver().monotonic() >= end:
+            break
+        pause(0.1)
 
     logger.warning("Did not find %r entry in search results", target)
     return False
 
 
-def _click_add_to_contacts_button(add_contacts_window) -> None:
+@timed("add_contact.click_add_button")
+def _click_add_to_contacts_button(add_contacts_window, timeout: float = 5.0) -> None:
     """
-    Click the 'Add to Contacts' button inside the Add Contacts window.
+    Click the 'Add to Contacts' button inside the Add Contacts window,
+    waiting up to `timeout` for the profile to load and the button to
+    appear.
     """
 
     def is_add_button(el, role, title, identifier):
@@ -70,7 +86,7 @@ def _click_add_to_contacts_button(add_contacts_window) -> None:
             return True
         return False
 
-    button = dfs(add_contacts_window, is_add_button)
+    button = _wait_for_element(add_contacts_window, is_add_button, timeout=timeout)
     if button is None:
         raise RuntimeError(
             "Could not find 'Add to Contacts' button in Add Contacts window"
@@ -78,17 +94,21 @@ def _click_add_to_contacts_button(add_contacts_window) -> None:
 
     logger.info("Clicking 'Add to Contacts' button")
     click_element_center(button)
-    time.sleep(0.4)
 
 
-def _set_checkbox_state(checkbox, desired: bool) -> None:
+def _set_checkbox_state(checkbox, desired: bool, timeout: float = 1.0) -> None:
     current = ax_get(checkbox, kAXValueAttribute)
     current_bool = bool(current)
     if current_bool == desired:
         return
 
     click_element_center(checkbox)
-    time.sleep(0.2)
+    end = get_driver().monotonic() + timeout
+    while bool(ax_get(checkbox, kAXValueAttribute)) != desired:
+        if get_driver().monotonic() >= end:
+            logger.warning("Checkbox did not change to %s after clicking", desired)
+            return
+        pause(0.02)
 
 
 def _set_checkbox_by_title(window, title: str, desired: bool) -> None:
@@ -103,7 +123,9 @@ def _set_checkbox_by_title(window, title: str, desired: bool) -> None:
             and checkbox_title == title
         )
 
-    checkbox = dfs(window, is_checkbox)
+    # The checkboxes are only shown once the matching privacy option is
+    # selected, so give them a moment to appear.
+    checkbox = _wait_for_element(window, is_checkbox, timeout=1.0)
     if checkbox is None:
         logger.warning("Could not find checkbox with title %r", title)
         return
@@ -173,9 +195,16 @@ def _click_privacy_option(window, label: str) -> None:
 
     logger.info("Clicking privacy option %r", label)
     click_element_center(best_button)
-    time.sleep(0.2)
 
 
+def _normalize_privacy(privacy: str | None) -> str:
+    mode = (privacy or "all").strip().lower()
+    if mode in ("chats_only", "chats-only", "chats only"):
+        return "chats_only"
+    return "all"
+
+
+@timed("add_contact.configure_request")
 def _configure_friend_request_window(
     window,
     friending_msg: str | None,
@@ -204,9 +233,7 @@ def _configure_friend_request_window(
         if msg_area is None:
             logger.warning("Could not find friending message text area")
         else:
-            err = AXUIElementSetAttributeValue(
-                msg_area, kAXValueAttribute, friending_msg
-            )
+            err = ax_set_attribute(msg_area, kAXValueAttribute, friending_msg)
             if err != 0:
                 logger.warning("Failed to set friending message text, AX error %s", err)
             else:
@@ -226,7 +253,7 @@ def _configure_friend_request_window(
         if remark_field is None:
             logger.warning("Could not find remark text field")
         else:
-            err = AXUIElementSetAttributeValue(remark_field, kAXValueAttribute, remark)
+            err = ax_set_attribute(remark_field, kAXValueAttribute, remark)
             if err != 0:
                 logger.warning("Failed to set remark text, AX error %s", err)
             else:
@@ -237,12 +264,11 @@ def _configure_friend_request_window(
         logger.info("Tags argument provided but tag editing is not implemented yet")
 
     # Privacy + posts visibility
-    privacy_mode = (privacy or "all").strip().lower()
-    if privacy_mode in ("chats_only", "chats-only", "chats only"):
+    privacy_mode = _normalize_privacy(privacy)
+    if privacy_mode == "chats_only":
         _click_privacy_option(window, "Chats Only")
         logger.info("Privacy set to Chats Only")
     else:
-        privacy_mode = "all"
         _click_privacy_option(window, "Chats, Moments, WeRun, etc.")
         logger.info("Privacy set to Chats, Moments, WeRun, etc.")
 
@@ -253,6 +279,269 @@ def _configure_friend_request_window(
     return privacy_mode
 
 
+def _is_ok_button(el, role, title, identifier):
+    return role == kAXButtonRole and isinstance(title, str) and title == "OK"
+
+
+def _shows_wechat_id(window, wechat_id: str) -> bool:
+    """
+    Whether the Add Contacts `window` shows the profile of `wechat_id`,
+    i.e. has a text such as "WeChat ID: <id>" (or "微信号：<id>").
+    """
+
+    def is_id_text(el, role, title, identifier):
+        if role != kAXStaticTextRole:
+            return False
+        value = ax_get(el, kAXValueAttribute)
+        if not isinstance(value, str):
+            return False
+        return value.replace("：", ":").rpartition(":")[2].strip() == wechat_id
+
+    return dfs(window, is_id_text) is not None
+
+
+def _text_value(window, role: str, title: str) -> str | None:
+    def is_field(el, el_role, el_title, identifier):
+        return el_role == role and el_title == title
+
+    field = dfs(window, is_field)
+    if field is None:
+        return None
+    value = ax_get(field, kAXValueAttribute)
+    return value if isinstance(value, str) else ""
+
+
+def _checkbox_value(window, title: str) -> bool | None:
+    def is_checkbox(el, role, checkbox_title, identifier):
+        return role == kAXCheckBoxRole and checkbox_title == title
+
+    checkbox = dfs(window, is_checkbox)
+    if checkbox is None:
+        return None
+    return bool(ax_get(checkbox, kAXValueAttribute))
+
+
+@dataclass
+class _FriendRequestFlow:
+    """
+    State of the friend-request flow for one ID, filled in by its stages.
+    """
+
+    ax_app: Any
+    wechat_id: str
+    friending_msg: str | None
+    remark: str | None
+    tags: str | None
+    privacy: str | None
+    hide_my_posts: bool
+    hide_their_posts: bool
+    add_window: Any = None
+    request_window: Any = None
+    ok_button: Any = None
+    applied_privacy: str = "all"
+    applied_hide_my_posts: bool = False
+    applied_hide_their_posts: bool = False
+
+
+def _close_previous_windows(flow: _FriendRequestFlow) -> None:
+    # Windows left over from an earlier ID would otherwise be picked up
+    # by the window waits below before the new ones open.
+    for title in ("Send Friend Request", "Add Contacts"):
+        if not _close_window(flow.ax_app, title):
+            raise StageFailed(f"Could not close {title!r}")
+
+
+def _search_wechat_id(flow: _FriendRequestFlow) -> None:
+    logger.info("Typing WeChat ID into global search")
+    type_search_query(flow.ax_app, flow.wechat_id)
+    if not _click_more_card_by_title(flow.ax_app, "Search WeChat ID"):
+        raise StageFailed(
+            "Could not find a 'Search WeChat ID' entry in the "
+            "More section of WeChat's global search results."
+        )
+
+
+def _open_add_contacts_window(flow: _FriendRequestFlow) -> None:
+    flow.add_window = _wait_for_window(flow.ax_app, "Add Contacts", timeout=5.0)
+    if flow.add_window is None:
+        raise StageFailed(
+            "The 'Add Contacts' window did not appear after selecting "
+            "Search WeChat ID."
+        )
+
+
+def _find_add_contacts_window(flow: _FriendRequestFlow) -> bool:
+    flow.add_window = _find_window_by_title(flow.ax_app, "Add Contacts")
+    if flow.add_window is None:
+        return False
+    if not _shows_wechat_id(flow.add_window, flow.wechat_id):
+        logger.info("The open Add Contacts window is not for %s", flow.wechat_id)
+        return False
+    return True
+
+
+def _open_request_window(flow: _FriendRequestFlow) -> None:
+    flow.request_window = _wait_for_window(
+        flow.ax_app, "Send Friend Request", timeout=5.0
+    )
+    if flow.request_window is None:
+        raise StageFailed(
+            "The 'Send Friend Request' window did not appear after "
+            "clicking 'Add to Contacts'."
+        )
+
+
+def _find_request_window(flow: _FriendRequestFlow) -> bool:
+    # The request window does not show the ID. It is opened from, and
+    # stays above, the Add Contacts window found (and checked) before.
+    flow.request_window = _find_window_by_title(flow.ax_app, "Send Friend Request")
+    return flow.request_window is not None
+
+
+def _configure_request(flow: _FriendRequestFlow) -> None:
+    # The window is ready once its OK button is there.
+    flow.ok_button = _wait_for_element(flow.request_window, _is_ok_button, timeout=3.0)
+    if flow.ok_button is None:
+        raise StageFailed(
+            "Could not find 'OK' button in Send Friend Request window.",
+            stage="confirm_request",
+        )
+    flow.applied_privacy = _configure_friend_request_window(
+        flow.request_window,
+        friending_msg=flow.friending_msg,
+        remark=flow.remark,
+        tags=flow.tags,
+        privacy=flow.privacy,
+        hide_my_posts=flow.hide_my_posts,
+        hide_their_posts=flow.hide_their_posts,
+    )
+    _read_back_settings(flow)
+
+
+def _read_back_settings(flow: _FriendRequestFlow) -> None:
+    # The hide checkboxes are only shown while "Chats, Moments, WeRun,
+    # etc." is selected.
+    hide_my_posts = _checkbox_value(flow.request_window, "Hide My Posts")
+    hide_their_posts = _checkbox_value(flow.request_window, "Hide Their Posts")
+    flow.applied_privacy = "chats_only" if hide_my_posts is None else "all"
+    flow.applied_hide_my_posts = bool(hide_my_posts)
+    flow.applied_hide_their_posts = bool(hide_their_posts)
+
+
+def _find_ok_button(flow: _FriendRequestFlow) -> bool:
+    flow.ok_button = dfs(flow.request_window, _is_ok_button)
+    if flow.ok_button is None:
+        return False
+    _read_back_settings(flow)
+    expected = {
+        "friending message": (
+            flow.friending_msg,
+            _text_value(flow.request_window, kAXTextAreaRole, "Send Friend Request"),
+        ),
+        "remark": (
+            flow.remark,
+            _text_value(flow.request_window, kAXTextFieldRole, "ModifyRemark"),
+        ),
+        "privacy": (_normalize_privacy(flow.privacy), flow.applied_privacy),
+    }
+    if flow.applied_privacy == "all":
+        expected["hide_my_posts"] = (flow.hide_my_posts, flow.applied_hide_my_posts)
+        expected["hide_their_posts"] = (
+            flow.hide_their_posts,
+            flow.applied_hide_their_posts,
+        )
+    for setting, (wanted, shown) in expected.items():
+        if wanted is not None and wanted != shown:
+            logger.info(
+                "The open friend request has %s %r, not %r", setting, shown, wanted
+            )
+            return False
+    return True
+
+
+def _confirm_request(flow: _FriendRequestFlow) -> None:
+    logger.info("Clicking 'OK' to send friend request")
+    try:
+        click_element_center(flow.ok_button)
+    except RuntimeError as e:
+        raise StageFailed(
+            f"Failed to click OK button: {e}", stage="click_ok_button"
+        ) from e
+    if not _wait_for_window_closed(flow.ax_app, "Send Friend Request", timeout=5.0):
+        raise StageFailed(
+            "The 'Send Friend Request' window stayed open after clicking 'OK'."
+        )
+
+
+FRIEND_REQUEST_STAGES: StageMachine[_FriendRequestFlow] = StageMachine(
+    "add_contact_by_wechat_id",
+    [
+        Stage("close_previous_window", _close_previous_windows),
+        Stage("search_wechat_id", _search_wechat_id),
+        Stage(
+            "add_contacts_window", _open_add_contacts_window, _find_add_contacts_window
+        ),
+        Stage(
+            "click_add_to_contacts_button",
+            lambda flow: _click_add_to_contacts_button(flow.add_window),
+        ),
+        Stage("send_friend_request_window", _open_request_window, _find_request_window),
+        Stage("configure_request", _configure_request, _find_ok_button),
+        Stage("confirm_request", _confirm_request),
+    ],
+)
+
+
+@timed("add_contact.friend_request")
+def _send_friend_request(
+    ax_app: Any,
+    wechat_id: str,
+    friending_msg: str | None,
+    remark: str | None,
+    tags: str | None,
+    privacy: str | None,
+    hide_my_posts: bool,
+    hide_their_posts: bool,
+    resume_from: str | None = None,
+) -> dict[str, Any]:
+    """
+    Run the search → Add Contacts → Send Friend Request flow for one ID,
+    waiting for each window and control to be ready instead of sleeping
+    for fixed intervals. Returns the applied settings or an error dict
+    with the failing "stage" and the stage to pass as `resume_from` to
+    retry only that step, reusing the windows already open.
+    """
+    flow = _FriendRequestFlow(
+        ax_app,
+        wechat_id,
+        friending_msg=friending_msg,
+        remark=remark,
+        tags=tags,
+        privacy=privacy,
+        hide_my_posts=hide_my_posts,
+        hide_their_posts=hide_their_posts,
+    )
+    outcome = FRIEND_REQUEST_STAGES.run(flow, resume_from=resume_from)
+    if not outcome.ok:
+        return {**outcome.error_dict(), "wechat_id": wechat_id}
+
+    result: dict[str, Any] = {
+        "wechat_id": wechat_id,
+        "friending_msg": friending_msg,
+        "remark": remark,
+        "tags": tags,
+        "privacy": flow.applied_privacy,
+    }
+    if flow.applied_privacy == "all":
+        result["hide_my_posts"] = flow.applied_hide_my_posts
+        result["hide_their_posts"] = flow.applied_hide_their_posts
+    if outcome.resumed_from is not None:
+        result["resumed_from"] = outcome.resumed_from
+
+    logger.info("Friend request flow completed for ID=%s", wechat_id)
+    return result
+
+
 def add_contact_by_wechat_id(
     wechat_id: str,
     friending_msg: str | None = None,
@@ -261,6 +550,7 @@ def add_contact_by_wechat_id(
     privacy: str | None = None,
     hide_my_posts: bool = False,
     hide_their_posts: bool = False,
+    resume_from: str | None = None,
 ) -> dict[str, Any]:
     """
     Add a contact by WeChat ID using WeChat's global search and the
@@ -278,120 +568,32 @@ def add_contact_by_wechat_id(
     - "all" (default) selects "Chats, Moments, WeRun, etc." and applies
       the hide_my_posts / hide_their_posts flags.
     - "chats_only" selects "Chats Only" and ignores the hide flags.
+
+    A failed result carries the failing "stage" and "resume_from". To
+    retry, call again with the same arguments and that `resume_from`:
+    the windows the earlier steps opened are found again and only the
+    failed step and the ones after it run. Resuming fails if those
+    windows show another WeChat ID or settings other than the ones
+    passed. The returned privacy and hide flags are read back from the
+    Send Friend Request window.
     """
     logger.info("Starting add_contact_by_wechat_id for ID=%s", wechat_id)
+    invalid = FRIEND_REQUEST_STAGES.check_resume(resume_from)
+    if invalid is not None:
+        return {"error": invalid, "wechat_id": wechat_id, "stage": "validate_input"}
     try:
         ax_app = get_wechat_ax_app()
-
-        # Step 1: global search
-        logger.info("Typing WeChat ID into global search")
-        focus_and_type_search(ax_app, wechat_id)
-        time.sleep(0.4)
-
-        # Step 2: click "Search WeChat ID" card in More section
-        if not _click_more_card_by_title(ax_app, "Search WeChat ID"):
-            error_msg = (
-                "Could not find a 'Search WeChat ID' entry in the "
-                "More section of WeChat's global search results."
-            )
-            logger.warning(
-                "add_contact_by_wechat_id(%s) failed at Search WeChat ID step",
-                wechat_id,
-            )
-            return {
-                "error": error_msg,
-                "wechat_id": wechat_id,
-                "stage": "search_wechat_id",
-            }
-
-        # Step 3a: Add Contacts window
-        add_window = _wait_for_window(ax_app, "Add Contacts", timeout=5.0)
-        if add_window is None:
-            error_msg = (
-                "The 'Add Contacts' window did not appear after selecting "
-                "Search WeChat ID."
-            )
-            return {
-                "error": error_msg,
-                "wechat_id": wechat_id,
-                "stage": "add_contacts_window",
-            }
-
-        # Wait a moment for the button to appear
-        time.sleep(2)
-
-        # Step 3b: Click "Add to Contacts" button
-        try:
-            _click_add_to_contacts_button(add_window)
-        except RuntimeError as e:
-            return {
-                "error": str(e),
-                "wechat_id": wechat_id,
-                "stage": "click_add_to_contacts_button",
-            }
-
-        # Step 4: Send Friend Request window
-        request_window = _wait_for_window(ax_app, "Send Friend Request", timeout=5.0)
-        if request_window is None:
-            error_msg = (
-                "The 'Send Friend Request' window did not appear after "
-                "clicking 'Add to Contacts'."
-            )
-            return {
-                "error": error_msg,
-                "wechat_id": wechat_id,
-                "stage": "send_friend_request_window",
-            }
-
-        applied_privacy = _configure_friend_request_window(
-            request_window,
+        return _send_friend_request(
+            ax_app,
+            wechat_id,
             friending_msg=friending_msg,
             remark=remark,
             tags=tags,
             privacy=privacy,
             hide_my_posts=hide_my_posts,
             hide_their_posts=hide_their_posts,
+            resume_from=resume_from,
         )
-
-        # Final step: click OK
-
-        def is_ok_button(el, role, title, identifier):
-            return role == kAXButtonRole and isinstance(title, str) and title == "OK"
-
-        ok_button = dfs(request_window, is_ok_button)
-        if ok_button is None:
-            error_msg = "Could not find 'OK' button in Send Friend Request window."
-            logger.warning(error_msg)
-            return {
-                "error": error_msg,
-                "wechat_id": wechat_id,
-                "stage": "confirm_request",
-            }
-
-        logger.info("Clicking 'OK' to send friend request")
-        try:
-            click_element_center(ok_button)
-            time.sleep(0.4)
-        except RuntimeError as e:
-            return {
-                "error": f"Failed to click OK button: {e}",
-                "wechat_id": wechat_id,
-                "stage": "click_ok_button",
-            }
-
-        result: dict[str, Any] = {
-            "wechat_id": wechat_id,
-            "friending_msg": friending_msg,
-            "remark": remark,
-            "tags": tags,
-            "privacy": applied_privacy,
-        }
-        if applied_privacy == "all":
-            result["hide_my_posts"] = hide_my_posts
-            result["hide_their_posts"] = hide_their_posts
-
-        logger.info("Friend request flow completed for ID=%s", wechat_id)
-        return result
     except Exception as exc:  # noqa: BLE001
         logger.exception(
             "Error while adding contact by WeChat ID %s: %s", wechat_id, exc
@@ -400,3 +602,73 @@ def add_contact_by_wechat_id(
             "error": str(exc),
             "wechat_id": wechat_id,
         }
+
+
+def add_contacts_by_wechat_ids(
+    requests: list[AddContactRequest],
+    checkpoint: AddContactCheckpoint | None = None,
+    between_items: Callable[[], bool] | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Send friend requests to several WeChat IDs, yielding one result per
+    ID as soon as it completes.
+
+    IDs that already succeeded in an earlier, interrupted run of the
+    same batch (same IDs and options in the same order) are taken from
+    `checkpoint` and yielded first with "resumed": True, without
+    touching the UI. Every other ID goes through the single-ID flow; its
+    result is recorded in the checkpoint on success, and the "Add
+    Contacts" window is closed before the next ID. Each result has
+    "index" and "wechat_id", plus either the applied settings or "error"
+    and "stage". The checkpoint is dropped once every ID has succeeded.
+    Cancelling the job stops the batch instead of failing the current ID.
+
+    `between_items` is called before each ID after the first, so that
+    more urgent UI work can run in between.
+    """
+    key = batch_key(requests)
+    done = checkpoint.completed(key) if checkpoint is not None else {}
+    pending = []
+    for request in requests:
+        if request.wechat_id in done:
+            yield {**done[request.wechat_id], "index": request.index, "resumed": True}
+        else:
+            pending.append(request)
+    if done:
+        logger.info(
+            "Resuming add-contacts batch %s: %d of %d IDs already done",
+            key,
+            len(requests) - len(pending),
+            len(requests),
+        )
+
+    ax_app = get_wechat_ax_app()
+    all_ok = True
+    for position, request in enumerate(pending):
+        raise_if_cancelled()
+        if position and between_items is not None:
+            between_items()
+
+        try:
+            result = _send_friend_request(ax_app, request.wechat_id, **request.options)
+        except OperationCancelled:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(
+                "Error while adding contact by WeChat ID %s: %s", request.wechat_id, exc
+            )
+            result = {
+                "error": str(exc),
+                "wechat_id": request.wechat_id,
+                "stage": "unexpected_error",
+            }
+        if "error" in result:
+            all_ok = False
+        elif checkpoint is not None:
+            checkpoint.record(key, request.wechat_id, result)
+
+        _close_window(ax_app, "Add Contacts")
+        yield {**result, "index": request.index}
+
+    if all_ok and checkpoint is not None:
+        checkpoint.finish(key)
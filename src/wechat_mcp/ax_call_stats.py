@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+COPY = "copy"
+SET = "set"
+PERFORM = "perform"
+CALL_KINDS: tuple[str, ...] = (COPY, SET, PERFORM)
+
+
+class AXCallCounts:
+    """
+    Accessibility IPC calls made during one tool invocation (or in
+    total), per kind ("copy", "set", "perform") and per attribute or
+    action name.
+    """
+
+    def __init__(self, label: str = "") -> None:
+        self.label = label
+        self.calls: dict[str, Counter[str]] = {kind: Counter() for kind in CALL_KINDS}
+
+    def add(self, kind: str, name: str) -> None:
+        self.calls[kind][name] += 1
+
+    def total(self, kind: str | None = None) -> int:
+        if kind is not None:
+            return sum(self.calls[kind].values())
+        return sum(self.total(k) for k in CALL_KINDS)
+
+    def to_dict(self) -> dict[str, Any]:
+        result: dict[str, Any] = {"label": self.label, "total": self.total()}
+        for kind in CALL_KINDS:
+            result[kind] = {
+                "total": self.total(kind),
+                "by_name": dict(self.calls[kind].most_common()),
+            }
+        return result
+
+
+class AXCallAccounting:
+    """
+    Count the AX calls made through ax_calls, in total and per tool
+    invocation. Invocations are tracked per thread and may nest (a
+    preempting job runs inside a batch); calls count towards the
+    innermost one.
+    """
+
+    def __init__(self, recent_invocations: int = 20) -> None:
+        self._lock = threading.Lock()
+        self._totals = AXCallCounts("total")
+        self._recent: deque[dict[str, Any]] = deque(maxlen=recent_invocations)
+        self._local = threading.local()
+
+    def count(self, kind: str, name: Any) -> None:
+        name = str(name)
+        with self._lock:
+            self._totals.add(kind, name)
+        stack = getattr(self._local, "stack", None)
+        if stack:
+            stack[-1].add(kind, name)
+
+    @contextmanager
+    def invocation(self, label: str) -> Iterator[AXCallCounts]:
+        counts = AXCallCounts(label)
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(counts)
+        try:
+            yield counts
+        finally:
+            stack.pop()
+            with self._lock:
+                self._recent.append(counts.to_dict())
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "totals": self._totals.to_dict(),
+                "recent_invocations": list(self._recent),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals = AXCallCounts("total")
+            self._recent.clear()
+
+
+ax_call_accounting = AXCallAccounting()
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Any
+
+from .ax_call_stats import COPY, PERFORM, SET, ax_call_accounting
+from .driver import get_driver
+
+# Every Accessibility IPC call of the server goes through these three
+# functions so that ax_call_accounting sees it. Each one is a round trip
+# to WeChat, which is what dominates the cost of most tools.
+
+
+def ax_copy_attribute(element: Any, attribute: str) -> tuple[int, Any]:
+    ax_call_accounting.count(COPY, attribute)
+    return get_driver().copy_attribute(element, attribute)
+
+
+def ax_set_attribute(element: Any, attribute: str, value: Any) -> int:
+    ax_call_accounting.count(SET, attribute)
+    return get_driver().set_attribute(element, attribute, value)
+
+
+def ax_perform_action(element: Any, action: str) -> int:
+    ax_call_accounting.count(PERFORM, action)
+    return get_driver().perform_action(element, action)
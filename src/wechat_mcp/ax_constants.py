@@ -0,0 +1,56 @@
+"""
+Accessibility and event constants used by the UI flows.
+
+These are the values pyobjc exposes from ApplicationServices and Quartz,
+spelled out here so that the flows can be imported (and run against the
+simulator driver) on machines without pyobjc.
+"""
+
+from __future__ import annotations
+
+# Attributes
+kAXChildrenAttribute = "AXChildren"
+kAXCloseButtonAttribute = "AXCloseButton"
+kAXIdentifierAttribute = "AXIdentifier"
+kAXIndexAttribute = "AXIndex"
+kAXParentAttribute = "AXParent"
+kAXPositionAttribute = "AXPosition"
+kAXRoleAttribute = "AXRole"
+kAXSizeAttribute = "AXSize"
+kAXTitleAttribute = "AXTitle"
+kAXValueAttribute = "AXValue"
+
+# Roles
+kAXApplicationRole = "AXApplication"
+kAXButtonRole = "AXButton"
+kAXCellRole = "AXCell"
+kAXCheckBoxRole = "AXCheckBox"
+kAXGroupRole = "AXGroup"
+kAXListRole = "AXList"
+kAXRowRole = "AXRow"
+kAXSheetRole = "AXSheet"
+kAXStaticTextRole = "AXStaticText"
+kAXTextAreaRole = "AXTextArea"
+kAXTextFieldRole = "AXTextField"
+kAXWindowRole = "AXWindow"
+
+# Actions
+kAXPressAction = "AXPress"
+kAXRaiseAction = "AXRaise"
+
+# AXError values
+kAXErrorSuccess = 0
+kAXErrorIllegalArgument = -25201
+kAXErrorInvalidUIElement = -25202
+kAXErrorCannotComplete = -25204
+kAXErrorAttributeUnsupported = -25205
+kAXErrorActionUnsupported = -25206
+kAXErrorNoValue = -25212
+
+# CGEventFlags
+kCGEventFlagMaskCommand = 1 << 20
+
+# Virtual key codes (US layout)
+KEYCODE_A = 0
+KEYCODE_V = 9
+KEYCODE_RETURN = 36
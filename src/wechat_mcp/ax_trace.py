@@ -0,0 +1,737 @@
+"""
+Record the Accessibility traffic of tool calls and replay it later.
+
+With WECHAT_MCP_AX_TRACE_DIR set, every UI tool call is recorded through
+a RecordingDriver into a gzipped JSON Lines trace in that directory:
+each AX read (element id, attribute, error and decoded result), AX write
+and action, synthesized mouse, scroll and key event, pasteboard write,
+wait and screenshot region (with its pixels, unless
+WECHAT_MCP_AX_TRACE_SCREENSHOTS=0). Element handles are replaced by
+small integer ids, in order of first appearance.
+
+ReplayDriver serves such a trace back, so a flow can be re-run on any
+platform against the tree that WeChat showed when the trace was
+recorded:
+
+    python -m wechat_mcp.ax_trace replay TRACE fetch_recent_messages --last-n 50
+
+reports the AX calls of the recording and of the replay, plus CPU and
+wall time, so that versions of the flows can be compared on the same
+input.
+
+Replay model: input events (AX writes and actions, mouse, scroll and
+keys) divide the trace into epochs, the UI states between two events.
+Within an epoch, the recorded answers to each (element, attribute) read
+are served in order, the last one repeating, so polling loops see the
+UI change as it did. A read that was not recorded in the current epoch
+gets the latest earlier answer ("stale"), or kAXErrorCannotComplete when
+the element was never read ("missing"). An input event is matched with
+the next recorded event of the same kind (and element); if there is
+none, replay has diverged and ReplayDivergence is raised.
+"""
+
+from __future__ import annotations
+
+import base64
+import gzip
+import json
+import os
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from .ax_constants import (
+    kAXErrorCannotComplete,
+    kAXPositionAttribute,
+    kAXSizeAttribute,
+)
+from .driver import (
+    DelegatingDriver,
+    DelegatingRunningApp,
+    Driver,
+    RunningApp,
+    get_driver,
+    use_driver,
+)
+from .logging_config import logger
+
+TRACE_VERSION = 1
+
+# Record kinds. Input events start a new epoch during replay.
+COPY = "copy"
+SET = "set"
+PERFORM = "perform"
+MOUSE_DOWN = "down"
+MOUSE_UP = "up"
+SCROLL = "scroll"
+KEY = "key"
+INPUT_EVENTS = (SET, PERFORM, MOUSE_DOWN, MOUSE_UP, SCROLL, KEY)
+
+
+class ReplayDivergence(RuntimeError):
+    """
+    The replayed flow sent an input event the recorded run did not.
+    """
+
+
+@dataclass(frozen=True)
+class TraceElement:
+    """
+    An element handle served by ReplayDriver.
+    """
+
+    id: int
+
+
+@dataclass(frozen=True)
+class TracePoint:
+    x: float
+    y: float
+
+
+@dataclass(frozen=True)
+class TraceSize:
+    width: float
+    height: float
+
+
+class TraceImage:
+    """
+    A recorded screenshot as RGB bytes, with the parts of the PIL Image
+    interface the sender classifier uses.
+    """
+
+    def __init__(self, width: int, height: int, data: bytes) -> None:
+        self.width = width
+        self.height = height
+        self.data = data
+
+    @classmethod
+    def blank(cls, width: int, height: int) -> TraceImage:
+        return cls(width, height, bytes(3 * width * height))
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def crop(self, box: tuple[int, int, int, int]) -> TraceImage:
+        left, top, right, bottom = box
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(self.width, right), min(self.height, bottom)
+        width, height = max(0, right - left), max(0, bottom - top)
+        rows = [
+            self.data[3 * (y * self.width + left) : 3 * (y * self.width + right)]
+            for y in range(top, top + height)
+        ]
+        return TraceImage(width, height, b"".join(rows))
+
+    def convert(self, mode: str) -> TraceImage:
+        return self
+
+    def tobytes(self) -> bytes:
+        return self.data
+
+    def load(self) -> _TracePixels:
+        return _TracePixels(self)
+
+
+class _TracePixels:
+    def __init__(self, image: TraceImage) -> None:
+        self._data = image.data
+        self._width = image.width
+
+    def __getitem__(self, xy: tuple[int, int]) -> tuple[int, int, int]:
+        x, y = xy
+        i = 3 * (y * self._width + x)
+        return self._data[i], self._data[i + 1], self._data[i + 2]
+
+
+# Recording -----------------------------------------------------------------
+
+
+class _RecordingRunningApp(DelegatingRunningApp):
+    def __init__(self, app: RunningApp, recorder: RecordingDriver) -> None:
+        super().__init__(app)
+        self._recorder = recorder
+
+    def activate(self) -> None:
+        self._recorder._record("activate")
+        self.inner.activate()
+
+
+class RecordingDriver(DelegatingDriver):
+    """
+    Pass every call through to `inner` and record it for replay.
+
+    Values that are not numbers, strings or lists are taken to be
+    element handles, except AXPosition and AXSize values, which are
+    stored decoded.
+    """
+
+    name = "recording"
+
+    def __init__(
+        self, inner: Driver, label: str = "", screenshots: bool = True
+    ) -> None:
+        super().__init__(inner)
+        self.label = label
+        self.screenshots = screenshots
+        self.records: list[dict[str, Any]] = []
+        self._ids: dict[Any, int] = {}
+        self._started = time.monotonic()
+
+    def _record(self, kind: str, **fields: Any) -> None:
+        elapsed_ms = round((time.monotonic() - self._started) * 1000.0, 1)
+        self.records.append({"k": kind, "t": elapsed_ms, **fields})
+
+    def _element_id(self, element: Any) -> int:
+        element_id = self._ids.get(element)
+        if element_id is None:
+            element_id = self._ids[element] = len(self._ids)
+        return element_id
+
+    def _encode(self, value: Any, attribute: str = "") -> Any:
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if attribute == kAXPositionAttribute:
+            point = self.inner.point_value(value)
+            return {"$pt": list(point)} if point is not None else None
+        if attribute == kAXSizeAttribute:
+            size = self.inner.size_value(value)
+            return {"$sz": list(size)} if size is not None else None
+        if isinstance(value, (list, tuple)) or type(value).__name__.endswith(
+            "Array"
+        ):
+            return [self._encode(item) for item in value]
+        return {"$el": self._element_id(value)}
+
+    # Accessibility
+    def copy_attribute(self, element: Any, attribute: str) -> tuple[int, Any]:
+        err, value = self.inner.copy_attribute(element, attribute)
+        self._record(
+            COPY,
+            e=self._element_id(element),
+            a=attribute,
+            r=err,
+            v=self._encode(value, attribute) if err == 0 else None,
+        )
+        return err, value
+
+    def set_attribute(self, element: Any, attribute: str, value: Any) -> int:
+        err = self.inner.set_attribute(element, attribute, value)
+        self._record(
+            SET,
+            e=self._element_id(element),
+            a=attribute,
+            v=self._encode(value),
+            r=err,
+        )
+        return err
+
+    def perform_action(self, element: Any, action: str) -> int:
+        err = self.inner.perform_action(element, action)
+        self._record(PERFORM, e=self._element_id(element), a=action, r=err)
+        return err
+
+    # Applications
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        app = self.inner.running_application(bundle_id)
+        if app is None:
+            self._record("app", b=bundle_id, pid=None)
+            return None
+        # Creating the application element is free (no IPC), and it
+        # compares equal to the one cached by wechat_session, so replay
+        # learns which element id is the application.
+        element = self.inner.application_element(app.pid)
+        self._record(
+            "app",
+            b=bundle_id,
+            pid=app.pid,
+            active=app.is_active(),
+            e=self._element_id(element),
+        )
+        return _RecordingRunningApp(app, self)
+
+    # Input
+    def mouse_down(self, x: float, y: float) -> None:
+        self._record(MOUSE_DOWN, x=round(x, 1), y=round(y, 1))
+        self.inner.mouse_down(x, y)
+
+    def mouse_up(self, x: float, y: float) -> None:
+        self._record(MOUSE_UP, x=round(x, 1), y=round(y, 1))
+        self.inner.mouse_up(x, y)
+
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        self._record(SCROLL, x=round(x, 1), y=round(y, 1), d=delta_lines)
+        self.inner.scroll(x, y, delta_lines)
+
+    def key_press(self, keycode: int, flags: int = 0) -> None:
+        self._record(KEY, c=keycode, f=flags)
+        self.inner.key_press(keycode, flags)
+
+    # Pasteboard
+    def pasteboard_set_text(self, text: str) -> None:
+        self._record("paste", v=text)
+        self.inner.pasteboard_set_text(text)
+
+    # Screen
+    def grab_screen(self, bbox: tuple[int, int, int, int]) -> Any:
+        image = self.inner.grab_screen(bbox)
+        fields: dict[str, Any] = {"bbox": list(bbox), "size": list(image.size)}
+        if self.screenshots:
+            data = zlib.compress(image.convert("RGB").tobytes(), 6)
+            fields["rgb"] = base64.b64encode(data).decode("ascii")
+        self._record("screen", **fields)
+        return image
+
+    # Time
+    def sleep(self, seconds: float) -> None:
+        self._record("sleep", s=seconds)
+        self.inner.sleep(seconds)
+
+    def header(self) -> dict[str, Any]:
+        return {
+            "k": "header",
+            "version": TRACE_VERSION,
+            "label": self.label,
+            "driver": self.inner.name,
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+            "screenshots": self.screenshots,
+        }
+
+    def save(self, path: str | os.PathLike[str]) -> Path:
+        """
+        Write the trace as gzipped JSON Lines, header first.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(path, "wt", encoding="utf-8") as fh:
+            for record in [self.header(), *self.records]:
+                fh.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                fh.write("\n")
+        return path
+
+
+def _trace_dir() -> Path | None:
+    trace_dir = os.getenv("WECHAT_MCP_AX_TRACE_DIR", "").strip()
+    if not trace_dir:
+        return None
+    return Path(trace_dir).expanduser().resolve()
+
+
+def _prune_traces(trace_dir: Path, keep: int) -> None:
+    traces = sorted(trace_dir.glob("*.jsonl.gz"), key=lambda p: p.stat().st_mtime)
+    for old in traces[: max(0, len(traces) - keep)]:
+        old.unlink(missing_ok=True)
+
+
+@contextmanager
+def ax_trace_recording(label: str) -> Iterator[RecordingDriver | None]:
+    """
+    Record the block into a trace file when WECHAT_MCP_AX_TRACE_DIR is
+    set; otherwise do nothing. Only the newest WECHAT_MCP_AX_TRACE_KEEP
+    traces (default 50) are kept.
+    """
+    trace_dir = _trace_dir()
+    if trace_dir is None or isinstance(get_driver(), RecordingDriver):
+        yield None
+        return
+
+    screenshots = os.getenv("WECHAT_MCP_AX_TRACE_SCREENSHOTS", "1") != "0"
+    recorder = RecordingDriver(get_driver(), label=label, screenshots=screenshots)
+    try:
+        with use_driver(recorder):
+            yield recorder
+    finally:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        try:
+            path = recorder.save(trace_dir / f"{stamp}-{label}.jsonl.gz")
+            _prune_traces(trace_dir, int(os.getenv("WECHAT_MCP_AX_TRACE_KEEP", "50")))
+            logger.info(
+                "Recorded %d AX trace events to %s", len(recorder.records), path
+            )
+        except OSError as exc:
+            logger.warning("Could not write AX trace for %s: %s", label, exc)
+
+
+# Replay --------------------------------------------------------------------
+
+
+def load_trace(path: str | os.PathLike[str]) -> tuple[dict[str, Any], list[dict]]:
+    """
+    Read a trace file, returning its header and records.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        lines = [json.loads(line) for line in fh if line.strip()]
+    if not lines or lines[0].get("k") != "header":
+        raise ValueError(f"{path} is not an AX trace")
+    header = lines[0]
+    if header.get("version") != TRACE_VERSION:
+        raise ValueError(f"Unsupported AX trace version {header.get('version')}")
+    return header, lines[1:]
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        if "$el" in value:
+            return TraceElement(value["$el"])
+        if "$pt" in value:
+            return TracePoint(*value["$pt"])
+        if "$sz" in value:
+            return TraceSize(*value["$sz"])
+    return value
+
+
+class _ReplayRunningApp(RunningApp):
+    def __init__(self, pid: int, active: bool) -> None:
+        self.pid = pid
+        self.active = active
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def activate(self) -> None:
+        self.active = True
+
+
+class ReplayDriver(Driver):
+    """
+    Serve a recorded trace (see the module docstring for the model).
+
+    `counts` tallies the calls of the replayed flow by kind; `served`,
+    `stale` and `missing` count how AX reads were answered, and
+    `skipped_events` the recorded input events the replay jumped over.
+    """
+
+    name = "replay"
+
+    def __init__(self, header: dict[str, Any], records: list[dict[str, Any]]) -> None:
+        self.header = header
+        self.records = records
+        self.counts: Counter[str] = Counter()
+        self.served = 0
+        self.stale = 0
+        self.missing = 0
+        self.skipped_events = 0
+
+        # Input events in trace order, with the epoch each one starts.
+        self._events: list[dict[str, Any]] = []
+        self._answers: dict[tuple[int, int, str], list[tuple[int, Any]]] = {}
+        self._key_epochs: dict[tuple[int, str], list[int]] = {}
+        self._screens: list[dict[str, Any]] = []
+        self._apps: dict[str, dict[str, Any]] = {}
+        epoch = 0
+        for record in records:
+            kind = record["k"]
+            if kind in INPUT_EVENTS:
+                epoch += 1
+                self._events.append(record)
+            elif kind == COPY:
+                key = (record["e"], record["a"])
+                answers = self._answers.setdefault((epoch, *key), [])
+                if not answers:
+                    self._key_epochs.setdefault(key, []).append(epoch)
+                answers.append((record["r"], record.get("v")))
+            elif kind == "screen":
+                self._screens.append(record)
+            elif kind == "app":
+                self._apps.setdefault(record["b"], record)
+
+        self._epoch = 0
+        self._next_event = 0
+        self._cursors: Counter[tuple[int, int, str]] = Counter()
+        self._next_screen = 0
+        # Waits take no time in a replay; this clock is advanced by them.
+        self._now = 0.0
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> ReplayDriver:
+        header, records = load_trace(path)
+        return cls(header, records)
+
+    def recorded_counts(self) -> dict[str, int]:
+        counts = Counter(record["k"] for record in self.records)
+        return dict(sorted(counts.items()))
+
+    def _match_event(self, kind: str, element: Any = None) -> dict[str, Any]:
+        element_id = element.id if isinstance(element, TraceElement) else None
+        for index in range(self._next_event, len(self._events)):
+            event = self._events[index]
+            if event["k"] != kind:
+                continue
+            if element_id is not None and event.get("e") != element_id:
+                continue
+            self.skipped_events += index - self._next_event
+            self._next_event = index + 1
+            self._epoch = index + 1
+            return event
+        raise ReplayDivergence(
+            f"No recorded {kind} event left to match (after event "
+            f"{self._next_event} of {len(self._events)})"
+        )
+
+    # Accessibility
+    def copy_attribute(self, element: Any, attribute: str) -> tuple[int, Any]:
+        self.counts[COPY] += 1
+        if not isinstance(element, TraceElement):
+            return kAXErrorCannotComplete, None
+        key = (self._epoch, element.id, attribute)
+        answers = self._answers.get(key)
+        if answers is not None:
+            cursor = self._cursors[key]
+            self._cursors[key] = cursor + 1
+            self.served += 1
+            err, value = answers[min(cursor, len(answers) - 1)]
+            return err, _decode(value)
+
+        earlier = [
+            e
+            for e in self._key_epochs.get((element.id, attribute), [])
+            if e < self._epoch
+        ]
+        if not earlier:
+            self.missing += 1
+            return kAXErrorCannotComplete, None
+        self.stale += 1
+        err, value = self._answers[(earlier[-1], element.id, attribute)][-1]
+        return err, _decode(value)
+
+    def set_attribute(self, element: Any, attribute: str, value: Any) -> int:
+        self.counts[SET] += 1
+        return self._match_event(SET, element)["r"]
+
+    def perform_action(self, element: Any, action: str) -> int:
+        self.counts[PERFORM] += 1
+        return self._match_event(PERFORM, element)["r"]
+
+    def point_value(self, ax_value: Any) -> tuple[float, float] | None:
+        if not isinstance(ax_value, TracePoint):
+            return None
+        return ax_value.x, ax_value.y
+
+    def size_value(self, ax_value: Any) -> tuple[float, float] | None:
+        if not isinstance(ax_value, TraceSize):
+            return None
+        return ax_value.width, ax_value.height
+
+    # Applications
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        record = self._apps.get(bundle_id)
+        if record is None or record.get("pid") is None:
+            return None
+        return _ReplayRunningApp(record["pid"], bool(record.get("active")))
+
+    def application_element(self, pid: int) -> Any:
+        for record in self._apps.values():
+            if record.get("pid") == pid:
+                return TraceElement(record["e"])
+        return TraceElement(-1)
+
+    def recorded_app(self) -> TraceElement | None:
+        """
+        Return the application element the recorded flow looked up.
+        """
+        for record in self._apps.values():
+            if record.get("pid") is not None:
+                return TraceElement(record["e"])
+        return None
+
+    # Input
+    def mouse_down(self, x: float, y: float) -> None:
+        self.counts[MOUSE_DOWN] += 1
+        self._match_event(MOUSE_DOWN)
+
+    def mouse_up(self, x: float, y: float) -> None:
+        self.counts[MOUSE_UP] += 1
+        self._match_event(MOUSE_UP)
+
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        self.counts[SCROLL] += 1
+        self._match_event(SCROLL)
+
+    def key_press(self, keycode: int, flags: int = 0) -> None:
+        self.counts[KEY] += 1
+        self._match_event(KEY)
+
+    # Pasteboard
+    def pasteboard_save(self) -> Any:
+        return None
+
+    def pasteboard_restore(self, saved: Any) -> None:
+        pass
+
+    def pasteboard_set_text(self, text: str) -> None:
+        pass
+
+    # Screen
+    def grab_screen(self, bbox: tuple[int, int, int, int]) -> TraceImage:
+        """
+        Serve the next recorded screenshot of the same region, or a
+        blank one if there is none (or pixels were not recorded).
+        """
+        self.counts["screen"] += 1
+        left, top, right, bottom = bbox
+        for index in range(self._next_screen, len(self._screens)):
+            record = self._screens[index]
+            if record["bbox"] != list(bbox) or "rgb" not in record:
+                continue
+            self._next_screen = index + 1
+            width, height = record["size"]
+            data = zlib.decompress(base64.b64decode(record["rgb"]))
+            return TraceImage(width, height, data)
+        return TraceImage.blank(right - left, bottom - top)
+
+    # Time
+    def sleep(self, seconds: float) -> None:
+        self.counts["sleep"] += 1
+        self._now += seconds
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def user_idle_seconds(self) -> float:
+        # Nobody is at the keyboard during a replay.
+        return float("inf")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "served": self.served,
+            "stale": self.stale,
+            "missing": self.missing,
+            "skipped_events": self.skipped_events,
+            "unmatched_events": len(self._events) - self._next_event,
+        }
+
+
+def replay(
+    driver: ReplayDriver, flow: str, **kwargs: Any
+) -> tuple[Any, dict[str, Any]]:
+    """
+    Run one of the REPLAY_FLOWS against `driver` and return its result
+    with a report of AX calls and timings.
+    """
+    from .ax_call_stats import ax_call_accounting
+    from .wechat_session import wechat_session
+
+    fn = _replay_flows()[flow]
+    # Hand the application element over directly: the pid-keyed cache
+    # in wechat_session may still hold a live handle for the same pid.
+    if kwargs.get("ax_app") is None and driver.recorded_app() is not None:
+        kwargs["ax_app"] = driver.recorded_app()
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    with (
+        use_driver(driver),
+        wechat_session(f"replay:{flow}"),
+        ax_call_accounting.invocation(f"replay:{flow}") as calls,
+    ):
+        result = fn(**kwargs)
+    report = {
+        "flow": flow,
+        "trace": {
+            "label": driver.header.get("label"),
+            "recorded_at": driver.header.get("recorded_at"),
+            "records": driver.recorded_counts(),
+        },
+        "replayed": dict(sorted(driver.counts.items())),
+        "ax_calls": calls.to_dict(),
+        "cpu_ms": round((time.process_time() - cpu_started) * 1000.0, 1),
+        "wall_ms": round((time.perf_counter() - wall_started) * 1000.0, 1),
+        **driver.stats(),
+    }
+    return result, report
+
+
+def _replay_flows() -> dict[str, Any]:
+    from .fetch_messages_by_chat_utils import fetch_recent_messages
+    from .list_unread_chats_utils import list_session_summaries
+    from .wechat_accessibility import get_current_chat_name, open_chat_for_contact
+
+    return {
+        "fetch_recent_messages": fetch_recent_messages,
+        "open_chat_for_contact": open_chat_for_contact,
+        "list_session_summaries": list_session_summaries,
+        "get_current_chat_name": get_current_chat_name,
+    }
+
+
+REPLAY_FLOWS = (
+    "fetch_recent_messages",
+    "open_chat_for_contact",
+    "list_session_summaries",
+    "get_current_chat_name",
+)
+
+
+def _to_jsonable(result: Any) -> Any:
+    if isinstance(result, list):
+        return [_to_jsonable(item) for item in result]
+    if hasattr(result, "to_dict"):
+        return result.to_dict()
+    return result
+
+
+def main(argv: list[str] | None = None) -> None:
+    # Only the command line needs these; the server imports this module
+    # for ax_trace_recording.
+    import argparse
+    import shutil
+    import tempfile
+
+    parser = argparse.ArgumentParser(
+        prog="python -m wechat_mcp.ax_trace",
+        description="Inspect and replay recorded AX traces.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    summary = commands.add_parser("summary", help="count the records of a trace")
+    summary.add_argument("trace")
+    run = commands.add_parser("replay", help="re-run a flow against a trace")
+    run.add_argument("trace")
+    run.add_argument("flow", choices=REPLAY_FLOWS)
+    run.add_argument("--chat-name", help="for open_chat_for_contact")
+    run.add_argument("--last-n", type=int, default=100)
+    run.add_argument("--include-read", action="store_true")
+    run.add_argument("--show-result", action="store_true")
+    run.add_argument(
+        "--state-dir",
+        help="learned state (routes, contacts) to start from; a copy is used, "
+        "and by default the replay starts from none",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "summary":
+        header, records = load_trace(args.trace)
+        counts = Counter(record["k"] for record in records)
+        print(json.dumps({**header, "records": dict(sorted(counts.items()))}, indent=2))
+        return
+
+    kwargs: dict[str, Any] = {}
+    if args.flow == "fetch_recent_messages":
+        kwargs["last_n"] = args.last_n
+    elif args.flow == "open_chat_for_contact":
+        if not args.chat_name:
+            parser.error("open_chat_for_contact needs --chat-name")
+        kwargs["chat_name"] = args.chat_name
+    elif args.flow == "list_session_summaries":
+        kwargs["only_unread"] = not args.include_read
+    with tempfile.TemporaryDirectory(prefix="wechat-mcp-replay-") as tmp:
+        # Flows learn as they go; keep that out of the real state dir.
+        state_dir = Path(tmp) / "state"
+        if args.state_dir:
+            shutil.copytree(Path(args.state_dir).expanduser(), state_dir)
+        os.environ["WECHAT_MCP_STATE_DIR"] = str(state_dir)
+        result, report = replay(ReplayDriver.load(args.trace), args.flow, **kwargs)
+    if args.show_result:
+        report["result"] = _to_jsonable(result)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .ax_constants import kAXChildrenAttribute, kAXPositionAttribute, kAXValueAttribute
+from .cancellation import raise_if_cancelled
+from .driver import get_driver, pause
+from .fetch_messages_by_chat_utils import get_messages_list
+from .logging_config import logger
+from .perf_stats import timed
+from .text_entry import PASTE
+from .timing_profile import timing_profile
+from .wechat_accessibility import (
+    _collect_search_entries,
+    ax_get,
+    axvalue_to_point,
+    click_element_center,
+    find_search_list,
+    focus_and_type_search,
+    get_list_center,
+    get_wechat_ax_app,
+    post_scroll,
+)
+
+# Query typed into the global search to time typing; a single letter
+# matches enough contacts for a "View All" row, which times clicks.
+CALIBRATION_QUERY = "a"
+
+# Lines scrolled up and back down in the open chat to time scrolling.
+SCROLL_LINES = 5
+
+POLL_INTERVAL = 0.01
+MAX_WAIT = 2.0
+
+
+@dataclass
+class CalibrationResult:
+    """
+    Latencies measured per kind of input (in ms, one per trial), the
+    reason a kind could not be measured, and the resulting profile.
+    """
+
+    samples_ms: dict[str, list[float]] = field(default_factory=dict)
+    skipped: dict[str, str] = field(default_factory=dict)
+    profile: dict[str, Any] = field(default_factory=dict)
+
+    def latencies(self) -> dict[str, float]:
+        """
+        The slowest trial of each measured kind, in seconds.
+        """
+        return {
+            kind: max(samples) / 1000.0
+            for kind, samples in self.samples_ms.items()
+            if samples
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "samples_ms": {
+                kind: [round(ms, 1) for ms in samples]
+                for kind, samples in self.samples_ms.items()
+            },
+            "skipped": dict(self.skipped),
+            "profile": self.profile,
+        }
+
+
+def _time_until(ready: Callable[[], bool]) -> float | None:
+    """
+    Poll `ready()` and return the seconds until it held, or None if it
+    did not within MAX_WAIT of waiting.
+    """
+    started = get_driver().monotonic()
+    waited = 0.0
+    while True:
+        if ready():
+            return get_driver().monotonic() - started
+        if waited >= MAX_WAIT:
+            return None
+        pause(POLL_INTERVAL)
+        waited += POLL_INTERVAL
+
+
+def _list_signature(msg_list: Any) -> tuple[Any, ...]:
+    children = ax_get(msg_list, kAXChildrenAttribute) or []
+    if not children:
+        return ()
+    first = children[0]
+    point = axvalue_to_point(ax_get(first, kAXPositionAttribute))
+    return len(children), ax_get(first, kAXValueAttribute), point
+
+
+def _measure_scroll(ax_app: Any, trials: int, result: CalibrationResult) -> None:
+    try:
+        msg_list = get_messages_list(ax_app)
+        center = get_list_center(msg_list)
+    except RuntimeError as exc:
+        result.skipped["scroll"] = f"no open chat to scroll: {exc}"
+        return
+
+    samples: list[float] = []
+    for _ in range(trials):
+        for delta in (SCROLL_LINES, -SCROLL_LINES):
+            raise_if_cancelled()
+            before = _list_signature(msg_list)
+            post_scroll(center, delta)
+            elapsed = _time_until(lambda: _list_signature(msg_list) != before)
+            if elapsed is not None:
+                samples.append(elapsed * 1000.0)
+    if samples:
+        result.samples_ms["scroll"] = samples
+    else:
+        result.skipped["scroll"] = "the messages list did not move"
+
+
+def _clear_search(ax_app: Any) -> None:
+    focus_and_type_search(ax_app, "", strategies=(PASTE,))
+    _time_until(lambda: find_search_list(ax_app) is None)
+
+
+def _measure_search(ax_app: Any, trials: int, result: CalibrationResult) -> None:
+    typing: list[float] = []
+    clicks: list[float] = []
+    try:
+        for _ in range(trials):
+            raise_if_cancelled()
+            _clear_search(ax_app)
+            entry = focus_and_type_search(
+                ax_app, CALIBRATION_QUERY, strategies=(PASTE,)
+            )
+            if not entry.verified:
+                break
+            elapsed = _time_until(lambda: find_search_list(ax_app) is not None)
+            if elapsed is None:
+                continue
+            typing.append(elapsed * 1000.0)
+
+            search_list = find_search_list(ax_app)
+            view_all = next(
+                (
+                    e
+                    for e in _collect_search_entries(search_list)
+                    if e.text.startswith("View All")
+                ),
+                None,
+            )
+            if view_all is None:
+                continue
+            click_element_center(view_all.element)
+            elapsed = _time_until(
+                lambda: view_all.text
+                not in [e.text for e in _collect_search_entries(search_list)]
+            )
+            if elapsed is not None:
+                clicks.append(elapsed * 1000.0)
+    finally:
+        _clear_search(ax_app)
+
+    if typing:
+        result.samples_ms["typing"] = typing
+    else:
+        result.skipped["typing"] = "no search results appeared"
+    if clicks:
+        result.samples_ms["click"] = clicks
+    else:
+        result.skipped["click"] = (
+            f"no 'View All' row to click for the query {CALIBRATION_QUERY!r}"
+        )
+
+
+@timed("calibrate.timing")
+def calibrate_timing(trials: int = 3, reset: bool = False) -> CalibrationResult:
+    """
+    Measure how quickly WeChat reflects scrolls, typing and clicks on
+    this machine and tune the timing profile from it.
+
+    Scrolls are timed in the open chat (scrolled up and back down),
+    typing by pasting a one-letter query into the global search until
+    its results list appears, and clicks by expanding a "View All" row
+    of those results until the row is replaced. The search is cleared
+    afterwards. Each delay is then set from the slowest trial of what
+    it waits for and persisted; kinds that could not be measured keep
+    their current delays. With `reset`, the profile first goes back to
+    its defaults.
+    """
+    trials = max(1, int(trials))
+    if reset:
+        timing_profile.reset()
+    ax_app = get_wechat_ax_app()
+
+    result = CalibrationResult()
+    _measure_scroll(ax_app, trials, result)
+    _measure_search(ax_app, trials, result)
+
+    latencies = result.latencies()
+    if latencies:
+        timing_profile.apply_calibration(latencies)
+    logger.info(
+        "Timing calibration measured %s; skipped %s",
+        {kind: round(s * 1000.0, 1) for kind, s in latencies.items()},
+        sorted(result.skipped),
+    )
+    result.profile = timing_profile.to_dict()
+    return result
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class OperationCancelled(Exception):
+    """
+    Raised inside UI work when the tool call that requested it was
+    cancelled.
+    """
+
+
+class CancellationToken:
+    """
+    Thread-safe flag shared between an awaiting tool handler and the UI
+    worker executing its job.
+    """
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise OperationCancelled("Operation was cancelled")
+
+
+_state = threading.local()
+
+
+def current_token() -> CancellationToken | None:
+    """
+    Return the token of the job running on this thread, if any.
+    """
+    return getattr(_state, "token", None)
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken | None) -> Iterator[None]:
+    """
+    Make `token` the current token for the duration of the block.
+    """
+    previous = current_token()
+    _state.token = token
+    try:
+        yield
+    finally:
+        _state.token = previous
+
+
+def raise_if_cancelled() -> None:
+    """
+    Check point for long-running loops (scrolling, waiting for windows).
+
+    Raises OperationCancelled when the current job has been cancelled;
+    does nothing outside of a cancellable job.
+    """
+    token = current_token()
+    if token is not None:
+        token.raise_if_cancelled()
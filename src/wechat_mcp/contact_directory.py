@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterable, Literal
+
+from .logging_config import logger
+from .state_store import load_state, save_state
+
+try:  # Optional: lets ASCII queries match Chinese names by pinyin.
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # pragma: no cover - depends on the environment
+    lazy_pinyin = None
+
+STATE_NAME = "contact_directory"
+
+DirectoryKind = Literal["contact", "group", "chat"]
+
+# Scores for the different ways a name can match a query; trigram
+# similarity fills the range below PINYIN_SCORE.
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.95
+SUBSTRING_SCORE = 0.9
+PINYIN_SCORE = 0.85
+MIN_TRIGRAM_SCORE = 0.2
+
+
+@dataclass
+class DirectoryEntry:
+    """
+    A contact or group name seen somewhere in the WeChat UI. `kind` is
+    "chat" when the name came from the session list, where contacts and
+    groups cannot be told apart.
+    """
+
+    name: str
+    kind: DirectoryKind
+    last_seen: float
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def normalize_name(name: str) -> str:
+    return "".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+def trigrams(text: str) -> set[str]:
+    if len(text) < 3:
+        return {text} if text else set()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def pinyin_keys(name: str) -> tuple[str, ...]:
+    """
+    Return the full pinyin and the pinyin initials of `name`, or an
+    empty tuple when pypinyin is not installed or the name has no Han
+    characters.
+    """
+    if lazy_pinyin is None or not any("一" <= ch <= "鿿" for ch in name):
+        return ()
+    full = normalize_name("".join(lazy_pinyin(name)))
+    initials = normalize_name("".join(lazy_pinyin(name, style=Style.FIRST_LETTER)))
+    return (full, initials)
+
+
+class ContactDirectory:
+    """
+    Local directory of every contact and group name seen in the UI, with
+    a trigram index for fuzzy lookup.
+
+    Names are added from the session list, from search results and from
+    chats that were opened successfully; nothing here touches the UI, so
+    search() answers in milliseconds. Matching is case- and
+    width-insensitive; exact, prefix and substring matches rank above
+    trigram similarity. When pypinyin is installed, ASCII queries also
+    match Chinese names by full pinyin or initials. The directory is
+    persisted under the state directory.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.time,
+        persist: bool = True,
+    ) -> None:
+        self._clock = clock
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._entries: dict[str, DirectoryEntry] = {}
+        # name -> its normalized key
+        self._names: dict[str, str] = {}
+        # normalized key (a name or its pinyin) -> names it belongs to
+        self._keys: dict[str, set[str]] = {}
+        self._key_grams: dict[str, int] = {}
+        # trigram -> keys containing it
+        self._index: dict[str, set[str]] = {}
+        if persist:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_names(self, names: Iterable[str], kind: DirectoryKind) -> int:
+        """
+        Record `names` as seen now; returns how many were new.
+
+        A specific kind ("contact" or "group") replaces "chat", but a
+        name is never downgraded back to "chat".
+        """
+        now = self._clock()
+        added = 0
+        changed = False
+        with self._lock:
+            for name in names:
+                name = name.strip()
+                if not name:
+                    continue
+                entry = self._entries.get(name)
+                if entry is None:
+                    self._entries[name] = DirectoryEntry(name, kind, now)
+                    self._index_name_locked(name)
+                    added += 1
+                    changed = True
+                    continue
+                if kind != "chat" and entry.kind != kind:
+                    entry.kind = kind
+                    changed = True
+                entry.last_seen = now
+            if changed:
+                self._save_locked()
+        if added:
+            logger.debug("Contact directory learned %d new names", added)
+        return added
+
+    def search(
+        self,
+        query: str,
+        limit: int = 15,
+        kind: DirectoryKind | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Return up to `limit` entries matching `query`, best first, each
+        with a "score" between 0 and 1.
+        """
+        needle = normalize_name(query)
+        if not needle:
+            return []
+        with self._lock:
+            scored = []
+            for name, score in self._scores_locked(needle).items():
+                entry = self._entries[name]
+                if kind is None or entry.kind in (kind, "chat"):
+                    scored.append((score, entry))
+        scored.sort(key=lambda item: (-item[0], -item[1].last_seen, item[1].name))
+        return [
+            {**entry.to_dict(), "score": round(score, 3)}
+            for score, entry in scored[:limit]
+        ]
+
+    def suggest_candidates(self, query: str, limit: int = 15) -> dict[str, list[str]]:
+        """
+        Candidate names in the shape open_chat_for_contact returns them:
+        names known to be groups go under "group_chats", everything else
+        under "contacts".
+        """
+        contacts: list[str] = []
+        group_chats: list[str] = []
+        for match in self.search(query, limit=limit * 2):
+            bucket = group_chats if match["kind"] == "group" else contacts
+            if len(bucket) < limit:
+                bucket.append(match["name"])
+        return {"contacts": contacts, "group_chats": group_chats}
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            kinds: dict[str, int] = {}
+            for entry in self._entries.values():
+                kinds[entry.kind] = kinds.get(entry.kind, 0) + 1
+            return {
+                "names": len(self._entries),
+                "by_kind": kinds,
+                "pinyin": lazy_pinyin is not None,
+            }
+
+    def _index_name_locked(self, name: str) -> None:
+        key = normalize_name(name)
+        self._names[name] = key
+        for indexed in (key, *pinyin_keys(name)):
+            names = self._keys.setdefault(indexed, set())
+            if not names:
+                grams = trigrams(indexed)
+                self._key_grams[indexed] = len(grams)
+                for gram in grams:
+                    self._index.setdefault(gram, set()).add(indexed)
+            names.add(name)
+
+    def _scores_locked(self, needle: str) -> dict[str, float]:
+        """
+        Score every name that has a key sharing trigrams with `needle`;
+        keys are names or their pinyin spellings.
+        """
+        scores: dict[str, float] = {}
+
+        def offer(name: str, score: float) -> None:
+            if score > scores.get(name, 0.0):
+                scores[name] = score
+
+        if len(needle) < 3:
+            # Too short for trigrams (e.g. a two-character Chinese name);
+            # the directory is small enough to scan.
+            for key, names in self._keys.items():
+                if needle in key:
+                    for name in names:
+                        offer(name, self._containment_score(needle, key, name))
+            return scores
+
+        needle_grams = trigrams(needle)
+        overlap: Counter[str] = Counter()
+        for gram in needle_grams:
+            overlap.update(self._index.get(gram, ()))
+        for key, shared in overlap.items():
+            names = self._keys[key]
+            if shared == len(needle_grams) and needle in key:
+                for name in names:
+                    offer(name, self._containment_score(needle, key, name))
+                continue
+            union = len(needle_grams) + self._key_grams[key] - shared
+            similarity = shared / union * PINYIN_SCORE
+            if similarity >= MIN_TRIGRAM_SCORE:
+                for name in names:
+                    offer(name, similarity)
+        return scores
+
+    def _containment_score(self, needle: str, key: str, name: str) -> float:
+        if self._names[name] != key:
+            # `key` is a pinyin spelling of the name.
+            return PINYIN_SCORE if key.startswith(needle) else MIN_TRIGRAM_SCORE
+        if needle == key:
+            return EXACT_SCORE
+        if key.startswith(needle):
+            return PREFIX_SCORE
+        return SUBSTRING_SCORE
+
+    def _load(self) -> None:
+        state = load_state(STATE_NAME, [])
+        if not isinstance(state, list):
+            return
+        for item in state:
+            try:
+                entry = DirectoryEntry(**item)
+            except TypeError as exc:
+                logger.warning("Ignoring malformed contact directory entry: %s", exc)
+                continue
+            self._entries[entry.name] = entry
+            self._index_name_locked(entry.name)
+
+    def _save_locked(self) -> None:
+        if not self._persist:
+            return
+        try:
+            save_state(
+                STATE_NAME, [entry.to_dict() for entry in self._entries.values()]
+            )
+        except OSError as exc:
+            logger.warning("Could not persist contact directory: %s", exc)
+
+
+contact_directory = ContactDirectory()
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from .logging_config import logger
+
+
+class RunningApp(ABC):
+    """
+    A running application as seen by a Driver.
+    """
+
+    pid: int
+
+    @abstractmethod
+    def is_active(self) -> bool:
+        ...
+
+    @abstractmethod
+    def activate(self) -> None:
+        ...
+
+
+class Driver(ABC):
+    """
+    The platform operations the UI flows need: Accessibility reads,
+    writes and actions, synthesized mouse and keyboard input, the
+    pasteboard, screenshots and waiting.
+
+    MacDriver (mac_driver.py) talks to the real WeChat through pyobjc;
+    SimulatorDriver (simulator.py) serves a pure-Python model of WeChat
+    so the flows can run and be benchmarked anywhere.
+    """
+
+    name = "abstract"
+
+    # Accessibility
+    @abstractmethod
+    def copy_attribute(self, element: Any, attribute: str) -> tuple[int, Any]:
+        ...
+
+    @abstractmethod
+    def set_attribute(self, element: Any, attribute: str, value: Any) -> int:
+        ...
+
+    @abstractmethod
+    def perform_action(self, element: Any, action: str) -> int:
+        ...
+
+    @abstractmethod
+    def point_value(self, ax_value: Any) -> tuple[float, float] | None:
+        """
+        Decode an AXPosition value into (x, y), or None.
+        """
+
+    @abstractmethod
+    def size_value(self, ax_value: Any) -> tuple[float, float] | None:
+        """
+        Decode an AXSize value into (width, height), or None.
+        """
+
+    # Applications
+    @abstractmethod
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        ...
+
+    @abstractmethod
+    def application_element(self, pid: int) -> Any:
+        ...
+
+    # Input
+    @abstractmethod
+    def mouse_down(self, x: float, y: float) -> None:
+        ...
+
+    @abstractmethod
+    def mouse_up(self, x: float, y: float) -> None:
+        ...
+
+    def click(self, x: float, y: float) -> None:
+        self.mouse_down(x, y)
+        self.mouse_up(x, y)
+
+    @abstractmethod
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        ...
+
+    @abstractmethod
+    def key_press(self, keycode: int, flags: int = 0) -> None:
+        ...
+
+    # Pasteboard
+    @abstractmethod
+    def pasteboard_save(self) -> Any:
+        ...
+
+    @abstractmethod
+    def pasteboard_restore(self, saved: Any) -> None:
+        ...
+
+    @abstractmethod
+    def pasteboard_set_text(self, text: str) -> None:
+        ...
+
+    # Screen
+    @abstractmethod
+    def grab_screen(self, bbox: tuple[int, int, int, int]) -> Any:
+        """
+        Capture the screen region (left, top, right, bottom) as an image
+        with the PIL Image interface used by the sender classifier.
+        """
+
+    # Time
+    @abstractmethod
+    def sleep(self, seconds: float) -> None:
+        ...
+
+    @abstractmethod
+    def monotonic(self) -> float:
+        """
+        Return the seconds on a clock that `sleep` advances. Polling
+        deadlines are measured on it, so that a simulated run, whose
+        waits take no real time, polls as often as a real one.
+        """
+
+    # User activity
+    @abstractmethod
+    def user_idle_seconds(self) -> float:
+        """
+        Return the seconds since the user last pressed a key or moved,
+        clicked or scrolled the mouse. Background work that takes over
+        the WeChat window waits for this to be long enough.
+        """
+
+
+class DelegatingRunningApp(RunningApp):
+    """
+    A RunningApp that passes every call through to `inner`.
+    """
+
+    def __init__(self, inner: RunningApp) -> None:
+        self.inner = inner
+        self.pid = inner.pid
+
+    def is_active(self) -> bool:
+        return self.inner.is_active()
+
+    def activate(self) -> None:
+        self.inner.activate()
+
+
+class DelegatingDriver(Driver):
+    """
+    A Driver that passes every call through to `inner`. Drivers that
+    observe another one (recording, timelines) override only the calls
+    they look at.
+    """
+
+    name = "delegating"
+
+    def __init__(self, inner: Driver) -> None:
+        self.inner = inner
+
+    # Accessibility
+    def copy_attribute(self, element: Any, attribute: str) -> tuple[int, Any]:
+        return self.inner.copy_attribute(element, attribute)
+
+    def set_attribute(self, element: Any, attribute: str, value: Any) -> int:
+        return self.inner.set_attribute(element, attribute, value)
+
+    def perform_action(self, element: Any, action: str) -> int:
+        return self.inner.perform_action(element, action)
+
+    def point_value(self, ax_value: Any) -> tuple[float, float] | None:
+        return self.inner.point_value(ax_value)
+
+    def size_value(self, ax_value: Any) -> tuple[float, float] | None:
+        return self.inner.size_value(ax_value)
+
+    # Applications
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        return self.inner.running_application(bundle_id)
+
+    def application_element(self, pid: int) -> Any:
+        return self.inner.application_element(pid)
+
+    # Input
+    def mouse_down(self, x: float, y: float) -> None:
+        self.inner.mouse_down(x, y)
+
+    def mouse_up(self, x: float, y: float) -> None:
+        self.inner.mouse_up(x, y)
+
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        self.inner.scroll(x, y, delta_lines)
+
+    def key_press(self, keycode: int, flags: int = 0) -> None:
+        self.inner.key_press(keycode, flags)
+
+    # Pasteboard
+    def pasteboard_save(self) -> Any:
+        return self.inner.pasteboard_save()
+
+    def pasteboard_restore(self, saved: Any) -> None:
+        self.inner.pasteboard_restore(saved)
+
+    def pasteboard_set_text(self, text: str) -> None:
+        self.inner.pasteboard_set_text(text)
+
+    # Screen
+    def grab_screen(self, bbox: tuple[int, int, int, int]) -> Any:
+        return self.inner.grab_screen(bbox)
+
+    # Time
+    def sleep(self, seconds: float) -> None:
+        self.inner.sleep(seconds)
+
+    def monotonic(self) -> float:
+        return self.inner.monotonic()
+
+    # User activity
+    def user_idle_seconds(self) -> float:
+        return self.inner.user_idle_seconds()
+
+
+_lock = threading.Lock()
+_driver: Driver | None = None
+
+
+def _default_driver() -> Driver:
+    name = os.getenv("WECHAT_MCP_DRIVER", "macos").strip().lower()
+    if name == "simulator":
+        from .simulator import SimulatorDriver
+
+        logger.info("Using the simulated WeChat driver")
+        return SimulatorDriver.from_env()
+    from .mac_driver import MacDriver
+
+    return MacDriver()
+
+
+def get_driver() -> Driver:
+    """
+    Return the driver the UI flows run against, creating the default one
+    (selected by WECHAT_MCP_DRIVER: "macos" or "simulator") on first use.
+    """
+    global _driver
+    driver = _driver
+    if driver is None:
+        with _lock:
+            if _driver is None:
+                _driver = _default_driver()
+            driver = _driver
+    return driver
+
+
+def set_driver(driver: Driver | None) -> None:
+    """
+    Replace the driver; None goes back to the default on next use.
+    """
+    global _driver
+    with _lock:
+        _driver = driver
+
+
+@contextmanager
+def use_driver(driver: Driver) -> Iterator[Driver]:
+    """
+    Run the block against `driver`, restoring the previous one after.
+    """
+    global _driver
+    with _lock:
+        previous = _driver
+        _driver = driver
+    try:
+        yield driver
+    finally:
+        with _lock:
+            _driver = previous
+
+
+def pause(seconds: float) -> None:
+    """
+    Wait for the UI to settle. Goes through the driver so that simulated
+    runs are not slowed down by waits meant for the real WeChat.
+    """
+    get_driver().sleep(seconds)
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import logging
+import os
+
+# The "wechat_mcp" logger of logging_config, looked up by name because
+# logging_config itself is configured through modules that import this
+# one.
+logger = logging.getLogger("wechat_mcp")
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """
+    Read a boolean setting: unset means `default`; "0", "false", "no",
+    "off" and the empty string mean False, anything else True.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+def env_float(name: str, default: float) -> float:
+    """
+    Read a numeric setting, falling back to `default` when it is unset or
+    not a number.
+    """
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning("Invalid value for %s; using %s", name, default)
+        return default
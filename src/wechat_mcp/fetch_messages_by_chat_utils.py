@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-import time
 from dataclasses import asdict, dataclass
-from typing import Any, Literal
+from typing import Any, Callable, Iterator, Literal
 
-from ApplicationServices import (
+from .ax_constants import (
     kAXChildrenAttribute,
     kAXListRole,
     kAXPositionAttribute,
@@ -12,20 +11,27 @@ from ApplicationServices import (
     kAXTitleAttribute,
     kAXValueAttribute,
 )
-from PIL import ImageGrab
-
-from .logging_config import logger
+from .cancellation import OperationCancelled, raise_if_cancelled
+from .driver import get_driver
+from .logging_config import SAMPLED, logger
+from .perf_stats import timed
+from .timing_profile import settle
 from .wechat_accessibility import (
     ax_get,
     axvalue_to_point,
     axvalue_to_size,
+    collect_chat_elements,
+    get_current_chat_name,
     get_list_center,
     get_wechat_ax_app,
+    lookup_chat_element,
+    open_chat_for_contact,
     post_scroll,
     dfs,
 )
 
 
+@timed("fetch.messages_list")
 def get_messages_list(ax_app: Any) -> Any:
     """
     Find the AX list that contains chat messages in the current WeChat window.
@@ -40,6 +46,7 @@ def get_messages_list(ax_app: Any) -> Any:
     return msg_list
 
 
+@timed("fetch.capture_image")
 def capture_message_area(msg_list: Any):
     """
     Capture a screenshot of the visible message area for the given list and
@@ -56,10 +63,11 @@ def capture_message_area(msg_list: Any):
     w, h = size
 
     bbox = (int(x), int(y), int(x + w), int(y + h))
-    image = ImageGrab.grab(bbox=bbox)
+    image = get_driver().grab_screen(bbox)
     return image, origin, size
 
 
+@timed("fetch.scroll_to_bottom")
 def scroll_to_bottom(msg_list: Any, center: tuple[float, float]) -> None:
     """
     Scroll the messages list to the bottom (newest messages) by repeatedly
@@ -70,9 +78,10 @@ def scroll_to_bottom(msg_list: Any, center: tuple[float, float]) -> None:
     stable = 0
 
     for _ in range(40):
+        raise_if_cancelled()
         # Negative delta moves towards newer messages (bottom of history).
         post_scroll(center, -1000)
-        time.sleep(0.05)
+        settle("scroll_settle")
 
         children = ax_get(msg_list, kAXChildrenAttribute) or []
         texts: list[str] = []
@@ -92,16 +101,17 @@ def scroll_to_bottom(msg_list: Any, center: tuple[float, float]) -> None:
             last_text = new_last
             stable = 0
 
-    time.sleep(0.2)
+    settle("list_settle")
 
 
+@timed("fetch.scroll_up")
 def scroll_up_small(center: tuple[float, float]) -> None:
     """
     Scroll slightly upwards to reveal older messages.
     """
     # Positive delta scrolls towards older messages.
     post_scroll(center, 50)
-    time.sleep(0.1)
+    settle("scroll_step")
 
 
 def count_colored_pixels(
@@ -136,6 +146,7 @@ def count_colored_pixels(
 SenderLabel = Literal["ME", "OTHER", "UNKNOWN"]
 
 
+@timed("fetch.classify_sender")
 def classify_sender_for_message(
     image, list_origin, message_pos, message_size
 ) -> SenderLabel:
@@ -193,8 +204,11 @@ class ChatMessage:
         return asdict(self)
 
 
+@timed("fetch.recent_messages")
 def fetch_recent_messages(
-    last_n: int = 100, max_scrolls: int | None = None
+    last_n: int = 100,
+    max_scrolls: int | None = None,
+    ax_app: Any | None = None,
 ) -> list[ChatMessage]:
     """
     Fetch the true last N messages from the currently open chat, even
@@ -209,8 +223,12 @@ def fetch_recent_messages(
       screenshot-based heuristic as before.
     - Merges newly revealed older messages at the front of the list by
       aligning on the oldest already-known message text.
+
+    Pass an existing `ax_app` to reuse an application handle instead of
+    re-activating WeChat.
     """
-    ax_app = get_wechat_ax_app()
+    if ax_app is None:
+        ax_app = get_wechat_ax_app()
     msg_list = get_messages_list(ax_app)
     center = get_list_center(msg_list)
     scroll_to_bottom(msg_list, center)
@@ -220,6 +238,7 @@ def fetch_recent_messages(
     no_new_counter = 0
 
     while True:
+        raise_if_cancelled()
         image, list_origin, _ = capture_message_area(msg_list)
 
         children = ax_get(msg_list, kAXChildrenAttribute) or []
@@ -271,6 +290,13 @@ def fetch_recent_messages(
         if len(messages) >= last_n:
             break
 
+        logger.debug(
+            "Fetch scroll %d: %d visible, %d collected",
+            scrolls,
+            len(visible),
+            len(messages),
+            extra=SAMPLED,
+        )
         scroll_up_small(center)
 
         scrolls += 1
@@ -278,7 +304,8 @@ def fetch_recent_messages(
             break
 
     if len(messages) > last_n:
-        messages = messages[-last_n:]
+        # Not messages[-last_n:], which keeps everything for last_n=0.
+        messages = messages[len(messages) - last_n :]
 
     logger.info(
         "Fetched %d messages from current chat (requested last_n=%d)",
@@ -286,3 +313,145 @@ def fetch_recent_messages(
         last_n,
     )
     return messages
+
+
+@dataclass
+class ChatFetchRequest:
+    index: int
+    chat_name: str
+    last_n: int
+
+
+ChatRoute = Literal["current", "session_list", "search"]
+
+
+def normalize_chat_fetch_requests(
+    chats: list[str | dict[str, Any]], default_last_n: int
+) -> list[ChatFetchRequest]:
+    """
+    Turn the loosely typed `chats` argument of the batch tool into
+    ChatFetchRequest objects.
+
+    Each entry is either a chat name or a dict with a "chat_name" key and
+    an optional "last_n" overriding `default_last_n`.
+    """
+    requests: list[ChatFetchRequest] = []
+    for index, item in enumerate(chats):
+        if isinstance(item, str):
+            chat_name, last_n = item, default_last_n
+        elif isinstance(item, dict):
+            chat_name = item.get("chat_name")
+            last_n = item.get("last_n")
+            if last_n is None:
+                last_n = default_last_n
+        else:
+            raise ValueError(f"Unsupported chat entry at index {index}: {item!r}")
+
+        if not isinstance(chat_name, str) or not chat_name.strip():
+            raise ValueError(f"Chat entry at index {index} has no chat_name")
+        if int(last_n) < 0:
+            raise ValueError(f"Chat entry at index {index} has a negative last_n")
+        requests.append(
+            ChatFetchRequest(index=index, chat_name=chat_name, last_n=int(last_n))
+        )
+    return requests
+
+
+def plan_chat_fetch_order(
+    requests: list[ChatFetchRequest],
+    chat_elements: dict[str, Any],
+    current_chat: str | None,
+) -> list[tuple[ChatFetchRequest, ChatRoute]]:
+    """
+    Order batch requests by expected navigation cost.
+
+    The chat that is already open goes first (no navigation at all),
+    then chats visible in the sidebar session list (a single click), and
+    finally chats that have to be opened through global search. The
+    relative input order is kept within each group.
+    """
+    rank: dict[ChatRoute, int] = {"current": 0, "session_list": 1, "search": 2}
+    planned: list[tuple[ChatFetchRequest, ChatRoute]] = []
+    for request in requests:
+        route: ChatRoute
+        if current_chat is not None and request.chat_name == current_chat:
+            route = "current"
+        elif lookup_chat_element(chat_elements, request.chat_name) is not None:
+            route = "session_list"
+        else:
+            route = "search"
+        planned.append((request, route))
+
+    planned.sort(key=lambda item: (rank[item[1]], item[0].index))
+    return planned
+
+
+def fetch_messages_for_chats(
+    requests: list[ChatFetchRequest],
+    between_chats: Callable[[], bool] | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Fetch recent messages for several chats, yielding one result per chat
+    as soon as it completes.
+
+    WeChat is activated once and the same application handle and session
+    list snapshot are reused for the whole batch. Chats are visited in
+    the order returned by plan_chat_fetch_order. Each yielded dict has
+    "index" (position in the original request list), "chat_name" and
+    "route", plus either "messages" or "error" (and "candidates" when
+    the chat name was ambiguous).
+
+    `between_chats` is called before each chat after the first; if it
+    returns True, other work has driven the UI in the meantime and the
+    session list snapshot and current chat are read again.
+    """
+    ax_app = get_wechat_ax_app()
+    chat_elements = collect_chat_elements(ax_app)
+    current_chat = get_current_chat_name(ax_app)
+
+    plan = plan_chat_fetch_order(requests, chat_elements, current_chat)
+    logger.info(
+        "Planned batch fetch for %d chats: %s",
+        len(plan),
+        [(request.chat_name, route) for request, route in plan],
+    )
+
+    for position, (request, route) in enumerate(plan):
+        raise_if_cancelled()
+        if position and between_chats is not None and between_chats():
+            logger.info("UI was used by another job; refreshing batch state")
+            chat_elements = collect_chat_elements(ax_app)
+            current_chat = get_current_chat_name(ax_app)
+
+        result: dict[str, Any] = {
+            "index": request.index,
+            "chat_name": request.chat_name,
+            "route": route,
+        }
+        try:
+            if request.chat_name != current_chat:
+                open_result = open_chat_for_contact(
+                    request.chat_name, ax_app=ax_app, chat_elements=chat_elements
+                )
+                if isinstance(open_result, dict) and open_result.get("error"):
+                    result["error"] = open_result.get("error")
+                    result["candidates"] = open_result.get("candidates", {})
+                    yield result
+                    continue
+                current_chat = request.chat_name
+
+            messages = fetch_recent_messages(last_n=request.last_n, ax_app=ax_app)
+            result["messages"] = [msg.to_dict() for msg in messages]
+        except OperationCancelled:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(
+                "Error fetching messages for chat=%s in batch: %s",
+                request.chat_name,
+                exc,
+            )
+            result["error"] = str(exc)
+            # The UI state is unknown after a failure; force navigation
+            # for the next chat.
+            current_chat = None
+        yield result
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from .ax_constants import (
+    kAXChildrenAttribute,
+    kAXIdentifierAttribute,
+    kAXParentAttribute,
+    kAXRoleAttribute,
+    kAXStaticTextRole,
+    kAXTitleAttribute,
+    kAXValueAttribute,
+)
+from .logging_config import logger
+from .perf_stats import timed
+from .wechat_accessibility import ax_get, collect_chat_elements, get_wechat_ax_app
+
+_BADGE_RE = re.compile(r"^(\d+)\+?$")
+_PREVIEW_COUNT_RE = re.compile(r"^\[(\d+)\+?\]\s*")
+_TIME_RE = re.compile(
+    r"^("
+    r"\d{1,2}:\d{2}"
+    r"|\d{1,4}[/-]\d{1,2}([/-]\d{1,4})?"
+    r"|Yesterday|Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday"
+    r"|昨天|星期[一二三四五六日天]"
+    r")$"
+)
+
+
+@dataclass
+class SessionSummary:
+    chat_name: str
+    unread_count: int
+    last_message_preview: str | None
+    last_message_time: str | None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def _collect_row_texts(
+    row: Any, skip: Any, max_depth: int = 3
+) -> list[tuple[str, str]]:
+    """
+    Collect (identifier, text) pairs for static texts inside a session
+    row, excluding the chat name element itself.
+    """
+    texts: list[tuple[str, str]] = []
+
+    def walk(el, depth: int) -> None:
+        if el is None or depth > max_depth:
+            return
+        if el != skip:
+            role = ax_get(el, kAXRoleAttribute)
+            if role == kAXStaticTextRole:
+                value = ax_get(el, kAXValueAttribute) or ax_get(el, kAXTitleAttribute)
+                if isinstance(value, str) and value.strip():
+                    identifier = ax_get(el, kAXIdentifierAttribute)
+                    texts.append(
+                        (identifier if isinstance(identifier, str) else "", value)
+                    )
+        for child in ax_get(el, kAXChildrenAttribute) or []:
+            walk(child, depth + 1)
+
+    walk(row, 0)
+    return texts
+
+
+def _summarize_session_row(
+    chat_name: str, texts: list[tuple[str, str]]
+) -> SessionSummary:
+    """
+    Classify the sibling texts of a session row into unread badge, time
+    label and last-message preview.
+    """
+    unread = 0
+    time_label: str | None = None
+    preview: str | None = None
+
+    for identifier, raw in texts:
+        text = raw.strip()
+        lowered = identifier.lower()
+        badge = _BADGE_RE.match(text)
+        if badge and ("badge" in lowered or "unread" in lowered or not lowered):
+            unread = max(unread, int(badge.group(1)))
+        elif time_label is None and _TIME_RE.match(text):
+            time_label = text
+        elif preview is None or len(text) > len(preview):
+            preview = text
+
+    # Muted chats show no badge; WeChat prefixes the preview with "[N]".
+    if unread == 0 and preview:
+        prefixed = _PREVIEW_COUNT_RE.match(preview)
+        if prefixed:
+            unread = int(prefixed.group(1))
+
+    return SessionSummary(
+        chat_name=chat_name,
+        unread_count=unread,
+        last_message_preview=preview,
+        last_message_time=time_label,
+    )
+
+
+@timed("unread.session_summaries")
+def list_session_summaries(
+    ax_app: Any | None = None, only_unread: bool = True
+) -> list[SessionSummary]:
+    """
+    Read the left sidebar session list once and summarize each chat
+    without opening any of them.
+
+    For every `session_item_*` element found by collect_chat_elements,
+    the sibling texts in the same row (unread badge, time label and
+    last-message preview) are read from its parent element. When
+    `only_unread` is True, chats without unread messages are dropped.
+    """
+    if ax_app is None:
+        ax_app = get_wechat_ax_app()
+
+    chat_elements = collect_chat_elements(ax_app)
+    summaries: list[SessionSummary] = []
+    for chat_name, element in chat_elements.items():
+        row = ax_get(element, kAXParentAttribute)
+        texts = _collect_row_texts(row, skip=element) if row is not None else []
+        summary = _summarize_session_row(chat_name, texts)
+        if only_unread and summary.unread_count <= 0:
+            continue
+        summaries.append(summary)
+
+    logger.info(
+        "Summarized %d session rows (only_unread=%s)", len(summaries), only_unread
+    )
+    return summaries
@@ -1,6 +1,227 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import itertools
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Iterator
+
+from .perf_stats import perf_stats
+
+# Pass as `extra=SAMPLED` on debug lines in hot loops (scrolls, polls):
+# only one in WECHAT_MCP_LOG_SAMPLE_EVERY of them is kept per call site.
+SAMPLED = {"sampled": True}
+
+_TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s - %(message)s"
+
+
+def get_log_dir() -> Path:
+    """
+    Return the log directory: WECHAT_MCP_LOG_DIR, otherwise a "logs"
+    directory relative to the current working directory.
+    """
+    log_dir_env = os.getenv("WECHAT_MCP_LOG_DIR", "logs")
+    return Path(log_dir_env).expanduser().resolve()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_level(name: str, default: int) -> int:
+    value = os.getenv(name, "").strip().upper()
+    level = logging.getLevelName(value) if value else default
+    return level if isinstance(level, int) else default
+
+
+# Request context ------------------------------------------------------------
+
+_context = threading.local()
+_request_ids = itertools.count(1)
+# Distinguishes the request ids of different server runs.
+_RUN_ID = os.urandom(3).hex()
+
+
+def current_request() -> tuple[str, str] | None:
+    """
+    Return (request id, tool label) of the tool call logging on this
+    thread, if any.
+    """
+    return getattr(_context, "request", None)
+
+
+@contextmanager
+def log_request(label: str) -> Iterator[str]:
+    """
+    Tag the log records of the block with a fresh correlation id and the
+    tool label. Nested calls get their own id and restore the outer one.
+    """
+    previous = current_request()
+    request_id = f"{_RUN_ID}-{next(_request_ids)}"
+    _context.request = (request_id, label)
+    try:
+        yield request_id
+    finally:
+        _context.request = previous
+
+
+class ContextFilter(logging.Filter):
+    """
+    Add `request_id`, `tool` and `stage` (the innermost perf_stats span)
+    to each record. Runs on the thread that logs, before the record is
+    queued.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request = current_request()
+        record.request_id, record.tool = request if request else (None, None)
+        record.stage = perf_stats.current_stage()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep the first and then every `every`-th record of each call site
+    logged with extra=SAMPLED; other records pass unchanged.
+    """
+
+    def __init__(self, every: int) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self._seen: Counter[tuple[str, int]] = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            seen = self._seen[key]
+            self._seen[key] = seen + 1
+        if seen % self.every:
+            return False
+        record.sample_every = self.every
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with the request context of ContextFilter.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        for key in ("request_id", "tool", "stage", "sample_every"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _TextFormatter(logging.Formatter):
+    # The request tag ends the message line, ahead of any traceback.
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        request_id = getattr(record, "request_id", None)
+        if request_id is None:
+            return line
+        stage = getattr(record, "stage", None)
+        tag = f"{request_id} {stage}" if stage else request_id
+        return f"{line} [{tag}]"
+
+
+class _CreateDirOnOpen:
+    # The log directory is created when the first record is written,
+    # not when the server starts.
+    baseFilename: str
+
+    def _open(self) -> Any:
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()  # type: ignore[misc]
+
+
+class _RotatingFileHandler(_CreateDirOnOpen, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class _TimedRotatingFileHandler(
+    _CreateDirOnOpen, logging.handlers.TimedRotatingFileHandler
+):
+    pass
+
+
+def build_file_handler(log_file: Path) -> logging.Handler:
+    """
+    Rotate by time when WECHAT_MCP_LOG_ROTATE_WHEN is set (e.g.
+    "midnight", "H"), otherwise by size (WECHAT_MCP_LOG_MAX_MB, default
+    10). WECHAT_MCP_LOG_BACKUPS old files are kept (default 5). The file
+    is opened on the first write.
+    """
+    backups = _env_int("WECHAT_MCP_LOG_BACKUPS", 5)
+    when = os.getenv("WECHAT_MCP_LOG_ROTATE_WHEN", "").strip()
+    if when:
+        return _TimedRotatingFileHandler(
+            log_file, when=when, backupCount=backups, encoding="utf-8", delay=True
+        )
+    return _RotatingFileHandler(
+        log_file,
+        maxBytes=_env_int("WECHAT_MCP_LOG_MAX_MB", 10) * 1024 * 1024,
+        backupCount=backups,
+        encoding="utf-8",
+        delay=True,
+    )
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue records with their message merged but their exception info
+    kept, so that the formatters of the listener place the traceback
+    themselves. The stock prepare() folds it into the message.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def build_queue_handler(
+    *handlers: logging.Handler,
+) -> tuple[logging.Handler, logging.handlers.QueueListener]:
+    """
+    Return a handler that queues records and the (not yet started)
+    listener that writes them to `handlers` on a background thread.
+    """
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    return _QueueHandler(log_queue), listener
 
 
 def setup_logging() -> logging.Logger:
@@ -9,34 +230,51 @@ def setup_logging() -> logging.Logger:
 
     The log directory can be customized via WECHAT_MCP_LOG_DIR, otherwise
     a "logs" directory relative to the current working directory is used.
+    Records are handed to a queue and written by a background thread,
+    so tool calls do not wait on the disk; WECHAT_MCP_LOG_ASYNC=0 writes
+    them inline instead. WECHAT_MCP_LOG_FORMAT=json writes JSON lines to
+    the file; WECHAT_MCP_LOG_LEVEL (default DEBUG) and
+    WECHAT_MCP_LOG_CONSOLE_LEVEL (default INFO) set the levels.
     """
-    log_dir_env = os.getenv("WECHAT_MCP_LOG_DIR", "logs")
-    log_dir = Path(log_dir_env).expanduser().resolve()
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    log_file = log_dir / "wechat_mcp.log"
+    log_file = get_log_dir() / "wechat_mcp.log"
 
     logger = logging.getLogger("wechat_mcp")
     if logger.handlers:
         return logger
 
-    logger.setLevel(logging.DEBUG)
+    file_level = _env_level("WECHAT_MCP_LOG_LEVEL", logging.DEBUG)
+    console_level = _env_level("WECHAT_MCP_LOG_CONSOLE_LEVEL", logging.INFO)
+    logger.setLevel(min(file_level, console_level))
 
-    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    text_formatter = _TextFormatter(_TEXT_FORMAT)
+    log_format = os.getenv("WECHAT_MCP_LOG_FORMAT", "text").strip().lower()
 
     # Console handler
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(text_formatter)
 
     # File handler
-    file_handler = logging.FileHandler(log_file, encoding="utf-8")
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+    file_handler = build_file_handler(log_file)
+    file_handler.setLevel(file_level)
+    if log_format == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(text_formatter)
+
+    logger.addFilter(SamplingFilter(_env_int("WECHAT_MCP_LOG_SAMPLE_EVERY", 20)))
+    logger.addFilter(ContextFilter())
+
+    if os.getenv("WECHAT_MCP_LOG_ASYNC", "1").strip() == "0":
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+    else:
+        queue_handler, listener = build_queue_handler(console_handler, file_handler)
+        logger.addHandler(queue_handler)
+        listener.start()
+        # Flush what is still queued when the process exits.
+        atexit.register(listener.stop)
 
-    logger.debug("Logging initialized, log file at %s", log_file)
     return logger
 
 
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import AppKit
+from ApplicationServices import (
+    AXUIElementCopyAttributeValue,
+    AXUIElementCreateApplication,
+    AXUIElementPerformAction,
+    AXUIElementSetAttributeValue,
+    AXValueGetType,
+    AXValueGetValue,
+    kAXValueCGPointType,
+    kAXValueCGSizeType,
+)
+from PIL import ImageGrab
+from Quartz import (
+    CGEventCreateKeyboardEvent,
+    CGEventCreateMouseEvent,
+    CGEventCreateScrollWheelEvent,
+    CGEventPost,
+    CGEventSetFlags,
+    CGEventSetLocation,
+    CGEventSourceSecondsSinceLastEventType,
+    CGPoint,
+    kCGAnyInputEventType,
+    kCGEventLeftMouseDown,
+    kCGEventLeftMouseUp,
+    kCGEventSourceStateHIDSystemState,
+    kCGHIDEventTap,
+    kCGScrollEventUnitLine,
+)
+
+from .driver import Driver, RunningApp
+
+
+class MacRunningApp(RunningApp):
+    def __init__(self, app: Any) -> None:
+        self._app = app
+        self.pid = int(app.processIdentifier())
+
+    def is_active(self) -> bool:
+        return bool(self._app.isActive())
+
+    def activate(self) -> None:
+        self._app.activateWithOptions_(AppKit.NSApplicationActivateIgnoringOtherApps)
+
+
+class MacDriver(Driver):
+    """
+    Drive the real WeChat through the macOS Accessibility API, Quartz
+    events, the general pasteboard and screen capture.
+    """
+
+    name = "macos"
+
+    def copy_attribute(self, element: Any, attribute: str) -> tuple[int, Any]:
+        return AXUIElementCopyAttributeValue(element, attribute, None)
+
+    def set_attribute(self, element: Any, attribute: str, value: Any) -> int:
+        return AXUIElementSetAttributeValue(element, attribute, value)
+
+    def perform_action(self, element: Any, action: str) -> int:
+        return AXUIElementPerformAction(element, action)
+
+    def point_value(self, ax_value: Any) -> tuple[float, float] | None:
+        if ax_value is None or AXValueGetType(ax_value) != kAXValueCGPointType:
+            return None
+        ok, cg_point = AXValueGetValue(ax_value, kAXValueCGPointType, None)
+        if not ok:
+            return None
+        return float(cg_point.x), float(cg_point.y)
+
+    def size_value(self, ax_value: Any) -> tuple[float, float] | None:
+        if ax_value is None or AXValueGetType(ax_value) != kAXValueCGSizeType:
+            return None
+        ok, cg_size = AXValueGetValue(ax_value, kAXValueCGSizeType, None)
+        if not ok:
+            return None
+        return float(cg_size.width), float(cg_size.height)
+
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        apps = AppKit.NSRunningApplication.runningApplicationsWithBundleIdentifier_(
+            bundle_id
+        )
+        if not apps:
+            return None
+        return MacRunningApp(apps[0])
+
+    def application_element(self, pid: int) -> Any:
+        return AXUIElementCreateApplication(pid)
+
+    def mouse_down(self, x: float, y: float) -> None:
+        event = CGEventCreateMouseEvent(None, kCGEventLeftMouseDown, CGPoint(x, y), 0)
+        CGEventPost(kCGHIDEventTap, event)
+
+    def mouse_up(self, x: float, y: float) -> None:
+        event = CGEventCreateMouseEvent(None, kCGEventLeftMouseUp, CGPoint(x, y), 0)
+        CGEventPost(kCGHIDEventTap, event)
+
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        event = CGEventCreateScrollWheelEvent(
+            None, kCGScrollEventUnitLine, 1, delta_lines
+        )
+        CGEventSetLocation(event, CGPoint(x, y))
+        CGEventPost(kCGHIDEventTap, event)
+
+    def key_press(self, keycode: int, flags: int = 0) -> None:
+        event_down = CGEventCreateKeyboardEvent(None, keycode, True)
+        CGEventSetFlags(event_down, flags)
+        event_up = CGEventCreateKeyboardEvent(None, keycode, False)
+        CGEventSetFlags(event_up, flags)
+        CGEventPost(kCGHIDEventTap, event_down)
+        CGEventPost(kCGHIDEventTap, event_up)
+
+    def pasteboard_save(self) -> list[dict[str, Any]]:
+        pb = AppKit.NSPasteboard.generalPasteboard()
+        items = []
+        for item in pb.pasteboardItems() or []:
+            data = {}
+            for pb_type in item.types() or []:
+                value = item.dataForType_(pb_type)
+                if value is not None:
+                    data[pb_type] = value
+            items.append(data)
+        return items
+
+    def pasteboard_restore(self, saved: list[dict[str, Any]]) -> None:
+        pb = AppKit.NSPasteboard.generalPasteboard()
+        pb.clearContents()
+        restored = []
+        for data in saved:
+            item = AppKit.NSPasteboardItem.alloc().init()
+            for pb_type, value in data.items():
+                item.setData_forType_(value, pb_type)
+            restored.append(item)
+        if restored:
+            pb.writeObjects_(restored)
+
+    def pasteboard_set_text(self, text: str) -> None:
+        pb = AppKit.NSPasteboard.generalPasteboard()
+        pb.clearContents()
+        pb.setString_forType_(text, AppKit.NSPasteboardTypeString)
+
+    def grab_screen(self, bbox: tuple[int, int, int, int]) -> Any:
+        return ImageGrab.grab(bbox=bbox)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def user_idle_seconds(self) -> float:
+        # The HID system state only reflects events from the hardware.
+        return float(
+            CGEventSourceSecondsSinceLastEventType(
+                kCGEventSourceStateHIDSystemState, kCGAnyInputEventType
+            )
+        )
@@ -1,28 +1,295 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import atexit
+import functools
+import inspect
 import logging
-from typing import Any
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 
-from .logging_config import logger
+from .cancellation import OperationCancelled
+from .contact_directory import contact_directory
+from .logging_config import get_log_dir, log_request, logger
+from .add_contact_batch import add_contact_checkpoint, normalize_add_contact_requests
 from .add_contact_by_wechat_id_utils import (
     add_contact_by_wechat_id as ax_add_contact_by_wechat_id,
 )
-from .fetch_messages_by_chat_utils import ChatMessage, fetch_recent_messages
+from .add_contact_by_wechat_id_utils import (
+    add_contacts_by_wechat_ids as ax_add_contacts_by_wechat_ids,
+)
+from .ax_call_stats import ax_call_accounting
+from .ax_trace import ax_trace_recording
+from .calibrate_timing_utils import calibrate_timing as ax_calibrate_timing
+from .fetch_messages_by_chat_utils import (
+    ChatMessage,
+    fetch_messages_for_chats as ax_fetch_messages_for_chats,
+    fetch_recent_messages,
+    normalize_chat_fetch_requests,
+)
+from .list_unread_chats_utils import list_session_summaries
+from .navigation_cache import navigation_cache
+from .perf_stats import PERF_IN_RESULTS, perf_stats
+from .prefetch import prefetcher_from_env
 from .publish_moment_utils import publish_moment_without_media as ax_publish_moment
-from .reply_to_messages_by_chat_utils import send_message
-from .wechat_accessibility import get_current_chat_name, open_chat_for_contact
+from .publish_moment_utils import publish_moments as ax_publish_moments
+from .read_cache import ALL_CHATS, read_cache
+from .reply_to_messages_by_chat_utils import (
+    normalize_outgoing_messages,
+    send_message,
+    send_messages_to_chats,
+)
+from .send_rate_limiter import (
+    QueuedSend,
+    SendReservations,
+    may_have_been_delivered,
+    send_queue,
+    send_rate_limiter,
+)
+from .text_entry import text_entry_stats
+from .timeline import timeline_recording, timeline_writer
+from .timing_profile import timing_profile
+from .ui_scheduler import UIPriority, ui_scheduler
+from .wechat_accessibility import (
+    get_current_chat_name,
+    get_wechat_ax_app,
+    open_chat_for_contact,
+)
+from .wechat_session import activation_stats, wechat_session
 
 
 mcp = FastMCP("WeChat Helper MCP Server")
 
+# Collects the stage timings and AX calls of the UI jobs of the current
+# tool call for _perf_in_results.
+_call_perf: ContextVar[list[dict[str, Any]] | None] = ContextVar(
+    "wechat_mcp_call_perf", default=None
+)
+
+
+def _client_id(ctx: Context | None) -> str:
+    """
+    Identify the MCP client behind a tool call for scheduler fairness.
+    """
+    if ctx is None:
+        return "local"
+    try:
+        return ctx.client_id or f"session-{id(ctx.session):x}"
+    except ValueError:
+        # Called outside of an MCP request (e.g. from a script).
+        return "local"
+
+
+async def _run_ui(
+    fn: Callable[..., Any],
+    *args: Any,
+    priority: UIPriority,
+    ctx: Context | None,
+    label: str,
+    **kwargs: Any,
+) -> Any:
+    """
+    Run blocking UI work on the UI worker thread and await its result,
+    keeping the event loop free for pings, list_tools and other sessions.
+
+    Cancelling the tool call stops the job (see UIScheduler.run_async).
+    """
+    return await ui_scheduler.run_async(
+        _run_in_session,
+        label,
+        fn,
+        *args,
+        priority=priority,
+        client_id=_client_id(ctx),
+        label=label,
+        perf=_call_perf.get(),
+        **kwargs,
+    )
+
+
+def _run_in_session(
+    label: str,
+    fn: Callable[..., Any],
+    *args: Any,
+    perf: list[dict[str, Any]] | None = None,
+    **kwargs: Any,
+) -> Any:
+    """
+    Run `fn` inside a wechat_session() so that all of its helpers share
+    one WeChat app handle and activate WeChat at most once.
+
+    The stage timings and AX calls of the call are collected for
+    get_performance_stats, and appended to `perf` if given (see
+    _perf_in_results).
+    With WECHAT_MCP_AX_TRACE_DIR set, the AX traffic of the call is
+    recorded for replay (see ax_trace); with WECHAT_MCP_TIMELINE=1 its
+    stages and AX calls are written out as a timeline (see timeline).
+    Its log records carry a correlation id (see log_request).
+    """
+    with (
+        log_request(label),
+        ax_trace_recording(label),
+        wechat_session(label),
+        perf_stats.call(label) as call,
+        timeline_recording(label, call),
+        ax_call_accounting.invocation(label) as ax_calls,
+    ):
+        result = fn(*args, **kwargs)
+    if perf is not None and call is not None:
+        perf.append({"perf_ms": call.to_dict(), "ax_calls": ax_calls.to_dict()})
+    return result
+
+
+def _perf_in_results(tool: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    With WECHAT_MCP_PERF_IN_RESULTS=1, add the stage timings and AX calls
+    of the tool call's UI job to its result as "perf_ms" and "ax_calls":
+    merged into a JSON object result, while a list result is wrapped as
+    {"results": [...], "perf_ms": ..., "ax_calls": ...}. Results that
+    needed no UI job (e.g. read cache hits) carry no timings. Without
+    the flag the tool is returned unchanged.
+    """
+    if not PERF_IN_RESULTS:
+        return tool
+
+    @functools.wraps(tool)
+    async def with_perf(*args: Any, **kwargs: Any) -> dict[str, Any]:
+        perf: list[dict[str, Any]] = []
+        token = _call_perf.set(perf)
+        try:
+            result = await tool(*args, **kwargs)
+        finally:
+            _call_perf.reset(token)
+        timings = perf[-1] if perf else {}
+        if isinstance(result, list):
+            return {"results": result, **timings}
+        return {**result, **timings}
+
+    # Publish an output schema that admits the wrapped list results.
+    with_perf.__signature__ = inspect.signature(  # type: ignore[attr-defined]
+        tool, eval_str=True
+    ).replace(return_annotation=dict[str, Any])
+    return with_perf
+
+
+def _fetch_messages_by_chat_ui(chat_name: str, last_n: int) -> list[dict[str, Any]]:
+    ax_app = get_wechat_ax_app()
+    current_chat = get_current_chat_name(ax_app)
+    same_chat = current_chat == chat_name if current_chat is not None else False
+    logger.info(
+        "Current chat title=%r, target=%r, same_chat=%s",
+        current_chat,
+        chat_name,
+        same_chat,
+    )
+    if not same_chat:
+        open_result = open_chat_for_contact(chat_name, ax_app=ax_app)
+        if isinstance(open_result, dict) and open_result.get("error"):
+            # No exact match; surface candidates instead of forcing a chat.
+            logger.info(
+                "open_chat_for_contact returned candidates for chat=%s; "
+                "skipping message fetch",
+                chat_name,
+            )
+            enriched = dict(open_result)
+            enriched.setdefault("tool", "fetch_messages_by_chat")
+            return [enriched]
+
+    messages: list[ChatMessage] = fetch_recent_messages(
+        last_n=last_n, ax_app=ax_app
+    )
+    # Opening a chat clears its unread badge.
+    read_cache.invalidate(ALL_CHATS)
+    return [msg.to_dict() for msg in messages]
+
+
+# Refreshes watched chats into the read cache while no tool call runs.
+prefetcher = prefetcher_from_env(
+    lambda chat_name, last_n: _run_in_session(
+        "prefetch", _fetch_messages_by_chat_ui, chat_name, last_n
+    )
+)
+
+
+def _messages_cache_key(chat_name: str, last_n: int) -> tuple[str, str, int]:
+    return ("fetch_messages_by_chat", chat_name, last_n)
+
+
+def _is_cacheable(result: list[dict[str, Any]]) -> bool:
+    return not any("error" in item for item in result)
+
+
+async def _stream_result(
+    ctx: Context,
+    label: str,
+    result: dict[str, Any],
+    progress: int,
+    total: int,
+    message: str,
+) -> None:
+    """
+    Send one per-item result of a batch tool to the client as a log
+    notification and report it as the `progress`-th of `total` items.
+    """
+    await ctx.session.send_log_message(
+        level="info",
+        data=result,
+        logger=label,
+        related_request_id=ctx.request_id,
+    )
+    await ctx.report_progress(progress=progress, total=total, message=message)
+
+
+async def _stream_ui_batch(
+    produce: Callable[[], Iterable[dict[str, Any]]],
+    ctx: Context,
+    label: str,
+    results: list[dict[str, Any]],
+    total: int,
+    describe: Callable[[dict[str, Any]], str],
+) -> None:
+    """
+    Run the per-item results of `produce()` as one BULK UI job and stream
+    each to the client (see _stream_result) as soon as the UI worker
+    yields it, appending it to `results`. `describe(result)` is the
+    progress message. Cancelling the tool call cancels the job; an error
+    of the job is raised once the results before it have been streamed.
+    """
+    loop = asyncio.get_running_loop()
+    completed: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+
+    def run_batch() -> None:
+        try:
+            for result in produce():
+                loop.call_soon_threadsafe(completed.put_nowait, result)
+        finally:
+            loop.call_soon_threadsafe(completed.put_nowait, None)
+
+    batch = asyncio.ensure_future(
+        _run_ui(run_batch, priority=UIPriority.BULK, ctx=ctx, label=label)
+    )
+    try:
+        while (result := await completed.get()) is not None:
+            results.append(result)
+            await _stream_result(
+                ctx, label, result, len(results), total, describe(result)
+            )
+    except asyncio.CancelledError:
+        batch.cancel()
+        raise
+    await batch
+
 
 @mcp.tool()
-def fetch_messages_by_chat(
+@_perf_in_results
+async def fetch_messages_by_chat(
     chat_name: str,
     last_n: int = 50,
+    max_age_seconds: float | None = None,
+    ctx: Context | None = None,
 ) -> list[dict[str, Any]]:
     """
     Fetch recent messages for a specific chat (contact or group).
@@ -32,32 +299,42 @@ def fetch_messages_by_chat(
     - If found, click it to open the chat
     - If not found, search for the chat via the search box
     - Once the chat is open, retrieve recent messages from that chat
+
+    Identical requests made within a few seconds share one UI pass and
+    are answered from a short-lived cache; sending to the chat drops its
+    cached messages.
+
+    Chats on the prefetch watchlist (see set_prefetch_watchlist) are
+    answered without touching the UI from the copy refreshed in the
+    background, if it is at most `max_age_seconds` old (default:
+    WECHAT_MCP_PREFETCH_MAX_AGE, 300); each message then carries
+    "cached_age_seconds". Pass 0 to always read the UI.
     """
     try:
         logger.info("Tool fetch_messages_by_chat called for chat=%s", chat_name)
-        current_chat = get_current_chat_name()
-        same_chat = current_chat == chat_name if current_chat is not None else False
-        logger.info(
-            "Current chat title=%r, target=%r, same_chat=%s",
-            current_chat,
+        prefetched = prefetcher.lookup(chat_name, last_n, max_age_seconds)
+        if prefetched is not None:
+            messages, age = prefetched
+            logger.info(
+                "Returning %d prefetched messages for chat=%s (%.1fs old)",
+                len(messages),
+                chat_name,
+                age,
+            )
+            return [{**msg, "cached_age_seconds": round(age, 1)} for msg in messages]
+        result = await read_cache.get_or_compute_async(
+            _messages_cache_key(chat_name, last_n),
             chat_name,
-            same_chat,
+            lambda: _run_ui(
+                _fetch_messages_by_chat_ui,
+                chat_name,
+                last_n,
+                priority=UIPriority.INTERACTIVE,
+                ctx=ctx,
+                label="fetch_messages_by_chat",
+            ),
+            cacheable=_is_cacheable,
         )
-        if not same_chat:
-            open_result = open_chat_for_contact(chat_name)
-            if isinstance(open_result, dict) and open_result.get("error"):
-                # No exact match; surface candidates instead of forcing a chat.
-                logger.info(
-                    "open_chat_for_contact returned candidates for chat=%s; "
-                    "skipping message fetch",
-                    chat_name,
-                )
-                enriched = dict(open_result)
-                enriched.setdefault("tool", "fetch_messages_by_chat")
-                return [enriched]
-
-        messages: list[ChatMessage] = fetch_recent_messages(last_n=last_n)
-        result = [msg.to_dict() for msg in messages]
         logger.info("Returning %d messages for chat=%s", len(result), chat_name)
         return result
     except Exception as exc:
@@ -75,9 +352,212 @@ def fetch_messages_by_chat(
 
 
 @mcp.tool()
-def reply_to_messages_by_chat(
+@_perf_in_results
+async def fetch_messages_for_chats(
+    chats: list[str | dict[str, Any]],
+    ctx: Context,
+    last_n: int = 50,
+) -> list[dict[str, Any]]:
+    """
+    Fetch recent messages for several chats in one call.
+
+    Each entry in `chats` is either a chat name or an object
+    {"chat_name": str, "last_n": int}; `last_n` is the default for
+    entries that do not set their own.
+
+    Chats are visited in navigation-cost order: the chat that is already
+    open first, then chats visible in the left sidebar session list, and
+    chats that require global search last. Each per-chat result is
+    streamed to the client as a log notification (and reported as
+    progress) as soon as it completes; chats answered by the short-lived
+    read cache are reported first with route "cache". The returned list
+    follows the input order; every item has "index", "chat_name" and
+    "route", plus either "messages" or "error" (with "candidates" for
+    ambiguous names).
+    """
+    logger.info("Tool fetch_messages_for_chats called for %d chats", len(chats))
+    try:
+        requests = normalize_chat_fetch_requests(chats, default_last_n=last_n)
+    except ValueError as exc:
+        return [{"error": str(exc), "tool": "fetch_messages_for_chats"}]
+
+    results: list[dict[str, Any]] = []
+    pending = []
+    for request in requests:
+        cached = read_cache.get(_messages_cache_key(request.chat_name, request.last_n))
+        if cached is None:
+            pending.append(request)
+            continue
+        results.append(
+            {
+                "index": request.index,
+                "chat_name": request.chat_name,
+                "route": "cache",
+                "messages": cached,
+            }
+        )
+
+    def fetch_pending() -> Iterable[dict[str, Any]]:
+        # Runs on the UI worker; more urgent jobs (e.g. sends) queued by
+        # other clients get to run between two chats of the batch.
+        try:
+            for result in ax_fetch_messages_for_chats(
+                pending,
+                between_chats=lambda: ui_scheduler.run_preempting_jobs(
+                    UIPriority.BULK
+                ),
+            ):
+                if "messages" in result:
+                    request = requests[result["index"]]
+                    read_cache.put(
+                        _messages_cache_key(request.chat_name, request.last_n),
+                        request.chat_name,
+                        result["messages"],
+                    )
+                yield result
+        finally:
+            read_cache.invalidate(ALL_CHATS)
+
+    def describe(result: dict[str, Any]) -> str:
+        return f"Fetched {result['chat_name']}"
+
+    try:
+        for progress, result in enumerate(list(results), start=1):
+            await _stream_result(
+                ctx,
+                "fetch_messages_for_chats",
+                result,
+                progress,
+                len(requests),
+                describe(result),
+            )
+        if pending:
+            await _stream_ui_batch(
+                fetch_pending,
+                ctx,
+                "fetch_messages_for_chats",
+                results,
+                len(requests),
+                describe,
+            )
+    except Exception as exc:
+        logger.exception("Error in fetch_messages_for_chats: %s", exc)
+        done = {result["index"] for result in results}
+        for request in requests:
+            if request.index not in done:
+                results.append(
+                    {
+                        "index": request.index,
+                        "chat_name": request.chat_name,
+                        "error": str(exc),
+                    }
+                )
+
+    results.sort(key=lambda result: result["index"])
+    logger.info("Returning batch results for %d chats", len(results))
+    return results
+
+
+@mcp.tool()
+@_perf_in_results
+async def list_unread_chats(
+    include_read: bool = False,
+    ctx: Context | None = None,
+) -> list[dict[str, Any]]:
+    """
+    List chats with unread messages from the left sidebar session list.
+
+    The session list is read once; no chat is opened. Each item contains
+    "chat_name", "unread_count", "last_message_preview" and
+    "last_message_time" as shown in the sidebar. Set `include_read` to
+    True to also return chats without unread messages.
+    """
+    logger.info("Tool list_unread_chats called (include_read=%s)", include_read)
+    try:
+
+        async def compute() -> list[dict[str, Any]]:
+            summaries = await _run_ui(
+                list_session_summaries,
+                only_unread=not include_read,
+                priority=UIPriority.INTERACTIVE,
+                ctx=ctx,
+                label="list_unread_chats",
+            )
+            return [summary.to_dict() for summary in summaries]
+
+        return await read_cache.get_or_compute_async(
+            ("list_unread_chats", include_read), ALL_CHATS, compute
+        )
+    except Exception as exc:
+        logger.exception("Error in list_unread_chats: %s", exc)
+        return [{"error": str(exc)}]
+
+
+def _reply_to_messages_by_chat_ui(
+    chat_name: str,
+    reply_message: str | None,
+    claim: Callable[[], bool] | None = None,
+) -> dict[str, Any]:
+    ax_app = get_wechat_ax_app()
+    current_chat = get_current_chat_name(ax_app)
+    same_chat = current_chat == chat_name if current_chat is not None else False
+    logger.info(
+        "Current chat title=%r, target=%r, same_chat=%s",
+        current_chat,
+        chat_name,
+        same_chat,
+    )
+    if not same_chat:
+        open_result = open_chat_for_contact(chat_name, ax_app=ax_app)
+        if isinstance(open_result, dict) and open_result.get("error"):
+            logger.info(
+                "open_chat_for_contact returned candidates for chat=%s; "
+                "skipping reply send",
+                chat_name,
+            )
+            enriched: dict[str, Any] = {
+                "error": open_result.get("error"),
+                "chat_name": chat_name,
+                "candidates": open_result.get("candidates", {}),
+                "reply_message": reply_message,
+                "sent": False,
+                "tool": "reply_to_messages_by_chat",
+            }
+            return enriched
+
+    receipt = None
+    if reply_message is not None and reply_message.strip():
+        if claim is not None and not claim():
+            raise OperationCancelled("Operation was cancelled")
+        receipt = send_message(reply_message, ax_app=ax_app)
+        logger.info(
+            "Reply to chat=%s %s after %.0f ms; message length=%d",
+            chat_name,
+            receipt.status,
+            receipt.latency_ms,
+            len(reply_message),
+        )
+
+    # Cached messages for this chat are stale now, and so is the sidebar
+    # summary since opening the chat clears its unread badge.
+    read_cache.invalidate(chat_name)
+
+    result: dict[str, Any] = {
+        "chat_name": chat_name,
+        "reply_message": reply_message,
+        "sent": False,
+    }
+    if receipt is not None:
+        result.update(receipt.result_fields())
+    return result
+
+
+@mcp.tool()
+@_perf_in_results
+async def reply_to_messages_by_chat(
     chat_name: str,
     reply_message: str | None = None,
+    ctx: Context | None = None,
 ) -> dict[str, Any]:
     """
     Optionally send a reply to a chat (contact or group).
@@ -89,55 +569,53 @@ def reply_to_messages_by_chat(
 
     If reply_message is None or empty, no message is sent; the tool still
     ensures the chat is open.
+
+    When a message is sent, the result also carries "delivery_status"
+    ("sent" once the text is visible in the chat, "pending" if it left
+    the input field but did not show up in time, "failed" if it stayed in
+    the input field) and the measured "send_latency_ms". "sent" is true
+    only for a confirmed delivery; a pending one has a "warning" and must
+    not be retried blindly, since it may still arrive.
+
+    Sends are rate limited globally and per chat. A reply over the limit
+    is not rejected: it is queued and sent in the background as soon as
+    the limit allows, and the result has "queued": true, a "queue_id" and
+    "estimated_wait_seconds" (see get_send_queue_status).
     """
     logger.info(
         "Tool reply_to_messages_by_chat called for chat=%s (has_reply=%s)",
         chat_name,
         bool(reply_message),
     )
-    try:
-        current_chat = get_current_chat_name()
-        same_chat = current_chat == chat_name if current_chat is not None else False
-        logger.info(
-            "Current chat title=%r, target=%r, same_chat=%s",
-            current_chat,
-            chat_name,
-            same_chat,
-        )
-        if not same_chat:
-            open_result = open_chat_for_contact(chat_name)
-            if isinstance(open_result, dict) and open_result.get("error"):
-                logger.info(
-                    "open_chat_for_contact returned candidates for chat=%s; "
-                    "skipping reply send",
-                    chat_name,
-                )
-                enriched: dict[str, Any] = {
-                    "error": open_result.get("error"),
-                    "chat_name": chat_name,
-                    "candidates": open_result.get("candidates", {}),
-                    "reply_message": reply_message,
-                    "sent": False,
-                    "tool": "reply_to_messages_by_chat",
-                }
-                return enriched
-
-        sent = False
-        if reply_message is not None and reply_message.strip():
-            send_message(reply_message)
-            sent = True
-            logger.info(
-                "Reply sent to chat=%s; message length=%d",
-                chat_name,
-                len(reply_message),
-            )
-
+    has_reply = reply_message is not None and bool(reply_message.strip())
+    if has_reply and not _acquire_send_slot(chat_name):
+        item = send_queue.enqueue(chat_name, reply_message, _client_id(ctx))
         return {
             "chat_name": chat_name,
             "reply_message": reply_message,
-            "sent": sent,
+            "sent": False,
+            **_queued_status(item),
         }
-    except Exception as exc:
+
+    reservations = SendReservations(send_rate_limiter)
+    if has_reply:
+        reservations.add(chat_name, chat_name)
+    try:
+        result = await _run_ui(
+            _reply_to_messages_by_chat_ui,
+            chat_name,
+            reply_message,
+            claim=functools.partial(reservations.claim, chat_name),
+            priority=UIPriority.SEND,
+            ctx=ctx,
+            label="reply_to_messages_by_chat",
+        )
+    except BaseException as exc:
+        # Only a reply that was never started gets its token back; the
+        # UI job may still be sending it after a cancellation.
+        reservations.refund_unclaimed()
+        if not isinstance(exc, Exception):
+            raise
         logger.exception(
             "Error in reply_to_messages_by_chat for chat=%s: %s",
             chat_name,
@@ -148,9 +626,177 @@ def reply_to_messages_by_chat(
             "chat_name": chat_name,
         }
 
+    if has_reply and not may_have_been_delivered(result):
+        send_rate_limiter.release(chat_name)
+    return result
+
+
+def _acquire_send_slot(chat_name: str) -> bool:
+    """
+    Take a rate-limit token for an immediate send to `chat_name`.
+
+    Fails while queued sends would be overtaken by it (see
+    OutboundSendQueue.try_acquire_immediate).
+    """
+    return send_queue.try_acquire_immediate(chat_name)
+
+
+def _queued_status(item: QueuedSend) -> dict[str, Any]:
+    eta = send_queue.estimated_send_at(item) - item.enqueued_at
+    return {
+        "queued": True,
+        "queue_id": item.queue_id,
+        "estimated_wait_seconds": round(max(0.0, eta), 1),
+    }
+
+
+def _send_queued_message(chat_name: str, text: str) -> dict[str, Any]:
+    return ui_scheduler.run(
+        _run_in_session,
+        "queued_send",
+        _reply_to_messages_by_chat_ui,
+        chat_name,
+        text,
+        priority=UIPriority.SEND,
+        client_id="send-queue",
+        label="queued_send",
+    )
+
+
+send_queue.send_fn = _send_queued_message
+
+
+def _send_messages_ui(
+    messages: list[Any], claim: Callable[[Any], bool] | None = None
+) -> list[dict[str, Any]]:
+    statuses: list[dict[str, Any]] = []
+    try:
+        for status in send_messages_to_chats(messages, claim):
+            statuses.append(status)
+    except OperationCancelled:
+        # The tool call was cancelled: stop the batch instead of reporting
+        # the remaining messages as failed.
+        logger.info(
+            "Batch send cancelled after %d of %d messages",
+            len(statuses),
+            len(messages),
+        )
+        raise
+    except Exception as exc:
+        # Keep the statuses of messages that already went out so callers
+        # do not resend them.
+        logger.exception("Batch send aborted: %s", exc)
+        done = {status["index"] for status in statuses}
+        statuses.extend(
+            {
+                "index": message.index,
+                "chat_name": message.chat_name,
+                "sent": False,
+                "error": str(exc),
+            }
+            for message in messages
+            if message.index not in done
+        )
+    finally:
+        for chat_name in {message.chat_name for message in messages}:
+            read_cache.invalidate(chat_name)
+    return statuses
+
+
+@mcp.tool()
+@_perf_in_results
+async def send_messages(
+    messages: list[dict[str, str]],
+    ctx: Context | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Send several messages, possibly to several chats, in one call.
+
+    Each entry of `messages` is {"chat_name": str, "text": str}. Messages
+    are grouped per chat so that every chat is opened only once, and the
+    messages for a chat are sent back to back in their original order.
+    Returns one status per message, in input order, with "index",
+    "chat_name" and "sent"; entries that were not sent carry an "error"
+    (and "candidates" when the chat name was ambiguous).
+
+    Messages over the send rate limit are queued instead of sent and
+    reported with "queued": true, a "queue_id" and
+    "estimated_wait_seconds"; later messages to the same chat queue
+    behind them so that their order is kept.
+    """
+    logger.info("Tool send_messages called with %d messages", len(messages))
+    try:
+        outgoing = normalize_outgoing_messages(messages)
+    except ValueError as exc:
+        return [{"error": str(exc), "tool": "send_messages"}]
+
+    immediate = []
+    reservations = SendReservations(send_rate_limiter)
+    statuses: list[dict[str, Any]] = []
+    queued_chats: set[str] = set()
+    for message in outgoing:
+        if message.chat_name not in queued_chats and _acquire_send_slot(
+            message.chat_name
+        ):
+            immediate.append(message)
+            reservations.add(message.index, message.chat_name)
+            continue
+        # Once a chat is throttled, its later messages queue behind it.
+        queued_chats.add(message.chat_name)
+        item = send_queue.enqueue(message.chat_name, message.text, _client_id(ctx))
+        statuses.append(
+            {
+                "index": message.index,
+                "chat_name": message.chat_name,
+                "sent": False,
+                **_queued_status(item),
+            }
+        )
+
+    if immediate:
+        try:
+            sent_statuses = await _run_ui(
+                _send_messages_ui,
+                immediate,
+                lambda message: reservations.claim(message.index),
+                priority=UIPriority.SEND,
+                ctx=ctx,
+                label="send_messages",
+            )
+        except BaseException as exc:
+            # Messages the UI job already started may have been delivered
+            # and keep their tokens; it sends none of the others now.
+            reservations.refund_unclaimed()
+            if not isinstance(exc, Exception):
+                raise
+            logger.exception("Error in send_messages: %s", exc)
+            sent_statuses = [
+                {
+                    "index": message.index,
+                    "chat_name": message.chat_name,
+                    "sent": False,
+                    "error": str(exc),
+                }
+                for message in immediate
+            ]
+        else:
+            for status in sent_statuses:
+                if not may_have_been_delivered(status):
+                    send_rate_limiter.release(status["chat_name"])
+        statuses.extend(sent_statuses)
+
+    statuses.sort(key=lambda status: status["index"])
+    logger.info(
+        "send_messages finished: %d/%d sent",
+        sum(1 for status in statuses if status["sent"]),
+        len(statuses),
+    )
+    return statuses
+
 
 @mcp.tool()
-def add_contact_by_wechat_id(
+@_perf_in_results
+async def add_contact_by_wechat_id(
     wechat_id: str,
     friending_msg: str | None = None,
     remark: str | None = None,
@@ -158,6 +804,8 @@ def add_contact_by_wechat_id(
     privacy: str | None = None,
     hide_my_posts: bool = False,
     hide_their_posts: bool = False,
+    resume_from: str | None = None,
+    ctx: Context | None = None,
 ) -> dict[str, Any]:
     """
     Add a new contact using a WeChat ID.
@@ -174,6 +822,11 @@ def add_contact_by_wechat_id(
     - "all" (default) selects "Chats, Moments, WeRun, etc." and applies
       the `hide_my_posts` / `hide_their_posts` flags.
     - "chats_only" selects "Chats Only" and ignores the hide flags.
+
+    If a step fails (e.g. a window appears late), the error result has
+    the failing "stage" and "resume_from". Call again with the same
+    arguments and that `resume_from` to retry only from that step: the
+    windows already open are reused and the search is not repeated.
     """
     logger.info(
         "Tool add_contact_by_wechat_id called for ID=%s (privacy=%r, hide_my_posts=%s, hide_their_posts=%s)",
@@ -183,7 +836,11 @@ def add_contact_by_wechat_id(
         hide_their_posts,
     )
     try:
-        result = ax_add_contact_by_wechat_id(
+        result = await _run_ui(
+            ax_add_contact_by_wechat_id,
+            priority=UIPriority.INTERACTIVE,
+            ctx=ctx,
+            label="add_contact_by_wechat_id",
             wechat_id=wechat_id,
             friending_msg=friending_msg,
             remark=remark,
@@ -191,6 +848,7 @@ def add_contact_by_wechat_id(
             privacy=privacy,
             hide_my_posts=hide_my_posts,
             hide_their_posts=hide_their_posts,
+            resume_from=resume_from,
         )
         return result
     except Exception as exc:
@@ -206,21 +864,106 @@ def add_contact_by_wechat_id(
 
 
 @mcp.tool()
-def publish_moment_without_media(
+@_perf_in_results
+async def add_contacts_by_wechat_ids(
+    contacts: list[str | dict[str, Any]],
+    ctx: Context,
+    friending_msg: str | None = None,
+    remark: str | None = None,
+    tags: str | None = None,
+    privacy: str | None = None,
+    hide_my_posts: bool = False,
+    hide_their_posts: bool = False,
+) -> list[dict[str, Any]]:
+    """
+    Send friend requests to several WeChat IDs in one call.
+
+    Each entry in `contacts` is either a WeChat ID or an object with
+    "wechat_id" and any of "friending_msg", "remark", "tags", "privacy",
+    "hide_my_posts" and "hide_their_posts", overriding the defaults
+    given as arguments for that ID (see add_contact_by_wechat_id).
+
+    Each per-ID result is streamed to the client as a log notification
+    (and reported as progress) as soon as it completes. Successful IDs
+    are checkpointed, so if the call is interrupted, calling it again
+    with the same list skips the IDs that already got their request;
+    their results are returned with "resumed": true. The returned list
+    follows the input order; every item has "index" and "wechat_id",
+    plus either the applied settings or "error" and "stage".
+    """
+    logger.info("Tool add_contacts_by_wechat_ids called for %d IDs", len(contacts))
+    defaults = {
+        "friending_msg": friending_msg,
+        "remark": remark,
+        "tags": tags,
+        "privacy": privacy,
+        "hide_my_posts": hide_my_posts,
+        "hide_their_posts": hide_their_posts,
+    }
+    try:
+        requests = normalize_add_contact_requests(contacts, defaults)
+    except ValueError as exc:
+        return [{"error": str(exc), "tool": "add_contacts_by_wechat_ids"}]
+
+    results: list[dict[str, Any]] = []
+    try:
+        await _stream_ui_batch(
+            lambda: ax_add_contacts_by_wechat_ids(
+                requests,
+                checkpoint=add_contact_checkpoint,
+                between_items=lambda: ui_scheduler.run_preempting_jobs(
+                    UIPriority.BULK
+                ),
+            ),
+            ctx,
+            "add_contacts_by_wechat_ids",
+            results,
+            len(requests),
+            lambda result: f"Processed {result['wechat_id']}",
+        )
+    except Exception as exc:
+        logger.exception("Error in add_contacts_by_wechat_ids: %s", exc)
+        done = {result["index"] for result in results}
+        for request in requests:
+            if request.index not in done:
+                results.append(
+                    {
+                        "index": request.index,
+                        "wechat_id": request.wechat_id,
+                        "error": str(exc),
+                    }
+                )
+
+    results.sort(key=lambda result: result["index"])
+    return results
+
+
+@mcp.tool()
+@_perf_in_results
+async def publish_moment_without_media(
     content: str,
     publish: bool = True,
+    resume_from: str | None = None,
+    ctx: Context | None = None,
 ) -> dict[str, Any]:
     """
     Publish a Moments post containing only text (no media).
 
     This will:
-    - Open the main WeChat window and click the "Moments" button.
-    - Long-press the "Post" button in the Moments window to open the
-      composer sheet.
+    - Reuse the Moments window if it is open, otherwise click the
+      "Moments" button in the main WeChat window.
+    - Reuse an open composer, otherwise long-press the "Post" button in
+      the Moments window until the composer sheet appears.
     - Fill the text entry area with the provided content.
     - If `publish` is True (default), click the "Post" button in the
       sheet to publish the moment; if False, leave the composer open
       without sending.
+
+    The result includes "timings_ms" with the duration of each stage.
+    A failed result also has "resume_from": pass it back (with the same
+    content) to retry from that stage, reusing the open Moments window
+    and composer. With publish=False followed by resume_from="post",
+    a prepared draft can be posted later.
     """
     logger.info(
         "Tool publish_moment_without_media called (content_length=%d, publish=%s)",
@@ -228,7 +971,15 @@ def publish_moment_without_media(
         publish,
     )
     try:
-        result = ax_publish_moment(content=content, publish=publish)
+        result = await _run_ui(
+            ax_publish_moment,
+            priority=UIPriority.INTERACTIVE,
+            ctx=ctx,
+            label="publish_moment_without_media",
+            content=content,
+            publish=publish,
+            resume_from=resume_from,
+        )
         return result
     except Exception as exc:
         logger.exception("Error in publish_moment_without_media: %s", exc)
@@ -238,6 +989,221 @@ def publish_moment_without_media(
         }
 
 
+@mcp.tool()
+@_perf_in_results
+async def publish_moments(
+    contents: list[str],
+    ctx: Context | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Publish several text-only Moments posts in one call.
+
+    The Moments window is opened once and reused for every post, and the
+    composer is reopened for each. Every result has "index", "content",
+    "posted" and "timings_ms" (per-stage durations). If a post fails,
+    its result carries "error" and "stage", and the remaining posts are
+    returned with "stage": "skipped" without being attempted.
+    """
+    logger.info("Tool publish_moments called for %d posts", len(contents))
+    try:
+        return await _run_ui(
+            lambda: list(ax_publish_moments(contents)),
+            priority=UIPriority.INTERACTIVE,
+            ctx=ctx,
+            label="publish_moments",
+        )
+    except Exception as exc:
+        logger.exception("Error in publish_moments: %s", exc)
+        return [{"error": str(exc), "tool": "publish_moments"}]
+
+
+@mcp.tool()
+@_perf_in_results
+async def calibrate_timing(
+    trials: int = 3,
+    reset: bool = False,
+    ctx: Context | None = None,
+) -> dict[str, Any]:
+    """
+    Tune the waits after clicks, scrolls and typing to this machine.
+
+    Measures how quickly WeChat reflects a scroll in the open chat, a
+    query typed into the global search and a click on a "View All"
+    search row, `trials` times each, then sets every settle delay from
+    the slowest trial and persists the profile. The search is cleared
+    afterwards; open a chat first to also time scrolling. With `reset`,
+    the profile first goes back to its defaults.
+
+    Returns "samples_ms" per kind of input, "skipped" with the reason
+    for kinds that could not be measured (their delays are kept), and
+    "profile" with every delay's value, bounds and online adaptation
+    counts. Delays keep adapting as the tools observe late UI updates.
+    """
+    logger.info("Tool calibrate_timing called (trials=%d, reset=%s)", trials, reset)
+    try:
+        result = await _run_ui(
+            ax_calibrate_timing,
+            priority=UIPriority.INTERACTIVE,
+            ctx=ctx,
+            label="calibrate_timing",
+            trials=trials,
+            reset=reset,
+        )
+        return result.to_dict()
+    except Exception as exc:
+        logger.exception("Error in calibrate_timing: %s", exc)
+        return {"error": str(exc), "profile": timing_profile.to_dict()}
+
+
+@mcp.tool()
+def search_contacts(
+    query: str,
+    limit: int = 15,
+    kind: str | None = None,
+) -> dict[str, Any]:
+    """
+    Look up contact and group names similar to `query` without touching
+    the WeChat UI.
+
+    Answers from a local directory of every name seen so far in the
+    session list, in search results and in opened chats, so it returns
+    in milliseconds but only knows names that have appeared before. Use
+    it to resolve an ambiguous or misspelled chat name before calling
+    fetch_messages_by_chat or reply_to_messages_by_chat.
+
+    - `kind` optionally restricts results to "contact" or "group"
+      (names only seen in the session list match either).
+    - Each match has "name", "kind" ("contact", "group" or "chat" when
+      unknown), "score" (0-1, 1 for an exact match) and "last_seen".
+    """
+    logger.info("Tool search_contacts called (query=%r, kind=%r)", query, kind)
+    if kind not in (None, "contact", "group"):
+        return {"error": "kind must be 'contact', 'group' or null", "query": query}
+    return {
+        "query": query,
+        "matches": contact_directory.search(query, limit=limit, kind=kind),
+        "directory_size": len(contact_directory),
+    }
+
+
+@mcp.tool()
+def get_ui_queue_stats() -> dict[str, Any]:
+    """
+    Report the state of the UI action queue.
+
+    All tools that drive the WeChat UI are serialized through a single
+    queue (sends first, then interactive calls, then bulk batches, with
+    round-robin between clients). This returns the current queue depth
+    per priority, wait-time aggregates and the most recent jobs with
+    their individual wait and run times.
+
+    "wechat_activation" counts how often WeChat was brought to the front
+    (each tool call activates it at most once, and not at all when it is
+    already frontmost) and lists the most recent calls with their counts.
+    "text_entry" reports, per text field, the success rate and latency of
+    each way of entering text (direct AX value set vs. pasting).
+    """
+    return {
+        **ui_scheduler.stats(),
+        "wechat_activation": activation_stats(),
+        "text_entry": text_entry_stats.stats(),
+    }
+
+
+@mcp.tool()
+def get_performance_stats(reset: bool = False) -> dict[str, Any]:
+    """
+    Report where the time of UI tool calls goes.
+
+    "stages" has, per instrumented stage (AX traversal, search, scroll
+    loops, screenshot capture, sender classification, window waits,
+    ...), the number of runs and failures with total, average, p50,
+    p95, p99 and max duration in milliseconds. "recent_calls" breaks
+    down the most recent tool calls by stage. With `reset`, the figures
+    are cleared after being returned. Collection can be disabled with
+    WECHAT_MCP_PERF_STATS=0.
+
+    "ax_calls" counts Accessibility IPC calls (attribute reads, attribute
+    sets and actions) by attribute or action name, in total and for the
+    most recent tool calls.
+
+    "timing_profile" lists the settle delays after clicks, scrolls and
+    typing (see calibrate_timing) with how often each proved long
+    enough or too short.
+    """
+    stats = {
+        **perf_stats.stats(),
+        "ax_calls": ax_call_accounting.stats(),
+        "timing_profile": timing_profile.to_dict(),
+    }
+    if reset:
+        perf_stats.reset()
+        ax_call_accounting.reset()
+    return stats
+
+
+@mcp.tool()
+def set_prefetch_watchlist(
+    chats: list[str | dict[str, Any]],
+    last_n: int = 50,
+) -> dict[str, Any]:
+    """
+    Set the chats to keep prefetched for fetch_messages_by_chat.
+
+    Each entry in `chats` is either a chat name or an object
+    {"chat_name": str, "last_n": int}; `last_n` is the default for
+    entries that do not set their own. An empty list stops prefetching.
+    The watchlist replaces the previous one and survives restarts.
+
+    Once no tool call has run and the user has not used the keyboard or
+    mouse for WECHAT_MCP_PREFETCH_IDLE_SECONDS (30), a background job
+    refreshes the watched chat fetched longest ago, at most every
+    WECHAT_MCP_PREFETCH_REFRESH_SECONDS (120) per chat. The job is
+    cancelled as soon as a tool call arrives. Returns the
+    prefetcher's state as reported by get_read_cache_stats.
+    """
+    logger.info("Tool set_prefetch_watchlist called for %d chats", len(chats))
+    try:
+        requests = normalize_chat_fetch_requests(chats, default_last_n=last_n)
+    except ValueError as exc:
+        return {"error": str(exc), "tool": "set_prefetch_watchlist"}
+    prefetcher.set_watchlist(
+        {request.chat_name: request.last_n for request in requests}
+    )
+    return prefetcher.stats()
+
+
+@mcp.tool()
+def get_read_cache_stats() -> dict[str, Any]:
+    """
+    Report the short-lived read cache used by fetch_messages_by_chat,
+    fetch_messages_for_chats and list_unread_chats.
+
+    Returns the number of cached entries and requests in flight, plus
+    hit, miss and coalesce counts and rates. A coalesced request is an
+    identical request that shared the result of one already running.
+    "prefetch" reports the watched chats, when each was last refreshed
+    and how many refreshes ran, yielded to a tool call or failed.
+    """
+    return {**read_cache.stats(), "prefetch": prefetcher.stats()}
+
+
+@mcp.tool()
+def get_send_queue_status() -> dict[str, Any]:
+    """
+    Report the outbound send rate limiter and its queue.
+
+    Returns the configured global and per-chat limits with the current
+    token levels, the number of queued sends, the seconds until the next
+    queued send may go out, each queued item with how long it has been
+    waiting, and recently drained items with their total wait and result.
+    """
+    return {
+        "limits": send_rate_limiter.snapshot(),
+        **send_queue.stats(),
+    }
+
+
 def main() -> None:
     """
     Entry point for the WeChat MCP server.
@@ -271,9 +1237,14 @@ def main() -> None:
             handler.setFormatter(debug_formatter)
 
     logger.info("Starting WeChat Helper MCP Server")
+    logger.info("Log file: %s", get_log_dir() / "wechat_mcp.log")
     logger.info("Transport: %s", args.transport)
     logger.info("MCP Debug mode: %s", args.mcp_debug)
 
+    atexit.register(navigation_cache.flush)
+    atexit.register(timeline_writer.flush)
+    prefetcher.start()
+
     if args.transport == "stdio":
         mcp.run()
     elif args.transport == "streamable-http":
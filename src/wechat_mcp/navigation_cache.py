@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Literal
+
+from .logging_config import logger
+from .state_store import load_state, save_state
+
+STATE_NAME = "navigation_routes"
+
+NavigationRouteName = Literal["session_list", "contacts", "group_chats"]
+ROUTE_NAMES: tuple[str, ...] = ("session_list", "contacts", "group_chats")
+
+
+@dataclass
+class NavigationRoute:
+    """
+    How a chat was opened before: from its row in the sidebar session
+    list, or from an exact match in the "Contacts" / "Group Chats"
+    section of the global search results at roughly `result_index`
+    within that section.
+    """
+
+    route: NavigationRouteName
+    result_index: int | None = None
+    successes: int = 0
+    failures: int = 0
+    last_used: float = 0.0
+
+    @property
+    def score(self) -> int:
+        # One failure outweighs two successes so that a route that stops
+        # working is demoted quickly.
+        return self.successes - 2 * self.failures
+
+
+class NavigationCache:
+    """
+    Remembers which route opened each chat and offers it first next time.
+
+    Routes are kept per chat name, scored by their successes minus
+    twice their failures. best_route() returns the highest-scoring route
+    with a positive score; routes whose score drops to zero or below are
+    discarded. The cache is persisted under the state directory and
+    bounded to `max_entries` chats, evicting the least recently used.
+
+    A success that only bumps the counters of a stored route is written
+    at most every `save_interval` seconds; new, changed and dropped
+    routes are written at once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 500,
+        clock: Callable[[], float] = time.time,
+        persist: bool = True,
+        save_interval: float = 60.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self._clock = clock
+        self._persist = persist
+        self._lock = threading.Lock()
+        self._routes: dict[str, dict[str, NavigationRoute]] = {}
+        self._saved_at = float("-inf")
+        self._dirty = False
+        self._hits = 0
+        self._misses = 0
+        self._demotions = 0
+        if persist:
+            self._load()
+
+    def best_route(self, chat_name: str) -> NavigationRoute | None:
+        with self._lock:
+            routes = self._routes.get(chat_name, {})
+            best = max(routes.values(), key=lambda r: r.score, default=None)
+            if best is None or best.score <= 0:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return NavigationRoute(**asdict(best))
+
+    def record_success(
+        self,
+        chat_name: str,
+        route: NavigationRouteName,
+        result_index: int | None = None,
+    ) -> None:
+        with self._lock:
+            routes = self._routes.setdefault(chat_name, {})
+            entry = routes.get(route)
+            changed = (
+                entry is None
+                or entry.failures > 0
+                or (result_index is not None and entry.result_index != result_index)
+            )
+            if entry is None:
+                entry = routes[route] = NavigationRoute(route=route)
+            entry.successes += 1
+            entry.failures = 0
+            if result_index is not None:
+                entry.result_index = result_index
+            entry.last_used = self._clock()
+            self._evict_locked()
+            if changed or entry.last_used - self._saved_at >= self.save_interval:
+                self._save_locked()
+            else:
+                self._dirty = True
+
+    def record_failure(self, chat_name: str, route: NavigationRouteName) -> None:
+        with self._lock:
+            routes = self._routes.get(chat_name)
+            entry = routes.get(route) if routes else None
+            if entry is None:
+                return
+            entry.failures += 1
+            self._demotions += 1
+            if entry.score <= 0:
+                del routes[route]
+                if not routes:
+                    del self._routes[chat_name]
+            logger.info(
+                "Demoted navigation route %s for chat=%s (score=%d)",
+                route,
+                chat_name,
+                entry.score,
+            )
+            self._save_locked()
+
+    def forget(self, chat_name: str) -> None:
+        with self._lock:
+            if self._routes.pop(chat_name, None) is not None:
+                self._save_locked()
+
+    def flush(self) -> None:
+        """
+        Write successes not persisted yet because of `save_interval`.
+        """
+        with self._lock:
+            if self._dirty:
+                self._save_locked()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "chats": len(self._routes),
+                "hits": self._hits,
+                "misses": self._misses,
+                "demotions": self._demotions,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _evict_locked(self) -> None:
+        overflow = len(self._routes) - self.max_entries
+        if overflow <= 0:
+            return
+        by_age = sorted(
+            self._routes,
+            key=lambda name: max(r.last_used for r in self._routes[name].values()),
+        )
+        for name in by_age[:overflow]:
+            del self._routes[name]
+
+    def _load(self) -> None:
+        state = load_state(STATE_NAME, {})
+        if not isinstance(state, dict):
+            return
+        for chat_name, routes in state.items():
+            try:
+                loaded = {
+                    name: NavigationRoute(**data)
+                    for name, data in routes.items()
+                    if name in ROUTE_NAMES
+                }
+            except (AttributeError, TypeError) as exc:
+                logger.warning(
+                    "Ignoring malformed navigation route for %s: %s", chat_name, exc
+                )
+                continue
+            if loaded:
+                self._routes[chat_name] = loaded
+
+    def _save_locked(self) -> None:
+        self._dirty = False
+        self._saved_at = self._clock()
+        if not self._persist:
+            return
+        state = {
+            chat_name: {name: asdict(route) for name, route in routes.items()}
+            for chat_name, routes in self._routes.items()
+        }
+        try:
+            save_state(STATE_NAME, state)
+        except OSError as exc:
+            logger.warning("Could not persist navigation routes: %s", exc)
+
+
+navigation_cache = NavigationCache()
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar
+
+from .env import env_flag
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Durations kept per stage for the percentiles; older samples are
+# dropped so the figures follow recent behaviour.
+SAMPLES_PER_STAGE = 1024
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class StageStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: deque[float] = deque(maxlen=SAMPLES_PER_STAGE)
+
+    def add(self, elapsed_ms: float, ok: bool) -> None:
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def to_dict(self) -> dict[str, Any]:
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 1),
+            "avg_ms": round(self.total_ms / self.count, 1),
+            "p50_ms": round(_percentile(ordered, 0.50), 1),
+            "p95_ms": round(_percentile(ordered, 0.95), 1),
+            "p99_ms": round(_percentile(ordered, 0.99), 1),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class CallSpans:
+    """
+    Per-stage time and counts of one tool call.
+    """
+
+    def __init__(self, label: str) -> None:
+        self.label = label
+        self.started = time.time()
+        self.elapsed_ms = 0.0
+        self.stages: dict[str, list[float]] = {}
+        # Set by timeline_recording() to also place each span on a
+        # timeline of the call.
+        self.timeline: Any = None
+
+    def add(
+        self,
+        name: str,
+        elapsed_ms: float,
+        started: float | None = None,
+        ok: bool = True,
+    ) -> None:
+        entry = self.stages.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        if self.timeline is not None and started is not None:
+            self.timeline.add_span(name, "stage", started, elapsed_ms, ok=ok)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "label": self.label,
+            "started": self.started,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "stages": {
+                name: {"count": int(count), "total_ms": round(total, 1)}
+                for name, (count, total) in self.stages.items()
+            },
+        }
+
+
+class PerfStats:
+    """
+    Lightweight spans around the stages of the UI flows.
+
+    Each span adds its duration to a per-stage aggregate (count, errors,
+    total, max and p50/p95/p99 over the most recent samples) and, when
+    it runs inside call(), to that tool call's breakdown. Disabled
+    instances (WECHAT_MCP_PERF_STATS=0) skip all bookkeeping; the only
+    remaining cost is one attribute check per span.
+    """
+
+    def __init__(self, enabled: bool = True, recent_calls: int = 20) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages: dict[str, StageStats] = {}
+        self._recent: deque[dict[str, Any]] = deque(maxlen=recent_calls)
+        self._local = threading.local()
+
+    def _calls(self) -> list[CallSpans]:
+        calls = getattr(self._local, "calls", None)
+        if calls is None:
+            calls = self._local.calls = []
+        return calls
+
+    def _open_stages(self) -> list[str]:
+        stages = getattr(self._local, "stages", None)
+        if stages is None:
+            stages = self._local.stages = []
+        return stages
+
+    def current_stage(self) -> str | None:
+        """
+        Return the innermost span open on this thread, if any.
+        """
+        stages = getattr(self._local, "stages", None)
+        return stages[-1] if stages else None
+
+    def record(
+        self,
+        name: str,
+        elapsed_ms: float,
+        ok: bool = True,
+        started: float | None = None,
+    ) -> None:
+        """
+        Add one span; `started` is its perf_counter() start, if known.
+        """
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = StageStats()
+            stats.add(elapsed_ms, ok)
+        calls = getattr(self._local, "calls", None)
+        if calls:
+            calls[-1].add(name, elapsed_ms, started, ok)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        stages = self._open_stages()
+        stages.append(name)
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            stages.pop()
+            self.record(name, elapsed_ms, ok, started)
+
+    def timed(self, name: str) -> Callable[[F], F]:
+        """
+        Decorator form of span(), for stages that are whole functions.
+        """
+
+        def decorate(fn: F) -> F:
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                stages = self._open_stages()
+                stages.append(name)
+                started = time.perf_counter()
+                ok = False
+                try:
+                    result = fn(*args, **kwargs)
+                    ok = True
+                    return result
+                finally:
+                    elapsed_ms = (time.perf_counter() - started) * 1000.0
+                    stages.pop()
+                    self.record(name, elapsed_ms, ok, started)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorate
+
+    @contextmanager
+    def call(self, label: str) -> Iterator[CallSpans | None]:
+        """
+        Collect the spans of one tool call on this thread. Calls may
+        nest (a preempting job runs inside a batch); spans go to the
+        innermost one. Yields None when disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+        call = CallSpans(label)
+        calls = self._calls()
+        calls.append(call)
+        started = time.perf_counter()
+        try:
+            yield call
+        finally:
+            calls.pop()
+            call.elapsed_ms = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                self._recent.append(call.to_dict())
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "stages": {
+                    name: stats.to_dict()
+                    for name, stats in sorted(self._stages.items())
+                },
+                "recent_calls": list(self._recent),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._recent.clear()
+
+
+perf_stats = PerfStats(enabled=env_flag("WECHAT_MCP_PERF_STATS", True))
+
+# Whether UI tools add a "perf_ms" breakdown of their own stages to their
+# results (see mcp_server._perf_in_results).
+PERF_IN_RESULTS = env_flag("WECHAT_MCP_PERF_IN_RESULTS", False)
+
+timed = perf_stats.timed
+span = perf_stats.span
@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from .cancellation import CancellationToken, OperationCancelled, raise_if_cancelled
+from .driver import get_driver
+from .env import env_float
+from .logging_config import logger
+from .read_cache import ReadCache, read_cache
+from .state_store import load_state, save_state
+from .ui_scheduler import UIPriority, UIScheduler, ui_scheduler
+
+STATE_NAME = "prefetch_watchlist"
+
+DEFAULT_LAST_N = 50
+
+
+def prefetch_key(chat_name: str) -> tuple[str, str]:
+    return ("prefetch", chat_name)
+
+
+class Prefetcher:
+    """
+    Keep recent messages of a watchlist of chats warm in the read cache.
+
+    A background thread waits until the UI has been idle (no tool call
+    queued or running) and the user has not touched the keyboard or
+    mouse for `idle_seconds`, since a refresh brings WeChat to the
+    front. It then refreshes the watched chat whose copy is oldest, once
+    it is older than `refresh_seconds`.
+    Each refresh is a UIPriority.IDLE job, so it is cancelled as soon as
+    a tool call is submitted and retried at the next idle period.
+    Copies are stored in `cache` for `max_age_seconds` and dropped with
+    the chat's other entries, e.g. when a message is sent to it.
+
+    `fetch(chat_name, last_n)` runs on the UI worker and returns the
+    message dicts of fetch_messages_by_chat. `user_idle()` returns the
+    seconds since the last user input (default: the driver's
+    user_idle_seconds). The watchlist is persisted under the state
+    directory and loaded by start().
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, int], list[dict[str, Any]]],
+        idle_seconds: float = 30.0,
+        refresh_seconds: float = 120.0,
+        max_age_seconds: float = 300.0,
+        poll_seconds: float = 1.0,
+        scheduler: UIScheduler = ui_scheduler,
+        cache: ReadCache = read_cache,
+        persist: bool = True,
+        user_idle: Callable[[], float] | None = None,
+    ) -> None:
+        self.fetch = fetch
+        self.idle_seconds = idle_seconds
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.poll_seconds = poll_seconds
+        self._scheduler = scheduler
+        self._cache = cache
+        self._persist = persist
+        self._user_idle = user_idle or (lambda: get_driver().user_idle_seconds())
+        self._lock = threading.Lock()
+        self._watched: dict[str, int] = {}
+        self._refreshed_at: dict[str, float] = {}
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._refreshes = 0
+        self._yields = 0
+        self._failures = 0
+        self._served = 0
+        self._deferred = 0
+
+    # -- watchlist --------------------------------------------------------
+
+    def set_watchlist(self, chats: dict[str, int]) -> None:
+        """
+        Replace the watched chats, mapping each name to the number of
+        recent messages to keep.
+        """
+        with self._lock:
+            self._watched = {
+                name: max(1, int(last_n)) for name, last_n in chats.items()
+            }
+            for name in list(self._refreshed_at):
+                if name not in self._watched:
+                    del self._refreshed_at[name]
+            self._save_locked()
+        logger.info("Prefetch watchlist set to %s", sorted(chats))
+        if chats:
+            self.start()
+
+    def watched(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._watched)
+
+    # -- lookups ----------------------------------------------------------
+
+    def lookup(
+        self, chat_name: str, last_n: int, max_age_seconds: float | None = None
+    ) -> tuple[list[dict[str, Any]], float] | None:
+        """
+        Return the last `last_n` prefetched messages of `chat_name` and
+        their age in seconds, if a copy with at least that many messages
+        is at most `max_age_seconds` old (default: max_age_seconds).
+        """
+        max_age = self.max_age_seconds if max_age_seconds is None else max_age_seconds
+        if max_age <= 0:
+            return None
+        # Not a read-cache request: peek so its stats stay those of the
+        # tools.
+        hit = self._cache.peek(prefetch_key(chat_name))
+        if hit is None:
+            return None
+        (fetched_last_n, messages), age = hit
+        if age > max_age or fetched_last_n < last_n:
+            return None
+        with self._lock:
+            self._served += 1
+        return messages[-last_n:] if last_n else [], age
+
+    # -- background refresh -----------------------------------------------
+
+    def start(self) -> None:
+        """
+        Load the persisted watchlist and start the background thread,
+        unless it is already running. WECHAT_MCP_PREFETCH_CHATS
+        (comma-separated names) seeds an empty watchlist.
+        """
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+            if running and not self._stop.is_set():
+                return
+            if not self._watched:
+                self._load_locked()
+            if not self._watched:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._loop, name="wechat-prefetch", daemon=True
+            )
+            self._thread.start()
+        logger.info("Prefetching %d watched chats when idle", len(self._watched))
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.run_once()
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Prefetch pass failed: %s", exc)
+
+    def run_once(self) -> str | None:
+        """
+        Refresh the most overdue watched chat if the UI and the user are
+        idle. Returns the chat refreshed, or None if nothing ran or it
+        was cancelled.
+        """
+        if self._scheduler.idle_seconds() < self.idle_seconds:
+            return None
+        if self.idle_seconds > 0 and self._user_idle() < self.idle_seconds:
+            with self._lock:
+                self._deferred += 1
+            return None
+        due = self._next_due()
+        if due is None:
+            return None
+        chat_name, last_n = due
+
+        token = CancellationToken()
+        future = self._scheduler.submit(
+            self._refresh,
+            chat_name,
+            last_n,
+            priority=UIPriority.IDLE,
+            client_id="prefetch",
+            label="prefetch",
+            token=token,
+        )
+        try:
+            future.result()
+        except OperationCancelled:
+            logger.info("Prefetch of %s yielded to a tool call", chat_name)
+            with self._lock:
+                self._yields += 1
+            return None
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Prefetch of %s failed: %s", chat_name, exc)
+            with self._lock:
+                self._failures += 1
+                # Do not retry a failing chat before its next refresh.
+                self._refreshed_at[chat_name] = time.monotonic()
+            return None
+        return chat_name
+
+    def _next_due(self) -> tuple[str, int] | None:
+        now = time.monotonic()
+        with self._lock:
+            overdue = [
+                (self._refreshed_at.get(name, float("-inf")), name)
+                for name in self._watched
+                if now - self._refreshed_at.get(name, float("-inf"))
+                >= self.refresh_seconds
+            ]
+            if not overdue:
+                return None
+            _, name = min(overdue)
+            return name, self._watched[name]
+
+    def _refresh(self, chat_name: str, last_n: int) -> None:
+        # A tool call submitted while this job was queued has cancelled it.
+        raise_if_cancelled()
+        messages = self.fetch(chat_name, last_n)
+        with self._lock:
+            self._refreshed_at[chat_name] = time.monotonic()
+            self._refreshes += 1
+        if any("error" in item for item in messages):
+            raise RuntimeError(str(messages[0].get("error")))
+        # Stored from the UI worker, so no send to this chat can slip in
+        # between the fetch and the store.
+        self._cache.put(
+            prefetch_key(chat_name),
+            chat_name,
+            (last_n, messages),
+            ttl_seconds=self.max_age_seconds,
+        )
+        logger.info("Prefetched %d messages of %s", len(messages), chat_name)
+
+    # -- reporting --------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "idle_seconds": self.idle_seconds,
+                "refresh_seconds": self.refresh_seconds,
+                "max_age_seconds": self.max_age_seconds,
+                "watched": [
+                    {
+                        "chat_name": name,
+                        "last_n": last_n,
+                        "refreshed_seconds_ago": (
+                            round(now - self._refreshed_at[name], 1)
+                            if name in self._refreshed_at
+                            else None
+                        ),
+                    }
+                    for name, last_n in self._watched.items()
+                ],
+                "refreshes": self._refreshes,
+                "yields": self._yields,
+                "failures": self._failures,
+                "served": self._served,
+                "deferred_for_user": self._deferred,
+            }
+
+    def _load_locked(self) -> None:
+        if self._persist:
+            state = load_state(STATE_NAME, {})
+            chats = state.get("chats") if isinstance(state, dict) else None
+            if isinstance(chats, dict):
+                self._watched = {
+                    name: max(1, int(last_n))
+                    for name, last_n in chats.items()
+                    if isinstance(name, str) and isinstance(last_n, int)
+                }
+        if not self._watched:
+            names = os.getenv("WECHAT_MCP_PREFETCH_CHATS", "")
+            self._watched = {
+                name.strip(): DEFAULT_LAST_N
+                for name in names.split(",")
+                if name.strip()
+            }
+
+    def _save_locked(self) -> None:
+        if not self._persist:
+            return
+        try:
+            save_state(STATE_NAME, {"chats": self._watched})
+        except OSError as exc:
+            logger.warning("Could not persist the prefetch watchlist: %s", exc)
+
+
+def prefetcher_from_env(
+    fetch: Callable[[str, int], list[dict[str, Any]]],
+) -> Prefetcher:
+    return Prefetcher(
+        fetch,
+        idle_seconds=env_float("WECHAT_MCP_PREFETCH_IDLE_SECONDS", 30.0),
+        refresh_seconds=env_float("WECHAT_MCP_PREFETCH_REFRESH_SECONDS", 120.0),
+        max_age_seconds=env_float("WECHAT_MCP_PREFETCH_MAX_AGE", 300.0),
+    )
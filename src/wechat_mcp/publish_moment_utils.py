@@ -1,22 +1,28 @@
 from __future__ import annotations
 
-import time
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Iterator
 
-from ApplicationServices import (
-    AXUIElementPerformAction,
-    AXUIElementSetAttributeValue,
+from .ax_calls import ax_perform_action, ax_set_attribute
+from .ax_constants import (
     kAXButtonRole,
+    kAXChildrenAttribute,
     kAXRaiseAction,
+    kAXRoleAttribute,
     kAXSheetRole,
     kAXTextAreaRole,
     kAXValueAttribute,
 )
-
+from .cancellation import raise_if_cancelled
+from .driver import get_driver, pause
 from .logging_config import logger
+from .perf_stats import timed
+from .stage_machine import Stage, StageFailed, StageMachine
+from .stage_timer import StageTimer
 from .wechat_accessibility import (
     _find_window_by_title,
     _wait_for_window,
+    ax_get,
     click_element_center,
     dfs,
     get_wechat_ax_app,
@@ -24,12 +30,19 @@ from .wechat_accessibility import (
 )
 
 
+@timed("moments.open_window")
 def _open_moments_window(ax_app: Any, timeout: float = 5.0) -> Any:
     """
-    Ensure the WeChat Moments window is open by clicking the Moments
-    button in the main WeChat window and waiting for the Moments window
-    to appear.
+    Return the WeChat Moments window, reusing it when it is already open.
+    Otherwise click the Moments button in the main WeChat window and wait
+    for the Moments window to appear.
     """
+    existing = _find_window_by_title(ax_app, "Moments")
+    if existing is not None:
+        logger.info("Reusing open Moments window")
+        ax_perform_action(existing, kAXRaiseAction)
+        return existing
+
     main_window = _find_window_by_title(ax_app, "WeChat")
     if main_window is None:
         raise RuntimeError("Could not find main WeChat window with title 'WeChat'")
@@ -43,7 +56,6 @@ def _open_moments_window(ax_app: Any, timeout: float = 5.0) -> Any:
 
     logger.info("Clicking 'Moments' button in main window")
     click_element_center(button)
-    time.sleep(0.4)
 
     moments_window = _wait_for_window(ax_app, "Moments", timeout=timeout)
     if moments_window is None:
@@ -52,11 +64,33 @@ def _open_moments_window(ax_app: Any, timeout: float = 5.0) -> Any:
     return moments_window
 
 
-def _open_moment_composer(moments_window: Any) -> None:
+def _attached_sheet(moments_window: Any) -> Any | None:
+    """
+    Return the composer sheet if it is attached to the Moments window.
+
+    Sheets are direct children of their window, so this only reads one
+    level instead of walking the whole (large) Moments feed; it is cheap
+    enough to poll while the Post button is held down.
+    """
+    for child in ax_get(moments_window, kAXChildrenAttribute) or []:
+        if ax_get(child, kAXRoleAttribute) == kAXSheetRole:
+            return child
+    return None
+
+
+@timed("moments.open_composer")
+def _open_moment_composer(moments_window: Any, hold_seconds: float = 3.0) -> Any:
     """
     Open the Moments composer sheet by long-pressing the Post button in
-    the Moments window.
+    the Moments window, releasing the press as soon as the sheet shows
+    up (at most `hold_seconds`). An already open composer is reused.
+
+    Returns the sheet, or None if it did not appear during the press.
     """
+    sheet = _attached_sheet(moments_window)
+    if sheet is not None:
+        logger.info("Reusing open Moments composer sheet")
+        return sheet
 
     def is_post_button(el, role, title, identifier):
         return role == kAXButtonRole and isinstance(title, str) and title == "Post"
@@ -65,9 +99,12 @@ def _open_moment_composer(moments_window: Any) -> None:
     if button is None:
         raise RuntimeError("Could not find 'Post' button in Moments window")
 
-    logger.info("Long-pressing 'Post' button to open composer sheet")
-    long_press_element_center(button, hold_seconds=1.4)
-    time.sleep(0.3)
+    logger.info("Long-pressing 'Post' button until the composer sheet opens")
+    return long_press_element_center(
+        button,
+        hold_seconds=hold_seconds,
+        release_when=lambda: _attached_sheet(moments_window),
+    )
 
 
 def _find_moments_sheet(moments_window: Any, timeout: float = 5.0) -> Any | None:
@@ -79,13 +116,14 @@ def _find_moments_sheet(moments_window: Any, timeout: float = 5.0) -> Any | None
     def is_sheet(el, role, title, identifier):
         return role == kAXSheetRole
 
-    end = time.time() + timeout
-    while time.time() < end:
+    end = get_driver().monotonic() + timeout
+    while get_driver().monotonic() < end:
+        raise_if_cancelled()
         sheet = dfs(moments_window, is_sheet)
         if sheet is not None:
             logger.info("Found Moments composer sheet")
             return sheet
-        time.sleep(0.1)
+        pause(0.1)
 
     logger.warning("Timed out waiting for Moments composer sheet")
     return None
@@ -109,6 +147,20 @@ def _find_editor_root(moments_window: Any, timeout: float = 5.0) -> Any | None:
     return moments_window
 
 
+def _wait_for_sheet_closed(moments_window: Any, timeout: float = 3.0) -> bool:
+    """
+    Wait until the composer sheet has been dismissed after posting.
+    """
+    end = get_driver().monotonic() + timeout
+    while get_driver().monotonic() < end:
+        raise_if_cancelled()
+        if _attached_sheet(moments_window) is None:
+            return True
+        pause(0.05)
+    logger.warning("Moments composer sheet still open after %.1f s", timeout)
+    return False
+
+
 def _find_moment_text_area(root: Any) -> Any | None:
     """
     Locate the text entry area used to compose a Moments post.
@@ -132,28 +184,169 @@ def _find_post_button_in_editor(root: Any) -> Any | None:
     return dfs(root, is_post_button)
 
 
-def publish_moment_without_media(content: str, publish: bool = True) -> dict[str, Any]:
+def _validate_content(content: Any) -> dict[str, Any] | None:
+    if not isinstance(content, str) or not content.strip():
+        return {
+            "error": "content must be a non-empty string",
+            "content": content,
+            "stage": "validate_input",
+        }
+    return None
+
+
+@dataclass
+class _MomentPost:
+    """
+    State of one post through the Moments window, filled in by its stages.
+    """
+
+    ax_app: Any
+    content: str
+    moments_window: Any = None
+    editor_root: Any = None
+
+
+def _open_window_stage(post: _MomentPost) -> None:
+    post.moments_window = _open_moments_window(post.ax_app)
+
+
+def _find_moments_window(post: _MomentPost) -> bool:
+    post.moments_window = _find_window_by_title(post.ax_app, "Moments")
+    return post.moments_window is not None
+
+
+def _open_composer_stage(post: _MomentPost) -> None:
+    post.editor_root = _open_moment_composer(post.moments_window)
+    if post.editor_root is None:
+        # The sheet can still show up right after the press ended.
+        post.editor_root = _find_editor_root(post.moments_window, timeout=5.0)
+    if post.editor_root is None:
+        raise StageFailed(
+            "Could not locate Moments composer editor root", stage="editor_root"
+        )
+
+
+def _find_composer(post: _MomentPost) -> bool:
+    post.editor_root = _attached_sheet(post.moments_window)
+    return post.editor_root is not None
+
+
+def _set_text_stage(post: _MomentPost) -> None:
+    text_area = _find_moment_text_area(post.editor_root)
+    if text_area is None:
+        raise StageFailed(
+            "Could not find text entry area in Moments composer", stage="text_area"
+        )
+    ax_perform_action(text_area, kAXRaiseAction)
+    err = ax_set_attribute(text_area, kAXValueAttribute, post.content)
+    if err != 0:
+        raise StageFailed(f"Failed to set composer text, AX error {err}")
+
+
+def _find_text(post: _MomentPost) -> bool:
+    text_area = _find_moment_text_area(post.editor_root)
+    if text_area is None:
+        return False
+    if ax_get(text_area, kAXValueAttribute) != post.content:
+        logger.info("The open Moments composer holds other text")
+        return False
+    return True
+
+
+def _post_stage(post: _MomentPost) -> None:
+    logger.info("Moments composer text updated; clicking Post in sheet")
+    post_button = _find_post_button_in_editor(post.editor_root)
+    if post_button is None:
+        raise StageFailed(
+            "Could not find 'Post' button in Moments composer", stage="post_button"
+        )
+    click_element_center(post_button)
+    if not _wait_for_sheet_closed(post.moments_window):
+        # WeChat closes the composer once it takes the post, so the post
+        # most likely did not go out; resuming clicks Post again.
+        raise StageFailed(
+            "Moments composer still open after clicking Post", stage="post_confirm"
+        )
+
+
+_DRAFT_STAGES: list[Stage[_MomentPost]] = [
+    Stage("open_moments_window", _open_window_stage, _find_moments_window),
+    Stage("open_composer", _open_composer_stage, _find_composer),
+    Stage("set_text", _set_text_stage, _find_text),
+]
+DRAFT_MOMENT_STAGES: StageMachine[_MomentPost] = StageMachine(
+    "publish_moment_without_media", _DRAFT_STAGES
+)
+PUBLISH_MOMENT_STAGES: StageMachine[_MomentPost] = StageMachine(
+    "publish_moment_without_media", [*_DRAFT_STAGES, Stage("post", _post_stage)]
+)
+
+
+@timed("moments.publish")
+def _compose_and_post(
+    ax_app: Any,
+    content: str,
+    publish: bool,
+    timer: StageTimer,
+    resume_from: str | None = None,
+) -> dict[str, Any]:
+    """
+    Run one post through the Moments window, reusing the window and an
+    open composer when possible. Stage durations are recorded in `timer`.
+    A failed result names the stage to pass as `resume_from` to retry
+    from there with the window and composer already open.
+    """
+    stages = PUBLISH_MOMENT_STAGES if publish else DRAFT_MOMENT_STAGES
+    outcome = stages.run(
+        _MomentPost(ax_app, content), resume_from=resume_from, timer=timer
+    )
+    if not outcome.ok:
+        return {**outcome.error_dict(), "content": content}
+
+    result: dict[str, Any] = {"content": content, "posted": publish}
+    if outcome.resumed_from is not None:
+        result["resumed_from"] = outcome.resumed_from
+    if publish:
+        logger.info("Moments post submitted successfully")
+    else:
+        logger.info(
+            "Moments composer text updated; publish=False so skipping Post click"
+        )
+    return result
+
+
+def publish_moment_without_media(
+    content: str, publish: bool = True, resume_from: str | None = None
+) -> dict[str, Any]:
     """
     Publish a Moments post containing only text (no media).
 
     High-level flow:
-    - Click the "Moments" button in the main WeChat window to open the
-      Moments window.
-    - Long-press the "Post" button in the Moments window to reveal the
-      composer sheet.
+    - Reuse the Moments window if it is open; otherwise click the
+      "Moments" button in the main WeChat window to open it.
+    - Reuse an open composer sheet, or long-press the "Post" button in
+      the Moments window until the composer sheet appears.
     - In the composer sheet, set the text entry area's value to the
       provided content.
     - If `publish` is True (default), click the "Post" button in the
       sheet to publish the moment; if False, leave the composer open
       without sending, so that the user can modify the draft in the
       composer.
+
+    The result carries "timings_ms" with the duration of each stage. A
+    failed result also carries "resume_from"; calling again with it
+    reuses the open Moments window and composer and repeats only the
+    failed stage and the ones after it. Resuming past "set_text" fails
+    if the composer does not hold `content`.
     """
-    if not isinstance(content, str) or not content.strip():
-        return {
-            "error": "content must be a non-empty string",
-            "content": content,
-            "stage": "validate_input",
-        }
+    invalid = _validate_content(content)
+    if invalid is None:
+        stages = PUBLISH_MOMENT_STAGES if publish else DRAFT_MOMENT_STAGES
+        error = stages.check_resume(resume_from)
+        if error is not None:
+            invalid = {"error": error, "content": content, "stage": "validate_input"}
+    if invalid is not None:
+        return invalid
 
     logger.info(
         "Starting publish_moment_without_media (content_length=%d, publish=%s)",
@@ -161,74 +354,60 @@ def publish_moment_without_media(content: str, publish: bool = True) -> dict[str
         publish,
     )
 
+    timer = StageTimer()
     try:
         ax_app = get_wechat_ax_app()
-        moments_window = _open_moments_window(ax_app)
-        _open_moment_composer(moments_window)
-
-        editor_root = _find_editor_root(moments_window, timeout=5.0)
-        if editor_root is None:
-            error_msg = "Could not locate Moments composer editor root"
-            logger.warning(error_msg)
-            return {
-                "error": error_msg,
-                "content": content,
-                "stage": "editor_root",
-            }
-
-        text_area = _find_moment_text_area(editor_root)
-        if text_area is None:
-            error_msg = "Could not find text entry area in Moments composer"
-            logger.warning(error_msg)
-            return {
-                "error": error_msg,
-                "content": content,
-                "stage": "text_area",
-            }
-
-        AXUIElementPerformAction(text_area, kAXRaiseAction)
-        err = AXUIElementSetAttributeValue(text_area, kAXValueAttribute, content)
-        if err != 0:
-            error_msg = f"Failed to set composer text, AX error {err}"
-            logger.warning(error_msg)
-            return {
-                "error": error_msg,
-                "content": content,
-                "stage": "set_text",
-            }
-
-        if not publish:
-            logger.info(
-                "Moments composer text updated; publish=False so skipping Post click"
-            )
-            return {
-                "content": content,
-                "posted": False,
-            }
-
-        logger.info("Moments composer text updated; clicking Post in sheet")
-        post_button = _find_post_button_in_editor(editor_root)
-        if post_button is None:
-            error_msg = "Could not find 'Post' button in Moments composer"
-            logger.warning(error_msg)
-            return {
-                "error": error_msg,
-                "content": content,
-                "stage": "post_button",
-            }
-
-        click_element_center(post_button)
-        time.sleep(0.5)
-
-        logger.info("Moments post submitted successfully")
-        return {
-            "content": content,
-            "posted": True,
-        }
+        result = _compose_and_post(ax_app, content, publish, timer, resume_from)
     except Exception as exc:  # noqa: BLE001
         logger.exception("Error while publishing moment without media: %s", exc)
-        return {
+        result = {
             "error": str(exc),
             "content": content,
             "stage": "unexpected_error",
         }
+    result["timings_ms"] = timer.to_dict()
+    return result
+
+
+def publish_moments(contents: list[str]) -> Iterator[dict[str, Any]]:
+    """
+    Publish several text-only Moments posts in one pass, yielding one
+    result per post in order.
+
+    The Moments window is opened once and reused for every post. Each
+    result has "index", "content", "posted" and "timings_ms". If a post
+    fails, the remaining posts are not attempted and are yielded with
+    "posted": False and "stage": "skipped".
+    """
+    ax_app = get_wechat_ax_app()
+    failed = False
+    for index, content in enumerate(contents):
+        if failed:
+            yield {
+                "index": index,
+                "content": content,
+                "posted": False,
+                "stage": "skipped",
+            }
+            continue
+
+        raise_if_cancelled()
+        timer = StageTimer()
+        result = _validate_content(content)
+        if result is None:
+            try:
+                result = _compose_and_post(ax_app, content, True, timer)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Error while publishing moment %d: %s", index, exc)
+                result = {
+                    "error": str(exc),
+                    "content": content,
+                    "stage": "unexpected_error",
+                }
+        if "error" in result:
+            result.setdefault("posted", False)
+            # Invalid input leaves the UI untouched; anything else may have.
+            failed = result["stage"] != "validate_input"
+        result["index"] = index
+        result["timings_ms"] = timer.to_dict()
+        yield result
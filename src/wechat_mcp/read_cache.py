@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+from .cancellation import OperationCancelled
+from .logging_config import logger
+
+# Tag for entries that depend on every chat (e.g. the sidebar summary).
+ALL_CHATS = "*"
+
+_MISSING = object()
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    chat_name: str
+    stored_at: float
+    ttl_seconds: float | None = None
+
+
+class ReadCache:
+    """
+    Short-lived LRU cache with in-flight coalescing for read-only tools.
+
+    Identical concurrent requests share one execution: the first caller
+    computes the value while later callers with the same key wait for
+    that result instead of driving the UI again. Completed values are
+    kept for `ttl_seconds` (at most `max_entries` of them) and can be
+    dropped per chat via invalidate(), e.g. after sending to that chat.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 10.0,
+        max_entries: int = 64,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._in_flight: dict[Hashable, Future] = {}
+        # Bumped on invalidation so that a computation that started before
+        # a send does not store its (now stale) result afterwards.
+        self._generations: dict[str, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._invalidations = 0
+
+    def get_or_compute(
+        self,
+        key: Hashable,
+        chat_name: str,
+        compute: Callable[[], Any],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Return the cached value for `key`, join an identical in-flight
+        computation, or run `compute()` and cache its result when
+        `cacheable(result)` is True.
+        """
+        while True:
+            hit, pending, generation = self._begin(key, chat_name)
+            if hit is not _MISSING:
+                return hit
+            if generation is not None:
+                break
+            try:
+                return pending.result()
+            except OperationCancelled:
+                # The request we joined was cancelled by its caller; retry.
+                continue
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            self._fail(key, pending, exc)
+            raise
+        self._complete(key, chat_name, pending, generation, value, cacheable)
+        return value
+
+    async def get_or_compute_async(
+        self,
+        key: Hashable,
+        chat_name: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Async counterpart of get_or_compute(): followers await the
+        in-flight result instead of blocking the event loop.
+        """
+        while True:
+            hit, pending, generation = self._begin(key, chat_name)
+            if hit is not _MISSING:
+                return hit
+            if generation is not None:
+                break
+            try:
+                # shield(): a follower being cancelled must not cancel the
+                # shared future the leader and other followers wait on.
+                return await asyncio.shield(asyncio.wrap_future(pending))
+            except OperationCancelled:
+                continue
+
+        try:
+            value = await compute()
+        except BaseException as exc:
+            self._fail(key, pending, exc)
+            raise
+        self._complete(key, chat_name, pending, generation, value, cacheable)
+        return value
+
+    def get(self, key: Hashable) -> Any | None:
+        """
+        Return the cached value for `key` without computing anything, or
+        None when there is no fresh entry.
+        """
+        with self._lock:
+            entry = self._lookup_locked(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry.value
+
+    def peek(self, key: Hashable) -> tuple[Any, float] | None:
+        """
+        Like get(), but also return how many seconds ago the value was
+        stored, and count neither a hit nor a miss: for lookups that are
+        not tool requests, such as those of the prefetcher.
+        """
+        with self._lock:
+            entry = self._lookup_locked(key)
+            if entry is None:
+                return None
+            return entry.value, self._clock() - entry.stored_at
+
+    def put(
+        self,
+        key: Hashable,
+        chat_name: str,
+        value: Any,
+        ttl_seconds: float | None = None,
+    ) -> None:
+        """
+        Store a value computed elsewhere (e.g. by a batch fetch), kept
+        for `ttl_seconds` instead of the cache's TTL when given.
+        """
+        with self._lock:
+            self._store_locked(key, chat_name, value, ttl_seconds)
+
+    def invalidate(self, chat_name: str) -> None:
+        """
+        Drop cached values for `chat_name` and for entries that depend on
+        every chat.
+        """
+        with self._lock:
+            for tag in (chat_name, ALL_CHATS):
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if entry.chat_name in (chat_name, ALL_CHATS)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+        if stale:
+            logger.debug(
+                "Invalidated %d read cache entries for %s", len(stale), chat_name
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            requests = self._hits + self._misses + self._coalesced
+            return {
+                "entries": len(self._entries),
+                "in_flight": len(self._in_flight),
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+                "requests": requests,
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "invalidated_entries": self._invalidations,
+                "hit_rate": round(self._hits / requests, 3) if requests else 0.0,
+                "coalesce_rate": (
+                    round(self._coalesced / requests, 3) if requests else 0.0
+                ),
+            }
+
+    def _begin(
+        self, key: Hashable, chat_name: str
+    ) -> tuple[Any, Future | None, int | None]:
+        """
+        Return (cached value, None, None) on a hit, (_MISSING, in-flight
+        future, None) for a follower, or (_MISSING, new future, current
+        generation) when the caller has to compute the value itself.
+        """
+        with self._lock:
+            entry = self._lookup_locked(key)
+            if entry is not None:
+                self._hits += 1
+                logger.debug("Read cache hit for %r", key)
+                return entry.value, None, None
+
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                self._coalesced += 1
+                logger.debug("Coalescing with in-flight request for %r", key)
+                return _MISSING, pending, None
+
+            self._misses += 1
+            pending = Future()
+            self._in_flight[key] = pending
+            return _MISSING, pending, self._generation_locked(chat_name)
+
+    def _complete(
+        self,
+        key: Hashable,
+        chat_name: str,
+        pending: Future,
+        generation: int,
+        value: Any,
+        cacheable: Callable[[Any], bool],
+    ) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if cacheable(value) and generation == self._generation_locked(chat_name):
+                self._store_locked(key, chat_name, value)
+        pending.set_result(value)
+
+    def _fail(self, key: Hashable, pending: Future, exc: BaseException) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if isinstance(exc, (asyncio.CancelledError, OperationCancelled)):
+            # Followers did not ask for cancellation; let them retry.
+            exc = OperationCancelled("Shared read request was cancelled")
+        pending.set_exception(exc)
+
+    def _lookup_locked(self, key: Hashable) -> _CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        ttl = self.ttl_seconds if entry.ttl_seconds is None else entry.ttl_seconds
+        if self._clock() - entry.stored_at > ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store_locked(
+        self,
+        key: Hashable,
+        chat_name: str,
+        value: Any,
+        ttl_seconds: float | None = None,
+    ) -> None:
+        self._entries[key] = _CacheEntry(
+            value=value,
+            chat_name=chat_name,
+            stored_at=self._clock(),
+            ttl_seconds=ttl_seconds,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _generation_locked(self, chat_name: str) -> int:
+        # invalidate() bumps both the chat and ALL_CHATS, so entries tagged
+        # ALL_CHATS observe every invalidation.
+        return self._generations.get(chat_name, 0)
+
+
+read_cache = ReadCache(
+    ttl_seconds=float(os.getenv("WECHAT_MCP_READ_CACHE_TTL", "10")),
+    max_entries=int(os.getenv("WECHAT_MCP_READ_CACHE_SIZE", "64")),
+)
@@ -1,39 +1,41 @@
 from __future__ import annotations
 
-import time
-from typing import Any
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterator, Literal
 
-from ApplicationServices import (
-    AXUIElementPerformAction,
-    AXUIElementSetAttributeValue,
+from .ax_calls import ax_perform_action, ax_set_attribute
+from .ax_constants import (
+    KEYCODE_RETURN,
+    kAXChildrenAttribute,
     kAXRaiseAction,
     kAXTextAreaRole,
+    kAXTitleAttribute,
     kAXValueAttribute,
 )
-from Quartz import (
-    CGEventCreateKeyboardEvent,
-    CGEventPost,
-    CGEventSetFlags,
-    kCGHIDEventTap,
-)
-
+from .cancellation import OperationCancelled, raise_if_cancelled
+from .driver import get_driver, pause
+from .fetch_messages_by_chat_utils import get_messages_list
 from .logging_config import logger
-from .wechat_accessibility import dfs, get_wechat_ax_app
+from .perf_stats import timed
+from .text_entry import wait_for_value
+from .wechat_accessibility import (
+    ax_get,
+    collect_chat_elements,
+    dfs,
+    get_current_chat_name,
+    get_wechat_ax_app,
+    open_chat_for_contact,
+)
 
 
 def press_return() -> None:
     """
     Synthesize a Return key press.
     """
-    keycode_return = 36
-    event_down = CGEventCreateKeyboardEvent(None, keycode_return, True)
-    CGEventSetFlags(event_down, 0)
-    event_up = CGEventCreateKeyboardEvent(None, keycode_return, False)
-    CGEventSetFlags(event_up, 0)
-    CGEventPost(kCGHIDEventTap, event_down)
-    CGEventPost(kCGHIDEventTap, event_up)
+    get_driver().key_press(KEYCODE_RETURN)
 
 
+@timed("reply.find_input")
 def find_input_field(ax_app: Any):
     """
     Locate the chat input text area in the current WeChat window.
@@ -50,21 +52,260 @@ def find_input_field(ax_app: Any):
     return input_field
 
 
-def send_message(text: str) -> None:
+DeliveryStatus = Literal["sent", "pending", "failed"]
+
+
+@dataclass
+class SendReceipt:
+    """
+    Outcome of send_message.
+
+    - "sent": the text showed up at the tail of the Messages list.
+    - "pending": the input field was cleared by Return but the text was
+      not visible in the Messages list before the deadline.
+    - "failed": the text was still sitting in the input field at the
+      deadline, i.e. Return was not taken.
+    """
+
+    status: DeliveryStatus
+    latency_ms: float
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    def result_fields(self) -> dict[str, Any]:
+        """
+        The delivery fields of a tool result. Only a confirmed delivery
+        is reported as "sent"; a pending one carries a "warning" and a
+        failed one an "error".
+        """
+        fields: dict[str, Any] = {
+            "sent": self.status == "sent",
+            "delivery_status": self.status,
+            "send_latency_ms": self.latency_ms,
+        }
+        if self.status == "pending":
+            fields["warning"] = (
+                "Message left the input field but was not seen in the chat"
+            )
+        elif self.status == "failed":
+            fields["error"] = "Message was still in the input field"
+        return fields
+
+
+def _element_text(element: Any) -> str | None:
+    text = ax_get(element, kAXValueAttribute) or ax_get(element, kAXTitleAttribute)
+    return str(text) if text else None
+
+
+def _message_tail(msg_list: Any) -> tuple[int, Any]:
+    """
+    Return (number of children, last child) of the Messages list; the
+    pair identifies the list tail before a send.
+    """
+    children = ax_get(msg_list, kAXChildrenAttribute) or []
+    return len(children), (children[-1] if children else None)
+
+
+def _tail_shows_text(msg_list: Any, text: str, baseline: tuple[int, Any]) -> bool:
+    """
+    True when a new last row (compared to `baseline`) carries `text`.
+    """
+    children = ax_get(msg_list, kAXChildrenAttribute) or []
+    if not children:
+        return False
+    last = children[-1]
+    if (len(children), last) == baseline:
+        return False
+    shown = _element_text(last)
+    return shown is not None and shown.strip() == text.strip()
+
+
+@timed("reply.send_message")
+def send_message(
+    text: str,
+    ax_app: Any | None = None,
+    input_field: Any | None = None,
+    msg_list: Any | None = None,
+    confirm_timeout: float = 3.0,
+) -> SendReceipt:
     """
     Send a message in the currently open chat by focusing the input
     field, setting its value, and pressing Return.
+
+    Instead of sleeping for a fixed time, the input field is read back
+    until it holds the text before Return is pressed, and delivery is
+    confirmed by polling the tail of the Messages list until the text
+    appears or `confirm_timeout` expires. Returns a SendReceipt with the
+    delivery status and the measured send-to-visible latency.
+
+    Batch callers can pass the `ax_app` handle plus the `input_field` and
+    `msg_list` of the open chat to send several messages without looking
+    them up again.
     """
     logger.info("Sending message of length %d characters", len(text))
-    ax_app = get_wechat_ax_app()
-    input_field = find_input_field(ax_app)
+    if input_field is None or msg_list is None:
+        if ax_app is None:
+            ax_app = get_wechat_ax_app()
+        if input_field is None:
+            input_field = find_input_field(ax_app)
+        if msg_list is None:
+            msg_list = get_messages_list(ax_app)
 
-    AXUIElementPerformAction(input_field, kAXRaiseAction)
+    ax_perform_action(input_field, kAXRaiseAction)
 
-    err = AXUIElementSetAttributeValue(input_field, kAXValueAttribute, text)
+    err = ax_set_attribute(input_field, kAXValueAttribute, text)
     if err != 0:
         raise RuntimeError(f"Failed to set input text, AX error {err}")
 
-    time.sleep(0.1)
+    if not wait_for_value(input_field, text, timeout=0.5):
+        logger.warning("Input field did not read back the message text; sending")
+
+    baseline = _message_tail(msg_list)
+    started = get_driver().monotonic()
     press_return()
-    logger.info("Message sent")
+
+    end = started + confirm_timeout
+    while get_driver().monotonic() < end:
+        if _tail_shows_text(msg_list, text, baseline):
+            latency_ms = (get_driver().monotonic() - started) * 1000.0
+            logger.info("Message visible in chat after %.0f ms", latency_ms)
+            return SendReceipt(status="sent", latency_ms=round(latency_ms, 1))
+        pause(0.05)
+
+    latency_ms = round((get_driver().monotonic() - started) * 1000.0, 1)
+    remaining = ax_get(input_field, kAXValueAttribute)
+    if isinstance(remaining, str) and remaining.strip() == text.strip():
+        logger.warning("Message still in input field after %.0f ms", latency_ms)
+        return SendReceipt(status="failed", latency_ms=latency_ms)
+
+    logger.warning(
+        "Message left the input field but was not visible after %.0f ms", latency_ms
+    )
+    return SendReceipt(status="pending", latency_ms=latency_ms)
+
+
+@dataclass
+class OutgoingMessage:
+    index: int
+    chat_name: str
+    text: str
+
+
+def normalize_outgoing_messages(
+    messages: list[dict[str, Any]],
+) -> list[OutgoingMessage]:
+    """
+    Validate the `messages` argument of the batch send tool; each entry
+    must be an object with non-empty "chat_name" and "text" strings.
+    """
+    normalized: list[OutgoingMessage] = []
+    for index, item in enumerate(messages):
+        chat_name = item.get("chat_name") if isinstance(item, dict) else None
+        text = item.get("text") if isinstance(item, dict) else None
+        if not isinstance(chat_name, str) or not chat_name.strip():
+            raise ValueError(f"Message at index {index} has no chat_name")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"Message at index {index} has no text")
+        normalized.append(OutgoingMessage(index=index, chat_name=chat_name, text=text))
+    return normalized
+
+
+def group_messages_by_chat(
+    messages: list[OutgoingMessage],
+) -> dict[str, list[OutgoingMessage]]:
+    """
+    Group messages per chat, keeping chats in order of first appearance
+    and messages in their original order within each chat.
+    """
+    grouped: dict[str, list[OutgoingMessage]] = {}
+    for message in messages:
+        grouped.setdefault(message.chat_name, []).append(message)
+    return grouped
+
+
+def send_messages_to_chats(
+    messages: list[OutgoingMessage],
+    claim: Callable[[OutgoingMessage], bool] | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Send several messages, navigating to each chat only once.
+
+    WeChat is activated once, the current chat and session list are read
+    once, and the input field is located once per chat; all messages for
+    that chat are then sent back to back. Yields one status dict per
+    message with "index", "chat_name" and "sent". Messages that reached
+    send_message carry the fields of SendReceipt.result_fields; unsent
+    ones carry an "error" (and "candidates" for ambiguous chat names).
+
+    With `claim`, it is called right before each message is sent; when
+    it returns False the batch stops with OperationCancelled (see
+    SendReservations).
+    """
+    ax_app = get_wechat_ax_app()
+    chat_elements = collect_chat_elements(ax_app)
+    current_chat = get_current_chat_name(ax_app)
+
+    for chat_name, chat_messages in group_messages_by_chat(messages).items():
+        raise_if_cancelled()
+        try:
+            if chat_name != current_chat:
+                open_result = open_chat_for_contact(
+                    chat_name, ax_app=ax_app, chat_elements=chat_elements
+                )
+                if isinstance(open_result, dict) and open_result.get("error"):
+                    for message in chat_messages:
+                        yield {
+                            "index": message.index,
+                            "chat_name": chat_name,
+                            "sent": False,
+                            "error": open_result.get("error"),
+                            "candidates": open_result.get("candidates", {}),
+                        }
+                    continue
+                current_chat = chat_name
+            input_field = find_input_field(ax_app)
+            msg_list = get_messages_list(ax_app)
+        except OperationCancelled:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Error opening chat=%s for batch send: %s", chat_name, exc)
+            current_chat = None
+            for message in chat_messages:
+                yield {
+                    "index": message.index,
+                    "chat_name": chat_name,
+                    "sent": False,
+                    "error": str(exc),
+                }
+            continue
+
+        for message in chat_messages:
+            raise_if_cancelled()
+            if claim is not None and not claim(message):
+                raise OperationCancelled("Operation was cancelled")
+            try:
+                receipt = send_message(
+                    message.text, input_field=input_field, msg_list=msg_list
+                )
+            except OperationCancelled:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.exception(
+                    "Error sending message %d to chat=%s: %s",
+                    message.index,
+                    chat_name,
+                    exc,
+                )
+                yield {
+                    "index": message.index,
+                    "chat_name": chat_name,
+                    "sent": False,
+                    "error": str(exc),
+                }
+                continue
+            yield {
+                "index": message.index,
+                "chat_name": chat_name,
+                **receipt.result_fields(),
+            }
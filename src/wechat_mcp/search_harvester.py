@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+SEARCH_SECTION_TITLES = (
+    "Contacts",
+    "Group Chats",
+    "Chat History",
+    "Official Accounts",
+    "Internet search results",
+    "More",
+)
+
+# Sections whose entries can be opened as chats; WeChat lists them first.
+CHAT_SECTIONS = ("Contacts", "Group Chats")
+
+
+@dataclass
+class SearchEntry:
+    element: Any
+    text: str
+    y: float
+
+
+@dataclass
+class HarvestedEntry:
+    """
+    A search result text together with the section it belongs to and its
+    position among that section's results.
+    """
+
+    element: Any
+    text: str
+    y: float
+    section: str | None
+    index: int
+
+
+class SearchResultHarvester:
+    """
+    Incrementally read the global search results list while it scrolls.
+
+    `list_rows()` returns the rows currently present in the list, top to
+    bottom (a single cheap call), and `read_row(row)` returns the
+    SearchEntry texts of one row, which is the expensive part. Rows are
+    remembered by `row_key(row)`, so each harvest() only reads rows that
+    were not seen before. Section membership is carried across snapshots:
+    a row takes the section of the closest header above it, whether that
+    header was read in this snapshot or an earlier one.
+
+    The key must identify the result a row shows, not just the row
+    object: lists recycle row objects for other results while scrolling,
+    so key them by their position as well, e.g. (row, AXIndex).
+    """
+
+    def __init__(
+        self,
+        list_rows: Callable[[], list[Any]],
+        read_row: Callable[[Any], list[SearchEntry]],
+        row_key: Callable[[Any], Hashable],
+    ) -> None:
+        self._list_rows = list_rows
+        self._read_row = read_row
+        self._row_key = row_key
+        # row key -> section the row ended in (for headers: their own title)
+        self._seen: dict[Hashable, str | None] = {}
+        self._section_sizes: dict[str, int] = {}
+        self.sections_seen: list[str] = []
+        self.current_section: str | None = None
+        self.rows_read = 0
+        self.snapshots = 0
+
+    def harvest(self) -> list[HarvestedEntry]:
+        """
+        Read the rows revealed since the last call and return their
+        entries (excluding section headers and "View All"/"Collapse"
+        rows) in top-to-bottom order.
+        """
+        self.snapshots += 1
+        section: str | None = None
+        new_entries: list[HarvestedEntry] = []
+        for row in self._list_rows():
+            key = self._row_key(row)
+            if key in self._seen:
+                section = self._seen[key]
+                continue
+
+            self.rows_read += 1
+            for entry in sorted(self._read_row(row), key=lambda e: e.y):
+                if entry.text in SEARCH_SECTION_TITLES:
+                    section = entry.text
+                    if section not in self.sections_seen:
+                        self.sections_seen.append(section)
+                    continue
+                if section is None and self.current_section is not None:
+                    # First visible row continues the last known section.
+                    section = self.current_section
+                if entry.text.startswith(("View All", "Collapse")):
+                    continue
+                index = self._section_sizes.get(section or "", 0)
+                self._section_sizes[section or ""] = index + 1
+                new_entries.append(
+                    HarvestedEntry(entry.element, entry.text, entry.y, section, index)
+                )
+            self._seen[key] = section
+
+        if section is not None:
+            self.current_section = section
+        return new_entries
+
+    def forget_rows(self) -> None:
+        """
+        Start over on the next harvest, e.g. after expanding a section
+        re-rendered the list.
+        """
+        self._seen.clear()
+        self._section_sizes.clear()
+        self.sections_seen.clear()
+        self.current_section = None
+
+    def past_sections(self, sections: tuple[str, ...] = CHAT_SECTIONS) -> bool:
+        """
+        True once the list has scrolled into a section that comes after
+        all of `sections`, i.e. nothing further down can belong to them.
+        """
+        if self.current_section is None:
+            return False
+        return self.current_section not in sections
+
+
+def find_exact_entry(
+    entries: list[HarvestedEntry],
+    name: str,
+    sections: tuple[str, ...] = CHAT_SECTIONS,
+) -> HarvestedEntry | None:
+    """
+    Return the entry whose text equals `name`, preferring sections in the
+    order given and ignoring entries of every other section.
+    """
+    target = name.strip()
+    for section in sections:
+        for entry in entries:
+            if entry.section == section and entry.text == target:
+                return entry
+    return None
@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
+
+from .env import env_float
+from .logging_config import logger
+from .state_store import load_state, save_state
+
+STATE_NAME = "send_rate_limits"
+
+
+@dataclass
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and regains
+    `rate_per_minute` tokens per minute.
+    """
+
+    capacity: float
+    rate_per_minute: float
+    tokens: float
+    updated_at: float
+
+    def refill(self, now: float) -> None:
+        if now > self.updated_at:
+            gained = (now - self.updated_at) * self.rate_per_minute / 60.0
+            self.tokens = min(self.capacity, self.tokens + gained)
+        self.updated_at = now
+
+    def seconds_until_available(self, now: float) -> float:
+        self.refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) * 60.0 / self.rate_per_minute
+
+    def is_full(self, now: float) -> bool:
+        self.refill(now)
+        return self.tokens >= self.capacity
+
+
+class SendRateLimiter:
+    """
+    Global plus per-chat token buckets for outbound messages.
+
+    A send consumes one token from the global bucket and one from the
+    bucket of its chat; it is allowed only when both have a token. Bucket
+    levels are persisted under the state directory so that restarting the
+    server does not hand out a fresh burst. A rate of 0 disables the
+    corresponding limit.
+    """
+
+    def __init__(
+        self,
+        global_rate_per_minute: float,
+        global_burst: float,
+        chat_rate_per_minute: float,
+        chat_burst: float,
+        clock: Callable[[], float] = time.time,
+        persist: bool = True,
+    ) -> None:
+        self.global_rate_per_minute = global_rate_per_minute
+        self.global_burst = global_burst
+        self.chat_rate_per_minute = chat_rate_per_minute
+        self.chat_burst = chat_burst
+        self._clock = clock
+        self._persist = persist
+        self._lock = threading.Lock()
+        # Writes happen outside _lock; versions keep an older snapshot
+        # from overwriting a newer one.
+        self._save_lock = threading.Lock()
+        self._version = 0
+        self._saved_version = 0
+        now = clock()
+        self._global = TokenBucket(
+            global_burst, global_rate_per_minute, global_burst, now
+        )
+        self._chats: dict[str, TokenBucket] = {}
+        if persist:
+            self._load()
+
+    def try_acquire(self, chat_name: str) -> bool:
+        """
+        Take a token for one send to `chat_name` if both buckets allow it.
+        """
+        with self._lock:
+            now = self._clock()
+            buckets = self._buckets_locked(chat_name)
+            if any(bucket.seconds_until_available(now) > 0 for bucket in buckets):
+                return False
+            for bucket in buckets:
+                bucket.tokens -= 1.0
+            state = self._snapshot_locked(now)
+        self._save(state)
+        return True
+
+    def release(self, chat_name: str) -> None:
+        """
+        Return a token taken by try_acquire() when the send did not happen
+        (e.g. the chat could not be opened).
+        """
+        with self._lock:
+            now = self._clock()
+            for bucket in self._buckets_locked(chat_name):
+                bucket.refill(now)
+                bucket.tokens = min(bucket.capacity, bucket.tokens + 1.0)
+            state = self._snapshot_locked(now)
+        self._save(state)
+
+    def seconds_until_available(self, chat_name: str) -> float:
+        with self._lock:
+            now = self._clock()
+            return max(
+                (
+                    bucket.seconds_until_available(now)
+                    for bucket in self._buckets_locked(chat_name)
+                ),
+                default=0.0,
+            )
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            self._global.refill(now)
+            chats = {}
+            for name, bucket in self._chats.items():
+                bucket.refill(now)
+                chats[name] = round(bucket.tokens, 2)
+            return {
+                "global_rate_per_minute": self.global_rate_per_minute,
+                "global_burst": self.global_burst,
+                "chat_rate_per_minute": self.chat_rate_per_minute,
+                "chat_burst": self.chat_burst,
+                "global_tokens": (
+                    round(self._global.tokens, 2)
+                    if self.global_rate_per_minute > 0
+                    else None
+                ),
+                "chat_tokens": chats,
+            }
+
+    def _buckets_locked(self, chat_name: str) -> list[TokenBucket]:
+        buckets: list[TokenBucket] = []
+        if self.global_rate_per_minute > 0:
+            buckets.append(self._global)
+        if self.chat_rate_per_minute > 0:
+            bucket = self._chats.get(chat_name)
+            if bucket is None:
+                bucket = TokenBucket(
+                    self.chat_burst,
+                    self.chat_rate_per_minute,
+                    self.chat_burst,
+                    self._clock(),
+                )
+                self._chats[chat_name] = bucket
+            buckets.append(bucket)
+        return buckets
+
+    def _load(self) -> None:
+        state = load_state(STATE_NAME, {})
+        if not isinstance(state, dict):
+            return
+        try:
+            saved = state.get("global")
+            if saved:
+                self._global.tokens = min(self.global_burst, float(saved["tokens"]))
+                self._global.updated_at = float(saved["updated_at"])
+            for name, saved in (state.get("chats") or {}).items():
+                self._chats[name] = TokenBucket(
+                    self.chat_burst,
+                    self.chat_rate_per_minute,
+                    min(self.chat_burst, float(saved["tokens"])),
+                    float(saved["updated_at"]),
+                )
+        except (KeyError, TypeError, ValueError) as exc:
+            logger.warning("Ignoring malformed send rate limit state: %s", exc)
+
+    def _snapshot_locked(self, now: float) -> tuple[int, dict[str, Any]] | None:
+        if not self._persist:
+            return None
+        # Full buckets carry no information; drop them to keep the file small.
+        for name in [n for n, b in self._chats.items() if b.is_full(now)]:
+            del self._chats[name]
+        self._version += 1
+        return self._version, {
+            "global": {
+                "tokens": self._global.tokens,
+                "updated_at": self._global.updated_at,
+            },
+            "chats": {
+                name: {"tokens": bucket.tokens, "updated_at": bucket.updated_at}
+                for name, bucket in self._chats.items()
+            },
+        }
+
+    def _save(self, snapshot: tuple[int, dict[str, Any]] | None) -> None:
+        """
+        Write a snapshot taken by _snapshot_locked, without holding the
+        bucket lock, unless a newer one has been written already.
+        """
+        if snapshot is None:
+            return
+        version, state = snapshot
+        with self._save_lock:
+            if version <= self._saved_version:
+                return
+            try:
+                save_state(STATE_NAME, state)
+            except OSError as exc:
+                logger.warning("Could not persist send rate limit state: %s", exc)
+                return
+            self._saved_version = version
+
+
+@dataclass
+class QueuedSend:
+    queue_id: int
+    chat_name: str
+    text: str
+    client_id: str
+    enqueued_at: float
+    finished_at: float | None = None
+    result: dict[str, Any] | None = field(default=None, repr=False)
+
+    def to_dict(self, now: float) -> dict[str, Any]:
+        data = asdict(self)
+        data.pop("text")
+        data["text_length"] = len(self.text)
+        end = self.finished_at if self.finished_at is not None else now
+        data["wait_seconds"] = round(end - self.enqueued_at, 2)
+        return data
+
+
+class OutboundSendQueue:
+    """
+    Holds sends that exceeded the rate limit and drains them in the
+    background as tokens become available.
+
+    Items are sent in FIFO order, except that an item whose chat is still
+    throttled does not block items for other chats. `send_fn(chat_name,
+    text)` performs the actual send and returns the tool-style result.
+    With `start_worker=False` nothing is sent until drain_ready() is
+    called, which lets tests drive the queue with a fake clock.
+    """
+
+    def __init__(
+        self,
+        limiter: SendRateLimiter,
+        send_fn: Callable[[str, str], dict[str, Any]] | None = None,
+        clock: Callable[[], float] = time.time,
+        history_size: int = 50,
+        start_worker: bool = True,
+    ) -> None:
+        self.limiter = limiter
+        self.send_fn = send_fn
+        self._clock = clock
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._pending: deque[QueuedSend] = deque()
+        self._history: deque[QueuedSend] = deque(maxlen=history_size)
+        self._worker: threading.Thread | None = None
+        self._start_worker = start_worker
+
+    def enqueue(
+        self, chat_name: str, text: str, client_id: str = "local"
+    ) -> QueuedSend:
+        item = QueuedSend(
+            queue_id=next(self._ids),
+            chat_name=chat_name,
+            text=text,
+            client_id=client_id,
+            enqueued_at=self._clock(),
+        )
+        with self._cond:
+            self._pending.append(item)
+            self._ensure_worker_locked()
+            self._cond.notify()
+        logger.info(
+            "Queued send %d to chat=%s (rate limited, depth=%d)",
+            item.queue_id,
+            chat_name,
+            len(self._pending),
+        )
+        return item
+
+    def try_acquire_immediate(self, chat_name: str) -> bool:
+        """
+        Take a rate-limit token for a send that bypasses the queue.
+
+        Refused while a send to `chat_name` is queued, so that a new
+        message cannot overtake older ones, and, under a global limit,
+        while anything is queued, so that it cannot take the global token
+        a queued send to another chat is waiting for.
+        """
+        with self._cond:
+            if self._pending and self.limiter.global_rate_per_minute > 0:
+                return False
+            if any(item.chat_name == chat_name for item in self._pending):
+                return False
+            return self.limiter.try_acquire(chat_name)
+
+    def has_pending(self, chat_name: str) -> bool:
+        """
+        True when a send to `chat_name` is already waiting; new messages
+        for that chat must queue behind it to keep their order.
+        """
+        with self._cond:
+            return any(item.chat_name == chat_name for item in self._pending)
+
+    def estimated_send_at(self, item: QueuedSend) -> float:
+        """
+        Rough estimate of when `item` will be sent: its chat's next slot,
+        pushed back by the global interval for every item ahead of it.
+        """
+        with self._cond:
+            ahead = 0
+            for pending in self._pending:
+                if pending is item:
+                    break
+                ahead += 1
+        wait = self.limiter.seconds_until_available(item.chat_name)
+        if self.limiter.global_rate_per_minute > 0:
+            wait += ahead * 60.0 / self.limiter.global_rate_per_minute
+        return self._clock() + wait
+
+    def drain_ready(self) -> float | None:
+        """
+        Send every queued item that currently has tokens.
+
+        Returns the number of seconds until the next item may be sent, or
+        None when the queue is empty.
+        """
+        while True:
+            with self._cond:
+                item = None
+                for candidate in self._pending:
+                    if self.limiter.try_acquire(candidate.chat_name):
+                        item = candidate
+                        break
+                if item is None:
+                    if not self._pending:
+                        return None
+                    return min(
+                        self.limiter.seconds_until_available(pending.chat_name)
+                        for pending in self._pending
+                    )
+                self._pending.remove(item)
+            self._send(item)
+
+    def stats(self) -> dict[str, Any]:
+        now = self._clock()
+        with self._cond:
+            pending = list(self._pending)
+            history = list(self._history)
+        next_slot = self.drain_delay()
+        return {
+            "queue_depth": len(pending),
+            "next_available_in_seconds": (
+                round(next_slot, 2) if next_slot is not None else None
+            ),
+            "queued": [item.to_dict(now) for item in pending],
+            "recent": [item.to_dict(now) for item in history],
+        }
+
+    def drain_delay(self) -> float | None:
+        with self._cond:
+            chats = {item.chat_name for item in self._pending}
+        if not chats:
+            return None
+        return min(self.limiter.seconds_until_available(chat) for chat in chats)
+
+    def _send(self, item: QueuedSend) -> None:
+        if self.send_fn is None:
+            raise RuntimeError("OutboundSendQueue has no send_fn configured")
+        try:
+            result = self.send_fn(item.chat_name, item.text)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Queued send %d failed: %s", item.queue_id, exc)
+            result = {"error": str(exc), "chat_name": item.chat_name, "sent": False}
+        if not may_have_been_delivered(result):
+            self.limiter.release(item.chat_name)
+        item.result = result
+        item.finished_at = self._clock()
+        with self._cond:
+            self._history.append(item)
+        logger.info(
+            "Queued send %d to chat=%s finished after waiting %.1f s (sent=%s)",
+            item.queue_id,
+            item.chat_name,
+            item.finished_at - item.enqueued_at,
+            result.get("sent"),
+        )
+
+    def _ensure_worker_locked(self) -> None:
+        if not self._start_worker:
+            return
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(
+            target=self._worker_loop, name="wechat-send-queue", daemon=True
+        )
+        self._worker.start()
+
+    def _worker_loop(self) -> None:
+        while True:
+            delay = self.drain_ready()
+            with self._cond:
+                if delay is None and not self._pending:
+                    self._cond.wait()
+                else:
+                    self._cond.wait(timeout=max(0.05, delay or 0.0))
+
+
+class SendReservations:
+    """
+    The rate-limit tokens taken up front for the immediate sends of one
+    tool call.
+
+    The UI job claims the token of a message right before sending it.
+    When the call gives up early (cancelled, or its job failed),
+    refund_unclaimed() returns the tokens of the messages that were not
+    claimed yet and makes later claims fail. A token is thus either spent
+    on a send or refunded, never both, even though the UI job may still
+    be running when its caller stops waiting for it.
+    """
+
+    def __init__(self, limiter: SendRateLimiter) -> None:
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._unclaimed: dict[Any, str] = {}
+        self._closed = False
+
+    def add(self, key: Any, chat_name: str) -> None:
+        with self._lock:
+            self._unclaimed[key] = chat_name
+
+    def claim(self, key: Any) -> bool:
+        """
+        Mark the send for `key` as started. Returns False once the call
+        has given up, in which case the message must not be sent.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            self._unclaimed.pop(key, None)
+            return True
+
+    def refund_unclaimed(self) -> None:
+        with self._lock:
+            self._closed = True
+            chat_names = list(self._unclaimed.values())
+            self._unclaimed.clear()
+        for chat_name in chat_names:
+            self.limiter.release(chat_name)
+
+
+def may_have_been_delivered(result: dict[str, Any]) -> bool:
+    """
+    False only when a send result shows the message never left WeChat.
+    A "pending" delivery may still show up in the chat, so its token
+    stays spent instead of making room for a resend.
+    """
+    return bool(result.get("sent")) or result.get("delivery_status") == "pending"
+
+
+send_rate_limiter = SendRateLimiter(
+    global_rate_per_minute=env_float("WECHAT_MCP_SEND_RATE_PER_MINUTE", 20),
+    global_burst=env_float("WECHAT_MCP_SEND_BURST", 5),
+    chat_rate_per_minute=env_float("WECHAT_MCP_CHAT_SEND_RATE_PER_MINUTE", 6),
+    chat_burst=env_float("WECHAT_MCP_CHAT_SEND_BURST", 3),
+)
+send_queue = OutboundSendQueue(send_rate_limiter)
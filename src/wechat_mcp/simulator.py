@@ -0,0 +1,1564 @@
+"""
+A pure-Python model of the WeChat macOS client, served through the
+Driver interface so that the UI flows run unchanged on any platform.
+
+SimulatedWeChat models the parts of WeChat the tools drive: the sidebar
+session list, the Messages list of each chat with scrolling and
+variable-height bubbles, the global search list with its sections, the
+Moments window with its composer sheet, and the Add Contacts / Send
+Friend Request windows. Lists are virtualized like the real ones: only
+rows inside the viewport are children of the list, and a row that
+scrolled out of view is no longer a valid element.
+
+SimulatorDriver adds what the real driver gets from macOS: hit-tested
+mouse input, scrolling, keyboard focus and Return/Command+V, a
+pasteboard, synthetic screenshots of the Messages list for the sender
+classifier, and a virtual clock. Each AX call can be given a fixed
+IPC latency to approximate a real WeChat.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import os
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .ax_constants import (
+    KEYCODE_RETURN,
+    KEYCODE_V,
+    kAXApplicationRole,
+    kAXButtonRole,
+    kAXCellRole,
+    kAXCheckBoxRole,
+    kAXChildrenAttribute,
+    kAXCloseButtonAttribute,
+    kAXErrorActionUnsupported,
+    kAXErrorAttributeUnsupported,
+    kAXErrorIllegalArgument,
+    kAXErrorInvalidUIElement,
+    kAXErrorNoValue,
+    kAXErrorSuccess,
+    kAXIdentifierAttribute,
+    kAXIndexAttribute,
+    kAXListRole,
+    kAXParentAttribute,
+    kAXPositionAttribute,
+    kAXPressAction,
+    kAXRaiseAction,
+    kAXRoleAttribute,
+    kAXRowRole,
+    kAXSheetRole,
+    kAXSizeAttribute,
+    kAXStaticTextRole,
+    kAXTextAreaRole,
+    kAXTextFieldRole,
+    kAXTitleAttribute,
+    kAXValueAttribute,
+    kAXWindowRole,
+    kCGEventFlagMaskCommand,
+)
+from .driver import Driver, RunningApp
+from .wechat_session import WECHAT_BUNDLE_ID
+
+Frame = tuple[float, float, float, float]
+Color = tuple[int, int, int]
+
+# Layout of the main window, in screen points.
+MAIN_WINDOW: Frame = (0.0, 0.0, 1200.0, 800.0)
+MOMENTS_BUTTON: Frame = (16.0, 180.0, 36.0, 36.0)
+SEARCH_FIELD: Frame = (70.0, 16.0, 230.0, 28.0)
+SIDEBAR_LIST: Frame = (60.0, 60.0, 250.0, 740.0)
+CHAT_TITLE: Frame = (330.0, 16.0, 500.0, 28.0)
+MESSAGES_LIST: Frame = (310.0, 60.0, 890.0, 560.0)
+INPUT_FIELD: Frame = (310.0, 640.0, 890.0, 160.0)
+
+SESSION_ROW_HEIGHT = 64.0
+SEARCH_HEADER_HEIGHT = 28.0
+SEARCH_ROW_HEIGHT = 56.0
+SEARCH_LINK_HEIGHT = 36.0
+
+# Message bubbles: text wraps at CHARS_PER_LINE characters.
+CHARS_PER_LINE = 40
+LINE_HEIGHT = 20.0
+CHAR_WIDTH = 7.0
+MESSAGE_PADDING = 12.0
+AVATAR_SIZE = 36.0
+BUBBLE_OFFSET = 56.0
+
+# Points scrolled per scroll-wheel line.
+SCROLL_LINE = 8.0
+
+# How long the Moments Post button has to be held for the text composer.
+LONG_PRESS_SECONDS = 1.0
+
+# Dark mode colours, as the sender classifier sees them.
+BACKGROUND: Color = (25, 25, 25)
+OTHER_BUBBLE: Color = (44, 44, 44)
+ME_BUBBLE: Color = (86, 196, 98)
+AVATAR: Color = (120, 140, 200)
+
+FIRST_NAMES = (
+    "Alice", "Bob", "Carol", "David", "Emma", "Frank", "Grace", "Henry",
+    "Iris", "Jack", "Kate", "Leo", "Mia", "Noah", "Olivia", "Peter",
+    "Quinn", "Rose", "Sam", "Tina", "Uma", "Victor", "Wendy", "Xavier",
+    "Yara", "Zoe", "Amy", "Ben", "Chloe", "Dylan", "Eva", "Felix",
+    "Gina", "Hugo", "Ivy", "Jason", "Kelly", "Liam", "Maya", "Nina",
+    "Oscar", "Paula", "Ray", "Sara", "Tom", "Vera", "Will", "Yuki",
+    "Zack", "Lily",
+)  # fmt: skip
+LAST_NAMES = (
+    "Wang", "Li", "Zhang", "Liu", "Chen", "Yang", "Huang", "Zhao", "Wu",
+    "Zhou", "Xu", "Sun", "Ma", "Zhu", "Hu", "Guo", "He", "Lin", "Gao",
+    "Luo", "Zheng", "Liang", "Xie", "Song", "Tang", "Han", "Feng", "Deng",
+    "Cao", "Peng", "Zeng", "Xiao", "Tian", "Dong", "Pan", "Yuan", "Cai",
+    "Jiang", "Yu", "Du", "Ye", "Cheng", "Wei", "Su", "Lu", "Ding", "Ren",
+    "Shen", "Yao", "Jin", "Fu", "Qian", "Fan", "Bai", "Shi", "Lei", "Tan",
+    "Kong", "Mao", "Qiu",
+)  # fmt: skip
+GROUP_TOPICS = (
+    "Family", "Hiking Club", "Project Team", "Book Club", "Alumni",
+    "Badminton", "Neighbours", "Photography", "Travel Buddies", "Startup",
+    "Study Group", "Coffee Lovers", "Parents", "Band", "Chess Club",
+    "Foodies", "Running Crew", "Design Review", "Weekend Trips", "Gaming",
+)  # fmt: skip
+WORDS = (
+    "ok", "sure", "see", "you", "at", "the", "station", "tomorrow", "lunch",
+    "meeting", "moved", "to", "three", "pm", "thanks", "sounds", "good",
+    "did", "get", "my", "message", "photos", "from", "trip", "are", "great",
+    "running", "late", "ten", "minutes", "can", "we", "call", "tonight",
+    "please", "check", "document", "shared", "earlier", "happy", "birthday",
+    "dinner", "on", "friday", "works", "for", "me", "let", "know", "when",
+)  # fmt: skip
+TIME_LABELS = ("09:15", "12:30", "18:02", "Yesterday", "Monday", "2024/05/06")
+
+# Every simulated WeChat is a new "process", so that AX application
+# elements cached per pid (see wechat_session) are never shared.
+_pids = itertools.count(4242)
+
+
+def _contains(frame: Frame | None, x: float, y: float) -> bool:
+    if frame is None:
+        return False
+    fx, fy, fw, fh = frame
+    return fx <= x < fx + fw and fy <= y < fy + fh
+
+
+@dataclass(frozen=True)
+class SimPoint:
+    x: float
+    y: float
+
+
+@dataclass(frozen=True)
+class SimSize:
+    width: float
+    height: float
+
+
+class SimElement:
+    """
+    One node of the simulated AX tree.
+
+    `value`, `frame`, `children` and `valid` may be callables, so that
+    virtualized lists lay out their rows from the model state whenever
+    they are read. Handlers (`on_press`, `on_long_press`, `on_scroll`,
+    `on_return`, `on_change`) are looked up on the element under the
+    pointer or with keyboard focus, then on its ancestors.
+    """
+
+    __slots__ = (
+        "role",
+        "title",
+        "identifier",
+        "index",
+        "parent",
+        "editable",
+        "close_button",
+        "on_press",
+        "on_long_press",
+        "on_scroll",
+        "on_return",
+        "on_change",
+        "_value",
+        "_frame",
+        "_children",
+        "_valid",
+    )
+
+    def __init__(
+        self,
+        role: str,
+        title: str | None = None,
+        identifier: str | None = None,
+        value: Any = None,
+        frame: Frame | Callable[[], Frame | None] | None = None,
+        children: list[SimElement] | Callable[[], list[SimElement]] | None = None,
+        valid: Callable[[], bool] | None = None,
+        parent: SimElement | None = None,
+        editable: bool = False,
+        index: int | None = None,
+        on_press: Callable[[], None] | None = None,
+        on_long_press: Callable[[], None] | None = None,
+        on_scroll: Callable[[int], None] | None = None,
+        on_return: Callable[[], None] | None = None,
+        on_change: Callable[[str], None] | None = None,
+    ) -> None:
+        self.role = role
+        self.title = title
+        self.identifier = identifier
+        self.index = index
+        self.parent = parent
+        self.editable = editable
+        self.close_button: SimElement | None = None
+        self.on_press = on_press
+        self.on_long_press = on_long_press
+        self.on_scroll = on_scroll
+        self.on_return = on_return
+        self.on_change = on_change
+        self._value = value
+        self._frame = frame
+        self._children = children
+        self._valid = valid
+        if isinstance(children, list):
+            for child in children:
+                child.parent = self
+
+    def __repr__(self) -> str:
+        label = self.title or self.identifier or ""
+        return f"SimElement({self.role!r}, {label!r})"
+
+    def value(self) -> Any:
+        value = self._value
+        return value() if callable(value) else value
+
+    def set_value(self, value: Any) -> None:
+        self._value = value
+
+    def frame(self) -> Frame | None:
+        frame = self._frame
+        return frame() if callable(frame) else frame
+
+    def children(self) -> list[SimElement]:
+        children = self._children
+        if children is None:
+            return []
+        return children() if callable(children) else children
+
+    def append(self, child: SimElement) -> SimElement:
+        child.parent = self
+        if self._children is None:
+            self._children = []
+        self._children.append(child)  # type: ignore[union-attr]
+        return child
+
+    def is_valid(self) -> bool:
+        return self._valid is None or self._valid()
+
+    def attribute(self, name: str) -> Any:
+        if name == kAXRoleAttribute:
+            return self.role
+        if name == kAXTitleAttribute:
+            return self.title
+        if name == kAXIdentifierAttribute:
+            return self.identifier
+        if name == kAXIndexAttribute:
+            return self.index
+        if name == kAXValueAttribute:
+            value = self.value()
+            return int(value) if isinstance(value, bool) else value
+        if name == kAXChildrenAttribute:
+            return list(self.children()) or None
+        if name == kAXParentAttribute:
+            return self.parent
+        if name == kAXPositionAttribute:
+            frame = self.frame()
+            return None if frame is None else SimPoint(frame[0], frame[1])
+        if name == kAXSizeAttribute:
+            frame = self.frame()
+            return None if frame is None else SimSize(frame[2], frame[3])
+        if name == kAXCloseButtonAttribute:
+            return self.close_button
+        return None
+
+    def handler(self, name: str) -> Callable[..., None] | None:
+        element: SimElement | None = self
+        while element is not None:
+            found = getattr(element, name)
+            if found is not None:
+                return found
+            element = element.parent
+        return None
+
+
+@dataclass
+class SimMessage:
+    sender: str
+    text: str
+    height: float
+
+
+def message_height(text: str) -> float:
+    lines = max(1, -(-len(text) // CHARS_PER_LINE))
+    return 2 * MESSAGE_PADDING + max(AVATAR_SIZE, lines * LINE_HEIGHT)
+
+
+class SimChat:
+    """
+    One chat: its message history, laid out top to bottom, and how far
+    the Messages list is scrolled.
+    """
+
+    def __init__(self, name: str, is_group: bool = False, members: int = 0) -> None:
+        self.name = name
+        self.is_group = is_group
+        self.members = members
+        self.messages: list[SimMessage] = []
+        # Bottom edge of each message, from the top of the history.
+        self.bottoms: list[float] = []
+        self.scroll_top = 0.0
+        self.unread = 0
+        self.time_label = "12:30"
+
+    @property
+    def height(self) -> float:
+        return self.bottoms[-1] if self.bottoms else 0.0
+
+    @property
+    def title(self) -> str:
+        return f"{self.name}({self.members})" if self.is_group else self.name
+
+    def append(self, sender: str, text: str) -> SimMessage:
+        message = SimMessage(sender, text, message_height(text))
+        self.messages.append(message)
+        self.bottoms.append(self.height + message.height)
+        return message
+
+    def top(self, index: int) -> float:
+        return self.bottoms[index] - self.messages[index].height
+
+    def visible(self, viewport: float) -> range:
+        """
+        Indices of the messages at least partly inside the viewport.
+        """
+        start = bisect.bisect_right(self.bottoms, self.scroll_top)
+        end = bisect.bisect_left(self.bottoms, self.scroll_top + viewport) + 1
+        return range(start, min(end, len(self.messages)))
+
+    def scroll_by(self, delta: float, viewport: float) -> None:
+        bottom = max(0.0, self.height - viewport)
+        self.scroll_top = min(bottom, max(0.0, self.scroll_top + delta))
+
+    def scroll_to_bottom(self, viewport: float) -> None:
+        self.scroll_top = max(0.0, self.height - viewport)
+
+
+@dataclass
+class SearchRow:
+    key: tuple[Any, ...]
+    texts: tuple[str, ...]
+    height: float
+    top: float = 0.0
+    action: Callable[[], None] | None = None
+
+
+@dataclass
+class FriendRequest:
+    wechat_id: str
+    message: str
+    remark: str
+    privacy: str
+    hide_my_posts: bool
+    hide_their_posts: bool
+
+
+@dataclass
+class _RequestForm:
+    wechat_id: str
+    privacy: str = "all"
+    hide_my_posts: bool = False
+    hide_their_posts: bool = False
+    elements: dict[str, SimElement] = field(default_factory=dict)
+
+
+class SimulatedWeChat:
+    """
+    The state of a simulated WeChat client and its AX tree.
+
+    The address book has `contacts` people and `groups` group chats, of
+    which `sessions` appear in the sidebar session list; every
+    `unread_every`-th session starts with unread messages. Each chat has
+    `messages` messages of history unless set_history() gives it a
+    different size. Names and texts are generated deterministically from
+    `seed`.
+    """
+
+    def __init__(
+        self,
+        contacts: int = 300,
+        groups: int = 40,
+        sessions: int = 60,
+        messages: int = 40,
+        unread_every: int = 5,
+        seed: int = 0,
+    ) -> None:
+        self.lock = threading.RLock()
+        self.pid = next(_pids)
+        self.active = False
+        self.activations = 0
+        self.now = 0.0
+        self.seed = seed
+        self.history_size = messages
+        # Whether setting the search field's AXValue runs the search, as
+        # opposed to only a paste doing so.
+        self.ax_set_triggers_search = True
+        self.unknown_ids: set[str] = set()
+
+        self.contact_names = _contact_names(contacts)
+        self.group_names = [
+            f"{GROUP_TOPICS[i % len(GROUP_TOPICS)]} {i // len(GROUP_TOPICS) + 1}"
+            for i in range(groups)
+        ]
+        self._groups = set(self.group_names)
+        self._chats: dict[str, SimChat] = {}
+
+        rng = random.Random(seed)
+        n_groups = min(len(self.group_names), sessions // 4)
+        names = self.contact_names[: sessions - n_groups] + self.group_names[:n_groups]
+        rng.shuffle(names)
+        self.sessions: list[str] = names
+        self._session_index: dict[str, int] = {}
+        self._reindex_sessions()
+        for position, name in enumerate(self.sessions):
+            chat = self.chat(name)
+            chat.time_label = TIME_LABELS[position % len(TIME_LABELS)]
+            if unread_every and position % unread_every == 0:
+                chat.unread = 2
+        self.session_scroll = 0.0
+
+        self.current: str | None = None
+        self.focused: SimElement | None = None
+        self.pasteboard: list[Any] = []
+
+        self.search_text = ""
+        self.search_query = ""
+        self.search_expanded: set[str] = set()
+        self.search_scroll = 0.0
+        self._search_rows: list[SearchRow] | None = None
+        self._search_tops: list[float] = []
+        self._search_elements: dict[tuple[Any, ...], SimElement] = {}
+        self._search_generation = 0
+
+        self.moments: list[str] = [f"Moment {i}" for i in range(10)]
+        self.composer_open = False
+        self.friend_requests: list[FriendRequest] = []
+        self._request: _RequestForm | None = None
+        self._add_contact_id: str | None = None
+
+        self._press: tuple[SimElement, float, bool] | None = None
+        self._session_rows: dict[str, SimElement] = {}
+        self._message_rows: dict[tuple[str, int], SimElement] = {}
+
+        self.app = SimElement(kAXApplicationRole, title="WeChat")
+        self.main_window = self._build_main_window()
+        self.windows: list[SimElement] = [self.main_window]
+        self.app._children = lambda: list(self.windows)
+        self.open_chat(self.sessions[0] if self.sessions else None)
+
+    # Model ---------------------------------------------------------------
+
+    def chat(self, name: str) -> SimChat:
+        """
+        Return the chat with `name`, generating its history on first use.
+        """
+        chat = self._chats.get(name)
+        if chat is None:
+            is_group = name in self._groups
+            rng = random.Random(f"{self.seed}:{name}")
+            members = rng.randint(3, 500) if is_group else 0
+            chat = self._chats[name] = SimChat(name, is_group, members)
+            self._generate(chat, self.history_size, rng)
+        return chat
+
+    def set_history(self, name: str, count: int) -> SimChat:
+        """
+        Replace the history of `name` with `count` generated messages.
+        """
+        with self.lock:
+            chat = self.chat(name)
+            chat.messages.clear()
+            chat.bottoms.clear()
+            self._generate(chat, count, random.Random(f"{self.seed}:{name}:{count}"))
+            chat.scroll_to_bottom(MESSAGES_LIST[3])
+            return chat
+
+    def _generate(self, chat: SimChat, count: int, rng: random.Random) -> None:
+        for index in range(count):
+            words = rng.choice((1, 2, 4, 6, 10, 18, 30))
+            text = " ".join(rng.choice(WORDS) for _ in range(words))
+            sender = "ME" if rng.random() < 0.4 else "OTHER"
+            chat.append(sender, f"{text} {index}")
+        chat.scroll_to_bottom(MESSAGES_LIST[3])
+
+    def receive(self, name: str, text: str) -> None:
+        """
+        Deliver an incoming message to `name`, as if someone sent it.
+        """
+        with self.lock:
+            chat = self.chat(name)
+            chat.append("OTHER", text)
+            if name != self.current:
+                chat.unread += 1
+            else:
+                chat.scroll_to_bottom(MESSAGES_LIST[3])
+            self._move_session_to_top(name)
+
+    def open_chat(self, name: str | None) -> None:
+        self.current = name
+        if name is None:
+            return
+        chat = self.chat(name)
+        chat.unread = 0
+        chat.scroll_to_bottom(MESSAGES_LIST[3])
+        if name not in self._session_index:
+            self._move_session_to_top(name)
+
+    def send(self, text: str) -> None:
+        if self.current is None:
+            return
+        chat = self.chat(self.current)
+        chat.append("ME", text)
+        chat.scroll_to_bottom(MESSAGES_LIST[3])
+        self._move_session_to_top(self.current)
+
+    def _move_session_to_top(self, name: str) -> None:
+        if name in self._session_index:
+            self.sessions.remove(name)
+        self.sessions.insert(0, name)
+        self._reindex_sessions()
+
+    def _reindex_sessions(self) -> None:
+        self._session_index = {name: i for i, name in enumerate(self.sessions)}
+
+    def advance(self, seconds: float) -> None:
+        """
+        Move the virtual clock forward and fire a long press that has
+        been held for long enough.
+        """
+        with self.lock:
+            self.now += max(0.0, seconds)
+            self.tick()
+
+    def tick(self) -> None:
+        if self._press is None:
+            return
+        element, started, fired = self._press
+        if fired or self.now - started < LONG_PRESS_SECONDS:
+            return
+        handler = element.handler("on_long_press")
+        self._press = (element, started, True)
+        if handler is not None:
+            handler()
+
+    # Main window ---------------------------------------------------------
+
+    def _build_main_window(self) -> SimElement:
+        self.moments_button = SimElement(
+            kAXButtonRole,
+            title="Moments",
+            frame=MOMENTS_BUTTON,
+            on_press=self._open_moments,
+        )
+        self.search_field = SimElement(
+            kAXTextAreaRole,
+            title="Search",
+            value=lambda: self.search_text,
+            frame=SEARCH_FIELD,
+            editable=True,
+            on_change=self._search_changed,
+        )
+        self.session_list = SimElement(
+            kAXListRole,
+            identifier="session_list",
+            frame=SIDEBAR_LIST,
+            children=self._visible_session_rows,
+            on_scroll=self._scroll_sessions,
+        )
+        self.search_list = SimElement(
+            kAXListRole,
+            identifier="search_list",
+            frame=SIDEBAR_LIST,
+            children=self._visible_search_rows,
+            valid=lambda: bool(self.search_query),
+            on_scroll=self._scroll_search,
+        )
+        self.chat_title = SimElement(
+            kAXStaticTextRole,
+            identifier="big_title_line_h_view",
+            value=lambda: self.chat(self.current).title if self.current else None,
+            frame=CHAT_TITLE,
+        )
+        self.messages_list = SimElement(
+            kAXListRole,
+            title="Messages",
+            frame=MESSAGES_LIST,
+            children=self._visible_message_rows,
+            valid=lambda: self.current is not None,
+            on_scroll=self._scroll_messages,
+        )
+        self.input_field = SimElement(
+            kAXTextAreaRole,
+            identifier="chat_input_field",
+            value="",
+            frame=INPUT_FIELD,
+            editable=True,
+            on_return=self._input_return,
+        )
+
+        def children() -> list[SimElement]:
+            sidebar = self.search_list if self.search_query else self.session_list
+            elements = [self.moments_button, self.search_field, sidebar]
+            if self.current is not None:
+                elements += [self.chat_title, self.messages_list, self.input_field]
+            return elements
+
+        window = SimElement(kAXWindowRole, title="WeChat", frame=MAIN_WINDOW)
+        window._children = children
+        window.parent = self.app
+        for element in (
+            self.moments_button,
+            self.search_field,
+            self.session_list,
+            self.search_list,
+            self.chat_title,
+            self.messages_list,
+            self.input_field,
+        ):
+            element.parent = window
+        return window
+
+    def _input_return(self) -> None:
+        text = self.input_field.value()
+        if isinstance(text, str) and text.strip():
+            self.send(text)
+            self.input_field.set_value("")
+
+    # Session list
+
+    def _visible_session_range(self) -> range:
+        height = SIDEBAR_LIST[3]
+        first = int(self.session_scroll // SESSION_ROW_HEIGHT)
+        last = int(-(-(self.session_scroll + height) // SESSION_ROW_HEIGHT))
+        return range(first, min(last, len(self.sessions)))
+
+    def _visible_session_rows(self) -> list[SimElement]:
+        return [
+            self._session_row(self.sessions[i]) for i in self._visible_session_range()
+        ]
+
+    def visible_sessions(self) -> list[str]:
+        with self.lock:
+            return [self.sessions[i] for i in self._visible_session_range()]
+
+    def _scroll_sessions(self, delta_lines: int) -> None:
+        bottom = max(0.0, len(self.sessions) * SESSION_ROW_HEIGHT - SIDEBAR_LIST[3])
+        scroll = self.session_scroll - delta_lines * SCROLL_LINE
+        self.session_scroll = min(bottom, max(0.0, scroll))
+
+    def _session_row(self, name: str) -> SimElement:
+        row = self._session_rows.get(name)
+        if row is not None:
+            return row
+
+        def frame() -> Frame | None:
+            index = self._session_index.get(name)
+            if index is None:
+                return None
+            x, y, w, _ = SIDEBAR_LIST
+            return (x, y + index * SESSION_ROW_HEIGHT - self.session_scroll, w, 64.0)
+
+        def valid() -> bool:
+            index = self._session_index.get(name)
+            return (
+                not self.search_query
+                and index is not None
+                and index in self._visible_session_range()
+            )
+
+        def inside(dx: float, dy: float, w: float, h: float) -> Callable[[], Frame]:
+            def located() -> Frame | None:
+                origin = frame()
+                if origin is None:
+                    return None
+                return (origin[0] + dx, origin[1] + dy, w, h)
+
+            return located
+
+        chat = self.chat(name)
+        title = SimElement(
+            kAXStaticTextRole,
+            identifier=f"session_item_{name}",
+            value=name,
+            frame=inside(60, 10, 140, 20),
+            valid=valid,
+        )
+        time_label = SimElement(
+            kAXStaticTextRole,
+            value=lambda: chat.time_label,
+            frame=inside(200, 10, 44, 16),
+            valid=valid,
+        )
+        preview = SimElement(
+            kAXStaticTextRole,
+            value=lambda: chat.messages[-1].text[:30] if chat.messages else "",
+            frame=inside(60, 36, 180, 18),
+            valid=valid,
+        )
+        badge = SimElement(
+            kAXStaticTextRole,
+            identifier="badge_view",
+            value=lambda: str(chat.unread),
+            frame=inside(40, 6, 18, 18),
+            valid=valid,
+        )
+
+        def children() -> list[SimElement]:
+            if chat.unread > 0:
+                return [title, time_label, preview, badge]
+            return [title, time_label, preview]
+
+        row = SimElement(
+            kAXCellRole,
+            frame=frame,
+            children=children,
+            valid=valid,
+            parent=self.session_list,
+            on_press=lambda: self.open_chat(name),
+        )
+        for child in (title, time_label, preview, badge):
+            child.parent = row
+        self._session_rows[name] = row
+        return row
+
+    # Messages list
+
+    def _visible_message_rows(self) -> list[SimElement]:
+        if self.current is None:
+            return []
+        chat = self.chat(self.current)
+        return [
+            self._message_row(chat, i) for i in chat.visible(MESSAGES_LIST[3])
+        ]
+
+    def _scroll_messages(self, delta_lines: int) -> None:
+        if self.current is not None:
+            chat = self.chat(self.current)
+            chat.scroll_by(-delta_lines * SCROLL_LINE, MESSAGES_LIST[3])
+
+    def _message_frame(self, chat: SimChat, index: int) -> Frame:
+        x, y, w, _ = MESSAGES_LIST
+        top = y + chat.top(index) - chat.scroll_top
+        return (x, top, w, chat.messages[index].height)
+
+    def _message_row(self, chat: SimChat, index: int) -> SimElement:
+        key = (chat.name, index)
+        row = self._message_rows.get(key)
+        if row is None:
+            row = self._message_rows[key] = SimElement(
+                kAXRowRole,
+                value=lambda: chat.messages[index].text,
+                frame=lambda: self._message_frame(chat, index),
+                valid=lambda: (
+                    self.current == chat.name
+                    and index in chat.visible(MESSAGES_LIST[3])
+                ),
+                parent=self.messages_list,
+            )
+        return row
+
+    def paint(self, bbox: tuple[int, int, int, int]) -> SimImage:
+        """
+        Render the screen region (left, top, right, bottom): the visible
+        message bubbles and avatars on the dark chat background, with
+        other people's messages on the left and our own on the right.
+        """
+        left, top, right, bottom = bbox
+        rects: list[tuple[int, int, int, int, Color]] = []
+        if self.current is not None:
+            chat = self.chat(self.current)
+            lx, ly, lw, lh = MESSAGES_LIST
+            for index in chat.visible(lh):
+                message = chat.messages[index]
+                x, y, w, h = self._message_frame(chat, index)
+                lines = max(1, -(-len(message.text) // CHARS_PER_LINE))
+                chars = min(len(message.text), CHARS_PER_LINE)
+                bubble_w = min(w * 0.6, 24 + CHAR_WIDTH * chars)
+                bubble_h = max(AVATAR_SIZE, lines * LINE_HEIGHT)
+                by = y + MESSAGE_PADDING
+                if message.sender == "ME":
+                    avatar_x = x + w - 12 - AVATAR_SIZE
+                    bubble_x = x + w - BUBBLE_OFFSET - bubble_w
+                    color = ME_BUBBLE
+                else:
+                    avatar_x = x + 12
+                    bubble_x = x + BUBBLE_OFFSET
+                    color = OTHER_BUBBLE
+                for rx, rw, rh, rc in (
+                    (avatar_x, AVATAR_SIZE, AVATAR_SIZE, AVATAR),
+                    (bubble_x, bubble_w, bubble_h, color),
+                ):
+                    x0 = max(rx, lx, left)
+                    y0 = max(by, ly, top)
+                    x1 = min(rx + rw, lx + lw, right)
+                    y1 = min(by + rh, ly + lh, bottom)
+                    if x1 > x0 and y1 > y0:
+                        rects.append(
+                            (
+                                int(x0 - left),
+                                int(y0 - top),
+                                int(x1 - left),
+                                int(y1 - top),
+                                rc,
+                            )
+                        )
+        return SimImage(int(right - left), int(bottom - top), BACKGROUND, rects)
+
+    # Global search
+
+    def _search_changed(self, source: str) -> None:
+        if source == "paste" or self.ax_set_triggers_search:
+            self._set_query(self.search_text)
+
+    def _set_query(self, query: str) -> None:
+        self.search_query = query.strip()
+        self.search_expanded.clear()
+        self.search_scroll = 0.0
+        self._invalidate_search()
+
+    def _close_search(self) -> None:
+        self.search_text = ""
+        self._set_query("")
+
+    def _invalidate_search(self) -> None:
+        self._search_rows = None
+        self._search_elements = {}
+        self._search_generation += 1
+
+    def _search_layout(self) -> list[SearchRow]:
+        if self._search_rows is not None:
+            return self._search_rows
+        query = self.search_query.lower()
+        rows: list[SearchRow] = []
+
+        def add(row: SearchRow) -> None:
+            row.top = rows[-1].top + rows[-1].height if rows else 0.0
+            rows.append(row)
+
+        for section, names in (
+            ("Contacts", [n for n in self.contact_names if query in n.lower()]),
+            ("Group Chats", [n for n in self.group_names if query in n.lower()]),
+        ):
+            if not names:
+                continue
+            add(SearchRow(("header", section), (section,), SEARCH_HEADER_HEIGHT))
+            expanded = section in self.search_expanded
+            for name in names if expanded else names[:3]:
+                add(
+                    SearchRow(
+                        (section, name),
+                        (name,),
+                        SEARCH_ROW_HEIGHT,
+                        action=lambda name=name: self._open_from_search(name),
+                    )
+                )
+            if expanded:
+                add(
+                    SearchRow(
+                        ("collapse", section),
+                        ("Collapse",),
+                        SEARCH_LINK_HEIGHT,
+                        action=lambda s=section: self._expand(s, False),
+                    )
+                )
+            elif len(names) > 3:
+                add(
+                    SearchRow(
+                        ("view_all", section),
+                        (f"View All({len(names)})",),
+                        SEARCH_LINK_HEIGHT,
+                        action=lambda s=section: self._expand(s, True),
+                    )
+                )
+
+        history = [
+            name
+            for name in self.sessions
+            if self._chats[name].messages
+            and query in self._chats[name].messages[-1].text.lower()
+        ][:3]
+        if history:
+            add(
+                SearchRow(
+                    ("header", "Chat History"), ("Chat History",), SEARCH_HEADER_HEIGHT
+                )
+            )
+            for name in history:
+                add(
+                    SearchRow(
+                        ("Chat History", name),
+                        (name, "1 related chat record"),
+                        SEARCH_ROW_HEIGHT,
+                        action=lambda name=name: self._open_from_search(name),
+                    )
+                )
+
+        add(SearchRow(("header", "More"), ("More",), SEARCH_HEADER_HEIGHT))
+        add(
+            SearchRow(
+                ("More", "wechat_id"),
+                (f"Search WeChat ID: {self.search_query}",),
+                SEARCH_ROW_HEIGHT,
+                action=lambda q=self.search_query: self._open_add_contacts(q),
+            )
+        )
+        self._search_rows = rows
+        self._search_tops = [row.top for row in rows]
+        return rows
+
+    def _visible_search_range(self) -> range:
+        self._search_layout()
+        tops = self._search_tops
+        start = max(0, bisect.bisect_right(tops, self.search_scroll) - 1)
+        end = bisect.bisect_left(tops, self.search_scroll + SIDEBAR_LIST[3])
+        return range(start, end)
+
+    def _visible_search_rows(self) -> list[SimElement]:
+        if not self.search_query:
+            return []
+        rows = self._search_layout()
+        return [self._search_row(rows[i], i) for i in self._visible_search_range()]
+
+    def _scroll_search(self, delta_lines: int) -> None:
+        rows = self._search_layout()
+        height = rows[-1].top + rows[-1].height if rows else 0.0
+        bottom = max(0.0, height - SIDEBAR_LIST[3])
+        scroll = self.search_scroll - delta_lines * SCROLL_LINE
+        self.search_scroll = min(bottom, max(0.0, scroll))
+
+    def _search_row(self, search_row: SearchRow, index: int) -> SimElement:
+        element = self._search_elements.get(search_row.key)
+        if element is not None:
+            return element
+        generation = self._search_generation
+
+        def frame() -> Frame:
+            x, y, w, _ = SIDEBAR_LIST
+            return (x, y + search_row.top - self.search_scroll, w, search_row.height)
+
+        def valid() -> bool:
+            if generation != self._search_generation or self._search_rows is None:
+                return False
+            top = search_row.top - self.search_scroll
+            return top + search_row.height > 0 and top < SIDEBAR_LIST[3]
+
+        def text_frame(line: int) -> Callable[[], Frame]:
+            def located() -> Frame:
+                x, y, w, _ = frame()
+                return (x + 56, y + 8 + 20 * line, w - 72, 18)
+
+            return located
+
+        texts = [
+            SimElement(
+                kAXStaticTextRole,
+                value=text,
+                frame=text_frame(line),
+                valid=valid,
+            )
+            for line, text in enumerate(search_row.texts)
+        ]
+        element = SimElement(
+            kAXCellRole,
+            frame=frame,
+            children=texts,
+            valid=valid,
+            parent=self.search_list,
+            index=index,
+            on_press=search_row.action,
+        )
+        self._search_elements[search_row.key] = element
+        return element
+
+    def _expand(self, section: str, expanded: bool) -> None:
+        if expanded:
+            self.search_expanded.add(section)
+        else:
+            self.search_expanded.discard(section)
+        self._invalidate_search()
+
+    def _open_from_search(self, name: str) -> None:
+        self._close_search()
+        self.open_chat(name)
+
+    # Windows -------------------------------------------------------------
+
+    def window(self, title: str) -> SimElement | None:
+        for window in self.windows:
+            if window.title == title:
+                return window
+        return None
+
+    def _add_window(self, window: SimElement) -> SimElement:
+        window.parent = self.app
+        close = SimElement(kAXButtonRole, on_press=lambda: self._close(window))
+        close.parent = window
+        window.close_button = close
+        self.windows.insert(0, window)
+        return window
+
+    def _close(self, window: SimElement) -> None:
+        if window in self.windows and window is not self.main_window:
+            self.windows.remove(window)
+            if window.title == "Moments":
+                self.composer_open = False
+            if self.focused is not None and self._window_of(self.focused) is window:
+                self.focused = None
+
+    def raise_window(self, window: SimElement) -> None:
+        if window in self.windows:
+            self.windows.remove(window)
+            self.windows.insert(0, window)
+
+    def _window_of(self, element: SimElement) -> SimElement | None:
+        node: SimElement | None = element
+        while node is not None and node.role != kAXWindowRole:
+            node = node.parent
+        return node
+
+    # Moments
+
+    def _open_moments(self) -> None:
+        existing = self.window("Moments")
+        if existing is not None:
+            self.raise_window(existing)
+            return
+        frame: Frame = (1220.0, 40.0, 600.0, 720.0)
+        post = SimElement(
+            kAXButtonRole,
+            title="Post",
+            frame=(1760.0, 52.0, 32.0, 32.0),
+            on_long_press=self._open_composer,
+        )
+
+        def feed_rows() -> list[SimElement]:
+            return [
+                SimElement(
+                    kAXStaticTextRole,
+                    value=text,
+                    frame=(1240.0, 100.0 + 80.0 * i, 560.0, 72.0),
+                    parent=feed,
+                )
+                for i, text in enumerate(reversed(self.moments[-8:]))
+            ]
+
+        feed = SimElement(
+            kAXListRole, frame=(1220.0, 92.0, 600.0, 668.0), children=feed_rows
+        )
+        text_area = SimElement(
+            kAXTextAreaRole,
+            value="",
+            frame=(1260.0, 160.0, 520.0, 300.0),
+            editable=True,
+        )
+        sheet_post = SimElement(
+            kAXButtonRole,
+            title="Post",
+            frame=(1700.0, 640.0, 80.0, 30.0),
+            on_press=lambda: self._post_moment(text_area),
+        )
+        sheet = SimElement(
+            kAXSheetRole,
+            frame=(1240.0, 120.0, 560.0, 580.0),
+            children=[text_area, sheet_post],
+        )
+
+        def children() -> list[SimElement]:
+            elements = [post, feed]
+            if self.composer_open:
+                elements.append(sheet)
+            return elements
+
+        window = SimElement(kAXWindowRole, title="Moments", frame=frame)
+        window._children = children
+        for element in (post, feed, sheet):
+            element.parent = window
+        self._add_window(window)
+
+    def _open_composer(self) -> None:
+        window = self.window("Moments")
+        if window is not None and not self.composer_open:
+            self.composer_open = True
+            for child in window.children():
+                if child.role == kAXSheetRole:
+                    child.children()[0].set_value("")
+
+    def _post_moment(self, text_area: SimElement) -> None:
+        text = text_area.value()
+        if isinstance(text, str) and text.strip():
+            self.moments.append(text)
+            self.composer_open = False
+
+    # Add contacts
+
+    def _open_add_contacts(self, wechat_id: str) -> None:
+        self._close_search()
+        existing = self.window("Add Contacts")
+        if existing is not None:
+            self._close(existing)
+        self._add_contact_id = wechat_id
+        children = [
+            SimElement(
+                kAXStaticTextRole,
+                value=f"WeChat ID: {wechat_id}",
+                frame=(1360.0, 200.0, 300.0, 20.0),
+            )
+        ]
+        if wechat_id in self.unknown_ids:
+            children.append(
+                SimElement(
+                    kAXStaticTextRole,
+                    value="User not found",
+                    frame=(1360.0, 240.0, 300.0, 20.0),
+                )
+            )
+        else:
+            children.append(
+                SimElement(
+                    kAXButtonRole,
+                    title="Add to Contacts",
+                    identifier="add_friend_button",
+                    frame=(1420.0, 560.0, 200.0, 36.0),
+                    on_press=lambda: self._open_friend_request(wechat_id),
+                )
+            )
+        window = SimElement(
+            kAXWindowRole,
+            title="Add Contacts",
+            frame=(1320.0, 150.0, 400.0, 500.0),
+            children=children,
+        )
+        self._add_window(window)
+
+    def _open_friend_request(self, wechat_id: str) -> None:
+        existing = self.window("Send Friend Request")
+        if existing is not None:
+            self._close(existing)
+        form = self._request = _RequestForm(wechat_id)
+        message = SimElement(
+            kAXTextAreaRole,
+            title="Send Friend Request",
+            value="I'm Me",
+            frame=(1360.0, 160.0, 340.0, 80.0),
+            editable=True,
+        )
+        remark = SimElement(
+            kAXTextFieldRole,
+            title="ModifyRemark",
+            value="",
+            frame=(1360.0, 270.0, 340.0, 24.0),
+            editable=True,
+        )
+
+        def privacy_option(label: str, mode: str, y: float) -> list[SimElement]:
+            def select() -> None:
+                form.privacy = mode
+
+            return [
+                SimElement(
+                    kAXButtonRole, frame=(1360.0, y + 2, 16.0, 16.0), on_press=select
+                ),
+                SimElement(
+                    kAXStaticTextRole, value=label, frame=(1382.0, y, 250.0, 20.0)
+                ),
+            ]
+
+        def checkbox(title: str, attr: str, y: float) -> SimElement:
+            def toggle() -> None:
+                setattr(form, attr, not getattr(form, attr))
+
+            return SimElement(
+                kAXCheckBoxRole,
+                title=title,
+                value=lambda: getattr(form, attr),
+                frame=(1382.0, y, 200.0, 20.0),
+                on_press=toggle,
+            )
+
+        fixed = [
+            message,
+            remark,
+            SimElement(
+                kAXStaticTextRole, value="Privacy", frame=(1360.0, 300.0, 100.0, 20.0)
+            ),
+            *privacy_option("Chats, Moments, WeRun, etc.", "all", 330.0),
+            *privacy_option("Chats Only", "chats_only", 360.0),
+        ]
+        hide = [
+            checkbox("Hide My Posts", "hide_my_posts", 400.0),
+            checkbox("Hide Their Posts", "hide_their_posts", 430.0),
+        ]
+        ok = SimElement(
+            kAXButtonRole,
+            title="OK",
+            frame=(1620.0, 640.0, 80.0, 30.0),
+            on_press=lambda: self._confirm_friend_request(form, message, remark),
+        )
+
+        def children() -> list[SimElement]:
+            return fixed + (hide if form.privacy == "all" else []) + [ok]
+
+        window = SimElement(
+            kAXWindowRole,
+            title="Send Friend Request",
+            frame=(1340.0, 120.0, 420.0, 560.0),
+        )
+        window._children = children
+        for element in fixed + hide + [ok]:
+            element.parent = window
+        self._add_window(window)
+
+    def _confirm_friend_request(
+        self, form: _RequestForm, message: SimElement, remark: SimElement
+    ) -> None:
+        self.friend_requests.append(
+            FriendRequest(
+                wechat_id=form.wechat_id,
+                message=str(message.value() or ""),
+                remark=str(remark.value() or ""),
+                privacy=form.privacy,
+                hide_my_posts=form.hide_my_posts,
+                hide_their_posts=form.hide_their_posts,
+            )
+        )
+        window = self.window("Send Friend Request")
+        if window is not None:
+            self._close(window)
+
+    # Input ---------------------------------------------------------------
+
+    def hit_test(self, x: float, y: float) -> SimElement | None:
+        for window in self.windows:
+            if _contains(window.frame(), x, y):
+                return self._deepest(window, x, y)
+        return None
+
+    def _deepest(self, element: SimElement, x: float, y: float) -> SimElement:
+        # Later children are drawn on top of earlier ones.
+        for child in reversed(element.children()):
+            if _contains(child.frame(), x, y):
+                return self._deepest(child, x, y)
+        return element
+
+    def mouse_down(self, x: float, y: float) -> None:
+        element = self.hit_test(x, y)
+        self._press = None
+        if element is None:
+            return
+        window = self._window_of(element)
+        if window is not None:
+            self.raise_window(window)
+        if element.editable:
+            self.focused = element
+        self._press = (element, self.now, False)
+
+    def mouse_up(self, x: float, y: float) -> None:
+        press, self._press = self._press, None
+        if press is None:
+            return
+        element, _, fired = press
+        if fired or not _contains(element.frame(), x, y):
+            return
+        handler = element.handler("on_press")
+        if handler is not None:
+            handler()
+
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        element = self.hit_test(x, y)
+        handler = element.handler("on_scroll") if element is not None else None
+        if handler is not None:
+            handler(delta_lines)
+
+    def key_press(self, keycode: int, flags: int) -> None:
+        focused = self.focused
+        if focused is None:
+            return
+        command = bool(flags & kCGEventFlagMaskCommand)
+        if command and keycode == KEYCODE_V and focused.editable:
+            text = next((item for item in self.pasteboard if isinstance(item, str)), "")
+            self.set_value(focused, text, source="paste")
+        elif not command and keycode == KEYCODE_RETURN and focused.on_return:
+            focused.on_return()
+
+    def set_value(self, element: SimElement, value: Any, source: str = "ax") -> None:
+        if element is self.search_field:
+            self.search_text = str(value)
+        else:
+            element.set_value(value)
+        if element.on_change is not None:
+            element.on_change(source)
+
+    def perform(self, element: SimElement, action: str) -> int:
+        if action == kAXRaiseAction:
+            if element.role == kAXWindowRole:
+                self.raise_window(element)
+            else:
+                self.focused = element
+                window = self._window_of(element)
+                if window is not None:
+                    self.raise_window(window)
+            return kAXErrorSuccess
+        if action == kAXPressAction and element.on_press is not None:
+            element.on_press()
+            return kAXErrorSuccess
+        return kAXErrorActionUnsupported
+
+
+def _contact_names(count: int) -> list[str]:
+    names: list[str] = []
+    round_ = 0
+    while len(names) < count:
+        for last in LAST_NAMES:
+            for first in FIRST_NAMES:
+                suffix = f" {round_ + 1}" if round_ else ""
+                names.append(f"{first} {last}{suffix}")
+                if len(names) == count:
+                    return names
+        round_ += 1
+    return names
+
+
+class SimImage:
+    """
+    A synthetic screenshot: a background colour plus filled rectangles,
+    with the parts of the PIL Image interface the sender classifier uses
+    (width, height, size, crop, convert and load), plus tobytes for
+    AX trace recording.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        background: Color,
+        rects: list[tuple[int, int, int, int, Color]],
+    ) -> None:
+        self.width = max(0, width)
+        self.height = max(0, height)
+        self.background = background
+        self.rects = rects
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def crop(self, box: tuple[int, int, int, int]) -> SimImage:
+        left, top, right, bottom = box
+        rects = []
+        for x0, y0, x1, y1, color in self.rects:
+            cx0, cy0 = max(x0, left), max(y0, top)
+            cx1, cy1 = min(x1, right), min(y1, bottom)
+            if cx1 > cx0 and cy1 > cy0:
+                rects.append((cx0 - left, cy0 - top, cx1 - left, cy1 - top, color))
+        return SimImage(right - left, bottom - top, self.background, rects)
+
+    def convert(self, mode: str) -> SimImage:
+        return self
+
+    def _rows(self) -> list[list[Color]]:
+        rows = [[self.background] * self.width for _ in range(self.height)]
+        for x0, y0, x1, y1, color in self.rects:
+            span = [color] * (x1 - x0)
+            for y in range(y0, y1):
+                rows[y][x0:x1] = span
+        return rows
+
+    def load(self) -> _PixelAccess:
+        return _PixelAccess(self._rows())
+
+    def tobytes(self) -> bytes:
+        rows = self._rows()
+        return bytes(channel for row in rows for color in row for channel in color)
+
+
+class _PixelAccess:
+    def __init__(self, rows: list[list[Color]]) -> None:
+        self._rows = rows
+
+    def __getitem__(self, xy: tuple[int, int]) -> Color:
+        x, y = xy
+        return self._rows[y][x]
+
+
+class SimRunningApp(RunningApp):
+    def __init__(self, wechat: SimulatedWeChat) -> None:
+        self._wechat = wechat
+        self.pid = wechat.pid
+
+    def is_active(self) -> bool:
+        return self._wechat.active
+
+    def activate(self) -> None:
+        self._wechat.active = True
+        self._wechat.activations += 1
+
+
+class SimulatorDriver(Driver):
+    """
+    Serve a SimulatedWeChat through the Driver interface.
+
+    `ipc_latency` (seconds) is waited for on every AX call, like the
+    round trip to the real WeChat. Waits of the UI flows advance the
+    model's virtual clock and take `time_scale` times as long in real
+    time (0 by default, so simulated runs never sleep). `user_idle` is
+    what user_idle_seconds() reports; by default the simulated user has
+    been away for good. `counts` tallies driver operations by kind.
+    """
+
+    name = "simulator"
+
+    def __init__(
+        self,
+        wechat: SimulatedWeChat | None = None,
+        ipc_latency: float = 0.0,
+        time_scale: float = 0.0,
+        user_idle: float = float("inf"),
+    ) -> None:
+        self.wechat = wechat if wechat is not None else SimulatedWeChat()
+        self.ipc_latency = ipc_latency
+        self.time_scale = time_scale
+        self.user_idle = user_idle
+        self.counts: Counter[str] = Counter()
+
+    @classmethod
+    def from_env(cls) -> SimulatorDriver:
+        """
+        Build the driver selected by WECHAT_MCP_DRIVER=simulator, sized
+        by WECHAT_MCP_SIM_CONTACTS and WECHAT_MCP_SIM_MESSAGES, with
+        WECHAT_MCP_SIM_LATENCY_MS of latency per AX call.
+        """
+        wechat = SimulatedWeChat(
+            contacts=int(os.getenv("WECHAT_MCP_SIM_CONTACTS", "300")),
+            messages=int(os.getenv("WECHAT_MCP_SIM_MESSAGES", "40")),
+        )
+        latency_ms = float(os.getenv("WECHAT_MCP_SIM_LATENCY_MS", "0"))
+        return cls(wechat, ipc_latency=latency_ms / 1000.0)
+
+    def _ipc(self, kind: str) -> None:
+        self.counts[kind] += 1
+        if self.ipc_latency > 0:
+            time.sleep(self.ipc_latency)
+            self.wechat.advance(self.ipc_latency)
+
+    def copy_attribute(self, element: Any, attribute: str) -> tuple[int, Any]:
+        self._ipc("copy")
+        if not isinstance(element, SimElement):
+            return kAXErrorIllegalArgument, None
+        with self.wechat.lock:
+            self.wechat.tick()
+            if not element.is_valid():
+                return kAXErrorInvalidUIElement, None
+            value = element.attribute(attribute)
+        if value is None:
+            return kAXErrorNoValue, None
+        return kAXErrorSuccess, value
+
+    def set_attribute(self, element: Any, attribute: str, value: Any) -> int:
+        self._ipc("set")
+        if not isinstance(element, SimElement):
+            return kAXErrorIllegalArgument
+        with self.wechat.lock:
+            if not element.is_valid():
+                return kAXErrorInvalidUIElement
+            if attribute != kAXValueAttribute or not element.editable:
+                return kAXErrorAttributeUnsupported
+            self.wechat.set_value(element, value)
+        return kAXErrorSuccess
+
+    def perform_action(self, element: Any, action: str) -> int:
+        self._ipc("perform")
+        if not isinstance(element, SimElement):
+            return kAXErrorIllegalArgument
+        with self.wechat.lock:
+            if not element.is_valid():
+                return kAXErrorInvalidUIElement
+            return self.wechat.perform(element, action)
+
+    def point_value(self, ax_value: Any) -> tuple[float, float] | None:
+        if not isinstance(ax_value, SimPoint):
+            return None
+        return ax_value.x, ax_value.y
+
+    def size_value(self, ax_value: Any) -> tuple[float, float] | None:
+        if not isinstance(ax_value, SimSize):
+            return None
+        return ax_value.width, ax_value.height
+
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        if bundle_id != WECHAT_BUNDLE_ID:
+            return None
+        return SimRunningApp(self.wechat)
+
+    def application_element(self, pid: int) -> Any:
+        if pid != self.wechat.pid:
+            return SimElement(kAXApplicationRole, valid=lambda: False)
+        return self.wechat.app
+
+    def mouse_down(self, x: float, y: float) -> None:
+        self.counts["mouse"] += 1
+        with self.wechat.lock:
+            self.wechat.mouse_down(x, y)
+
+    def mouse_up(self, x: float, y: float) -> None:
+        with self.wechat.lock:
+            self.wechat.mouse_up(x, y)
+
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        self.counts["scroll"] += 1
+        with self.wechat.lock:
+            self.wechat.scroll(x, y, delta_lines)
+
+    def key_press(self, keycode: int, flags: int = 0) -> None:
+        self.counts["key"] += 1
+        with self.wechat.lock:
+            self.wechat.key_press(keycode, flags)
+
+    def pasteboard_save(self) -> list[Any]:
+        return list(self.wechat.pasteboard)
+
+    def pasteboard_restore(self, saved: list[Any]) -> None:
+        self.wechat.pasteboard = list(saved)
+
+    def pasteboard_set_text(self, text: str) -> None:
+        self.wechat.pasteboard = [text]
+
+    def grab_screen(self, bbox: tuple[int, int, int, int]) -> SimImage:
+        self.counts["screenshot"] += 1
+        with self.wechat.lock:
+            return self.wechat.paint(bbox)
+
+    def sleep(self, seconds: float) -> None:
+        self.counts["sleep"] += 1
+        self.wechat.advance(seconds)
+        if self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def monotonic(self) -> float:
+        return self.wechat.now
+
+    def user_idle_seconds(self) -> float:
+        return self.user_idle
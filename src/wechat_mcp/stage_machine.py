@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, Sequence, TypeVar
+
+from .cancellation import raise_if_cancelled
+from .logging_config import logger
+from .stage_timer import StageTimer
+
+S = TypeVar("S")
+
+
+class StageFailed(Exception):
+    """
+    Raised by a stage to end its flow with an error. `stage` overrides
+    the stage name reported in the error result, for flows that report
+    finer-grained failures than their stages.
+    """
+
+    def __init__(self, message: str, stage: str | None = None) -> None:
+        super().__init__(message)
+        self.stage = stage
+
+
+@dataclass(frozen=True)
+class Stage(Generic[S]):
+    """
+    One step of a multi-step UI flow, run on the flow's state object.
+
+    `recover` is given for steps that later steps depend on, such as
+    opening a window or entering text: when a flow resumes past the
+    step, it finds that window (or control) again in the UI without
+    clicking anything, checks that it belongs to this call (the same
+    contact, the same text) and stores it in the state, returning False
+    if it is gone or does not match. Steps without it are simply
+    skipped when resuming past them.
+    """
+
+    name: str
+    run: Callable[[S], None]
+    recover: Callable[[S], bool] | None = None
+
+
+@dataclass
+class StageOutcome:
+    """
+    How far one run of a flow got. `failed` is the stage to resume from
+    (None when the flow must start over), `error_stage` the stage name
+    reported to the caller.
+    """
+
+    completed: list[str] = field(default_factory=list)
+    failed: str | None = None
+    error: str | None = None
+    error_stage: str | None = None
+    resumed_from: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def error_dict(self) -> dict[str, Any]:
+        return {
+            "error": self.error,
+            "stage": self.error_stage,
+            "resume_from": self.failed,
+            "completed_stages": list(self.completed),
+        }
+
+
+class StageMachine(Generic[S]):
+    """
+    Run the stages of a multi-step UI flow in order.
+
+    The current job's cancellation token is checked before every stage.
+    A stage fails by raising StageFailed or RuntimeError (what the UI
+    helpers raise); the flow then stops and reports the stage, so the
+    caller can retry with `resume_from` set to it. A resumed run only
+    re-finds the windows the earlier stages opened and starts at the
+    failed stage, instead of repeating the search and the waits before
+    it.
+    """
+
+    def __init__(self, flow: str, stages: Sequence[Stage[S]]) -> None:
+        self.flow = flow
+        self.stages = list(stages)
+
+    @property
+    def stage_names(self) -> list[str]:
+        return [stage.name for stage in self.stages]
+
+    def check_resume(self, resume_from: str | None) -> str | None:
+        """
+        Return an error message if `resume_from` is not a stage of this
+        flow, None if it is (or is None).
+        """
+        if resume_from is None or resume_from in self.stage_names:
+            return None
+        return (
+            f"Cannot resume {self.flow} from unknown stage {resume_from!r}; "
+            f"expected one of {self.stage_names}"
+        )
+
+    def run(
+        self,
+        state: S,
+        resume_from: str | None = None,
+        timer: StageTimer | None = None,
+    ) -> StageOutcome:
+        outcome = StageOutcome()
+        start = 0
+        if resume_from is not None:
+            start = self.stage_names.index(resume_from)
+            for stage in self.stages[:start]:
+                if not self._recover(stage, state):
+                    outcome.error = (
+                        f"Cannot resume {self.flow} from {resume_from!r}: what "
+                        f"stage {stage.name!r} left in WeChat is gone or does not "
+                        "match this call. Call again without resume_from to "
+                        "start over."
+                    )
+                    outcome.error_stage = stage.name
+                    logger.warning(outcome.error)
+                    return outcome
+            logger.info("Resuming %s from stage %s", self.flow, resume_from)
+            outcome.resumed_from = resume_from
+
+        for stage in self.stages[start:]:
+            raise_if_cancelled()
+            try:
+                if timer is None:
+                    stage.run(state)
+                else:
+                    with timer.stage(stage.name):
+                        stage.run(state)
+            except (StageFailed, RuntimeError) as exc:
+                outcome.failed = stage.name
+                outcome.error = str(exc)
+                outcome.error_stage = getattr(exc, "stage", None) or stage.name
+                logger.warning(
+                    "%s failed at %s: %s", self.flow, outcome.error_stage, exc
+                )
+                return outcome
+            outcome.completed.append(stage.name)
+        return outcome
+
+    def _recover(self, stage: Stage[S], state: S) -> bool:
+        if stage.recover is None:
+            return True
+        try:
+            return stage.recover(state)
+        except RuntimeError as exc:
+            logger.info("Could not recover stage %s: %s", stage.name, exc)
+            return False
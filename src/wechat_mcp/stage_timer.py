@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+class StageTimer:
+    """
+    Collect wall-clock durations of the named stages of one UI flow, for
+    reporting as "timings_ms" in tool results. A stage entered several
+    times accumulates.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._started = clock()
+        self.timings_ms: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = self._clock()
+        try:
+            yield
+        finally:
+            elapsed = (self._clock() - started) * 1000.0
+            self.timings_ms[name] = round(self.timings_ms.get(name, 0.0) + elapsed, 1)
+
+    def to_dict(self) -> dict[str, float]:
+        total = (self._clock() - self._started) * 1000.0
+        return {**self.timings_ms, "total": round(total, 1)}
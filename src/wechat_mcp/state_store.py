@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from .logging_config import logger
+
+
+def get_state_dir() -> Path:
+    """
+    Return the directory for state that must survive restarts.
+
+    Customizable via WECHAT_MCP_STATE_DIR; defaults to ~/.wechat_mcp.
+    """
+    state_dir = Path(os.getenv("WECHAT_MCP_STATE_DIR", "~/.wechat_mcp"))
+    return state_dir.expanduser().resolve()
+
+
+def state_path(name: str) -> Path:
+    return get_state_dir() / f"{name}.json"
+
+
+def load_state(name: str, default: Any) -> Any:
+    """
+    Load the JSON state file `name`, returning `default` when it does not
+    exist or cannot be parsed.
+    """
+    path = state_path(name)
+    try:
+        with path.open(encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable state file %s: %s", path, exc)
+        return default
+
+
+def save_state(name: str, data: Any) -> None:
+    """
+    Atomically write `data` as the JSON state file `name`.
+    """
+    path = state_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, ensure_ascii=False)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+# A strategy whose success rate drops below this (after MIN_ATTEMPTS
+# tries) is only used after every strategy that still works.
+MIN_SUCCESS_RATE = 0.8
+MIN_ATTEMPTS = 3
+
+
+@dataclass
+class StrategyStats:
+    attempts: int = 0
+    successes: int = 0
+    success_ms_total: float = 0.0
+    last_ms: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        return self.successes / self.attempts if self.attempts else 0.0
+
+    @property
+    def avg_success_ms(self) -> float | None:
+        return self.success_ms_total / self.successes if self.successes else None
+
+    @property
+    def unreliable(self) -> bool:
+        return self.attempts >= MIN_ATTEMPTS and self.success_rate < MIN_SUCCESS_RATE
+
+    def to_dict(self) -> dict[str, Any]:
+        avg = self.avg_success_ms
+        return {
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "success_rate": round(self.success_rate, 3),
+            "avg_success_ms": round(avg, 1) if avg is not None else None,
+            "last_ms": round(self.last_ms, 1),
+        }
+
+
+class StrategySelector:
+    """
+    Track success rate and latency of alternative ways to do the same
+    thing (per target, e.g. per text field) and order them so that the
+    fastest strategy that keeps working is tried first.
+
+    Strategies that have worked and stay reliable come first, fastest
+    (by average latency on success) first; strategies without a success
+    yet follow in their default order, and unreliable ones go last.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, StrategyStats]] = {}
+
+    def order(self, target: str, strategies: Sequence[str]) -> list[str]:
+        with self._lock:
+            stats = self._stats.get(target, {})
+
+            def key(item: tuple[int, str]) -> tuple[int, float, int]:
+                position, name = item
+                entry = stats.get(name)
+                if entry is not None and entry.unreliable:
+                    return (2, 0.0, position)
+                if entry is None or entry.avg_success_ms is None:
+                    return (1, 0.0, position)
+                return (0, entry.avg_success_ms, position)
+
+            return [name for _, name in sorted(enumerate(strategies), key=key)]
+
+    def record(self, target: str, strategy: str, ok: bool, elapsed_ms: float) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(target, {}).setdefault(
+                strategy, StrategyStats()
+            )
+            entry.attempts += 1
+            entry.last_ms = elapsed_ms
+            if ok:
+                entry.successes += 1
+                entry.success_ms_total += elapsed_ms
+
+    def record_ineffective(self, target: str, strategy: str) -> None:
+        """
+        Turn the last recorded success of `strategy` into a failure, for
+        when it reported success but later checks showed it had no
+        effect.
+        """
+        with self._lock:
+            entry = self._stats.get(target, {}).get(strategy)
+            if entry is None or entry.successes == 0:
+                return
+            entry.successes -= 1
+            entry.success_ms_total -= entry.last_ms
+
+    def stats(self) -> dict[str, dict[str, dict[str, Any]]]:
+        with self._lock:
+            return {
+                target: {name: entry.to_dict() for name, entry in entries.items()}
+                for target, entries in self._stats.items()
+            }
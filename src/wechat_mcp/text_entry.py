@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable, Sequence
+
+from .ax_calls import ax_copy_attribute, ax_perform_action, ax_set_attribute
+from .ax_constants import (
+    KEYCODE_A,
+    KEYCODE_V,
+    kAXRaiseAction,
+    kAXValueAttribute,
+    kCGEventFlagMaskCommand,
+)
+from .driver import get_driver, pause
+from .logging_config import logger
+from .strategy_stats import StrategySelector
+from .timing_profile import settle
+
+AX_SET = "ax_set"
+PASTE = "paste"
+DEFAULT_STRATEGIES = (AX_SET, PASTE)
+
+text_entry_stats = StrategySelector()
+
+
+@dataclass
+class TextEntryResult:
+    strategy: str | None
+    verified: bool
+    elapsed_ms: float
+
+
+def _read_value(element: Any) -> Any:
+    err, value = ax_copy_attribute(element, kAXValueAttribute)
+    return value if err == 0 else None
+
+
+def wait_for_value(element: Any, text: str, timeout: float) -> bool:
+    """
+    Poll the element's AXValue until it equals `text` (ignoring
+    surrounding whitespace) or `timeout` seconds pass.
+    """
+    deadline = get_driver().monotonic() + timeout
+    while True:
+        value = _read_value(element)
+        if isinstance(value, str) and value.strip() == text.strip():
+            return True
+        if get_driver().monotonic() >= deadline:
+            return False
+        pause(0.02)
+
+
+def _send_command_key(keycode: int) -> None:
+    get_driver().key_press(keycode, kCGEventFlagMaskCommand)
+
+
+def _enter_by_ax_set(element: Any, text: str) -> bool:
+    err = ax_set_attribute(element, kAXValueAttribute, text)
+    if err != 0:
+        logger.debug("AX value set failed (err=%s)", err)
+        return False
+    return wait_for_value(element, text, timeout=0.2)
+
+
+def _enter_by_paste(element: Any, text: str) -> bool:
+    """
+    Replace the field contents with Command+A, Command+V, restoring the
+    user's pasteboard once the field shows the pasted text.
+    """
+    err = ax_set_attribute(element, kAXValueAttribute, "")
+    if err != 0:
+        logger.debug("Failed to clear field via AX (err=%s)", err)
+
+    driver = get_driver()
+    saved = driver.pasteboard_save()
+    driver.pasteboard_set_text(text)
+    try:
+        settle("key_settle")
+        _send_command_key(KEYCODE_A)
+        settle("key_settle")
+        _send_command_key(KEYCODE_V)
+        # The paste happens asynchronously in WeChat; wait until it landed
+        # before putting the old pasteboard contents back.
+        return wait_for_value(element, text, timeout=1.0)
+    finally:
+        driver.pasteboard_restore(saved)
+
+
+STRATEGIES: dict[str, Callable[[Any, str], bool]] = {
+    AX_SET: _enter_by_ax_set,
+    PASTE: _enter_by_paste,
+}
+
+
+def enter_text(
+    element: Any,
+    text: str,
+    target: str,
+    strategies: Sequence[str] = DEFAULT_STRATEGIES,
+) -> TextEntryResult:
+    """
+    Put `text` into a text field and verify it by reading the value back.
+
+    Strategies are tried in the order chosen by text_entry_stats for
+    `target` (a name for the field, e.g. "search"): "ax_set" sets the
+    AXValue directly and touches neither keyboard nor pasteboard;
+    "paste" falls back to Command+A / Command+V through the pasteboard
+    and restores the previous pasteboard contents afterwards. Each
+    attempt's outcome and latency is recorded.
+    """
+    ax_perform_action(element, kAXRaiseAction)
+    clock = get_driver().monotonic
+    started = clock()
+    for strategy in text_entry_stats.order(target, strategies):
+        attempt_started = clock()
+        try:
+            ok = STRATEGIES[strategy](element, text)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Text entry strategy %s failed: %s", strategy, exc)
+            ok = False
+        elapsed_ms = (clock() - attempt_started) * 1000.0
+        text_entry_stats.record(target, strategy, ok, elapsed_ms)
+        if ok:
+            logger.debug(
+                "Entered text into %s via %s in %.0f ms", target, strategy, elapsed_ms
+            )
+            return TextEntryResult(
+                strategy, True, round((clock() - started) * 1000.0, 1)
+            )
+
+    logger.warning("Could not verify text entry into %s", target)
+    return TextEntryResult(None, False, round((clock() - started) * 1000.0, 1))
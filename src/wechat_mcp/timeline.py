@@ -0,0 +1,383 @@
+"""
+Per tool call timelines in the Chrome trace event format.
+
+With WECHAT_MCP_TIMELINE=1, every UI tool call writes one JSON file to
+<log dir>/timelines/ that opens in Perfetto (ui.perfetto.dev) or
+chrome://tracing. It shows on one track, nested by time:
+
+- the tool call itself,
+- the perf_stats stages (navigation, search, scrolls, captures, sender
+  classification, ...), which requires WECHAT_MCP_PERF_STATS on,
+- and, from the driver, every AX read, write and action, wait,
+  synthesized input event, pasteboard access and screenshot.
+
+Disk use is bounded: a file holds at most WECHAT_MCP_TIMELINE_MAX_EVENTS
+events (later ones are counted but dropped), and after each write the
+oldest files are removed until at most WECHAT_MCP_TIMELINE_KEEP files
+and WECHAT_MCP_TIMELINE_MAX_MB megabytes remain. Files are written and
+pruned by a background thread, not by the UI worker.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from .driver import (
+    DelegatingDriver,
+    DelegatingRunningApp,
+    Driver,
+    RunningApp,
+    get_driver,
+    use_driver,
+)
+from .env import env_flag, env_float
+from .logging_config import get_log_dir, logger
+from .perf_stats import CallSpans
+
+TIMELINE_ENABLED = env_flag("WECHAT_MCP_TIMELINE", False)
+
+DEFAULT_MAX_EVENTS = 100_000
+DEFAULT_KEEP = 200
+DEFAULT_MAX_MB = 100.0
+
+_PID = 1
+_TID = 1
+
+
+class CallTimeline:
+    """
+    The events of one tool call, in microseconds since its start.
+    """
+
+    def __init__(self, label: str, max_events: int = DEFAULT_MAX_EVENTS) -> None:
+        self.label = label
+        self.max_events = max_events
+        self.started_at = datetime.now()
+        self.origin = time.perf_counter()
+        self.events: list[dict[str, Any]] = []
+        self.dropped = 0
+
+    def add_span(
+        self,
+        name: str,
+        category: str,
+        started: float,
+        elapsed_ms: float,
+        ok: bool = True,
+        **args: Any,
+    ) -> None:
+        """
+        Add a complete event; `started` is a perf_counter() value.
+        """
+        if len(self.events) >= self.max_events and category != "tool":
+            self.dropped += 1
+            return
+        if not ok:
+            args["error"] = True
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((started - self.origin) * 1e6, 1),
+            "dur": round(elapsed_ms * 1000.0, 1),
+            "pid": _PID,
+            "tid": _TID,
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def to_dict(self) -> dict[str, Any]:
+        # Parents before children: by start, then longest first.
+        events = sorted(self.events, key=lambda e: (e["ts"], -e["dur"]))
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": _PID,
+                "tid": _TID,
+                "args": {"name": "wechat-mcp"},
+            },
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": _PID,
+                "tid": _TID,
+                "args": {"name": self.label},
+            },
+        ]
+        return {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "label": self.label,
+                "started_at": self.started_at.isoformat(timespec="milliseconds"),
+                "events": len(self.events),
+                "dropped_events": self.dropped,
+            },
+        }
+
+
+class _TimelineRunningApp(DelegatingRunningApp):
+    def __init__(self, app: RunningApp, driver: TimelineDriver) -> None:
+        super().__init__(app)
+        self._driver = driver
+
+    def activate(self) -> None:
+        started = time.perf_counter()
+        self.inner.activate()
+        self._driver._span("activate", "app", started)
+
+
+class TimelineDriver(DelegatingDriver):
+    """
+    Pass every call through to `inner`, adding it to a CallTimeline.
+    """
+
+    name = "timeline"
+
+    def __init__(self, inner: Driver, timeline: CallTimeline) -> None:
+        super().__init__(inner)
+        self.timeline = timeline
+
+    def _span(self, name: str, category: str, started: float, **args: Any) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.timeline.add_span(name, category, started, elapsed_ms, **args)
+
+    # Accessibility
+    def copy_attribute(self, element: Any, attribute: str) -> tuple[int, Any]:
+        started = time.perf_counter()
+        err, value = self.inner.copy_attribute(element, attribute)
+        if err:
+            self._span(attribute, "ax.copy", started, err=err)
+        else:
+            self._span(attribute, "ax.copy", started)
+        return err, value
+
+    def set_attribute(self, element: Any, attribute: str, value: Any) -> int:
+        started = time.perf_counter()
+        err = self.inner.set_attribute(element, attribute, value)
+        self._span(attribute, "ax.set", started, err=err)
+        return err
+
+    def perform_action(self, element: Any, action: str) -> int:
+        started = time.perf_counter()
+        err = self.inner.perform_action(element, action)
+        self._span(action, "ax.perform", started, err=err)
+        return err
+
+    # Applications
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        started = time.perf_counter()
+        app = self.inner.running_application(bundle_id)
+        self._span("running_application", "app", started)
+        return _TimelineRunningApp(app, self) if app is not None else None
+
+    # Input
+    def mouse_down(self, x: float, y: float) -> None:
+        started = time.perf_counter()
+        self.inner.mouse_down(x, y)
+        self._span("mouse_down", "input", started, x=round(x), y=round(y))
+
+    def mouse_up(self, x: float, y: float) -> None:
+        started = time.perf_counter()
+        self.inner.mouse_up(x, y)
+        self._span("mouse_up", "input", started, x=round(x), y=round(y))
+
+    def scroll(self, x: float, y: float, delta_lines: int) -> None:
+        started = time.perf_counter()
+        self.inner.scroll(x, y, delta_lines)
+        self._span("scroll", "input", started, lines=delta_lines)
+
+    def key_press(self, keycode: int, flags: int = 0) -> None:
+        started = time.perf_counter()
+        self.inner.key_press(keycode, flags)
+        self._span("key_press", "input", started, keycode=keycode, flags=flags)
+
+    # Pasteboard
+    def pasteboard_save(self) -> Any:
+        started = time.perf_counter()
+        saved = self.inner.pasteboard_save()
+        self._span("pasteboard_save", "pasteboard", started)
+        return saved
+
+    def pasteboard_restore(self, saved: Any) -> None:
+        started = time.perf_counter()
+        self.inner.pasteboard_restore(saved)
+        self._span("pasteboard_restore", "pasteboard", started)
+
+    def pasteboard_set_text(self, text: str) -> None:
+        started = time.perf_counter()
+        self.inner.pasteboard_set_text(text)
+        self._span("pasteboard_set_text", "pasteboard", started)
+
+    # Screen
+    def grab_screen(self, bbox: tuple[int, int, int, int]) -> Any:
+        started = time.perf_counter()
+        image = self.inner.grab_screen(bbox)
+        self._span("grab_screen", "capture", started, bbox=list(bbox))
+        return image
+
+    # Time
+    def sleep(self, seconds: float) -> None:
+        started = time.perf_counter()
+        self.inner.sleep(seconds)
+        self._span("wait", "wait", started, seconds=seconds)
+
+
+def timeline_dir() -> Path:
+    return get_log_dir() / "timelines"
+
+
+def prune_timelines(directory: Path, keep: int, max_bytes: int) -> int:
+    """
+    Remove the oldest timeline files until at most `keep` files and
+    `max_bytes` bytes remain. Returns the number of files removed.
+    """
+    files = []
+    for path in directory.glob("*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in files:
+        if len(files) - removed <= keep and total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+_write_lock = threading.Lock()
+
+
+def write_timeline(timeline: CallTimeline, directory: Path | None = None) -> Path:
+    """
+    Write `timeline` as <timestamp>-<label>.json and prune old files.
+    """
+    directory = directory or timeline_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = timeline.started_at.strftime("%Y%m%d-%H%M%S-%f")
+    path = directory / f"{stamp}-{timeline.label}.json"
+    with _write_lock:
+        with path.open("w", encoding="utf-8") as fh:
+            json.dump(timeline.to_dict(), fh, separators=(",", ":"))
+        prune_timelines(
+            directory,
+            keep=int(env_float("WECHAT_MCP_TIMELINE_KEEP", DEFAULT_KEEP)),
+            max_bytes=int(
+                env_float("WECHAT_MCP_TIMELINE_MAX_MB", DEFAULT_MAX_MB) * 1e6
+            ),
+        )
+    return path
+
+
+class TimelineWriter:
+    """
+    Write finished timelines on a background thread, so that the UI
+    worker does not wait for their serialization, the disk and pruning.
+    """
+
+    def __init__(self) -> None:
+        self._queue: queue.SimpleQueue[tuple[CallTimeline, Path]] = (
+            queue.SimpleQueue()
+        )
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._thread: threading.Thread | None = None
+
+    def submit(self, timeline: CallTimeline, directory: Path | None = None) -> None:
+        """
+        Queue `timeline` to be written to `directory` (default:
+        timeline_dir()).
+        """
+        directory = directory or timeline_dir()
+        with self._cond:
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="wechat-timeline-writer", daemon=True
+                )
+                self._thread.start()
+        self._queue.put((timeline, directory))
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """
+        Wait until every submitted timeline is written. Returns False if
+        some are still pending after `timeout` seconds.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def _run(self) -> None:
+        while True:
+            timeline, directory = self._queue.get()
+            try:
+                path = write_timeline(timeline, directory)
+                logger.debug("Wrote timeline of %s to %s", timeline.label, path)
+            except OSError as exc:
+                logger.warning(
+                    "Could not write timeline of %s: %s", timeline.label, exc
+                )
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify_all()
+
+
+timeline_writer = TimelineWriter()
+
+
+@contextmanager
+def timeline_recording(
+    label: str, call: CallSpans | None, enabled: bool | None = None
+) -> Iterator[CallTimeline | None]:
+    """
+    Put the block of one tool call on a timeline and hand it to
+    timeline_writer when the block ends. A call nested in another one
+    (a preempting job run inside a batch) becomes a span on the outer
+    call's timeline.
+    Does nothing unless WECHAT_MCP_TIMELINE (or `enabled`) is on.
+    """
+    if not (TIMELINE_ENABLED if enabled is None else enabled):
+        yield None
+        return
+
+    driver = get_driver()
+    if isinstance(driver, TimelineDriver):
+        timeline = driver.timeline
+        outer = True
+    else:
+        max_events = env_float("WECHAT_MCP_TIMELINE_MAX_EVENTS", DEFAULT_MAX_EVENTS)
+        timeline = CallTimeline(label, max_events=int(max_events))
+        driver = TimelineDriver(driver, timeline)
+        outer = False
+    if call is not None:
+        call.timeline = timeline
+
+    started = time.perf_counter()
+    ok = False
+    try:
+        if outer:
+            yield timeline
+        else:
+            with use_driver(driver):
+                yield timeline
+        ok = True
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        timeline.add_span(label, "tool", started, elapsed_ms, ok=ok)
+        if not outer:
+            timeline_writer.submit(timeline)
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Literal
+
+from .driver import pause
+from .env import env_flag, env_float
+from .logging_config import logger
+from .state_store import load_state, save_state
+
+STATE_NAME = "timing_profile"
+
+# What a delay waits for WeChat to reflect; calibration measures each.
+Reflects = Literal["click", "scroll", "typing"]
+REFLECTS: tuple[str, ...] = ("click", "scroll", "typing")
+
+# Online adaptation: a delay that was long enough shrinks a little, one
+# that was too short grows a lot, so it settles just above the point
+# where WeChat starts to lag behind (about one miss in 14 waits).
+SHRINK = 0.97
+GROW = 1.5
+
+POLL_INTERVAL = 0.02
+
+
+@dataclass(frozen=True)
+class DelaySpec:
+    """
+    A fixed wait after an input event, before reading the UI again.
+
+    Calibration sets the delay to `factor` times the measured latency of
+    WeChat reflecting that kind of input, within [minimum, maximum].
+    Delays whose effect the flows can check (`adapts`) are waited through
+    settle_until() and also adapt online; the others have no observable
+    end and change only by calibration.
+    """
+
+    default: float
+    minimum: float
+    maximum: float
+    reflects: Reflects
+    factor: float
+    description: str
+    adapts: bool = False
+
+
+# The fixed waits are: key_settle between synthesized keys, which
+# leave nothing to read back; scroll_settle and scroll_step, since a
+# scroll that shows no new rows may just have hit the end of the list;
+# and list_settle, a last pause after scroll_to_bottom already saw the
+# list stop moving.
+DELAYS: dict[str, DelaySpec] = {
+    "session_click": DelaySpec(
+        0.3,
+        0.05,
+        1.0,
+        "click",
+        3.0,
+        "after clicking a chat in the session list, until its title shows",
+        adapts=True,
+    ),
+    "chat_open": DelaySpec(
+        0.4,
+        0.1,
+        1.5,
+        "click",
+        4.0,
+        "after opening a chat from search results, until its title shows",
+        adapts=True,
+    ),
+    "section_expand": DelaySpec(
+        0.3,
+        0.05,
+        1.0,
+        "click",
+        2.0,
+        "after clicking View All in search results, until the row is gone",
+        adapts=True,
+    ),
+    "search_results": DelaySpec(
+        0.4,
+        0.1,
+        1.5,
+        "typing",
+        2.0,
+        "after typing a search query, until the results list shows",
+        adapts=True,
+    ),
+    "key_settle": DelaySpec(
+        0.05, 0.01, 0.3, "typing", 1.0, "between synthesized shortcut keys"
+    ),
+    "scroll_settle": DelaySpec(
+        0.05, 0.01, 0.3, "scroll", 1.5, "between scrolls to the bottom of a chat"
+    ),
+    "scroll_step": DelaySpec(
+        0.1, 0.02, 0.5, "scroll", 2.0, "after a small scroll through a list"
+    ),
+    "list_settle": DelaySpec(
+        0.2, 0.05, 0.8, "scroll", 4.0, "after scrolling a chat to the bottom"
+    ),
+}
+
+
+class TimingProfile:
+    """
+    The settle delays of the UI flows, tuned to this machine's WeChat.
+
+    Each delay starts at its default, can be calibrated from measured
+    latencies (see calibrate_timing_utils), and adapts online: callers
+    that can tell whether a delay was long enough report it through
+    observe() or use settle_until(). Values are persisted under the
+    state directory, loaded on first use, and multiplied by `scale`
+    (WECHAT_MCP_TIMING_SCALE) when read.
+    """
+
+    def __init__(
+        self,
+        scale: float = 1.0,
+        adapt: bool = True,
+        persist: bool = True,
+        save_every: int = 25,
+    ) -> None:
+        self.scale = scale
+        self.adapt = adapt
+        self._persist = persist
+        self._save_every = save_every
+        self._lock = threading.Lock()
+        self._loaded = not persist
+        self._values = {name: spec.default for name, spec in DELAYS.items()}
+        self._successes = dict.fromkeys(DELAYS, 0)
+        self._failures = dict.fromkeys(DELAYS, 0)
+        self._unsaved = 0
+        self.calibrated_at: float | None = None
+        self.latencies_ms: dict[str, float] = {}
+
+    def delay(self, name: str) -> float:
+        """
+        Return the current value of the delay `name`, in seconds.
+        """
+        with self._lock:
+            self._ensure_loaded_locked()
+            return self._values[name] * self.scale
+
+    def settle(self, name: str) -> None:
+        pause(self.delay(name))
+
+    def observe(self, name: str, ok: bool) -> None:
+        """
+        Record whether the delay `name` was long enough.
+        """
+        if not self.adapt:
+            return
+        spec = DELAYS[name]
+        with self._lock:
+            self._ensure_loaded_locked()
+            value = self._values[name]
+            if ok:
+                self._successes[name] += 1
+                self._values[name] = max(spec.minimum, value * SHRINK)
+            else:
+                self._failures[name] += 1
+                self._values[name] = min(spec.maximum, value * GROW)
+                logger.info(
+                    "Delay %s was too short; raised to %.0f ms",
+                    name,
+                    self._values[name] * 1000.0,
+                )
+            self._unsaved += 1
+            if not ok or self._unsaved >= self._save_every:
+                self._save_locked()
+
+    def settle_until(self, name: str, ready: Callable[[], Any]) -> Any:
+        """
+        Wait the delay `name`, then check `ready()`. If it is not ready
+        yet, keep polling up to the delay's maximum and count the delay
+        as too short when it becomes ready late. Returns the last result
+        of `ready()`; if it never becomes truthy, nothing is learned.
+        """
+        self.settle(name)
+        result = ready()
+        if result:
+            self.observe(name, True)
+            return result
+        # Budget the polls by the time waited rather than the clock, so
+        # that drivers whose waits are virtual poll just as often.
+        waited = 0.0
+        limit = DELAYS[name].maximum * self.scale
+        while waited < limit:
+            pause(POLL_INTERVAL)
+            waited += POLL_INTERVAL
+            result = ready()
+            if result:
+                self.observe(name, False)
+                return result
+        return result
+
+    def apply_calibration(self, latencies: dict[str, float]) -> None:
+        """
+        Set every delay from the measured latency (in seconds) of what it
+        waits for. Kinds missing from `latencies` keep their values.
+        """
+        with self._lock:
+            self._ensure_loaded_locked()
+            for name, spec in DELAYS.items():
+                latency = latencies.get(spec.reflects)
+                if latency is None:
+                    continue
+                value = latency * spec.factor
+                self._values[name] = min(spec.maximum, max(spec.minimum, value))
+            self.calibrated_at = time.time()
+            self.latencies_ms = {
+                kind: round(latency * 1000.0, 1) for kind, latency in latencies.items()
+            }
+            self._save_locked()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._loaded = True
+            self._values = {name: spec.default for name, spec in DELAYS.items()}
+            self._successes = dict.fromkeys(DELAYS, 0)
+            self._failures = dict.fromkeys(DELAYS, 0)
+            self.calibrated_at = None
+            self.latencies_ms = {}
+            self._save_locked()
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            self._ensure_loaded_locked()
+            return {
+                "scale": self.scale,
+                "adapt": self.adapt,
+                "calibrated_at": self.calibrated_at,
+                "latencies_ms": dict(self.latencies_ms),
+                "delays": {
+                    name: {
+                        "value_ms": round(self._values[name] * 1000.0, 1),
+                        "default_ms": round(spec.default * 1000.0, 1),
+                        "min_ms": round(spec.minimum * 1000.0, 1),
+                        "max_ms": round(spec.maximum * 1000.0, 1),
+                        "reflects": spec.reflects,
+                        "adapts": spec.adapts,
+                        "successes": self._successes[name],
+                        "failures": self._failures[name],
+                        "description": spec.description,
+                    }
+                    for name, spec in DELAYS.items()
+                },
+            }
+
+    def _ensure_loaded_locked(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        state = load_state(STATE_NAME, {})
+        if not isinstance(state, dict):
+            return
+        for name, value in (state.get("delays") or {}).items():
+            spec = DELAYS.get(name)
+            if spec is None or not isinstance(value, (int, float)):
+                continue
+            self._values[name] = min(spec.maximum, max(spec.minimum, float(value)))
+        calibrated_at = state.get("calibrated_at")
+        if isinstance(calibrated_at, (int, float)):
+            self.calibrated_at = float(calibrated_at)
+        latencies = state.get("latencies_ms")
+        if isinstance(latencies, dict):
+            self.latencies_ms = {
+                kind: float(ms)
+                for kind, ms in latencies.items()
+                if kind in REFLECTS and isinstance(ms, (int, float))
+            }
+
+    def _save_locked(self) -> None:
+        self._unsaved = 0
+        if not self._persist:
+            return
+        state = {
+            "delays": dict(self._values),
+            "calibrated_at": self.calibrated_at,
+            "latencies_ms": self.latencies_ms,
+        }
+        try:
+            save_state(STATE_NAME, state)
+        except OSError as exc:
+            logger.warning("Could not persist the timing profile: %s", exc)
+
+
+timing_profile = TimingProfile(
+    scale=env_float("WECHAT_MCP_TIMING_SCALE", 1.0),
+    adapt=env_flag("WECHAT_MCP_TIMING_ADAPT", True),
+)
+settle = timing_profile.settle
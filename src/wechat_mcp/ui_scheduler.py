@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass, field
+from enum import IntEnum
+from typing import Any, Callable
+
+from .cancellation import CancellationToken, cancellation_scope
+from .logging_config import logger
+
+
+class UIPriority(IntEnum):
+    """
+    Priority classes for UI-driving work; lower values run first.
+    """
+
+    SEND = 0
+    INTERACTIVE = 10
+    BULK = 20
+    # Background work (prefetching); a running IDLE job is cancelled as
+    # soon as any other job is submitted.
+    IDLE = 30
+
+
+@dataclass
+class UIJobRecord:
+    label: str
+    client_id: str
+    priority: str
+    wait_ms: float
+    run_ms: float
+    ok: bool
+
+
+@dataclass
+class _UIJob:
+    fn: Callable[..., Any]
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+    priority: UIPriority
+    client_id: str
+    label: str
+    token: CancellationToken | None = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    seq: int = 0
+
+
+class UIScheduler:
+    """
+    Serialize all work that drives the WeChat UI through one worker thread.
+
+    WeChat is driven with global mouse and keyboard events, so two tool
+    calls touching the UI at the same time corrupt each other. Every such
+    call is submitted here instead. Jobs are picked by priority first
+    (UIPriority.SEND before INTERACTIVE before BULK); within a priority
+    class the scheduler round-robins between clients so that one client
+    queuing many jobs cannot starve the others.
+
+    Long-running jobs can call run_preempting_jobs() at safe points
+    (e.g. between chats of a batch) to let more urgent queued jobs run
+    before they continue. UIPriority.IDLE jobs yield at once instead:
+    submitting any other job cancels the tokens of the running and
+    queued IDLE jobs.
+    """
+
+    def __init__(self, history_size: int = 50) -> None:
+        self._lock = threading.Condition()
+        # priority -> client_id -> pending jobs; OrderedDict order is the
+        # round-robin order of clients within that priority.
+        self._queues: dict[UIPriority, OrderedDict[str, deque[_UIJob]]] = {
+            priority: OrderedDict() for priority in UIPriority
+        }
+        self._seq = itertools.count()
+        self._worker: threading.Thread | None = None
+        self._current: _UIJob | None = None
+        self._history: deque[UIJobRecord] = deque(maxlen=history_size)
+        self._completed = 0
+        self._failed = 0
+        self._max_depth = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+        self._last_activity = time.monotonic()
+
+    # -- submission -------------------------------------------------------
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: UIPriority = UIPriority.INTERACTIVE,
+        client_id: str = "local",
+        label: str | None = None,
+        token: CancellationToken | None = None,
+        **kwargs: Any,
+    ) -> Future:
+        """
+        Queue `fn(*args, **kwargs)` for the UI worker and return a Future
+        for its result.
+
+        Cancelling the Future drops the job if it has not started yet. To
+        stop a job that is already running, cancel its `token`; the job
+        sees it through cancellation.raise_if_cancelled() at its next
+        check point.
+        """
+        job = _UIJob(
+            fn=fn,
+            args=args,
+            kwargs=kwargs,
+            priority=UIPriority(priority),
+            client_id=client_id,
+            label=label or getattr(fn, "__name__", "ui_job"),
+            token=token,
+            seq=next(self._seq),
+        )
+        with self._lock:
+            self._queues[job.priority].setdefault(client_id, deque()).append(job)
+            depth = self._depth_locked()
+            self._max_depth = max(self._max_depth, depth)
+            if job.priority != UIPriority.IDLE:
+                self._last_activity = time.monotonic()
+                self._preempt_idle_jobs_locked(job)
+            self._ensure_worker_locked()
+            self._lock.notify()
+
+        logger.debug(
+            "Queued UI job %s (client=%s, priority=%s, depth=%d)",
+            job.label,
+            client_id,
+            job.priority.name,
+            depth,
+        )
+        return job.future
+
+    def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: UIPriority = UIPriority.INTERACTIVE,
+        client_id: str = "local",
+        label: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Submit a job and block until it has run, returning its result.
+
+        When called from the UI worker itself (a job scheduling nested UI
+        work), the function runs inline to avoid deadlocking the worker.
+        """
+        if self.in_worker():
+            return fn(*args, **kwargs)
+        future = self.submit(
+            fn, *args, priority=priority, client_id=client_id, label=label, **kwargs
+        )
+        return future.result()
+
+    async def run_async(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: UIPriority = UIPriority.INTERACTIVE,
+        client_id: str = "local",
+        label: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Submit a job and await its result without blocking the event
+        loop.
+
+        If the awaiting task is cancelled, the job is dropped when it has
+        not started yet; otherwise its cancellation token is set so the
+        scroll and wait loops stop at their next check point.
+        """
+        token = CancellationToken()
+        future = self.submit(
+            fn,
+            *args,
+            priority=priority,
+            client_id=client_id,
+            label=label,
+            token=token,
+            **kwargs,
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            logger.info("UI job %s cancelled by its caller; stopping it", label)
+            token.cancel()
+            future.cancel()
+            raise
+
+    def idle_seconds(self) -> float:
+        """
+        Seconds since the last job other than UIPriority.IDLE work was
+        submitted or finished; 0 while such a job is queued or running.
+        """
+        with self._lock:
+            current = self._current
+            if current is not None and current.priority != UIPriority.IDLE:
+                return 0.0
+            if self._depth_locked() > self._depth_of_locked(UIPriority.IDLE):
+                return 0.0
+            return time.monotonic() - self._last_activity
+
+    def in_worker(self) -> bool:
+        return threading.current_thread() is self._worker
+
+    # -- execution --------------------------------------------------------
+
+    def run_preempting_jobs(self, priority: UIPriority) -> bool:
+        """
+        From inside a running job, run every queued job whose priority is
+        strictly more urgent than `priority`.
+
+        Returns True if at least one job ran, meaning the UI state may
+        have changed underneath the caller.
+        """
+        if not self.in_worker():
+            return False
+
+        ran = False
+        while True:
+            with self._lock:
+                job = self._pop_next_locked(more_urgent_than=priority)
+            if job is None:
+                return ran
+            outer = self._current
+            self._execute(job)
+            with self._lock:
+                self._current = outer
+            ran = True
+
+    def _preempt_idle_jobs_locked(self, job: _UIJob) -> None:
+        idle_jobs = [
+            queued
+            for jobs in self._queues[UIPriority.IDLE].values()
+            for queued in jobs
+        ]
+        current = self._current
+        if current is not None and current.priority == UIPriority.IDLE:
+            idle_jobs.append(current)
+        for idle_job in idle_jobs:
+            if idle_job.token is not None and not idle_job.token.cancelled:
+                logger.info(
+                    "Cancelling idle UI job %s for %s", idle_job.label, job.label
+                )
+                idle_job.token.cancel()
+
+    def _ensure_worker_locked(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(
+            target=self._worker_loop, name="wechat-ui-worker", daemon=True
+        )
+        self._worker.start()
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._lock:
+                job = self._pop_next_locked()
+                while job is None:
+                    self._lock.wait()
+                    job = self._pop_next_locked()
+            self._execute(job)
+            with self._lock:
+                self._current = None
+
+    def _execute(self, job: _UIJob) -> None:
+        if not job.future.set_running_or_notify_cancel():
+            logger.info("Skipping cancelled UI job %s", job.label)
+            return
+
+        started = time.monotonic()
+        wait_ms = (started - job.enqueued_at) * 1000.0
+        with self._lock:
+            self._current = job
+
+        ok = True
+        try:
+            with cancellation_scope(job.token):
+                result = job.fn(*job.args, **job.kwargs)
+        except BaseException as exc:  # noqa: BLE001
+            ok = False
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
+
+        run_ms = (time.monotonic() - started) * 1000.0
+        with self._lock:
+            if job.priority != UIPriority.IDLE:
+                self._last_activity = time.monotonic()
+            self._completed += 1
+            if not ok:
+                self._failed += 1
+            self._total_wait_ms += wait_ms
+            self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+            self._history.append(
+                UIJobRecord(
+                    label=job.label,
+                    client_id=job.client_id,
+                    priority=job.priority.name,
+                    wait_ms=round(wait_ms, 1),
+                    run_ms=round(run_ms, 1),
+                    ok=ok,
+                )
+            )
+
+        logger.info(
+            "UI job %s for client=%s finished "
+            "(priority=%s, waited %.0f ms, ran %.0f ms)",
+            job.label,
+            job.client_id,
+            job.priority.name,
+            wait_ms,
+            run_ms,
+        )
+
+    def _pop_next_locked(
+        self, more_urgent_than: UIPriority | None = None
+    ) -> _UIJob | None:
+        for priority in sorted(self._queues):
+            if more_urgent_than is not None and priority >= more_urgent_than:
+                return None
+            clients = self._queues[priority]
+            if not clients:
+                continue
+            client_id, jobs = next(iter(clients.items()))
+            job = jobs.popleft()
+            # Rotate this client to the back of the round-robin order.
+            del clients[client_id]
+            if jobs:
+                clients[client_id] = jobs
+            return job
+        return None
+
+    def _depth_locked(self) -> int:
+        return sum(
+            len(jobs) for clients in self._queues.values() for jobs in clients.values()
+        )
+
+    def _depth_of_locked(self, priority: UIPriority) -> int:
+        return sum(len(jobs) for jobs in self._queues[priority].values())
+
+    # -- metrics ----------------------------------------------------------
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Return queue depth, wait-time aggregates and the most recent job
+        records.
+        """
+        with self._lock:
+            depth_by_priority = {
+                priority.name: sum(len(jobs) for jobs in clients.values())
+                for priority, clients in self._queues.items()
+            }
+            current = self._current
+            return {
+                "busy": current is not None,
+                "current_job": current.label if current is not None else None,
+                "queue_depth": sum(depth_by_priority.values()),
+                "queue_depth_by_priority": depth_by_priority,
+                "max_queue_depth": self._max_depth,
+                "completed_jobs": self._completed,
+                "failed_jobs": self._failed,
+                "avg_wait_ms": (
+                    round(self._total_wait_ms / self._completed, 1)
+                    if self._completed
+                    else 0.0
+                ),
+                "max_wait_ms": round(self._max_wait_ms, 1),
+                "recent_jobs": [asdict(record) for record in self._history],
+            }
+
+
+ui_scheduler = UIScheduler()
@@ -1,53 +1,53 @@
 from __future__ import annotations
 
 import re
-import time
 from dataclasses import dataclass
-from typing import Any, Callable
-
-import AppKit
-from ApplicationServices import (
-    AXUIElementCreateApplication,
-    AXUIElementCopyAttributeValue,
-    AXUIElementPerformAction,
-    AXUIElementSetAttributeValue,
-    AXValueGetType,
-    AXValueGetValue,
+from typing import Any, Callable, Sequence
+
+from .ax_calls import ax_copy_attribute, ax_perform_action
+from .ax_constants import (
     kAXChildrenAttribute,
+    kAXCloseButtonAttribute,
     kAXIdentifierAttribute,
+    kAXIndexAttribute,
     kAXListRole,
     kAXPositionAttribute,
-    kAXRaiseAction,
+    kAXPressAction,
     kAXRoleAttribute,
     kAXSizeAttribute,
     kAXStaticTextRole,
     kAXTextAreaRole,
     kAXTitleAttribute,
     kAXValueAttribute,
-    kAXValueCGPointType,
-    kAXValueCGSizeType,
     kAXWindowRole,
 )
-from Quartz import (
-    CGEventCreateKeyboardEvent,
-    CGEventCreateMouseEvent,
-    CGEventCreateScrollWheelEvent,
-    CGEventPost,
-    CGEventSetFlags,
-    CGEventSetLocation,
-    CGPoint,
-    kCGEventFlagMaskCommand,
-    kCGEventLeftMouseDown,
-    kCGEventLeftMouseUp,
-    kCGHIDEventTap,
-    kCGScrollEventUnitLine,
+from .cancellation import raise_if_cancelled
+from .contact_directory import contact_directory
+from .driver import get_driver, pause
+from .logging_config import SAMPLED, logger
+from .navigation_cache import NavigationRoute, navigation_cache
+from .perf_stats import timed
+from .search_harvester import (
+    CHAT_SECTIONS,
+    SEARCH_SECTION_TITLES,
+    SearchEntry,
+    SearchResultHarvester,
+    find_exact_entry,
 )
-
-from .logging_config import logger
+from .text_entry import (
+    AX_SET,
+    DEFAULT_STRATEGIES,
+    PASTE,
+    TextEntryResult,
+    enter_text,
+    text_entry_stats,
+)
+from .timing_profile import settle, timing_profile
+from .wechat_session import WeChatSession, current_session
 
 
 def ax_get(element, attribute):
-    err, value = AXUIElementCopyAttributeValue(element, attribute, None)
+    err, value = ax_copy_attribute(element, attribute)
     if err != 0:
         return None
     return value
@@ -72,24 +72,20 @@ def dfs(element, predicate: Callable[[Any, Any, Any, Any], bool]):
     return None
 
 
+@timed("ax.get_app")
 def get_wechat_ax_app() -> Any:
     """
     Get the AX UI element representing the WeChat application and bring
     it to the foreground.
-    """
-    bundle_id = "com.tencent.xinWeChat"
-    apps = AppKit.NSRunningApplication.runningApplicationsWithBundleIdentifier_(
-        bundle_id
-    )
-    if not apps:
-        raise RuntimeError("WeChat is not running")
 
-    app = apps[0]
-    app.activateWithOptions_(AppKit.NSApplicationActivateIgnoringOtherApps)
-    logger.info(
-        "Activated WeChat (bundle_id=%s, pid=%s)", bundle_id, app.processIdentifier()
-    )
-    return AXUIElementCreateApplication(app.processIdentifier())
+    Inside a wechat_session() scope (every UI job started by the MCP
+    server) the element and the activation are shared by all helpers of
+    the tool call; outside of one, a single-use session is created.
+    """
+    session = current_session()
+    if session is None:
+        session = WeChatSession("get_wechat_ax_app")
+    return session.ax_app()
 
 
 def _find_window_by_title(ax_app: Any, title: str):
@@ -107,22 +103,76 @@ def _find_window_by_title(ax_app: Any, title: str):
     return dfs(ax_app, is_window)
 
 
+@timed("ax.wait_for_window")
 def _wait_for_window(ax_app: Any, title: str, timeout: float = 5.0):
     """
     Wait for a window with the given title to appear, returning the AX
     element or None if the timeout expires.
     """
-    end = time.time() + timeout
-    while time.time() < end:
+    end = get_driver().monotonic() + timeout
+    while get_driver().monotonic() < end:
+        raise_if_cancelled()
         window = _find_window_by_title(ax_app, title)
         if window is not None:
             logger.info("Found window %r", title)
             return window
-        time.sleep(0.1)
+        pause(0.1)
     logger.warning("Timed out waiting for window %r", title)
     return None
 
 
+def _wait_for_window_closed(ax_app: Any, title: str, timeout: float = 5.0) -> bool:
+    """
+    Wait until no window with the given title is open, returning False
+    if one is still open when the timeout expires.
+    """
+    end = get_driver().monotonic() + timeout
+    while True:
+        raise_if_cancelled()
+        if _find_window_by_title(ax_app, title) is None:
+            return True
+        if get_driver().monotonic() >= end:
+            logger.warning("Window %r still open after %.1f s", title, timeout)
+            return False
+        pause(0.05)
+
+
+def _wait_for_element(
+    root: Any,
+    predicate: Callable[[Any, Any, Any, Any], bool],
+    timeout: float = 5.0,
+):
+    """
+    Poll `root` with dfs(predicate) until a matching element appears,
+    returning it or None if the timeout expires. Used as a readiness
+    check for controls that show up some time after their window.
+    """
+    end = get_driver().monotonic() + timeout
+    while True:
+        raise_if_cancelled()
+        element = dfs(root, predicate)
+        if element is not None or get_driver().monotonic() >= end:
+            return element
+        pause(0.1)
+
+
+def _close_window(ax_app: Any, title: str) -> bool:
+    """
+    Close the window with the given title through its close button, if
+    it is open. Returns True if the window is gone afterwards.
+    """
+    window = _find_window_by_title(ax_app, title)
+    if window is None:
+        return True
+    close_button = ax_get(window, kAXCloseButtonAttribute)
+    if close_button is None:
+        logger.warning("Window %r has no close button", title)
+        return False
+    logger.info("Closing window %r", title)
+    ax_perform_action(close_button, kAXPressAction)
+    return _wait_for_window_closed(ax_app, title, timeout=2.0)
+
+
 def _normalize_chat_title(name: str) -> str:
     """
     Normalize a WeChat chat title.
@@ -137,11 +187,15 @@ def _normalize_chat_title(name: str) -> str:
     return name
 
 
-def get_current_chat_name() -> str | None:
+def get_current_chat_name(ax_app: Any | None = None) -> str | None:
     """
     Return the display name of the currently open chat, if available.
+
+    Pass an existing `ax_app` to avoid re-activating WeChat when the
+    caller already holds an application handle.
     """
-    ax_app = get_wechat_ax_app()
+    if ax_app is None:
+        ax_app = get_wechat_ax_app()
 
     def is_chat_title(el, role, title, identifier):
         return role == kAXStaticTextRole and identifier == "big_title_line_h_view"
@@ -152,16 +206,17 @@ def get_current_chat_name() -> str | None:
         return None
 
     value = ax_get(title_el, kAXValueAttribute)
+    if not (isinstance(value, str) and value.strip()):
+        value = ax_get(title_el, kAXTitleAttribute)
     if isinstance(value, str) and value.strip():
-        return _normalize_chat_title(value)
-
-    title = ax_get(title_el, kAXTitleAttribute)
-    if isinstance(title, str) and title.strip():
-        return _normalize_chat_title(title)
+        name = _normalize_chat_title(value)
+        contact_directory.add_names([name], "chat")
+        return name
 
     return None
 
 
+@timed("ax.collect_chat_elements")
 def collect_chat_elements(ax_app) -> dict[str, Any]:
     """
     Collect chat elements from the left session list keyed by display name.
@@ -183,6 +238,7 @@ def collect_chat_elements(ax_app) -> dict[str, Any]:
 
     walk(ax_app)
     logger.info("Collected %d chat elements from session list", len(results))
+    contact_directory.add_names(results, "chat")
     return results
 
 
@@ -191,7 +247,15 @@ def find_chat_element_by_name(ax_app, chat_name: str):
     Find a chat element whose name matches the given chat name exactly
     (case-sensitive and case-insensitive match are both attempted).
     """
-    chat_elements = collect_chat_elements(ax_app)
+    return lookup_chat_element(collect_chat_elements(ax_app), chat_name)
+
+
+def lookup_chat_element(chat_elements: dict[str, Any], chat_name: str):
+    """
+    Resolve a chat name against an already collected session list
+    snapshot (see collect_chat_elements), trying an exact match first
+    and then a case-insensitive one.
+    """
     if chat_name in chat_elements:
         return chat_elements[chat_name]
 
@@ -202,15 +266,30 @@ def find_chat_element_by_name(ax_app, chat_name: str):
     return None
 
 
+def _search_row_key(row) -> tuple[Any, Any]:
+    """
+    Identify a search results row by its element and its row index, since
+    a list may hand the same element out again for another result as it
+    scrolls.
+    """
+    return row, ax_get(row, kAXIndexAttribute)
+
+
+def _element_has_bounds(element) -> bool:
+    """
+    Return True when the element still reports an on-screen position
+    and size, i.e. it can be clicked.
+    """
+    point = axvalue_to_point(ax_get(element, kAXPositionAttribute))
+    size = axvalue_to_size(ax_get(element, kAXSizeAttribute))
+    return point is not None and size is not None
+
+
 def send_key_with_modifiers(keycode: int, flags: int):
-    event_down = CGEventCreateKeyboardEvent(None, keycode, True)
-    CGEventSetFlags(event_down, flags)
-    event_up = CGEventCreateKeyboardEvent(None, keycode, False)
-    CGEventSetFlags(event_up, flags)
-    CGEventPost(kCGHIDEventTap, event_down)
-    CGEventPost(kCGHIDEventTap, event_up)
+    get_driver().key_press(keycode, flags)
 
 
+@timed("input.click")
 def click_element_center(element) -> None:
     """
     Synthesize a left mouse click at the visual center of the element.
@@ -227,18 +306,23 @@ def click_element_center(element) -> None:
     cx = x + w / 2.0
     cy = y + h / 2.0
 
-    event_down = CGEventCreateMouseEvent(
-        None, kCGEventLeftMouseDown, CGPoint(cx, cy), 0
-    )
-    event_up = CGEventCreateMouseEvent(None, kCGEventLeftMouseUp, CGPoint(cx, cy), 0)
-    CGEventPost(kCGHIDEventTap, event_down)
-    CGEventPost(kCGHIDEventTap, event_up)
+    get_driver().click(cx, cy)
 
 
-def long_press_element_center(element, hold_seconds: float = 2.2) -> None:
+@timed("input.long_press")
+def long_press_element_center(
+    element,
+    hold_seconds: float = 2.2,
+    release_when: Callable[[], Any] | None = None,
+    poll_interval: float = 0.05,
+) -> Any:
     """
     Synthesize a long left mouse press at the visual center of the
     given element.
+
+    With `release_when`, the press is released as soon as that callable
+    returns a truthy value (checked every `poll_interval` seconds), with
+    `hold_seconds` as the upper bound; its last result is returned.
     """
     pos_ref = ax_get(element, kAXPositionAttribute)
     size_ref = ax_get(element, kAXSizeAttribute)
@@ -252,17 +336,23 @@ def long_press_element_center(element, hold_seconds: float = 2.2) -> None:
     cx = x + w / 2.0
     cy = y + h / 2.0
 
-    event_down = CGEventCreateMouseEvent(
-        None, kCGEventLeftMouseDown, CGPoint(cx, cy), 0
-    )
-    CGEventPost(kCGHIDEventTap, event_down)
+    driver = get_driver()
+    driver.mouse_down(cx, cy)
+    result = None
     try:
-        time.sleep(max(0.0, hold_seconds))
+        if release_when is None:
+            pause(max(0.0, hold_seconds))
+        else:
+            end = get_driver().monotonic() + hold_seconds
+            while True:
+                raise_if_cancelled()
+                result = release_when()
+                if result or get_driver().monotonic() >= end:
+                    break
+                pause(poll_interval)
     finally:
-        event_up = CGEventCreateMouseEvent(
-            None, kCGEventLeftMouseUp, CGPoint(cx, cy), 0
-        )
-        CGEventPost(kCGHIDEventTap, event_up)
+        driver.mouse_up(cx, cy)
+    return result
 
 
 def find_search_field(ax_app):
@@ -277,34 +367,49 @@ def find_search_field(ax_app):
     return search
 
 
-def focus_and_type_search(ax_app, text: str):
+def focus_and_type_search(
+    ax_app, text: str, strategies: Sequence[str] = DEFAULT_STRATEGIES
+) -> TextEntryResult:
     """
-    Focus the WeChat sidebar search field and type the given text using
-    Command+A and Command+V
+    Focus the WeChat sidebar search field and enter the given text.
+
+    The text is set through the Accessibility value first and verified
+    by reading it back; only if that does not stick is it pasted with
+    Command+A and Command+V, after which the user's pasteboard is
+    restored (see text_entry.enter_text).
     """
     search = find_search_field(ax_app)
+    return enter_text(search, text, target="search", strategies=strategies)
 
-    AXUIElementPerformAction(search, kAXRaiseAction)
 
-    # Clear any existing value via AX (best effort).
-    err = AXUIElementSetAttributeValue(search, kAXValueAttribute, "")
-    if err != 0:
-        logger.debug("Failed to clear search field via AX (err=%s)", err)
-
-    pb = AppKit.NSPasteboard.generalPasteboard()
-    pb.clearContents()
-    pb.setString_forType_(text, AppKit.NSPasteboardTypeString)
-
-    time.sleep(0.1)
+@timed("search.type_query")
+def type_search_query(ax_app, text: str) -> None:
+    """
+    Enter `text` into the global search and wait for the results list.
 
-    keycode_a = 0  # US keyboard 'A'
-    keycode_v = 9  # US keyboard 'V'
-    send_key_with_modifiers(keycode_a, kCGEventFlagMaskCommand)
-    time.sleep(0.05)
-    send_key_with_modifiers(keycode_v, kCGEventFlagMaskCommand)
+    Setting the field's value can read back fine without WeChat running
+    the search. If no results list appears within the longest
+    search_results delay after an AX value set, that success is recorded
+    as ineffective and the text is pasted instead.
+    """
+    entry = focus_and_type_search(ax_app, text)
+    found = timing_profile.settle_until(
+        "search_results", lambda: find_search_list(ax_app)
+    )
+    if found is not None or entry.strategy != AX_SET:
+        return
+    logger.info("Search did not react to the AX value set; pasting instead")
+    text_entry_stats.record_ineffective("search", AX_SET)
+    focus_and_type_search(ax_app, text, strategies=(PASTE,))
+    timing_profile.settle_until("search_results", lambda: find_search_list(ax_app))
 
 
-def open_chat_for_contact(chat_name: str) -> dict[str, Any] | None:
+@timed("navigation.open_chat")
+def open_chat_for_contact(
+    chat_name: str,
+    ax_app: Any | None = None,
+    chat_elements: dict[str, Any] | None = None,
+) -> dict[str, Any] | None:
     """
     Open a chat for a given name (contact or group).
 
@@ -315,7 +420,8 @@ def open_chat_for_contact(chat_name: str) -> dict[str, Any] | None:
     - Otherwise, prefer an exact match under the "Group Chats" section.
     - If no exact match is visible, expand "View All" for Contacts and
       Group Chats (if present) and scroll through results, looking for
-      an exact match while explicitly ignoring the "Chat History", "Official Accounts", "Internet search results", and "More" sections.
+      an exact match while explicitly ignoring the "Chat History",
+      "Official Accounts", "Internet search results", and "More" sections.
 
     If no exact match can be found, this function does **not** fall back
     to the top search result. Instead, it returns a dict of the form:
@@ -330,26 +436,63 @@ def open_chat_for_contact(chat_name: str) -> dict[str, Any] | None:
     }
 
     Callers can use this to ask the LLM to choose a more specific target.
+
+    Batch callers may pass an existing `ax_app` and a `chat_elements`
+    snapshot from collect_chat_elements to skip re-activating WeChat and
+    re-walking the session list. If a row from the snapshot can no longer
+    be clicked (e.g. the list was re-rendered), the session list is
+    collected again once before falling back to global search.
+
+    The route that opened each chat is remembered in the navigation
+    cache. When a chat is not in the session list and was last opened
+    from a search section, that section is checked first (expanding it if
+    needed) without scrolling; a route that no longer finds the chat is
+    demoted and the full search runs as before.
     """
     logger.info("Opening chat for name: %s", chat_name)
-    ax_app = get_wechat_ax_app()
+    if ax_app is None:
+        ax_app = get_wechat_ax_app()
+
+    known = navigation_cache.best_route(chat_name)
+    known_search_route = known is not None and known.route != "session_list"
+    # The session list is always checked first: reading its visible rows
+    # is cheap, and a chat opened from search before usually sits near
+    # its top afterwards.
+    if chat_elements is None:
+        element = find_chat_element_by_name(ax_app, chat_name)
+    else:
+        element = lookup_chat_element(chat_elements, chat_name)
+        if element is not None and not _element_has_bounds(element):
+            logger.info("Cached session row for %s is stale; re-collecting", chat_name)
+            element = find_chat_element_by_name(ax_app, chat_name)
 
-    element = find_chat_element_by_name(ax_app, chat_name)
     if element is not None:
         logger.info("Found chat in session list, clicking center")
         click_element_center(element)
-        time.sleep(0.3)
+        navigation_cache.record_success(chat_name, "session_list")
+        contact_directory.add_names([chat_name], "chat")
+        _settle_until_chat_open("session_click", ax_app, chat_name)
         return
+    if known is not None and known.route == "session_list":
+        navigation_cache.record_failure(chat_name, "session_list")
 
     logger.info("Chat not in session list, using global search")
-    focus_and_type_search(ax_app, chat_name)
-    time.sleep(0.4)
+    type_search_query(ax_app, chat_name)
 
     try:
-        found, candidates = _select_contact_from_search_results(ax_app, chat_name)
-        if found:
+        if known_search_route:
+            match = _open_via_known_search_route(ax_app, chat_name, known)
+            if match is not None:
+                _record_search_match(chat_name, match)
+                _settle_until_chat_open("chat_open", ax_app, chat_name)
+                return None
+            navigation_cache.record_failure(chat_name, known.route)
+
+        match, candidates = _select_contact_from_search_results(ax_app, chat_name)
+        if match is not None:
             logger.info("Opened chat for %s via search results", chat_name)
-            time.sleep(0.4)
+            _record_search_match(chat_name, match)
+            _settle_until_chat_open("chat_open", ax_app, chat_name)
             return None
 
         logger.info(
@@ -372,7 +515,7 @@ def open_chat_for_contact(chat_name: str) -> dict[str, Any] | None:
         return {
             "error": error_msg,
             "chat_name": chat_name,
-            "candidates": candidates,
+            "candidates": _merge_directory_candidates(chat_name, candidates),
         }
     except Exception as exc:
         logger.exception(
@@ -383,16 +526,24 @@ def open_chat_for_contact(chat_name: str) -> dict[str, Any] | None:
         raise
 
 
-def get_search_list(ax_app):
+@timed("search.find_list")
+def find_search_list(ax_app):
     """
     Return the AX list that contains global search results in the
-    left sidebar (identifier: 'search_list').
+    left sidebar (identifier: 'search_list'), or None if it is not shown.
     """
 
     def is_search_list(el, role, title, identifier):
         return role == kAXListRole and identifier == "search_list"
 
-    search_list = dfs(ax_app, is_search_list)
+    return dfs(ax_app, is_search_list)
+
+
+def get_search_list(ax_app):
+    """
+    Like find_search_list, but raise if the results list is missing.
+    """
+    search_list = find_search_list(ax_app)
     if search_list is None:
         raise RuntimeError(
             "Could not find WeChat search results list via Accessibility API"
@@ -401,17 +552,31 @@ def get_search_list(ax_app):
 
 
 @dataclass
-class SearchEntry:
+class SearchMatch:
+    """
+    An exact match in the search results: its section ("Contacts" or
+    "Group Chats") and its position among that section's entries.
+    """
+
     element: Any
-    text: str
-    y: float
+    section: str
+    index: int
+
+
+# Navigation cache route names for the sections a chat can be opened from.
+SECTION_ROUTES = {"Contacts": "contacts", "Group Chats": "group_chats"}
+
+# The compact search popover shows this many results per section before
+# "View All" has to be clicked.
+COMPACT_SECTION_ROWS = 3
 
 
 def _collect_search_entries(search_list) -> list[SearchEntry]:
     """
-    Collect visible static-text entries from the search results list,
-    including section headers, result cards and "View All"/"Collapse"
-    rows. Entries are sorted by vertical (Y) position.
+    Collect visible static-text entries from the search results list (or
+    from one of its rows), including section headers, result cards and
+    "View All"/"Collapse" rows. Entries are sorted by vertical (Y)
+    position.
     """
     entries: list[SearchEntry] = []
 
@@ -444,19 +609,13 @@ def _collect_search_entries(search_list) -> list[SearchEntry]:
 
 def _build_section_headers(entries: list[SearchEntry]) -> dict[str, float]:
     """
-    Map known section titles ("Contacts", "Group Chats", "Chat History", "Official Accounts", "Internet search results", "More")
-    to their vertical Y coordinate within the search list.
+    Map known section titles ("Contacts", "Group Chats", "Chat History",
+    "Official Accounts", "Internet search results", "More") to their
+    vertical Y coordinate within the search list.
     """
     headers: dict[str, float] = {}
     for entry in entries:
-        if entry.text in (
-            "Contacts",
-            "Group Chats",
-            "Chat History",
-            "Official Accounts",
-            "Internet search results",
-            "More",
-        ):
+        if entry.text in SEARCH_SECTION_TITLES:
             headers[entry.text] = entry.y
     return headers
 
@@ -475,78 +634,39 @@ def _classify_section(entry: SearchEntry, headers: dict[str, float]) -> str | No
     return section
 
 
-def _find_exact_match_in_entries(entries: list[SearchEntry], contact_name: str):
+def _locate_exact_match(
+    entries: list[SearchEntry],
+    contact_name: str,
+    sections: tuple[str, ...] = ("Contacts", "Group Chats"),
+) -> SearchMatch | None:
     """
-    Look for an exact match in the current snapshot of search results.
-
-    Preference order:
-    - Exact match under "Contacts"
-    - Exact match under "Group Chats"
-
-    Entries classified as "Chat History", "Official Accounts", "Internet search results", or "More" are ignored.
+    Look for an exact match in the current snapshot of search results,
+    considering only `sections` in order of preference (by default an
+    exact match under "Contacts", then under "Group Chats"), and report
+    where it was found.
     """
     target = contact_name.strip()
     headers = _build_section_headers(entries)
 
-    contact_element = None
-    group_element = None
-
+    matches: dict[str, SearchMatch] = {}
+    positions: dict[str, int] = {}
     for entry in entries:
-        if entry.text != target:
+        if entry.text in SEARCH_SECTION_TITLES:
             continue
         section = _classify_section(entry, headers)
-        if section == "Contacts" and contact_element is None:
-            contact_element = entry.element
-        elif section == "Group Chats" and group_element is None:
-            group_element = entry.element
-
-    if contact_element is not None:
-        return contact_element
-    if group_element is not None:
-        return group_element
-    return None
-
-
-def _summarize_search_candidates(
-    entries: list[SearchEntry],
-) -> dict[str, list[str]]:
-    """
-    Summarize candidate names from search entries, grouped by section.
-
-    Returns up to 15 unique names from each of:
-    - "Contacts"
-    - "Group Chats"
-
-    Entries belonging to "Chat History", "Official Accounts", "Internet search results", or "More" are ignored.
-    """
-    headers = _build_section_headers(entries)
-    contacts: list[str] = []
-    group_chats: list[str] = []
-
-    for entry in entries:
-        # Skip section headers themselves.
-        if entry.text in (
-            "Contacts",
-            "Group Chats",
-            "Chat History",
-            "Official Accounts",
-            "Internet search results",
-            "More",
-        ):
+        if section not in sections:
             continue
-
-        section = _classify_section(entry, headers)
-        if section == "Contacts":
-            if entry.text not in contacts:
-                contacts.append(entry.text)
-        elif section == "Group Chats":
-            if entry.text not in group_chats:
-                group_chats.append(entry.text)
-
-    return {
-        "contacts": contacts[:15],
-        "group_chats": group_chats[:15],
-    }
+        if entry.text.startswith(("View All", "Collapse")):
+            continue
+        index = positions.get(section, 0)
+        positions[section] = index + 1
+        if entry.text == target and section not in matches:
+            matches[section] = SearchMatch(entry.element, section, index)
+
+    for section in sections:
+        if section in matches:
+            return matches[section]
+    return None
 
 
 def _expand_section_if_needed(search_list, section_title: str) -> None:
@@ -566,112 +686,214 @@ def _expand_section_if_needed(search_list, section_title: str) -> None:
         if section == section_title:
             logger.info("Expanding %s section via %r", section_title, entry.text)
             click_element_center(entry.element)
-            time.sleep(0.3)
+            timing_profile.settle_until(
+                "section_expand", lambda: _view_all_clicked(search_list, entry.text)
+            )
             return
 
 
+def _settle_until_chat_open(delay: str, ax_app, chat_name: str) -> None:
+    """
+    Wait the delay `delay` until the title of the open chat is `chat_name`.
+    """
+    timing_profile.settle_until(
+        delay, lambda: get_current_chat_name(ax_app) == chat_name
+    )
+
+
+def _view_all_clicked(search_list, view_all_text: str) -> bool:
+    """
+    Whether the "View All" row that was clicked has been replaced.
+    """
+    texts = [entry.text for entry in _collect_search_entries(search_list)]
+    return view_all_text not in texts
+
+
+def _record_search_match(chat_name: str, match: SearchMatch) -> None:
+    navigation_cache.record_success(
+        chat_name, SECTION_ROUTES[match.section], result_index=match.index
+    )
+    kind = "group" if match.section == "Group Chats" else "contact"
+    contact_directory.add_names([chat_name], kind)
+
+
+def _merge_directory_candidates(
+    chat_name: str, candidates: dict[str, list[str]]
+) -> dict[str, list[str]]:
+    """
+    Top up the candidates seen in the search results with similar names
+    from the contact directory (e.g. chats seen earlier that this search
+    did not show), keeping at most 15 per section.
+    """
+    suggested = contact_directory.suggest_candidates(chat_name)
+    merged: dict[str, list[str]] = {}
+    for section in ("contacts", "group_chats"):
+        names = list(candidates.get(section, []))
+        for name in suggested[section]:
+            if len(names) >= 15:
+                break
+            if name not in names:
+                names.append(name)
+        merged[section] = names
+    return merged
+
+
+def _open_via_known_search_route(
+    ax_app, contact_name: str, route: NavigationRoute
+) -> SearchMatch | None:
+    """
+    Look for `contact_name` only in the search section that opened it
+    last time, expanding that section when the remembered result index
+    is beyond the compact popover. Never scrolls; returns None when the
+    chat is not visible so that the caller can fall back to the full
+    search.
+    """
+    section = next(
+        title for title, name in SECTION_ROUTES.items() if name == route.route
+    )
+    search_list = get_search_list(ax_app)
+    expanded = False
+    if route.result_index is not None and route.result_index >= COMPACT_SECTION_ROWS:
+        _expand_section_if_needed(search_list, section)
+        expanded = True
+
+    entries = _collect_search_entries(search_list)
+    match = _locate_exact_match(entries, contact_name, sections=(section,))
+    if match is None and not expanded:
+        _expand_section_if_needed(search_list, section)
+        entries = _collect_search_entries(search_list)
+        match = _locate_exact_match(entries, contact_name, sections=(section,))
+
+    if match is None:
+        logger.info(
+            "Known route %s did not find %s; falling back to full search",
+            route.route,
+            contact_name,
+        )
+        return None
+
+    logger.info(
+        "Opening %s via known route %s (result %d)",
+        contact_name,
+        route.route,
+        match.index,
+    )
+    click_element_center(match.element)
+    return match
+
+
+@timed("search.select_result")
 def _select_contact_from_search_results(
     ax_app, contact_name: str
-) -> tuple[bool, dict[str, list[str]]]:
+) -> tuple[SearchMatch | None, dict[str, list[str]]]:
     """
     Try to open a chat by selecting an exact match from the global
     search results list, preferring Contacts over Group Chats and
-    ignoring the Chat History, Official Accounts, "Internet search results", and More sections.
+    ignoring the Chat History, Official Accounts, "Internet search
+    results", and More sections.
+
+    Returns the match that was clicked (or None) plus the candidate
+    names collected along the way.
     """
     search_list = get_search_list(ax_app)
+    harvester = SearchResultHarvester(
+        lambda: ax_get(search_list, kAXChildrenAttribute) or [],
+        _collect_search_entries,
+        row_key=_search_row_key,
+    )
+    seen: dict[str, dict[str, None]] = {section: {} for section in CHAT_SECTIONS}
 
-    aggregated_contacts: set[str] = set()
-    aggregated_groups: set[str] = set()
+    def candidates() -> dict[str, list[str]]:
+        return {
+            "contacts": list(seen["Contacts"])[:15],
+            "group_chats": list(seen["Group Chats"])[:15],
+        }
 
-    def update_candidates(entries: list[SearchEntry]) -> None:
-        partial = _summarize_search_candidates(entries)
-        aggregated_contacts.update(partial["contacts"])
-        aggregated_groups.update(partial["group_chats"])
+    def harvest_and_match() -> SearchMatch | None:
+        entries = harvester.harvest()
+        for entry in entries:
+            if entry.section in seen:
+                seen[entry.section][entry.text] = None
+        contact_directory.add_names(
+            [e.text for e in entries if e.section == "Contacts"], "contact"
+        )
+        contact_directory.add_names(
+            [e.text for e in entries if e.section == "Group Chats"], "group"
+        )
+        found = find_exact_entry(entries, contact_name)
+        if found is None:
+            return None
+        click_element_center(found.element)
+        return SearchMatch(found.element, found.section, found.index)
 
     # First, inspect the initial compact search popover without scrolling.
-    entries = _collect_search_entries(search_list)
-    update_candidates(entries)
-    element = _find_exact_match_in_entries(entries, contact_name)
-    if element is not None:
+    match = harvest_and_match()
+    if match is not None:
         logger.info("Found exact match for %s in initial search results", contact_name)
-        click_element_center(element)
-        return True, {
-            "contacts": list(aggregated_contacts)[:15],
-            "group_chats": list(aggregated_groups)[:15],
-        }
+        return match, candidates()
 
     # No exact match visible yet; expand Contacts and Group Chats if possible.
     _expand_section_if_needed(search_list, "Contacts")
     _expand_section_if_needed(search_list, "Group Chats")
+    harvester.forget_rows()
 
     center = get_list_center(search_list)
-    last_bottom_text = None
     stable = 0
 
-    # Scroll through the expanded search list, looking for an
-    # exact match under Contacts/Group Chats, while aggregating
-    # candidate names from Contacts and Group Chats.
+    # Scroll through the expanded search list, reading only rows that
+    # scrolled into view, until an exact match under Contacts/Group Chats
+    # shows up, the list is past those sections, or it stops moving.
     for _ in range(80):
-        entries = _collect_search_entries(search_list)
-        update_candidates(entries)
-
-        element = _find_exact_match_in_entries(entries, contact_name)
-        if element is not None:
+        raise_if_cancelled()
+        rows_before = harvester.rows_read
+        match = harvest_and_match()
+        if match is not None:
             logger.info(
                 "Found exact match for %s while scrolling search results",
                 contact_name,
             )
-            click_element_center(element)
-            return True, {
-                "contacts": list(aggregated_contacts)[:15],
-                "group_chats": list(aggregated_groups)[:15],
-            }
-
-        children = ax_get(search_list, kAXChildrenAttribute) or []
-        texts: list[str] = []
-        for child in children:
-            txt = ax_get(child, kAXValueAttribute) or ax_get(child, kAXTitleAttribute)
-            if isinstance(txt, str) and txt.strip():
-                texts.append(txt)
+            return match, candidates()
 
-        if not texts:
+        if harvester.past_sections():
+            logger.info(
+                "Search results scrolled past Contacts/Group Chats (now in %s)",
+                harvester.current_section,
+            )
             break
 
-        new_last = texts[-1]
-        if new_last == last_bottom_text:
+        if harvester.rows_read == rows_before:
             stable += 1
             if stable >= 3:
                 break
         else:
-            last_bottom_text = new_last
             stable = 0
 
+        logger.debug(
+            "Search harvest for %s: %d rows read, now in %s",
+            contact_name,
+            harvester.rows_read,
+            harvester.current_section,
+            extra=SAMPLED,
+        )
         # Negative delta scrolls downwards through the search results list.
         post_scroll(center, -80)
-        time.sleep(0.1)
+        settle("scroll_step")
 
-    return False, {
-        "contacts": list(aggregated_contacts)[:15],
-        "group_chats": list(aggregated_groups)[:15],
-    }
+    logger.info(
+        "Search harvest for %s read %d rows over %d snapshots",
+        contact_name,
+        harvester.rows_read,
+        harvester.snapshots,
+    )
+    return None, candidates()
 
 
 def axvalue_to_point(ax_value):
-    if ax_value is None or AXValueGetType(ax_value) != kAXValueCGPointType:
-        return None
-    ok, cg_point = AXValueGetValue(ax_value, kAXValueCGPointType, None)
-    if not ok:
-        return None
-    return float(cg_point.x), float(cg_point.y)
+    return get_driver().point_value(ax_value)
 
 
 def axvalue_to_size(ax_value):
-    if ax_value is None or AXValueGetType(ax_value) != kAXValueCGSizeType:
-        return None
-    ok, cg_size = AXValueGetValue(ax_value, kAXValueCGSizeType, None)
-    if not ok:
-        return None
-    return float(cg_size.width), float(cg_size.height)
+    return get_driver().size_value(ax_value)
 
 
 def get_list_center(msg_list):
@@ -691,6 +913,7 @@ def get_list_center(msg_list):
     return x + w / 2.0, y + h / 2.0
 
 
+@timed("input.scroll")
 def post_scroll(center, delta_lines: int) -> None:
     """
     Post a scroll-wheel event at the given screen position.
@@ -700,6 +923,4 @@ def post_scroll(center, delta_lines: int) -> None:
     - Negative delta_lines scrolls towards newer content (downwards in history).
     """
     cx, cy = center
-    event = CGEventCreateScrollWheelEvent(None, kCGScrollEventUnitLine, 1, delta_lines)
-    CGEventSetLocation(event, CGPoint(cx, cy))
-    CGEventPost(kCGHIDEventTap, event)
+    get_driver().scroll(cx, cy, delta_lines)
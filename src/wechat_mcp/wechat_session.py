@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from .driver import RunningApp, get_driver
+from .logging_config import logger
+
+WECHAT_BUNDLE_ID = "com.tencent.xinWeChat"
+
+# AX application elements stay valid for the lifetime of the process they
+# were created for, so they are shared across sessions keyed by pid.
+_ax_apps: dict[int, Any] = {}
+_lock = threading.Lock()
+_totals = {"sessions": 0, "activations": 0, "skipped_activations": 0}
+_recent: deque[dict[str, Any]] = deque(maxlen=50)
+
+
+def _find_running_wechat() -> RunningApp:
+    running = get_driver().running_application(WECHAT_BUNDLE_ID)
+    if running is None:
+        raise RuntimeError("WeChat is not running")
+    return running
+
+
+def _ax_app_for_pid(pid: int) -> Any:
+    with _lock:
+        ax_app = _ax_apps.get(pid)
+        if ax_app is None:
+            # A different pid means WeChat was restarted; old handles are dead.
+            _ax_apps.clear()
+            ax_app = get_driver().application_element(pid)
+            _ax_apps[pid] = ax_app
+        return ax_app
+
+
+class WeChatSession:
+    """
+    Handle on the running WeChat app for the duration of one tool call.
+
+    The pid is resolved and the AX application element looked up the
+    first time ax_app() is called; later calls within the same session
+    return the same element without querying NSRunningApplication again.
+    WeChat is brought to the front at most once per session, and not at
+    all when it is already the frontmost app.
+    """
+
+    def __init__(self, label: str = "ui_job") -> None:
+        self.label = label
+        self.pid: int | None = None
+        self.activations = 0
+        self.skipped_activations = 0
+        self.app_lookups = 0
+        self._ax_app: Any = None
+
+    def ax_app(self) -> Any:
+        self.app_lookups += 1
+        if self._ax_app is None:
+            running = _find_running_wechat()
+            self.pid = running.pid
+            self._ax_app = _ax_app_for_pid(self.pid)
+            self._activate(running)
+        return self._ax_app
+
+    def _activate(self, running: RunningApp) -> None:
+        if running.is_active():
+            self.skipped_activations += 1
+            with _lock:
+                _totals["skipped_activations"] += 1
+            logger.debug("WeChat already frontmost (pid=%s)", self.pid)
+            return
+        running.activate()
+        self.activations += 1
+        with _lock:
+            _totals["activations"] += 1
+        logger.info(
+            "Activated WeChat (bundle_id=%s, pid=%s)", WECHAT_BUNDLE_ID, self.pid
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "label": self.label,
+            "pid": self.pid,
+            "activations": self.activations,
+            "skipped_activations": self.skipped_activations,
+            "app_lookups": self.app_lookups,
+        }
+
+
+_state = threading.local()
+
+
+def current_session() -> WeChatSession | None:
+    """
+    Return the session of the tool call running on this thread, if any.
+    """
+    return getattr(_state, "session", None)
+
+
+@contextmanager
+def wechat_session(label: str = "ui_job") -> Iterator[WeChatSession]:
+    """
+    Make a WeChatSession current for the duration of the block.
+
+    Nested scopes (a job running other UI work inline) reuse the outer
+    session so that WeChat is still activated only once.
+    """
+    session = current_session()
+    if session is not None:
+        yield session
+        return
+
+    session = WeChatSession(label)
+    _state.session = session
+    try:
+        yield session
+    finally:
+        _state.session = None
+        with _lock:
+            _totals["sessions"] += 1
+            _recent.append(session.to_dict())
+        logger.info(
+            "WeChat session %s: activations=%d, skipped=%d, app lookups=%d",
+            label,
+            session.activations,
+            session.skipped_activations,
+            session.app_lookups,
+        )
+
+
+def activation_stats() -> dict[str, Any]:
+    """
+    Return totals over all finished sessions since the server started,
+    plus the per-session counts of the most recent ones.
+    """
+    with _lock:
+        return {**_totals, "recent_sessions": list(_recent)}
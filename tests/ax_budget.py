@@ -0,0 +1,61 @@
+"""
+Helpers for asserting that a tool stays within its AX call budget.
+
+Budgets are regression baselines kept in ax_budgets.json next to this
+file: for each scenario, the maximum number of attribute reads ("copy"),
+attribute writes ("set") and actions ("perform"). Run the budget tests
+with WECHAT_MCP_UPDATE_AX_BUDGETS=1 to rewrite the baselines after an
+intentional change, and review the diff.
+
+The calls are counted on every thread, so that a tool call whose UI
+work runs on the UI worker is measured as a whole.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from wechat_mcp.ax_call_stats import CALL_KINDS, ax_call_accounting
+
+BUDGETS_PATH = Path(__file__).with_name("ax_budgets.json")
+
+
+def _load_budgets() -> dict[str, dict[str, int]]:
+    with BUDGETS_PATH.open(encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _update_budget(name: str, counts: dict[str, Any]) -> None:
+    budgets = _load_budgets()
+    budgets[name] = {kind: counts[kind]["total"] for kind in CALL_KINDS}
+    with BUDGETS_PATH.open("w", encoding="utf-8") as fh:
+        json.dump(dict(sorted(budgets.items())), fh, indent=2)
+        fh.write("\n")
+
+
+@contextmanager
+def within_ax_budget(name: str) -> Iterator[None]:
+    """
+    Count the AX calls made while the block runs and assert that none of
+    the per-kind totals exceeds the budget recorded for `name`.
+    """
+    ax_call_accounting.reset()
+    yield
+    counts = ax_call_accounting.stats()["totals"]
+
+    if os.getenv("WECHAT_MCP_UPDATE_AX_BUDGETS"):
+        _update_budget(name, counts)
+        return
+
+    budget = _load_budgets().get(name)
+    assert budget is not None, f"No AX call budget recorded for {name!r}"
+    for kind in CALL_KINDS:
+        used = counts[kind]["total"]
+        assert used <= budget[kind], (
+            f"{name}: {used} AX {kind} calls, budget is {budget[kind]}; "
+            f"by name: {counts[kind]['by_name']}"
+        )
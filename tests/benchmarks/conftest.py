@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+from typing import Any
+
+import pytest
+
+from wechat_mcp.add_contact_batch import AddContactCheckpoint
+from wechat_mcp.driver import use_driver
+from wechat_mcp.read_cache import read_cache
+from wechat_mcp.send_rate_limiter import SendRateLimiter
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+
+# Sizes of a heavily used account: a long-running chat and a full
+# address book.
+HISTORY_MESSAGES = 10_000
+CONTACTS = 3_000
+GROUPS = 200
+SESSIONS = 300
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.log_messages: list[dict[str, Any]] = []
+
+    async def send_log_message(self, **kwargs: Any) -> None:
+        self.log_messages.append(kwargs)
+
+
+class FakeContext:
+    """
+    The parts of the MCP request context the streaming tools use.
+    """
+
+    client_id = "benchmark"
+    request_id = "benchmark-request"
+
+    def __init__(self) -> None:
+        self.session = FakeSession()
+        self.progress: list[dict[str, Any]] = []
+
+    async def report_progress(self, **kwargs: Any) -> None:
+        self.progress.append(kwargs)
+
+
+@pytest.fixture(scope="session")
+def wechat() -> SimulatedWeChat:
+    sim = SimulatedWeChat(
+        contacts=CONTACTS, groups=GROUPS, sessions=SESSIONS, messages=40
+    )
+    # The open chat and one reached only through search both carry the
+    # long history.
+    sim.set_history(sim.current, HISTORY_MESSAGES)
+    sim.set_history(sim.contact_names[-1], HISTORY_MESSAGES)
+    return sim
+
+
+@pytest.fixture(scope="session")
+def driver(wechat: SimulatedWeChat) -> SimulatorDriver:
+    latency_ms = float(os.getenv("WECHAT_MCP_SIM_LATENCY_MS", "0"))
+    return SimulatorDriver(wechat, ipc_latency=latency_ms / 1000.0)
+
+
+@pytest.fixture(autouse=True)
+def simulated_server(monkeypatch, tmp_path, driver):
+    """
+    Run the tools against the simulator with persistent state in a
+    temporary directory and without send rate limits, so that every
+    round does the same UI work.
+    """
+    from wechat_mcp import mcp_server
+
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    unlimited = SendRateLimiter(0, 0, 0, 0, persist=False)
+    monkeypatch.setattr(mcp_server, "send_rate_limiter", unlimited)
+    monkeypatch.setattr(mcp_server.send_queue, "limiter", unlimited)
+    with use_driver(driver):
+        yield
+
+
+@pytest.fixture
+def fresh_round(monkeypatch):
+    """
+    Setup for benchmark.pedantic: forget cached reads and batch
+    checkpoints before each round.
+    """
+    from wechat_mcp import mcp_server
+
+    def setup() -> None:
+        read_cache.clear()
+        monkeypatch.setattr(
+            mcp_server,
+            "add_contact_checkpoint",
+            AddContactCheckpoint(persist=False),
+        )
+
+    return setup
+
+
+@pytest.fixture
+def ctx() -> FakeContext:
+    return FakeContext()
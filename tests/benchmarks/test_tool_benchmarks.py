@@ -0,0 +1,160 @@
+"""
+End-to-end benchmarks of every MCP tool against the simulated WeChat
+(see conftest.py for the sizes). Run with
+
+    WECHAT_MCP_SIM_LATENCY_MS=2 pytest tests/benchmarks --benchmark-only
+
+to add a fixed Accessibility IPC latency to every AX call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("mcp")
+
+from wechat_mcp import mcp_server  # noqa: E402
+
+ROUNDS = 5
+
+_ids = itertools.count()
+
+
+def test_fetch_messages_open_chat(benchmark, wechat, fresh_round) -> None:
+    chat_name = wechat.current
+    result = benchmark.pedantic(
+        lambda: asyncio.run(mcp_server.fetch_messages_by_chat(chat_name, last_n=50)),
+        setup=fresh_round,
+        rounds=ROUNDS,
+    )
+    assert len(result) == 50 and "error" not in result[0]
+
+
+def test_fetch_messages_via_search(benchmark, wechat, fresh_round) -> None:
+    chat_name = wechat.contact_names[-1]
+
+    def fetch():
+        # Leave the chat so that every round navigates to it again.
+        wechat.open_chat(wechat.sessions[1])
+        return asyncio.run(mcp_server.fetch_messages_by_chat(chat_name, last_n=50))
+
+    result = benchmark.pedantic(fetch, setup=fresh_round, rounds=ROUNDS)
+    assert len(result) == 50 and "error" not in result[0]
+
+
+def test_fetch_messages_for_chats(benchmark, wechat, fresh_round, ctx) -> None:
+    chats = wechat.visible_sessions()[:3] + [wechat.contact_names[1234]]
+    result = benchmark.pedantic(
+        lambda: asyncio.run(
+            mcp_server.fetch_messages_for_chats(chats, ctx=ctx, last_n=20)
+        ),
+        setup=fresh_round,
+        rounds=ROUNDS,
+    )
+    assert all("messages" in item for item in result)
+
+
+def test_list_unread_chats(benchmark, fresh_round) -> None:
+    result = benchmark.pedantic(
+        lambda: asyncio.run(mcp_server.list_unread_chats(include_read=True)),
+        setup=fresh_round,
+        rounds=ROUNDS,
+    )
+    assert result and "error" not in result[0]
+
+
+def test_reply_to_messages_by_chat(benchmark, wechat, fresh_round) -> None:
+    chat_name = wechat.contact_names[2000]
+    result = benchmark.pedantic(
+        lambda: asyncio.run(
+            mcp_server.reply_to_messages_by_chat(
+                chat_name, f"benchmark reply {next(_ids)}"
+            )
+        ),
+        setup=fresh_round,
+        rounds=ROUNDS,
+    )
+    assert result.get("delivery_status") == "sent"
+
+
+def test_send_messages(benchmark, wechat, fresh_round) -> None:
+    chats = [wechat.contact_names[2100], wechat.group_names[150]]
+
+    def send():
+        messages = [
+            {"chat_name": chat_name, "text": f"benchmark batch {next(_ids)}"}
+            for chat_name in chats
+            for _ in range(3)
+        ]
+        return asyncio.run(mcp_server.send_messages(messages))
+
+    result = benchmark.pedantic(send, setup=fresh_round, rounds=ROUNDS)
+    assert all(status["sent"] for status in result)
+
+
+def test_add_contact_by_wechat_id(benchmark, fresh_round) -> None:
+    result = benchmark.pedantic(
+        lambda: asyncio.run(
+            mcp_server.add_contact_by_wechat_id(
+                f"wxid_bench_{next(_ids)}", remark="Benchmark", hide_my_posts=True
+            )
+        ),
+        setup=fresh_round,
+        rounds=ROUNDS,
+    )
+    assert "error" not in result
+
+
+def test_add_contacts_by_wechat_ids(benchmark, fresh_round, ctx) -> None:
+    def add():
+        ids = [f"wxid_batch_{next(_ids)}" for _ in range(5)]
+        return asyncio.run(mcp_server.add_contacts_by_wechat_ids(ids, ctx=ctx))
+
+    result = benchmark.pedantic(add, setup=fresh_round, rounds=ROUNDS)
+    assert all("error" not in item for item in result)
+
+
+def test_publish_moment_without_media(benchmark, fresh_round) -> None:
+    result = benchmark.pedantic(
+        lambda: asyncio.run(
+            mcp_server.publish_moment_without_media(f"Moment {next(_ids)}")
+        ),
+        setup=fresh_round,
+        rounds=ROUNDS,
+    )
+    assert result.get("posted") is True
+
+
+def test_publish_moments(benchmark, fresh_round) -> None:
+    result = benchmark.pedantic(
+        lambda: asyncio.run(
+            mcp_server.publish_moments([f"Batch moment {next(_ids)}" for _ in range(3)])
+        ),
+        setup=fresh_round,
+        rounds=ROUNDS,
+    )
+    assert all(item.get("posted") for item in result)
+
+
+def test_search_contacts(benchmark, wechat) -> None:
+    # Fill the directory the way a search-heavy session would.
+    asyncio.run(mcp_server.fetch_messages_by_chat(wechat.contact_names[-1], 10))
+    result = benchmark(mcp_server.search_contacts, "Li", limit=15)
+    assert result["matches"]
+
+
+def test_stats_tools(benchmark) -> None:
+    def stats():
+        return (
+            mcp_server.get_ui_queue_stats(),
+            mcp_server.get_performance_stats(),
+            mcp_server.get_read_cache_stats(),
+            mcp_server.get_send_queue_status(),
+        )
+
+    ui_queue, performance, read_cache_stats, send_queue = benchmark(stats)
+    assert "stages" in performance and "limits" in send_queue
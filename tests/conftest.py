@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+import pytest
+
+# The server logger is configured when wechat_mcp is first imported and
+# writes to logs/ under the working directory by default; keep test runs
+# from creating it in the checkout.
+os.environ.setdefault(
+    "WECHAT_MCP_LOG_DIR", os.path.join(tempfile.gettempdir(), "wechat_mcp_test_logs")
+)
+
+from wechat_mcp import (
+    calibrate_timing_utils,
+    fetch_messages_by_chat_utils,
+    text_entry,
+    wechat_accessibility,
+)
+from wechat_mcp.contact_directory import ContactDirectory
+from wechat_mcp.driver import use_driver
+from wechat_mcp.navigation_cache import NavigationCache
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+from wechat_mcp.timing_profile import TimingProfile
+from wechat_mcp.wechat_session import wechat_session
+
+
+@pytest.fixture
+def state_dir(monkeypatch, tmp_path):
+    """
+    Point the state directory at an empty temporary one and give the UI
+    flows freshly constructed persistent caches (learned navigation
+    routes, the contact directory and the timing profile). Tests then
+    neither see state left by earlier tests or real runs nor write to
+    ~/.wechat_mcp.
+    """
+    path = tmp_path / "state"
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(path))
+    monkeypatch.setattr(wechat_accessibility, "navigation_cache", NavigationCache())
+    monkeypatch.setattr(wechat_accessibility, "contact_directory", ContactDirectory())
+    profile = TimingProfile()
+    for module in (wechat_accessibility, calibrate_timing_utils):
+        monkeypatch.setattr(module, "timing_profile", profile)
+    for module in (wechat_accessibility, fetch_messages_by_chat_utils, text_entry):
+        monkeypatch.setattr(module, "settle", profile.settle)
+    return path
+
+
+@pytest.fixture
+def wechat(state_dir):
+    """
+    A simulated WeChat with a mid-sized address book, driven inside one
+    session.
+    """
+    sim = SimulatedWeChat(contacts=500, groups=40, sessions=60, messages=40)
+    with use_driver(SimulatorDriver(sim)), wechat_session("test"):
+        yield sim
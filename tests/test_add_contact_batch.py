@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp import add_contact_by_wechat_id_utils as add_contact_utils
+from wechat_mcp.add_contact_batch import (
+    AddContactCheckpoint,
+    batch_key,
+    normalize_add_contact_requests,
+)
+from wechat_mcp.add_contact_by_wechat_id_utils import add_contacts_by_wechat_ids
+from wechat_mcp.cancellation import (
+    CancellationToken,
+    OperationCancelled,
+    cancellation_scope,
+)
+
+DEFAULTS = {"friending_msg": "Hi", "privacy": "all", "hide_my_posts": False}
+
+
+def test_entries_override_defaults_per_id() -> None:
+    requests = normalize_add_contact_requests(
+        [" alice ", {"wechat_id": "bob", "remark": "Bob", "privacy": "chats_only"}],
+        DEFAULTS,
+    )
+
+    assert [r.wechat_id for r in requests] == ["alice", "bob"]
+    assert requests[0].options["friending_msg"] == "Hi"
+    assert requests[0].options["remark"] is None
+    assert requests[1].options["remark"] == "Bob"
+    assert requests[1].options["privacy"] == "chats_only"
+    assert requests[1].options["hide_their_posts"] is False
+
+
+@pytest.mark.parametrize(
+    "contacts",
+    [
+        ["alice", "alice"],
+        [{"remark": "x"}],
+        [{"wechat_id": "alice", "nickname": "x"}],
+        [42],
+    ],
+)
+def test_invalid_entries_are_rejected(contacts) -> None:
+    with pytest.raises(ValueError):
+        normalize_add_contact_requests(contacts, DEFAULTS)
+
+
+def test_batch_key_depends_on_ids_options_and_order() -> None:
+    ab = normalize_add_contact_requests(["a", "b"], DEFAULTS)
+    ba = normalize_add_contact_requests(["b", "a"], DEFAULTS)
+    ab_with_options = normalize_add_contact_requests(
+        ["a", {"wechat_id": "b", "remark": "B"}], DEFAULTS
+    )
+    same = normalize_add_contact_requests(["a", "b"], DEFAULTS)
+
+    assert batch_key(ab) == batch_key(same)
+    assert batch_key(ab) != batch_key(ba)
+    assert batch_key(ab) != batch_key(ab_with_options)
+
+
+def test_cancellation_stops_the_batch_instead_of_failing_an_id(
+    wechat, monkeypatch
+) -> None:
+    token = CancellationToken()
+    send_friend_request = add_contact_utils._send_friend_request
+
+    def cancel_then_send(*args, **kwargs):
+        token.cancel()
+        return send_friend_request(*args, **kwargs)
+
+    monkeypatch.setattr(add_contact_utils, "_send_friend_request", cancel_then_send)
+    requests = normalize_add_contact_requests(["wxid_7", "wxid_8"], DEFAULTS)
+
+    results = []
+    with cancellation_scope(token), pytest.raises(OperationCancelled):
+        for result in add_contacts_by_wechat_ids(requests):
+            results.append(result)
+    assert results == []
+
+
+def test_checkpoint_survives_restart_until_finished(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    AddContactCheckpoint().record("batch", "alice", {"wechat_id": "alice"})
+
+    restored = AddContactCheckpoint()
+    assert restored.completed("batch") == {"alice": {"wechat_id": "alice"}}
+
+    restored.finish("batch")
+    assert AddContactCheckpoint().completed("batch") == {}
+
+
+def test_oldest_unfinished_batches_are_dropped() -> None:
+    now = [0.0]
+    checkpoint = AddContactCheckpoint(
+        max_batches=2, clock=lambda: now[0], persist=False
+    )
+    for key in ("one", "two", "three"):
+        now[0] += 1
+        checkpoint.record(key, "alice", {"wechat_id": "alice"})
+
+    assert checkpoint.completed("one") == {}
+    assert checkpoint.completed("three") == {"alice": {"wechat_id": "alice"}}
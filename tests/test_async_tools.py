@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from wechat_mcp.cancellation import raise_if_cancelled
+from wechat_mcp.read_cache import ReadCache
+from wechat_mcp.ui_scheduler import UIPriority, UIScheduler
+
+STEP_SECONDS = 0.05
+
+
+def _slow_fetch(iterations: int) -> tuple[list[float], object]:
+    """
+    A scroll-like loop that blocks the worker thread for
+    iterations * STEP_SECONDS, recording when each iteration started.
+    """
+    ticks: list[float] = []
+
+    def slow_fetch(chat_name: str, last_n: int) -> list[dict[str, str]]:
+        for _ in range(iterations):
+            raise_if_cancelled()
+            ticks.append(time.monotonic())
+            time.sleep(STEP_SECONDS)
+        return [{"sender": "OTHER", "text": chat_name}]
+
+    return ticks, slow_fetch
+
+
+def _fetch(scheduler: UIScheduler, cache: ReadCache, slow_fetch, chat_name: str):
+    """
+    The path of fetch_messages_by_chat: the read cache in front of a UI
+    job awaited through the scheduler.
+    """
+    return cache.get_or_compute_async(
+        ("fetch_messages_by_chat", chat_name, 10),
+        chat_name,
+        lambda: scheduler.run_async(
+            slow_fetch, chat_name, 10, priority=UIPriority.INTERACTIVE, label="fetch"
+        ),
+    )
+
+
+def test_event_loop_stays_responsive_during_long_ui_job() -> None:
+    _, slow_fetch = _slow_fetch(iterations=20)
+    scheduler, cache = UIScheduler(), ReadCache()
+
+    async def scenario() -> list[float]:
+        fetch = asyncio.ensure_future(_fetch(scheduler, cache, slow_fetch, "slow"))
+        await asyncio.sleep(STEP_SECONDS * 2)
+
+        latencies = []
+        for _ in range(5):
+            started = time.perf_counter()
+            await asyncio.sleep(0)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(STEP_SECONDS)
+
+        assert not fetch.done(), "fetch finished before the loop was measured"
+        assert await fetch == [{"sender": "OTHER", "text": "slow"}]
+        return latencies
+
+    latencies = asyncio.run(scenario())
+    assert max(latencies) < 0.1
+
+
+def test_cancelled_ui_job_stops_within_one_iteration() -> None:
+    ticks, slow_fetch = _slow_fetch(iterations=100)
+    scheduler, cache = UIScheduler(), ReadCache()
+
+    async def scenario() -> float:
+        fetch = asyncio.ensure_future(_fetch(scheduler, cache, slow_fetch, "cancel"))
+        await asyncio.sleep(STEP_SECONDS * 4)
+        fetch.cancel()
+        cancelled_at = time.monotonic()
+        with pytest.raises(asyncio.CancelledError):
+            await fetch
+        # Give the worker time to reach its next check point.
+        await asyncio.sleep(STEP_SECONDS * 4)
+        return cancelled_at
+
+    cancelled_at = asyncio.run(scenario())
+    after_cancel = [tick for tick in ticks if tick > cancelled_at]
+    assert len(after_cancel) <= 1
+    assert len(ticks) < 100
+    assert scheduler.stats()["failed_jobs"] == 1
+
+
+def test_job_cancelled_before_it_starts_never_runs() -> None:
+    ticks, slow_fetch = _slow_fetch(iterations=10)
+    scheduler, cache = UIScheduler(), ReadCache()
+    ran: list[str] = []
+
+    async def scenario() -> None:
+        busy = asyncio.ensure_future(_fetch(scheduler, cache, slow_fetch, "busy"))
+        await asyncio.sleep(STEP_SECONDS)
+        queued = asyncio.ensure_future(scheduler.run_async(ran.append, "queued"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        await busy
+
+    asyncio.run(scenario())
+    assert ran == []
+    assert len(ticks) == 10
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    """
+    The MCP server module running against the simulator, with its UI
+    fetch replaced by the caller.
+    """
+    pytest.importorskip("mcp")
+    from wechat_mcp import mcp_server
+    from wechat_mcp.driver import use_driver
+    from wechat_mcp.simulator import SimulatorDriver
+
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(mcp_server, "read_cache", ReadCache())
+    with use_driver(SimulatorDriver()):
+        yield mcp_server
+
+
+def test_list_tools_stays_responsive_during_long_fetch(server, monkeypatch) -> None:
+    _, slow_fetch = _slow_fetch(iterations=20)
+    monkeypatch.setattr(server, "_fetch_messages_by_chat_ui", slow_fetch)
+
+    async def scenario() -> list[float]:
+        fetch = asyncio.ensure_future(
+            server.mcp.call_tool("fetch_messages_by_chat", {"chat_name": "slow"})
+        )
+        await asyncio.sleep(STEP_SECONDS * 2)
+
+        latencies = []
+        for _ in range(5):
+            started = time.perf_counter()
+            await server.mcp.list_tools()
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(STEP_SECONDS)
+
+        assert not fetch.done(), "fetch finished before list_tools was measured"
+        await fetch
+        return latencies
+
+    latencies = asyncio.run(scenario())
+    assert max(latencies) < 0.1
+
+
+def test_cancelled_tool_call_stops_within_one_iteration(server, monkeypatch) -> None:
+    ticks, slow_fetch = _slow_fetch(iterations=100)
+    monkeypatch.setattr(server, "_fetch_messages_by_chat_ui", slow_fetch)
+
+    async def scenario() -> float:
+        fetch = asyncio.ensure_future(
+            server.fetch_messages_by_chat("cancel-me", last_n=10)
+        )
+        await asyncio.sleep(STEP_SECONDS * 4)
+        fetch.cancel()
+        cancelled_at = time.monotonic()
+        with pytest.raises(asyncio.CancelledError):
+            await fetch
+        await asyncio.sleep(STEP_SECONDS * 4)
+        return cancelled_at
+
+    cancelled_at = asyncio.run(scenario())
+    assert len([tick for tick in ticks if tick > cancelled_at]) <= 1
+    assert len(ticks) < 100
+
+
+def test_list_results_carry_their_timings_when_asked(server, monkeypatch) -> None:
+    from mcp.server.fastmcp import FastMCP
+
+    monkeypatch.setattr(server, "PERF_IN_RESULTS", True)
+    tool = server._perf_in_results(server.list_unread_chats)
+    result = asyncio.run(tool(include_read=True))
+    assert isinstance(result["results"], list)
+    assert result["perf_ms"]["label"] == "list_unread_chats"
+    assert result["ax_calls"]["label"] == "list_unread_chats"
+
+    # A cache hit runs no UI job, so the list is wrapped without timings.
+    assert asyncio.run(tool(include_read=True)) == {"results": result["results"]}
+
+    # The published output schema admits the wrapped result.
+    app = FastMCP("perf")
+    app.add_tool(tool)
+    asyncio.run(app.call_tool("list_unread_chats", {"include_read": True}))
@@ -0,0 +1,89 @@
+"""
+AX call budgets for the MCP tools, measured end to end (scheduler,
+session, caches and UI flow) against the simulated WeChat. A failure
+means a change made a tool walk more of the tree than before; if that is
+intended, update the baselines in ax_budgets.json (see ax_budget.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from ax_budget import within_ax_budget
+
+from wechat_mcp.driver import use_driver
+from wechat_mcp.read_cache import ReadCache
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+
+
+@pytest.fixture
+def wechat(state_dir):
+    sim = SimulatedWeChat(sessions=50, messages=30)
+    with use_driver(SimulatorDriver(sim)):
+        yield sim
+
+
+@pytest.fixture
+def server(wechat, monkeypatch):
+    pytest.importorskip("mcp")
+    from wechat_mcp import mcp_server
+
+    monkeypatch.setattr(mcp_server, "read_cache", ReadCache())
+    return mcp_server
+
+
+def test_list_unread_chats(wechat, server) -> None:
+    with within_ax_budget("list_unread_chats"):
+        summaries = asyncio.run(server.list_unread_chats())
+    unread = [name for name in wechat.visible_sessions() if wechat.chat(name).unread]
+    assert [summary["chat_name"] for summary in summaries] == unread
+
+
+def test_fetch_messages_by_chat(wechat, server) -> None:
+    chat_name = wechat.visible_sessions()[3]
+    with within_ax_budget("fetch_messages_by_chat"):
+        messages = asyncio.run(server.fetch_messages_by_chat(chat_name, last_n=10))
+    assert [m["text"] for m in messages] == [
+        m.text for m in wechat.chat(chat_name).messages[-10:]
+    ]
+
+
+def test_reply_to_messages_by_chat(wechat, server) -> None:
+    chat_name = wechat.visible_sessions()[3]
+    with within_ax_budget("reply_to_messages_by_chat"):
+        result = asyncio.run(server.reply_to_messages_by_chat(chat_name, "on my way"))
+    assert result["sent"] is True
+
+
+def test_send_messages(wechat, server) -> None:
+    first, second = wechat.visible_sessions()[1:3]
+    messages = [
+        {"chat_name": first, "text": "one"},
+        {"chat_name": first, "text": "two"},
+        {"chat_name": second, "text": "three"},
+    ]
+    with within_ax_budget("send_messages"):
+        statuses = asyncio.run(server.send_messages(messages))
+    assert [status["sent"] for status in statuses] == [True, True, True]
+
+
+def test_open_chat_through_search(wechat, server) -> None:
+    contact = wechat.contact_names[250]
+    assert contact not in wechat.visible_sessions()
+    with within_ax_budget("reply_to_messages_by_chat_search"):
+        result = asyncio.run(server.reply_to_messages_by_chat(contact))
+    assert "error" not in result
+    assert wechat.current == contact
+
+
+def test_add_contact_by_wechat_id(server) -> None:
+    with within_ax_budget("add_contact_by_wechat_id"):
+        result = asyncio.run(server.add_contact_by_wechat_id("wxid_7", remark="R"))
+    assert "error" not in result
+
+
+def test_publish_moment_without_media(server) -> None:
+    with within_ax_budget("publish_moment_without_media"):
+        result = asyncio.run(server.publish_moment_without_media("hello"))
+    assert "error" not in result
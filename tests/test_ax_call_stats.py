@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import threading
+
+from wechat_mcp.ax_call_stats import COPY, PERFORM, SET, AXCallAccounting
+
+
+def test_invocation_counts_by_kind_and_name() -> None:
+    accounting = AXCallAccounting()
+    with accounting.invocation("list_unread_chats") as counts:
+        for _ in range(3):
+            accounting.count(COPY, "AXRole")
+        accounting.count(COPY, "AXChildren")
+        accounting.count(SET, "AXValue")
+        accounting.count(PERFORM, "AXRaise")
+    accounting.count(COPY, "AXRole")
+
+    assert counts.total() == 6
+    assert counts.to_dict()["copy"] == {
+        "total": 4,
+        "by_name": {"AXRole": 3, "AXChildren": 1},
+    }
+    stats = accounting.stats()
+    assert stats["totals"]["copy"]["total"] == 5
+    assert [call["label"] for call in stats["recent_invocations"]] == [
+        "list_unread_chats"
+    ]
+
+
+def test_nested_invocations_count_towards_the_innermost() -> None:
+    accounting = AXCallAccounting()
+    with accounting.invocation("batch") as outer:
+        accounting.count(COPY, "AXRole")
+        with accounting.invocation("send") as inner:
+            accounting.count(SET, "AXValue")
+        accounting.count(COPY, "AXRole")
+
+    assert (outer.total(COPY), outer.total(SET)) == (2, 0)
+    assert (inner.total(COPY), inner.total(SET)) == (0, 1)
+
+
+def test_invocations_are_per_thread() -> None:
+    accounting = AXCallAccounting()
+    with accounting.invocation("main") as counts:
+        worker = threading.Thread(target=accounting.count, args=(COPY, "AXRole"))
+        worker.start()
+        worker.join()
+
+    assert counts.total() == 0
+    assert accounting.stats()["totals"]["total"] == 1
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp import wechat_accessibility
+from wechat_mcp.ax_call_stats import ax_call_accounting
+from wechat_mcp.ax_trace import (
+    ReplayDivergence,
+    ReplayDriver,
+    TraceImage,
+    ax_trace_recording,
+    load_trace,
+    replay,
+)
+from wechat_mcp.driver import use_driver
+from wechat_mcp.fetch_messages_by_chat_utils import fetch_recent_messages
+from wechat_mcp.navigation_cache import NavigationCache
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+from wechat_mcp.wechat_accessibility import open_chat_for_contact
+from wechat_mcp.wechat_session import wechat_session
+
+
+@pytest.fixture
+def trace_dir(state_dir, monkeypatch, tmp_path):
+    monkeypatch.setenv("WECHAT_MCP_AX_TRACE_DIR", str(tmp_path / "traces"))
+    return tmp_path / "traces"
+
+
+def _record(trace_dir, label, fn, **kwargs):
+    sim = SimulatedWeChat(contacts=300, groups=20, sessions=40, messages=30)
+    with (
+        use_driver(SimulatorDriver(sim)),
+        ax_trace_recording(label),
+        wechat_session(label),
+        ax_call_accounting.invocation(label) as calls,
+    ):
+        result = fn(**kwargs)
+    (path,) = trace_dir.glob(f"*-{label}.jsonl.gz")
+    return sim, result, calls.to_dict(), path
+
+
+def _without_label(calls):
+    return {kind: count for kind, count in calls.items() if kind != "label"}
+
+
+def test_replay_fetch_recent_messages(trace_dir) -> None:
+    sim, recorded, calls, path = _record(
+        trace_dir, "fetch", fetch_recent_messages, last_n=25
+    )
+    assert len(recorded) == 25
+
+    header, records = load_trace(path)
+    assert header["label"] == "fetch" and header["driver"] == "simulator"
+    assert any(record["k"] == "screen" and "rgb" in record for record in records)
+
+    driver = ReplayDriver(header, records)
+    replayed, report = replay(driver, "fetch_recent_messages", last_n=25)
+    assert [m.to_dict() for m in replayed] == [m.to_dict() for m in recorded]
+    assert _without_label(report["ax_calls"]) == _without_label(calls)
+    assert report["missing"] == 0 and report["stale"] == 0
+    assert report["skipped_events"] == 0 and report["unmatched_events"] == 0
+
+
+def test_replay_open_chat_through_search(trace_dir, monkeypatch) -> None:
+    target = SimulatedWeChat(contacts=300, groups=20, sessions=40).contact_names[250]
+    sim, recorded, calls, path = _record(
+        trace_dir, "open_chat", open_chat_for_contact, chat_name=target
+    )
+    assert recorded is None and sim.current == target
+
+    # Replay must start from the learned state the recording started from,
+    # not from the route the recording just taught the cache.
+    monkeypatch.setattr(
+        wechat_accessibility, "navigation_cache", NavigationCache(persist=False)
+    )
+    driver = ReplayDriver.load(path)
+    replayed, report = replay(driver, "open_chat_for_contact", chat_name=target)
+    assert replayed is None
+    assert _without_label(report["ax_calls"]) == _without_label(calls)
+    assert report["missing"] == 0 and report["unmatched_events"] == 0
+
+
+def test_replay_diverges_on_unrecorded_input(trace_dir) -> None:
+    # Fetching only reads and scrolls, so a key press has no counterpart.
+    _, _, _, path = _record(trace_dir, "fetch", fetch_recent_messages, last_n=3)
+
+    driver = ReplayDriver.load(path)
+    with pytest.raises(ReplayDivergence):
+        driver.key_press(36)
+
+
+def test_recording_is_off_without_trace_dir(monkeypatch, tmp_path) -> None:
+    monkeypatch.delenv("WECHAT_MCP_AX_TRACE_DIR", raising=False)
+    with ax_trace_recording("noop") as recorder:
+        assert recorder is None
+
+
+def test_trace_image_crop_and_pixels() -> None:
+    data = bytes(range(3 * 4)) * 3  # 4x3 image
+    image = TraceImage(4, 3, data)
+    crop = image.crop((1, 1, 3, 3))
+    assert crop.size == (2, 2)
+    assert crop.load()[0, 0] == image.load()[1, 1]
+    assert crop.tobytes() == data[15:21] + data[27:33]
+    assert TraceImage.blank(2, 2).load()[1, 1] == (0, 0, 0)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from wechat_mcp import contact_directory as directory_module
+from wechat_mcp.contact_directory import ContactDirectory
+
+
+def _directory() -> ContactDirectory:
+    return ContactDirectory(clock=lambda: 1_000.0, persist=False)
+
+
+def test_exact_prefix_and_fuzzy_matches_are_ranked() -> None:
+    directory = _directory()
+    directory.add_names(["Alice Zhang", "Alicia Keys", "Bob"], "contact")
+    directory.add_names(["Project Alpha"], "group")
+
+    names = [match["name"] for match in directory.search("alice zhang")]
+    assert names[0] == "Alice Zhang"
+    assert directory.search("alice zhang")[0]["score"] == 1.0
+
+    names = [match["name"] for match in directory.search("ali")]
+    assert names[:2] == ["Alice Zhang", "Alicia Keys"]
+
+    # A typo still finds the name through shared trigrams.
+    assert directory.search("Project Alpah")[0]["name"] == "Project Alpha"
+    assert directory.search("zzz") == []
+
+
+def test_short_cjk_queries_match_by_substring() -> None:
+    directory = _directory()
+    directory.add_names(["张三", "张三丰", "李四"], "contact")
+
+    names = [match["name"] for match in directory.search("张三")]
+    assert names == ["张三", "张三丰"]
+
+
+def test_kind_is_refined_but_never_downgraded() -> None:
+    directory = _directory()
+    directory.add_names(["Family"], "chat")
+    directory.add_names(["Family"], "group")
+    directory.add_names(["Family"], "chat")
+
+    assert directory.search("Family")[0]["kind"] == "group"
+    assert directory.search("Family", kind="contact") == []
+    assert directory.suggest_candidates("Famil") == {
+        "contacts": [],
+        "group_chats": ["Family"],
+    }
+
+
+def test_directory_survives_restart(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    ContactDirectory(persist=True).add_names(["Carol"], "contact")
+
+    restored = ContactDirectory(persist=True)
+    assert [match["name"] for match in restored.search("carol")] == ["Carol"]
+
+
+def test_pinyin_queries_match_chinese_names() -> None:
+    if directory_module.lazy_pinyin is None:
+        pytest.skip("pypinyin is not installed")
+    directory = _directory()
+    directory.add_names(["张三丰", "王五"], "contact")
+
+    assert directory.search("zhangsan")[0]["name"] == "张三丰"
+    assert directory.search("zsf")[0]["name"] == "张三丰"
+
+
+def test_search_answers_in_milliseconds() -> None:
+    directory = _directory()
+    directory.add_names((f"Contact {i:05d}" for i in range(5000)), "contact")
+    directory.add_names((f"Group {i:04d}" for i in range(1000)), "group")
+
+    started = time.perf_counter()
+    for query in ("Contact 01234", "group 99", "ntact 4", "Grop 0042"):
+        assert directory.search(query)
+    per_query_ms = (time.perf_counter() - started) * 1000 / 4
+    print(f"search_contacts latency: {per_query_ms:.2f} ms per query")
+    assert per_query_ms < 50
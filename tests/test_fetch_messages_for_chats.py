@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp.fetch_messages_by_chat_utils import (
+    fetch_messages_for_chats,
+    normalize_chat_fetch_requests,
+)
+
+
+def test_explicit_last_n_overrides_the_default() -> None:
+    requests = normalize_chat_fetch_requests(
+        ["a", {"chat_name": "b", "last_n": 0}, {"chat_name": "c", "last_n": None}],
+        default_last_n=20,
+    )
+    assert [request.last_n for request in requests] == [20, 0, 20]
+
+    with pytest.raises(ValueError, match="negative last_n"):
+        normalize_chat_fetch_requests([{"chat_name": "a", "last_n": -1}], 20)
+
+
+def main() -> None:
+    requests = normalize_chat_fetch_requests(
+        ["家", {"chat_name": "邦邦", "last_n": 10}], default_last_n=20
+    )
+    for result in fetch_messages_for_chats(requests):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
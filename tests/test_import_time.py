@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# macOS frameworks the server must not import before a tool needs them.
+PLATFORM_MODULES = ("AppKit", "ApplicationServices", "Quartz", "PIL")
+
+# Total self import time of the wechat_mcp modules at startup, in ms.
+# Generous, to stay stable on slow CI runners; override to tighten.
+IMPORT_BUDGET_MS = float(os.getenv("WECHAT_MCP_IMPORT_BUDGET_MS", "150"))
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+_STUB = """
+def __getattr__(name):
+    return lambda *args, **kwargs: None
+"""
+
+_SCRIPT = """
+import json, sys
+
+import {modules}
+
+startup = [m for m in {platform!r} if m in sys.modules]
+sys.stderr.write("-- startup done --\\n")
+sys.stderr.flush()
+
+from wechat_mcp.driver import get_driver
+
+get_driver()
+first_use = [m for m in {platform!r} if m in sys.modules]
+print(json.dumps({{"startup": startup, "first_use": first_use}}))
+"""
+
+
+def _server_modules() -> list[str]:
+    if importlib.util.find_spec("mcp") is not None:
+        return ["wechat_mcp.mcp_server"]
+    # Without the MCP SDK, import everything mcp_server imports.
+    return [
+        "wechat_mcp.add_contact_by_wechat_id_utils",
+        "wechat_mcp.ax_trace",
+        "wechat_mcp.calibrate_timing_utils",
+        "wechat_mcp.fetch_messages_by_chat_utils",
+        "wechat_mcp.list_unread_chats_utils",
+        "wechat_mcp.prefetch",
+        "wechat_mcp.publish_moment_utils",
+        "wechat_mcp.read_cache",
+        "wechat_mcp.reply_to_messages_by_chat_utils",
+        "wechat_mcp.send_rate_limiter",
+        "wechat_mcp.timeline",
+        "wechat_mcp.ui_scheduler",
+        "wechat_mcp.wechat_accessibility",
+    ]
+
+
+def _write_stubs(root: Path) -> None:
+    for name in ("AppKit", "ApplicationServices", "Quartz"):
+        (root / f"{name}.py").write_text(_STUB)
+    (root / "PIL").mkdir()
+    (root / "PIL" / "__init__.py").write_text("")
+    (root / "PIL" / "ImageGrab.py").write_text(_STUB)
+
+
+def _run_startup(tmp_path: Path) -> tuple[dict, float]:
+    stubs = tmp_path / "stubs"
+    if not stubs.exists():
+        stubs.mkdir()
+        _write_stubs(stubs)
+    script = _SCRIPT.format(
+        modules=", ".join(_server_modules()), platform=PLATFORM_MODULES
+    )
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([str(stubs), str(SRC)]),
+        "WECHAT_MCP_LOG_DIR": str(tmp_path / "logs"),
+        "WECHAT_MCP_STATE_DIR": str(tmp_path / "state"),
+        "WECHAT_MCP_DRIVER": "macos",
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines look like "import time:   self |  cumulative | name" (in us).
+    self_us = 0
+    for line in proc.stderr.splitlines():
+        if line.startswith("-- startup done --"):
+            break
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [field.strip() for field in line[len("import time:") :].split("|")]
+        if fields[2].startswith("wechat_mcp") and fields[0].isdigit():
+            self_us += int(fields[0])
+    return json.loads(proc.stdout), self_us / 1000.0
+
+
+def test_startup_defers_platform_imports_and_stays_in_budget(tmp_path) -> None:
+    _run_startup(tmp_path)  # warm the bytecode caches
+    loaded, import_ms = _run_startup(tmp_path)
+
+    assert loaded["startup"] == []
+    assert set(loaded["first_use"]) == set(PLATFORM_MODULES)
+    assert not (tmp_path / "logs").exists()
+    assert import_ms < IMPORT_BUDGET_MS, f"wechat_mcp imports took {import_ms:.1f} ms"
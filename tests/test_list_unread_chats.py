@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import asyncio
+
+from wechat_mcp.mcp_server import list_unread_chats
+
+
+def main() -> None:
+    print(asyncio.run(list_unread_chats()))
+
+
+if __name__ == "__main__":
+    main()
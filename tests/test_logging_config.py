@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import logging.handlers
+
+from wechat_mcp.logging_config import (
+    SAMPLED,
+    ContextFilter,
+    JsonFormatter,
+    SamplingFilter,
+    _TextFormatter,
+    build_file_handler,
+    build_queue_handler,
+    log_request,
+    logger,
+)
+from wechat_mcp.perf_stats import perf_stats
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+def _test_logger(
+    name: str, *filters: logging.Filter
+) -> tuple[logging.Logger, _ListHandler]:
+    test_logger = logging.getLogger(f"wechat_mcp_test.{name}")
+    test_logger.propagate = False
+    test_logger.setLevel(logging.DEBUG)
+    handler = _ListHandler()
+    test_logger.handlers = [handler]
+    test_logger.filters = list(filters)
+    return test_logger, handler
+
+
+def test_server_logger_writes_through_a_queue() -> None:
+    assert any(isinstance(h, logging.handlers.QueueHandler) for h in logger.handlers)
+
+
+def test_json_lines_carry_request_id_and_stage() -> None:
+    test_logger, handler = _test_logger("json", ContextFilter())
+    with log_request("fetch_messages_by_chat") as request_id:
+        with perf_stats.span("fetch.scroll_up"):
+            test_logger.info("scrolled %d lines", 50)
+    test_logger.info("outside")
+
+    inside = json.loads(JsonFormatter().format(handler.records[0]))
+    assert inside["msg"] == "scrolled 50 lines"
+    assert inside["request_id"] == request_id
+    assert inside["tool"] == "fetch_messages_by_chat"
+    assert inside["stage"] == "fetch.scroll_up"
+    outside = json.loads(JsonFormatter().format(handler.records[1]))
+    assert "request_id" not in outside and "stage" not in outside
+
+
+def test_queued_records_keep_their_exception_for_the_formatter() -> None:
+    streams = {"json": io.StringIO(), "text": io.StringIO()}
+    targets = [logging.StreamHandler(stream) for stream in streams.values()]
+    targets[0].setFormatter(JsonFormatter())
+    targets[1].setFormatter(_TextFormatter("%(message)s"))
+    queue_handler, listener = build_queue_handler(*targets)
+    test_logger, _ = _test_logger("queued", ContextFilter())
+    test_logger.handlers = [queue_handler]
+
+    listener.start()
+    try:
+        with log_request("send_messages") as request_id:
+            try:
+                raise RuntimeError("boom")
+            except RuntimeError:
+                test_logger.exception("send to %s failed", "alice")
+    finally:
+        listener.stop()
+
+    entry = json.loads(streams["json"].getvalue())
+    assert entry["msg"] == "send to alice failed"
+    assert entry["request_id"] == request_id
+    assert "RuntimeError: boom" in entry["exc"]
+    text = streams["text"].getvalue().splitlines()
+    assert text[0] == f"send to alice failed [{request_id}]"
+    assert text[-1] == "RuntimeError: boom"
+
+
+def test_nested_requests_restore_the_outer_id() -> None:
+    test_logger, handler = _test_logger("nested", ContextFilter())
+    with log_request("batch") as outer:
+        with log_request("preempting") as inner:
+            test_logger.info("inner")
+        test_logger.info("outer")
+    assert inner != outer
+    assert [r.request_id for r in handler.records] == [inner, outer]
+
+
+def test_sampled_lines_are_thinned_per_call_site() -> None:
+    test_logger, handler = _test_logger("sampled", SamplingFilter(every=10))
+    for i in range(25):
+        test_logger.debug("scroll %d", i, extra=SAMPLED)
+        test_logger.debug("always %d", i)
+    sampled = [r.getMessage() for r in handler.records if r.msg.startswith("scroll")]
+    assert sampled == ["scroll 0", "scroll 10", "scroll 20"]
+    assert sum(r.msg.startswith("always") for r in handler.records) == 25
+
+
+def test_file_handler_rotates_by_size_or_time(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("WECHAT_MCP_LOG_MAX_MB", "2")
+    monkeypatch.setenv("WECHAT_MCP_LOG_BACKUPS", "3")
+    handler = build_file_handler(tmp_path / "a.log")
+    assert isinstance(handler, logging.handlers.RotatingFileHandler)
+    assert (handler.maxBytes, handler.backupCount) == (2 * 1024 * 1024, 3)
+    handler.close()
+
+    monkeypatch.setenv("WECHAT_MCP_LOG_ROTATE_WHEN", "midnight")
+    handler = build_file_handler(tmp_path / "b.log")
+    assert isinstance(handler, logging.handlers.TimedRotatingFileHandler)
+    handler.close()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from wechat_mcp import navigation_cache
+from wechat_mcp.navigation_cache import NavigationCache
+
+
+def _cache(**overrides) -> NavigationCache:
+    options = {"persist": False, "clock": lambda: 1_000.0}
+    options.update(overrides)
+    return NavigationCache(**options)
+
+
+def test_unknown_chat_has_no_route() -> None:
+    cache = _cache()
+    assert cache.best_route("alice") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_success_is_offered_first_with_its_result_index() -> None:
+    cache = _cache()
+    cache.record_success("Project group", "group_chats", result_index=7)
+
+    route = cache.best_route("Project group")
+    assert route is not None
+    assert route.route == "group_chats"
+    assert route.result_index == 7
+    assert cache.stats()["hits"] == 1
+
+
+def test_failing_route_is_demoted_and_then_dropped() -> None:
+    cache = _cache()
+    cache.record_success("alice", "contacts", result_index=0)
+    cache.record_success("alice", "contacts", result_index=0)
+    cache.record_success("alice", "session_list")
+
+    # contacts: 2 successes; session_list: 1 success.
+    assert cache.best_route("alice").route == "contacts"
+
+    cache.record_failure("alice", "contacts")
+    # contacts score 0 -> discarded; session_list remains.
+    assert cache.best_route("alice").route == "session_list"
+
+    cache.record_failure("alice", "session_list")
+    assert cache.best_route("alice") is None
+    assert cache.stats()["demotions"] == 2
+
+
+def test_routes_survive_restart(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    _cache(persist=True).record_success("bob", "contacts", result_index=4)
+
+    route = _cache(persist=True).best_route("bob")
+    assert route is not None
+    assert (route.route, route.result_index) == ("contacts", 4)
+
+
+def test_least_recently_used_chats_are_evicted() -> None:
+    now = [0.0]
+    cache = _cache(max_entries=2, clock=lambda: now[0])
+    for name in ("a", "b", "c"):
+        now[0] += 1
+        cache.record_success(name, "session_list")
+
+    assert cache.best_route("a") is None
+    assert cache.best_route("c") is not None
+    assert cache.stats()["chats"] == 2
+
+
+def test_repeated_successes_are_written_at_most_once_per_interval(
+    tmp_path, monkeypatch
+) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    now = [1_000.0]
+    cache = _cache(persist=True, clock=lambda: now[0], save_interval=60.0)
+    writes: list[float] = []
+    save_state = navigation_cache.save_state
+    monkeypatch.setattr(
+        navigation_cache,
+        "save_state",
+        lambda name, state: (writes.append(now[0]), save_state(name, state)),
+    )
+
+    cache.record_success("bob", "contacts", result_index=4)
+    for _ in range(5):
+        now[0] += 1
+        cache.record_success("bob", "contacts", result_index=4)
+    # A new route index is written at once.
+    cache.record_success("bob", "contacts", result_index=2)
+    now[0] += 60
+    cache.record_success("bob", "contacts", result_index=2)
+    assert writes == [1_000.0, 1_005.0, 1_065.0]
+
+    now[0] += 1
+    cache.record_success("bob", "contacts", result_index=2)
+    cache.flush()
+    assert _cache(persist=True).best_route("bob").successes == 9
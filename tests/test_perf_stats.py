@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from wechat_mcp.perf_stats import PerfStats
+
+
+def test_percentiles_and_counters() -> None:
+    stats = PerfStats()
+    for ms in range(1, 101):
+        stats.record("search.type_query", float(ms))
+    stats.record("search.type_query", 500.0, ok=False)
+
+    stage = stats.stats()["stages"]["search.type_query"]
+    assert stage["count"] == 101
+    assert stage["errors"] == 1
+    assert stage["p50_ms"] == 51.0
+    assert stage["p95_ms"] == 96.0
+    assert stage["p99_ms"] == 100.0
+    assert stage["max_ms"] == 500.0
+
+
+def test_timed_records_failures_and_reraises() -> None:
+    stats = PerfStats()
+
+    @stats.timed("fetch.capture_image")
+    def capture(fail: bool) -> str:
+        if fail:
+            raise RuntimeError("no screen")
+        return "image"
+
+    assert capture(False) == "image"
+    with pytest.raises(RuntimeError):
+        capture(True)
+
+    stage = stats.stats()["stages"]["fetch.capture_image"]
+    assert (stage["count"], stage["errors"]) == (2, 1)
+
+
+def test_spans_are_attributed_to_the_innermost_call() -> None:
+    stats = PerfStats()
+    with stats.call("fetch_messages_for_chats") as outer:
+        with stats.span("navigation.open_chat"):
+            pass
+        with stats.call("send_messages") as inner:
+            with stats.span("reply.send_message"):
+                pass
+        with stats.span("navigation.open_chat"):
+            pass
+
+    assert set(outer.stages) == {"navigation.open_chat"}
+    assert outer.stages["navigation.open_chat"][0] == 2
+    assert set(inner.stages) == {"reply.send_message"}
+    labels = [call["label"] for call in stats.stats()["recent_calls"]]
+    assert labels == ["send_messages", "fetch_messages_for_chats"]
+
+
+def test_disabled_stats_record_nothing_and_cost_little() -> None:
+    stats = PerfStats(enabled=False)
+
+    @stats.timed("input.scroll")
+    def scroll() -> None:
+        pass
+
+    started = time.perf_counter()
+    with stats.call("list_unread_chats") as call:
+        for _ in range(100_000):
+            scroll()
+            with stats.span("input.click"):
+                pass
+    elapsed = time.perf_counter() - started
+
+    assert call is None
+    assert stats.stats()["stages"] == {}
+    assert stats.stats()["recent_calls"] == []
+    # Two disabled spans per iteration; a few microseconds at most.
+    assert elapsed < 1.0
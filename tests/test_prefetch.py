@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+import pytest
+
+from wechat_mcp.cancellation import raise_if_cancelled
+from wechat_mcp.driver import use_driver
+from wechat_mcp.fetch_messages_by_chat_utils import fetch_recent_messages
+from wechat_mcp.prefetch import Prefetcher
+from wechat_mcp.read_cache import ReadCache
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+from wechat_mcp.ui_scheduler import UIScheduler
+from wechat_mcp.wechat_accessibility import open_chat_for_contact
+from wechat_mcp.wechat_session import wechat_session
+
+
+def _messages(chat_name: str, last_n: int) -> list[dict[str, Any]]:
+    return [{"sender": chat_name, "text": f"m{i}"} for i in range(last_n)]
+
+
+def _prefetcher(
+    fetch=_messages, cache: ReadCache | None = None, **kwargs: Any
+) -> Prefetcher:
+    return Prefetcher(
+        fetch,
+        scheduler=UIScheduler(),
+        cache=ReadCache() if cache is None else cache,
+        persist=False,
+        **kwargs,
+    )
+
+
+def test_refreshes_watched_chats_only_when_idle() -> None:
+    cache = ReadCache()
+    prefetcher = _prefetcher(cache=cache, idle_seconds=60)
+    prefetcher.set_watchlist({"Alice": 5})
+    prefetcher.stop()
+    assert prefetcher.run_once() is None
+
+    prefetcher.idle_seconds = 0
+    assert prefetcher.run_once() == "Alice"
+    # Not due again before refresh_seconds.
+    assert prefetcher.run_once() is None
+
+    messages, age = prefetcher.lookup("Alice", 3)
+    assert [m["text"] for m in messages] == ["m2", "m3", "m4"]
+    assert age >= 0
+    assert prefetcher.lookup("Alice", 10) is None
+    assert prefetcher.lookup("Alice", 3, max_age_seconds=0) is None
+    assert prefetcher.lookup("Bob", 3) is None
+    assert prefetcher.stats()["refreshes"] == 1
+    # Lookups leave the hit rate of the tools' read cache alone.
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 0)
+
+
+def test_refresh_yields_to_a_tool_call() -> None:
+    started = threading.Event()
+
+    def slow_fetch(chat_name: str, last_n: int) -> list[dict[str, Any]]:
+        started.set()
+        for _ in range(500):
+            raise_if_cancelled()
+            time.sleep(0.01)
+        return _messages(chat_name, last_n)
+
+    prefetcher = _prefetcher(slow_fetch, idle_seconds=0)
+    prefetcher.set_watchlist({"Alice": 5})
+    prefetcher.stop()
+
+    refreshed: list[str | None] = []
+    runner = threading.Thread(target=lambda: refreshed.append(prefetcher.run_once()))
+    runner.start()
+    assert started.wait(5)
+    prefetcher._scheduler.submit(lambda: None).result(timeout=5)
+    runner.join(5)
+
+    assert refreshed == [None]
+    assert prefetcher.stats()["yields"] == 1
+    assert prefetcher.lookup("Alice", 5) is None
+
+
+def test_sending_to_a_chat_drops_its_prefetched_copy() -> None:
+    prefetcher = _prefetcher(idle_seconds=0)
+    prefetcher.set_watchlist({"Alice": 5, "Bob": 5})
+    prefetcher.stop()
+    assert {prefetcher.run_once(), prefetcher.run_once()} == {"Alice", "Bob"}
+
+    prefetcher._cache.invalidate("Alice")
+    assert prefetcher.lookup("Alice", 5) is None
+    assert prefetcher.lookup("Bob", 5) is not None
+
+
+def test_failed_refresh_is_not_retried_at_once() -> None:
+    def failing_fetch(chat_name: str, last_n: int) -> list[dict[str, Any]]:
+        return [{"error": "No chat found", "chat_name": chat_name}]
+
+    prefetcher = _prefetcher(failing_fetch, idle_seconds=0)
+    prefetcher.set_watchlist({"Ghost": 5})
+    prefetcher.stop()
+
+    assert prefetcher.run_once() is None
+    assert prefetcher.run_once() is None
+    assert prefetcher.stats()["failures"] == 1
+
+
+def test_watchlist_survives_restart(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    monkeypatch.setenv("WECHAT_MCP_PREFETCH_CHATS", "Seed")
+    first = Prefetcher(_messages, scheduler=UIScheduler(), cache=ReadCache())
+    first.start()
+    first.stop()
+    assert first.watched() == {"Seed": 50}
+
+    first.set_watchlist({"Alice": 10})
+    first.stop()
+
+    restored = Prefetcher(_messages, scheduler=UIScheduler(), cache=ReadCache())
+    restored.start()
+    restored.stop()
+    assert restored.watched() == {"Alice": 10}
+
+
+def test_waits_while_the_user_is_active() -> None:
+    user_idle = [5.0]
+    prefetcher = _prefetcher(idle_seconds=10, user_idle=lambda: user_idle[0])
+    prefetcher._scheduler.idle_seconds = lambda: 60.0
+    prefetcher.set_watchlist({"Alice": 5})
+    prefetcher.stop()
+
+    assert prefetcher.run_once() is None
+    assert prefetcher.stats()["deferred_for_user"] == 1
+
+    user_idle[0] = 30.0
+    assert prefetcher.run_once() == "Alice"
+
+
+def test_user_idle_time_comes_from_the_driver() -> None:
+    prefetcher = _prefetcher(idle_seconds=10)
+    prefetcher._scheduler.idle_seconds = lambda: 60.0
+    prefetcher.set_watchlist({"Alice": 5})
+    prefetcher.stop()
+
+    with use_driver(SimulatorDriver(user_idle=2.0)):
+        assert prefetcher.run_once() is None
+    with use_driver(SimulatorDriver(user_idle=20.0)):
+        assert prefetcher.run_once() == "Alice"
+
+
+@pytest.fixture
+def sim(state_dir) -> SimulatedWeChat:
+    return SimulatedWeChat(contacts=200, groups=10, sessions=20, messages=30)
+
+
+def test_prefetches_from_the_simulator(sim) -> None:
+    chat = sim.sessions[5]
+
+    def fetch(chat_name: str, last_n: int) -> list[dict[str, Any]]:
+        with use_driver(SimulatorDriver(sim)), wechat_session("prefetch"):
+            open_chat_for_contact(chat_name)
+            return [m.to_dict() for m in fetch_recent_messages(last_n=last_n)]
+
+    prefetcher = _prefetcher(fetch, idle_seconds=0)
+    prefetcher.set_watchlist({chat: 10})
+    prefetcher.stop()
+    assert prefetcher.run_once() == chat
+    assert sim.current == chat
+
+    sim.open_chat(sim.sessions[0])
+    messages, _ = prefetcher.lookup(chat, 10)
+    assert len(messages) == 10
+    assert sim.current == sim.sessions[0]
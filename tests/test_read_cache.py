@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import threading
+
+from wechat_mcp.read_cache import ALL_CHATS, ReadCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_hit_within_ttl_and_expiry() -> None:
+    clock = FakeClock()
+    cache = ReadCache(ttl_seconds=5, clock=clock)
+    calls: list[int] = []
+
+    def compute() -> list[int]:
+        calls.append(1)
+        return [len(calls)]
+
+    assert cache.get_or_compute("k", "chat", compute) == [1]
+    clock.now = 4
+    assert cache.get_or_compute("k", "chat", compute) == [1]
+    clock.now = 10
+    assert cache.get_or_compute("k", "chat", compute) == [2]
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_concurrent_identical_requests_share_one_execution() -> None:
+    cache = ReadCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls: list[int] = []
+
+    def slow() -> str:
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "messages"
+
+    results: list[str] = []
+    leader = threading.Thread(
+        target=lambda: results.append(cache.get_or_compute("k", "chat", slow))
+    )
+    leader.start()
+    assert started.wait(5)
+
+    followers = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_compute("k", "chat", slow))
+        )
+        for _ in range(3)
+    ]
+    for thread in followers:
+        thread.start()
+    while cache.stats()["coalesced"] < 3:
+        pass
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["messages"] * 4
+    assert cache.stats()["coalesce_rate"] == 0.75
+
+
+def test_invalidate_drops_chat_and_sidebar_entries() -> None:
+    cache = ReadCache()
+    cache.put("a", "alice", 1)
+    cache.put("b", "bob", 2)
+    cache.put("sidebar", ALL_CHATS, 3)
+
+    cache.invalidate("alice")
+
+    assert cache.get("a") is None
+    assert cache.get("sidebar") is None
+    assert cache.get("b") == 2
+
+
+def test_result_computed_before_invalidation_is_not_stored() -> None:
+    cache = ReadCache()
+
+    def compute() -> str:
+        # A send to the same chat lands while this read is still running.
+        cache.invalidate("alice")
+        return "stale"
+
+    assert cache.get_or_compute("a", "alice", compute) == "stale"
+    assert cache.get("a") is None
+
+
+def test_uncacheable_results_are_not_stored() -> None:
+    cache = ReadCache()
+    cache.get_or_compute(
+        "a", "alice", lambda: [{"error": "x"}], cacheable=lambda value: False
+    )
+    assert cache.get("a") is None
+
+
+def test_entries_can_outlive_the_cache_ttl() -> None:
+    clock = FakeClock()
+    cache = ReadCache(ttl_seconds=5, clock=clock)
+    cache.put("short", "chat", 1)
+    cache.put("long", "chat", 2, ttl_seconds=60)
+
+    clock.now = 30
+    assert cache.get("short") is None
+    assert cache.peek("long") == (2, 30)
+
+    cache.invalidate("chat")
+    assert cache.peek("long") is None
+    # Peeks are not counted as requests.
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 1)
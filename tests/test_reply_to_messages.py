@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import asyncio
+
 from wechat_mcp.mcp_server import reply_to_messages_by_chat
 
 
 def main() -> None:
-    print(reply_to_messages_by_chat("邦邦", "Hello from tests"))
+    print(asyncio.run(reply_to_messages_by_chat("邦邦", "Hello from tests")))
 
 
 if __name__ == "__main__":
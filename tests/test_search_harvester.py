@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+from wechat_mcp.search_harvester import (
+    SearchEntry,
+    SearchResultHarvester,
+    find_exact_entry,
+)
+
+ROW_HEIGHT = 40.0
+VISIBLE_ROWS = 12
+SCROLL_ROWS = 8
+
+
+class SimulatedSearchList:
+    """
+    A scrolling search results list: rows are indices into `rows` and
+    only a window of VISIBLE_ROWS is present at a time, like the AX list.
+    Reading a row stands for one AX subtree walk, which is what the
+    tests count.
+    """
+
+    def __init__(self, sections: list[tuple[str, int]]) -> None:
+        self.rows: list[str] = []
+        for title, count in sections:
+            self.rows.append(title)
+            prefix = title.split()[0]
+            self.rows.extend(f"{prefix} result {i:04d}" for i in range(count))
+        self.top = 0
+        self.row_reads = 0
+
+    def visible_rows(self) -> list[int]:
+        return list(range(self.top, min(self.top + VISIBLE_ROWS, len(self.rows))))
+
+    def read_row(self, row: int) -> list[SearchEntry]:
+        self.row_reads += 1
+        y = (row - self.top) * ROW_HEIGHT
+        return [SearchEntry(element=row, text=self.rows[row], y=y)]
+
+    def read_all_visible(self) -> list[SearchEntry]:
+        entries: list[SearchEntry] = []
+        for row in self.visible_rows():
+            entries.extend(self.read_row(row))
+        return entries
+
+    def scroll(self) -> None:
+        self.top = min(self.top + SCROLL_ROWS, max(0, len(self.rows) - VISIBLE_ROWS))
+
+    def row_key(self, row: int) -> int:
+        return row
+
+    def harvester(self) -> SearchResultHarvester:
+        return SearchResultHarvester(
+            self.visible_rows, self.read_row, row_key=self.row_key
+        )
+
+
+class RecycledRow:
+    """
+    A row object that the list hands out again for other results.
+    """
+
+    def __init__(self) -> None:
+        self.result = 0
+
+
+class RecyclingSearchList(SimulatedSearchList):
+    """
+    Like SimulatedSearchList, but with a fixed pool of row objects that
+    are reassigned to results as the list scrolls, like reused table
+    row views.
+    """
+
+    def __init__(self, sections: list[tuple[str, int]]) -> None:
+        super().__init__(sections)
+        self.pool = [RecycledRow() for _ in range(VISIBLE_ROWS)]
+
+    def visible_rows(self) -> list[RecycledRow]:
+        rows = []
+        for result in super().visible_rows():
+            row = self.pool[result % VISIBLE_ROWS]
+            row.result = result
+            rows.append(row)
+        return rows
+
+    def read_row(self, row: RecycledRow) -> list[SearchEntry]:
+        return super().read_row(row.result)
+
+    def row_key(self, row: RecycledRow) -> tuple[RecycledRow, int]:
+        # The row object plus its AXIndex.
+        return row, row.result
+
+
+def _two_thousand_results() -> SimulatedSearchList:
+    return SimulatedSearchList(
+        [("Contacts", 900), ("Group Chats", 600), ("Chat History", 500)]
+    )
+
+
+def _harvest_until(search_list, harvester, name, max_scrolls=400):
+    for _ in range(max_scrolls):
+        match = find_exact_entry(harvester.harvest(), name)
+        if match is not None or harvester.past_sections():
+            return match
+        search_list.scroll()
+    return None
+
+
+def test_sections_carry_across_scrolls() -> None:
+    search_list = _two_thousand_results()
+    harvester = search_list.harvester()
+
+    match = _harvest_until(search_list, harvester, "Group result 0123")
+
+    assert match is not None
+    assert (match.section, match.index) == ("Group Chats", 123)
+    assert harvester.sections_seen == ["Contacts", "Group Chats"]
+
+
+def test_each_row_is_read_once() -> None:
+    search_list = _two_thousand_results()
+    harvester = search_list.harvester()
+
+    _harvest_until(search_list, harvester, "Group result 0599")
+
+    # Everything up to the end of Group Chats plus the first screen of
+    # Chat History, each row read exactly once.
+    assert search_list.row_reads == harvester.rows_read
+    assert search_list.row_reads <= 1 + 900 + 1 + 600 + VISIBLE_ROWS
+
+
+def test_stops_once_past_group_chats() -> None:
+    search_list = _two_thousand_results()
+    harvester = search_list.harvester()
+
+    assert _harvest_until(search_list, harvester, "Nobody") is None
+    assert harvester.current_section == "Chat History"
+    assert search_list.top < 1 + 900 + 1 + 600
+    # The 500 Chat History rows below the first screen were never read.
+    assert search_list.row_reads < 1 + 900 + 1 + 600 + SCROLL_ROWS + VISIBLE_ROWS
+
+
+def test_matches_outside_chat_sections_are_ignored() -> None:
+    search_list = SimulatedSearchList([("Chat History", 3)])
+    search_list.rows[2] = "Alice"
+    harvester = search_list.harvester()
+
+    assert find_exact_entry(harvester.harvest(), "Alice") is None
+    assert harvester.past_sections()
+
+
+def test_benchmark_against_full_rewalk() -> None:
+    """
+    Compare with the previous approach of re-reading every visible row
+    after each scroll step, on a simulated list of 2,000 results.
+    """
+    target = "Group result 0599"
+
+    naive_list = _two_thousand_results()
+    while True:
+        entries = naive_list.read_all_visible()
+        if any(entry.text == target for entry in entries):
+            break
+        naive_list.scroll()
+
+    search_list = _two_thousand_results()
+    harvester = search_list.harvester()
+    assert _harvest_until(search_list, harvester, target) is not None
+    assert search_list.row_reads * 1.4 < naive_list.row_reads
+
+
+def test_recycled_rows_are_read_again() -> None:
+    search_list = RecyclingSearchList([("Contacts", 40), ("Group Chats", 40)])
+    harvester = search_list.harvester()
+
+    match = _harvest_until(search_list, harvester, "Group result 0030")
+
+    assert match is not None
+    assert (match.section, match.index) == ("Group Chats", 30)
+    # Every result was read once, although only twelve row objects exist.
+    assert search_list.row_reads == harvester.rows_read
+    assert search_list.row_reads <= 1 + 40 + 1 + 31 + VISIBLE_ROWS
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp import reply_to_messages_by_chat_utils as reply_utils
+from wechat_mcp.cancellation import (
+    CancellationToken,
+    OperationCancelled,
+    cancellation_scope,
+)
+from wechat_mcp.reply_to_messages_by_chat_utils import (
+    normalize_outgoing_messages,
+    send_message,
+    send_messages_to_chats,
+)
+from wechat_mcp.wechat_accessibility import open_chat_for_contact
+
+
+def _cancel_after_first_send(monkeypatch, token: CancellationToken) -> None:
+    send_message = reply_utils.send_message
+
+    def send_then_cancel(*args, **kwargs):
+        receipt = send_message(*args, **kwargs)
+        token.cancel()
+        return receipt
+
+    monkeypatch.setattr(reply_utils, "send_message", send_then_cancel)
+
+
+def _batch(wechat) -> list:
+    first, second = wechat.visible_sessions()[1:3]
+    return normalize_outgoing_messages(
+        [
+            {"chat_name": first, "text": "one"},
+            {"chat_name": first, "text": "two"},
+            {"chat_name": second, "text": "three"},
+        ]
+    )
+
+
+def _drop_sends(wechat, monkeypatch) -> None:
+    """
+    Return clears the input field but the message never shows up.
+    """
+    monkeypatch.setattr(wechat, "send", lambda text: None)
+
+
+def _ignore_return(wechat, monkeypatch) -> None:
+    """
+    Return is not taken, so the message stays in the input field.
+    """
+    monkeypatch.setattr(reply_utils, "press_return", lambda: None)
+
+
+@pytest.mark.parametrize(
+    ("break_send", "delivery_status", "sent", "note"),
+    [
+        pytest.param(None, "sent", True, None, id="sent"),
+        pytest.param(_drop_sends, "pending", False, "warning", id="pending"),
+        pytest.param(_ignore_return, "failed", False, "error", id="failed"),
+    ],
+)
+def test_delivery_status_classification(
+    wechat, monkeypatch, break_send, delivery_status, sent, note
+) -> None:
+    chat_name = wechat.visible_sessions()[1]
+    open_chat_for_contact(chat_name, ax_app=wechat.app)
+    if break_send is not None:
+        break_send(wechat, monkeypatch)
+
+    receipt = send_message("are you there?", ax_app=wechat.app)
+    assert receipt.status == delivery_status
+    fields = receipt.result_fields()
+    assert fields["sent"] is sent
+    assert fields["delivery_status"] == delivery_status
+    assert {"warning", "error"} & set(fields) == ({note} if note else set())
+    shown = [m.text for m in wechat.chat(chat_name).messages[-1:]]
+    assert (shown == ["are you there?"]) is sent
+
+
+def test_cancellation_stops_a_batch_between_messages(wechat, monkeypatch) -> None:
+    messages = _batch(wechat)
+    token = CancellationToken()
+    _cancel_after_first_send(monkeypatch, token)
+
+    statuses = []
+    with cancellation_scope(token), pytest.raises(OperationCancelled):
+        for status in send_messages_to_chats(messages):
+            statuses.append(status)
+
+    assert [status["index"] for status in statuses] == [0]
+    assert statuses[0]["sent"] is True
+    first, second = messages[0].chat_name, messages[2].chat_name
+    assert [m.text for m in wechat.chat(first).messages[-1:]] == ["one"]
+    assert "three" not in [m.text for m in wechat.chat(second).messages]
+
+
+def test_cancelled_send_messages_job_is_not_reported_per_item(
+    wechat, monkeypatch
+) -> None:
+    pytest.importorskip("mcp")
+    from wechat_mcp import mcp_server
+
+    messages = _batch(wechat)
+    token = CancellationToken()
+    _cancel_after_first_send(monkeypatch, token)
+
+    with cancellation_scope(token), pytest.raises(OperationCancelled):
+        mcp_server._send_messages_ui(messages)
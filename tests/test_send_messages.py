@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import asyncio
+
+from wechat_mcp.mcp_server import send_messages
+
+
+def main() -> None:
+    messages = [
+        {"chat_name": "邦邦", "text": "Hello from tests (1/2)"},
+        {"chat_name": "邦邦", "text": "Hello from tests (2/2)"},
+    ]
+    print(asyncio.run(send_messages(messages)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any
+
+import pytest
+
+from wechat_mcp import reply_to_messages_by_chat_utils as reply_utils
+from wechat_mcp import send_rate_limiter
+from wechat_mcp.reply_to_messages_by_chat_utils import send_message
+from wechat_mcp.send_rate_limiter import OutboundSendQueue, SendRateLimiter
+from wechat_mcp.wechat_accessibility import open_chat_for_contact
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _limiter(clock: FakeClock, **overrides: Any) -> SendRateLimiter:
+    options = {
+        "global_rate_per_minute": 6,
+        "global_burst": 3,
+        "chat_rate_per_minute": 2,
+        "chat_burst": 2,
+        "clock": clock,
+        "persist": False,
+    }
+    options.update(overrides)
+    return SendRateLimiter(**options)
+
+
+def test_per_chat_bucket_limits_burst_and_refills() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock)
+
+    assert limiter.try_acquire("alice")
+    assert limiter.try_acquire("alice")
+    assert not limiter.try_acquire("alice")
+    # Other chats still have their own tokens.
+    assert limiter.try_acquire("bob")
+
+    # 2 per minute -> one token every 30 s.
+    assert limiter.seconds_until_available("alice") == 30.0
+    clock.advance(30)
+    assert limiter.try_acquire("alice")
+
+
+def test_global_bucket_caps_all_chats() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock)
+
+    assert all(limiter.try_acquire(chat) for chat in ("a", "b", "c"))
+    assert not limiter.try_acquire("d")
+    # 6 per minute -> one global token every 10 s.
+    assert limiter.seconds_until_available("d") == 10.0
+
+
+def test_release_returns_token() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, global_rate_per_minute=0)
+
+    assert limiter.try_acquire("alice")
+    assert limiter.try_acquire("alice")
+    limiter.release("alice")
+    assert limiter.try_acquire("alice")
+
+
+def test_bucket_levels_survive_restart(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    clock = FakeClock()
+    first = _limiter(clock, persist=True)
+    assert first.try_acquire("alice")
+    assert first.try_acquire("alice")
+
+    restarted = _limiter(clock, persist=True)
+    assert not restarted.try_acquire("alice")
+    clock.advance(30)
+    assert restarted.try_acquire("alice")
+
+
+def test_state_is_written_outside_the_lock(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    limiter = _limiter(FakeClock(), persist=True)
+    held: list[bool] = []
+    monkeypatch.setattr(
+        send_rate_limiter,
+        "save_state",
+        lambda name, state: held.append(limiter._lock.locked()),
+    )
+
+    assert limiter.try_acquire("alice")
+    limiter.release("alice")
+    assert held == [False, False]
+
+
+def test_queue_drains_as_tokens_refill() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    sent: list[tuple[float, str, str]] = []
+
+    def send(chat_name: str, text: str) -> dict[str, Any]:
+        sent.append((clock.now, chat_name, text))
+        return {"chat_name": chat_name, "sent": True}
+
+    queue = OutboundSendQueue(limiter, send_fn=send, clock=clock, start_worker=False)
+    assert limiter.try_acquire("alice")
+    assert limiter.try_acquire("alice")
+    queue.enqueue("alice", "one")
+    queue.enqueue("alice", "two")
+    queue.enqueue("bob", "hi")
+    assert queue.has_pending("alice")
+
+    # bob is not throttled and must not wait behind alice.
+    assert queue.drain_ready() == 30.0
+    assert [(chat, text) for _, chat, text in sent] == [("bob", "hi")]
+
+    clock.advance(30)
+    assert queue.drain_ready() == 30.0
+    clock.advance(30)
+    assert queue.drain_ready() is None
+
+    assert [text for _, _, text in sent] == ["hi", "one", "two"]
+    stats = queue.stats()
+    assert stats["queue_depth"] == 0
+    assert [item["wait_seconds"] for item in stats["recent"]] == [0.0, 30.0, 60.0]
+
+
+def test_failed_queued_send_returns_token() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, global_rate_per_minute=0, chat_burst=1)
+    queue = OutboundSendQueue(
+        limiter,
+        send_fn=lambda chat, text: {"chat_name": chat, "sent": False},
+        clock=clock,
+        start_worker=False,
+    )
+    queue.enqueue("alice", "hello")
+
+    assert queue.drain_ready() is None
+    assert limiter.try_acquire("alice")
+
+
+
+def test_pending_queued_send_keeps_its_token() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, global_rate_per_minute=0, chat_burst=1)
+    queue = OutboundSendQueue(
+        limiter,
+        send_fn=lambda chat, text: {
+            "chat_name": chat,
+            "sent": False,
+            "delivery_status": "pending",
+        },
+        clock=clock,
+        start_worker=False,
+    )
+    queue.enqueue("alice", "hello")
+
+    assert queue.drain_ready() is None
+    # The message may still show up, so no token is freed for a resend.
+    assert not limiter.try_acquire("alice")
+
+
+def test_immediate_send_waits_behind_the_queue_for_the_global_token() -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock, chat_rate_per_minute=0)
+    queue = OutboundSendQueue(limiter, clock=clock, start_worker=False)
+    assert all(queue.try_acquire_immediate(chat) for chat in ("a", "b", "c"))
+    assert not queue.try_acquire_immediate("alice")
+    queue.enqueue("alice", "hello")
+
+    # The refilled global token belongs to the queued send, not to a new
+    # send to another chat.
+    clock.advance(10)
+    assert not queue.try_acquire_immediate("bob")
+    assert limiter.seconds_until_available("alice") == 0.0
+
+
+def test_queued_sends_reach_the_simulator_as_tokens_refill(wechat) -> None:
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    first, second = wechat.visible_sessions()[1:3]
+
+    def send(chat_name: str, text: str) -> dict[str, Any]:
+        open_chat_for_contact(chat_name, ax_app=wechat.app)
+        return {"chat_name": chat_name, **send_message(text).result_fields()}
+
+    queue = OutboundSendQueue(limiter, send_fn=send, clock=clock, start_worker=False)
+    for text in ("one", "two", "three"):
+        if queue.try_acquire_immediate(first):
+            assert send(first, text)["sent"]
+        else:
+            queue.enqueue(first, text)
+    assert not queue.try_acquire_immediate(second)
+    queue.enqueue(second, "hi")
+
+    def texts(chat_name: str) -> list[str]:
+        return [m.text for m in wechat.chat(chat_name).messages[-3:]]
+
+    # `second` has its own tokens and is sent at once; the third message
+    # to `first` waits 30 s for its chat's next token.
+    assert queue.drain_ready() == 30.0
+    assert texts(first)[-2:] == ["one", "two"]
+    assert texts(second)[-1] == "hi"
+
+    clock.advance(30)
+    assert queue.drain_ready() is None
+    assert texts(first) == ["one", "two", "three"]
+    recent = queue.stats()["recent"]
+    assert [item["wait_seconds"] for item in recent] == [0.0, 30.0]
+
+
+def test_cancelled_batch_keeps_the_tokens_of_started_sends(wechat, monkeypatch) -> None:
+    pytest.importorskip("mcp")
+    from wechat_mcp import mcp_server
+
+    clock = FakeClock()
+    limiter = _limiter(clock, chat_burst=1)
+    queue = OutboundSendQueue(limiter, clock=clock, start_worker=False)
+    monkeypatch.setattr(mcp_server, "send_rate_limiter", limiter)
+    monkeypatch.setattr(mcp_server, "send_queue", queue)
+    first, second = wechat.visible_sessions()[1:3]
+
+    started = threading.Event()
+    cancelled = threading.Event()
+    send_message = reply_utils.send_message
+
+    def send_after_cancel(*args, **kwargs):
+        started.set()
+        cancelled.wait(timeout=5)
+        return send_message(*args, **kwargs)
+
+    monkeypatch.setattr(reply_utils, "send_message", send_after_cancel)
+
+    async def scenario() -> None:
+        call = asyncio.ensure_future(
+            mcp_server.send_messages(
+                [
+                    {"chat_name": first, "text": "one"},
+                    {"chat_name": second, "text": "two"},
+                ]
+            )
+        )
+        await asyncio.to_thread(started.wait, 5)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        cancelled.set()
+
+    asyncio.run(scenario())
+    deadline = time.monotonic() + 5
+    while "one" not in [m.text for m in wechat.chat(first).messages[-1:]]:
+        assert time.monotonic() < deadline, "the started send never finished"
+        time.sleep(0.01)
+
+    # "one" went out after the call was cancelled and keeps its token;
+    # "two" was never started and gets its token back.
+    assert "two" not in [m.text for m in wechat.chat(second).messages]
+    assert not limiter.try_acquire(first)
+    assert limiter.try_acquire(second)
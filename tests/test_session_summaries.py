@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp.list_unread_chats_utils import _summarize_session_row
+
+
+@pytest.mark.parametrize(
+    ("texts", "unread", "time_label", "preview"),
+    [
+        pytest.param(
+            [("badge", "3"), ("time", "18:42"), ("preview", "See you tomorrow")],
+            3,
+            "18:42",
+            "See you tomorrow",
+            id="unread-count",
+        ),
+        pytest.param(
+            [("unread_badge", "99+"), ("", "Yesterday"), ("", "Call me")],
+            99,
+            "Yesterday",
+            "Call me",
+            id="capped-unread-count",
+        ),
+        pytest.param(
+            [("", "2"), ("", "2024/5/3"), ("", "ok")],
+            2,
+            "2024/5/3",
+            "ok",
+            id="unlabelled-badge",
+        ),
+        pytest.param(
+            [("", "昨天"), ("", "[5] Bob: lunch?")],
+            5,
+            "昨天",
+            "[5] Bob: lunch?",
+            id="muted-group",
+        ),
+        pytest.param(
+            [("", "星期三"), ("", "Alice: lunch?")],
+            0,
+            "星期三",
+            "Alice: lunch?",
+            id="read-group",
+        ),
+        pytest.param(
+            [("preview", "42"), ("", "09:05")],
+            0,
+            "09:05",
+            "42",
+            id="numeric-preview-is-not-a-badge",
+        ),
+        pytest.param(
+            [("", "12:00"), ("", "13:00"), ("", "hi"), ("", "a longer line")],
+            0,
+            "12:00",
+            "a longer line",
+            id="longest-text-is-the-preview",
+        ),
+        pytest.param([], 0, None, None, id="empty-row"),
+    ],
+)
+def test_session_row_classification(
+    texts: list[tuple[str, str]],
+    unread: int,
+    time_label: str | None,
+    preview: str | None,
+) -> None:
+    summary = _summarize_session_row("Chat", texts)
+    assert summary.chat_name == "Chat"
+    assert summary.unread_count == unread
+    assert summary.last_message_time == time_label
+    assert summary.last_message_preview == preview
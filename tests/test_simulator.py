@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from wechat_mcp import wechat_accessibility
+from wechat_mcp.add_contact_by_wechat_id_utils import add_contact_by_wechat_id
+from wechat_mcp.fetch_messages_by_chat_utils import fetch_recent_messages
+from wechat_mcp.publish_moment_utils import publish_moment_without_media
+from wechat_mcp.reply_to_messages_by_chat_utils import send_message
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+from wechat_mcp.wechat_accessibility import (
+    get_current_chat_name,
+    open_chat_for_contact,
+)
+
+
+def test_open_chat_from_session_list(wechat) -> None:
+    name = wechat.visible_sessions()[3]
+    assert open_chat_for_contact(name, ax_app=wechat.app) is None
+    assert wechat.current == name
+    assert get_current_chat_name(wechat.app) == name
+
+
+def test_open_chat_through_search(wechat) -> None:
+    contact = wechat.contact_names[450]
+    group = wechat.group_names[35]
+    assert contact not in wechat.visible_sessions()
+
+    assert open_chat_for_contact(contact, ax_app=wechat.app) is None
+    assert wechat.current == contact
+    assert open_chat_for_contact(group, ax_app=wechat.app) is None
+    assert get_current_chat_name(wechat.app) == group
+    assert wechat.search_query == ""
+
+
+def test_chat_opened_through_search_is_then_opened_from_the_sidebar(
+    wechat, monkeypatch
+) -> None:
+    contact = wechat.contact_names[450]
+    assert open_chat_for_contact(contact, ax_app=wechat.app) is None
+    open_chat_for_contact(wechat.visible_sessions()[3], ax_app=wechat.app)
+    assert contact in wechat.visible_sessions()
+
+    queries: list[str] = []
+    monkeypatch.setattr(
+        wechat_accessibility,
+        "type_search_query",
+        lambda ax_app, query: queries.append(query),
+    )
+    assert open_chat_for_contact(contact, ax_app=wechat.app) is None
+    assert wechat.current == contact
+    assert queries == []
+
+
+def test_open_unknown_chat_returns_candidates(wechat) -> None:
+    # "Alice" matches ten contacts but none exactly, so the Contacts
+    # section is expanded and scrolled before giving up.
+    result = open_chat_for_contact("Alice", ax_app=wechat.app)
+    assert result is not None and "error" in result
+    alices = [name for name in wechat.contact_names if name.startswith("Alice ")]
+    assert len(alices) == 10
+    assert set(alices) <= set(result["candidates"]["contacts"])
+
+
+def test_fetch_classifies_senders_across_scrolls(wechat) -> None:
+    chat = wechat.set_history(wechat.current, 300)
+    messages = fetch_recent_messages(120, ax_app=wechat.app)
+
+    expected = chat.messages[-120:]
+    assert [m.text for m in messages] == [m.text for m in expected]
+    # Bubbles cut off at the edge of the list may not be classifiable,
+    # but no message is ever given the wrong sender.
+    for message, truth in zip(messages, expected):
+        assert message.sender in (truth.sender, "UNKNOWN")
+    known = sum(message.sender != "UNKNOWN" for message in messages)
+    assert known >= 0.9 * len(messages)
+    assert fetch_recent_messages(0, ax_app=wechat.app) == []
+
+
+def test_send_message_confirms_delivery(wechat) -> None:
+    receipt = send_message("See you at 6", ax_app=wechat.app)
+    chat = wechat.chat(wechat.current)
+    assert receipt.status == "sent"
+    assert (chat.messages[-1].sender, chat.messages[-1].text) == ("ME", "See you at 6")
+    assert wechat.sessions[0] == wechat.current
+
+
+def test_add_contact_fills_friend_request(wechat) -> None:
+    result = add_contact_by_wechat_id(
+        "wxid_42", remark="Neighbour", privacy="all", hide_their_posts=True
+    )
+    assert "error" not in result
+    (request,) = wechat.friend_requests
+    assert request.wechat_id == "wxid_42"
+    assert request.remark == "Neighbour"
+    assert (request.privacy, request.hide_my_posts, request.hide_their_posts) == (
+        "all",
+        False,
+        True,
+    )
+
+
+def test_add_unknown_contact_fails_at_add_button(wechat) -> None:
+    wechat.unknown_ids.add("wxid_missing")
+    started, virtual_started = time.monotonic(), wechat.now
+    result = add_contact_by_wechat_id("wxid_missing")
+    assert result["stage"] == "click_add_to_contacts_button"
+    assert wechat.friend_requests == []
+    # The wait for the button times out on the simulator's clock, not
+    # by spinning for the timeout in real time.
+    assert wechat.now - virtual_started >= 5.0
+    assert time.monotonic() - started < 2.0
+
+
+def test_publish_moment(wechat) -> None:
+    result = publish_moment_without_media("Sunny day at the lake")
+    assert result.get("posted") is True
+    assert wechat.moments[-1] == "Sunny day at the lake"
+    assert not wechat.composer_open
+
+
+def test_ipc_latency_advances_virtual_clock() -> None:
+    sim = SimulatedWeChat(sessions=10, messages=5)
+    driver = SimulatorDriver(sim, ipc_latency=0.001)
+    driver.copy_attribute(sim.app, "AXRole")
+    driver.sleep(0.5)
+    assert sim.now == pytest.approx(0.501)
+    assert driver.counts["copy"] == 1
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp import add_contact_by_wechat_id_utils as add_contact_utils
+from wechat_mcp.add_contact_by_wechat_id_utils import add_contact_by_wechat_id
+from wechat_mcp.cancellation import (
+    CancellationToken,
+    OperationCancelled,
+    cancellation_scope,
+)
+from wechat_mcp.publish_moment_utils import publish_moment_without_media
+from wechat_mcp.stage_machine import Stage, StageFailed, StageMachine
+
+
+class Flow:
+    def __init__(self, fail_at: str | None = None, window_open: bool = True) -> None:
+        self.fail_at = fail_at
+        self.window_open = window_open
+        self.ran: list[str] = []
+        self.recovered: list[str] = []
+
+    def step(self, name: str):
+        def run(flow: Flow) -> None:
+            flow.ran.append(name)
+            if flow.fail_at == name:
+                raise StageFailed(f"{name} timed out")
+
+        return run
+
+    def find_window(self, flow: Flow) -> bool:
+        flow.recovered.append("open_window")
+        return flow.window_open
+
+
+def _machine(flow: Flow) -> StageMachine[Flow]:
+    return StageMachine(
+        "test_flow",
+        [
+            Stage("search", flow.step("search")),
+            Stage("open_window", flow.step("open_window"), flow.find_window),
+            Stage("fill", flow.step("fill")),
+            Stage("confirm", flow.step("confirm")),
+        ],
+    )
+
+
+def test_failure_reports_the_stage_to_resume_from() -> None:
+    flow = Flow(fail_at="fill")
+    outcome = _machine(flow).run(flow)
+
+    assert outcome.error_dict() == {
+        "error": "fill timed out",
+        "stage": "fill",
+        "resume_from": "fill",
+        "completed_stages": ["search", "open_window"],
+    }
+
+
+def test_resume_recovers_earlier_stages_and_runs_only_the_rest() -> None:
+    flow = Flow()
+    outcome = _machine(flow).run(flow, resume_from="fill")
+
+    assert outcome.ok and outcome.resumed_from == "fill"
+    assert flow.ran == ["fill", "confirm"]
+    assert flow.recovered == ["open_window"]
+
+
+def test_resume_fails_when_a_window_is_gone() -> None:
+    flow = Flow(window_open=False)
+    outcome = _machine(flow).run(flow, resume_from="confirm")
+
+    assert outcome.error_stage == "open_window"
+    assert outcome.failed is None
+    assert flow.ran == []
+
+
+def test_unknown_resume_stage_is_rejected() -> None:
+    machine = _machine(Flow())
+    assert machine.check_resume("fill") is None
+    assert "unknown stage" in machine.check_resume("send")
+
+
+def test_cancellation_is_checked_between_stages() -> None:
+    flow = Flow()
+    token = CancellationToken()
+    machine = StageMachine(
+        "test_flow",
+        [Stage("search", lambda f: token.cancel()), Stage("fill", flow.step("fill"))],
+    )
+    with cancellation_scope(token), pytest.raises(OperationCancelled):
+        machine.run(flow)
+    assert flow.ran == []
+
+
+def test_add_contact_resumes_after_a_late_window(wechat, monkeypatch) -> None:
+    wait_for_window = add_contact_utils._wait_for_window
+
+    def late_request_window(ax_app, title, timeout=5.0):
+        if title == "Send Friend Request":
+            return None
+        return wait_for_window(ax_app, title, timeout)
+
+    monkeypatch.setattr(add_contact_utils, "_wait_for_window", late_request_window)
+    failed = add_contact_by_wechat_id("wxid_7", remark="Late")
+    assert failed["stage"] == failed["resume_from"] == "send_friend_request_window"
+    assert wechat.friend_requests == []
+
+    monkeypatch.setattr(add_contact_utils, "_wait_for_window", wait_for_window)
+    searches: list[str] = []
+    monkeypatch.setattr(
+        add_contact_utils, "type_search_query", lambda app, text: searches.append(text)
+    )
+    result = add_contact_by_wechat_id(
+        "wxid_7", remark="Late", resume_from=failed["resume_from"]
+    )
+
+    assert "error" not in result
+    assert result["resumed_from"] == "send_friend_request_window"
+    assert searches == []
+    (request,) = wechat.friend_requests
+    assert (request.wechat_id, request.remark) == ("wxid_7", "Late")
+
+
+def _fail_at_request_window(monkeypatch, wechat_id: str, **options) -> dict:
+    wait_for_window = add_contact_utils._wait_for_window
+
+    def late_request_window(ax_app, title, timeout=5.0):
+        if title == "Send Friend Request":
+            return None
+        return wait_for_window(ax_app, title, timeout)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(add_contact_utils, "_wait_for_window", late_request_window)
+        return add_contact_by_wechat_id(wechat_id, **options)
+
+
+def test_add_contact_does_not_resume_with_another_ids_window(
+    wechat, monkeypatch
+) -> None:
+    failed = _fail_at_request_window(monkeypatch, "wxid_7")
+    result = add_contact_by_wechat_id("wxid_8", resume_from=failed["resume_from"])
+
+    assert result["stage"] == "add_contacts_window"
+    assert result["resume_from"] is None
+    assert wechat.friend_requests == []
+
+
+def test_add_contact_resume_checks_and_reports_the_window_settings(
+    wechat, monkeypatch
+) -> None:
+    options = {"remark": "Late", "privacy": "chats_only"}
+    _fail_at_request_window(monkeypatch, "wxid_7", **options)
+
+    # The request window was never configured, so it cannot be confirmed.
+    skipped = add_contact_by_wechat_id(
+        "wxid_7", resume_from="confirm_request", **options
+    )
+    assert skipped["stage"] == "configure_request"
+    assert wechat.friend_requests == []
+
+    result = add_contact_by_wechat_id(
+        "wxid_7", resume_from="configure_request", **options
+    )
+    assert result["privacy"] == "chats_only"
+    assert "hide_my_posts" not in result
+    (request,) = wechat.friend_requests
+    assert (request.remark, request.privacy) == ("Late", "chats_only")
+
+
+def test_add_contact_rejects_an_unknown_resume_stage(wechat) -> None:
+    result = add_contact_by_wechat_id("wxid_7", resume_from="nowhere")
+    assert result["stage"] == "validate_input"
+
+
+def test_publish_moment_resumes_with_the_open_composer(wechat) -> None:
+    draft = publish_moment_without_media("Draft first", publish=False)
+    assert draft["posted"] is False and wechat.composer_open
+
+    result = publish_moment_without_media("Draft first", resume_from="post")
+    assert result["posted"] is True and result["resumed_from"] == "post"
+    assert wechat.moments[-1] == "Draft first"
+    assert "open_composer" not in result["timings_ms"]
+
+
+def test_publish_moment_fails_when_the_composer_stays_open(
+    wechat, monkeypatch
+) -> None:
+    posts = len(wechat.moments)
+    with monkeypatch.context() as patch:
+        patch.setattr(wechat, "_post_moment", lambda text_area: None)
+        failed = publish_moment_without_media("Stuck")
+    assert failed["stage"] == "post_confirm" and failed["resume_from"] == "post"
+    assert wechat.composer_open and len(wechat.moments) == posts
+
+    result = publish_moment_without_media("Stuck", resume_from="post")
+    assert result["posted"] is True
+    assert wechat.moments[posts:] == ["Stuck"]
+
+
+def test_publish_moment_does_not_post_another_draft(wechat) -> None:
+    publish_moment_without_media("Draft first", publish=False)
+
+    result = publish_moment_without_media("Something else", resume_from="post")
+    assert result["stage"] == "set_text" and result["resume_from"] is None
+    assert "Draft first" not in wechat.moments and wechat.composer_open
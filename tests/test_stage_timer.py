@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from wechat_mcp.stage_timer import StageTimer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_stages_accumulate_and_total_covers_everything() -> None:
+    clock = FakeClock()
+    timer = StageTimer(clock=clock)
+
+    with timer.stage("open"):
+        clock.now += 0.25
+    clock.now += 0.1
+    for _ in range(2):
+        with timer.stage("post"):
+            clock.now += 0.05
+
+    assert timer.to_dict() == {"open": 250.0, "post": 100.0, "total": 450.0}
+
+
+def test_stage_is_recorded_when_it_raises() -> None:
+    clock = FakeClock()
+    timer = StageTimer(clock=clock)
+
+    try:
+        with timer.stage("open"):
+            clock.now += 0.5
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    assert timer.timings_ms == {"open": 500.0}
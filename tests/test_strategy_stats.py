@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from wechat_mcp.strategy_stats import StrategySelector
+
+DEFAULT = ("ax_set", "paste")
+
+
+def test_default_order_until_measured() -> None:
+    selector = StrategySelector()
+    assert selector.order("search", DEFAULT) == ["ax_set", "paste"]
+
+
+def test_working_strategy_goes_first() -> None:
+    selector = StrategySelector()
+    selector.record("search", "ax_set", ok=False, elapsed_ms=5)
+    selector.record("search", "paste", ok=True, elapsed_ms=180)
+
+    assert selector.order("search", DEFAULT) == ["paste", "ax_set"]
+    # Other fields keep their own statistics.
+    assert selector.order("input", DEFAULT) == ["ax_set", "paste"]
+
+
+def test_fastest_reliable_strategy_wins() -> None:
+    selector = StrategySelector()
+    for _ in range(3):
+        selector.record("search", "paste", ok=True, elapsed_ms=180)
+        selector.record("search", "ax_set", ok=True, elapsed_ms=20)
+
+    assert selector.order("search", DEFAULT) == ["ax_set", "paste"]
+    stats = selector.stats()["search"]["ax_set"]
+    assert stats["success_rate"] == 1.0
+    assert stats["avg_success_ms"] == 20.0
+
+
+def test_ineffective_successes_demote_a_strategy() -> None:
+    selector = StrategySelector()
+    selector.record("search", "paste", ok=True, elapsed_ms=180)
+    for _ in range(3):
+        selector.record("search", "ax_set", ok=True, elapsed_ms=20)
+        selector.record_ineffective("search", "ax_set")
+
+    assert selector.stats()["search"]["ax_set"]["success_rate"] == 0.0
+    assert selector.order("search", DEFAULT) == ["paste", "ax_set"]
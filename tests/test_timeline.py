@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+from wechat_mcp.driver import use_driver
+from wechat_mcp.fetch_messages_by_chat_utils import fetch_recent_messages
+from wechat_mcp import timeline as timeline_module
+from wechat_mcp.perf_stats import perf_stats
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+from wechat_mcp.timeline import (
+    CallTimeline,
+    prune_timelines,
+    timeline_recording,
+    timeline_writer,
+    write_timeline,
+)
+from wechat_mcp.wechat_session import wechat_session
+
+
+def _load_only_timeline(directory):
+    (path,) = directory.glob("*.json")
+    return json.loads(path.read_text())
+
+
+def test_fetch_writes_nested_timeline(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("WECHAT_MCP_LOG_DIR", str(tmp_path))
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path / "state"))
+    sim = SimulatedWeChat(sessions=20, messages=60)
+    with (
+        use_driver(SimulatorDriver(sim)),
+        wechat_session("fetch"),
+        perf_stats.call("fetch") as call,
+        timeline_recording("fetch", call, enabled=True),
+    ):
+        fetch_recent_messages(40)
+
+    assert timeline_writer.flush()
+    trace = _load_only_timeline(tmp_path / "timelines")
+    events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    categories = {e["cat"] for e in events}
+    assert {"tool", "stage", "ax.copy", "wait", "input", "capture"} <= categories
+    assert trace["otherData"]["dropped_events"] == 0
+
+    (tool,) = [e for e in events if e["cat"] == "tool"]
+    assert tool["name"] == "fetch"
+    for event in events:
+        assert tool["ts"] <= event["ts"]
+        assert event["ts"] + event["dur"] <= tool["ts"] + tool["dur"] + 1
+
+    # Stage spans contain the AX reads made inside them.
+    (recent,) = [e for e in events if e["name"] == "fetch.recent_messages"]
+    inside = [
+        e
+        for e in events
+        if e["cat"] == "ax.copy"
+        and recent["ts"] <= e["ts"] <= recent["ts"] + recent["dur"]
+    ]
+    assert inside
+
+
+def test_timeline_is_off_by_default(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("WECHAT_MCP_LOG_DIR", str(tmp_path))
+    with timeline_recording("noop", None, enabled=False) as timeline:
+        assert timeline is None
+    assert not (tmp_path / "timelines").exists()
+
+
+def test_event_cap_keeps_the_tool_span() -> None:
+    timeline = CallTimeline("capped", max_events=2)
+    for _ in range(5):
+        timeline.add_span("AXRole", "ax.copy", timeline.origin, 0.1)
+    timeline.add_span("capped", "tool", timeline.origin, 5.0)
+    data = timeline.to_dict()
+    assert data["otherData"] == {
+        "label": "capped",
+        "started_at": data["otherData"]["started_at"],
+        "events": 3,
+        "dropped_events": 3,
+    }
+    assert data["traceEvents"][2]["cat"] == "tool"
+
+
+def test_prune_by_count_and_size(tmp_path) -> None:
+    for i in range(6):
+        path = tmp_path / f"{i}.json"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (i, i))
+
+    assert prune_timelines(tmp_path, keep=4, max_bytes=10_000) == 2
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == [
+        "2.json",
+        "3.json",
+        "4.json",
+        "5.json",
+    ]
+    assert prune_timelines(tmp_path, keep=10, max_bytes=250) == 2
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == ["4.json", "5.json"]
+
+
+def test_timeline_is_written_off_the_calling_thread(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("WECHAT_MCP_LOG_DIR", str(tmp_path))
+    writers = []
+
+    def write(timeline, directory=None):
+        writers.append(threading.current_thread())
+        return write_timeline(timeline, directory)
+
+    monkeypatch.setattr(timeline_module, "write_timeline", write)
+    with (
+        use_driver(SimulatorDriver()),
+        timeline_recording("tool", None, enabled=True),
+    ):
+        pass
+
+    assert timeline_writer.flush()
+    assert writers and threading.current_thread() not in writers
+    assert _load_only_timeline(tmp_path / "timelines")["otherData"]["label"] == "tool"
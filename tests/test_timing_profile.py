@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp import calibrate_timing_utils, wechat_accessibility
+from wechat_mcp.calibrate_timing_utils import calibrate_timing
+from wechat_mcp.driver import use_driver
+from wechat_mcp.fetch_messages_by_chat_utils import fetch_recent_messages
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+from wechat_mcp.text_entry import AX_SET, TextEntryResult, text_entry_stats
+from wechat_mcp.timing_profile import DELAYS, TimingProfile
+from wechat_mcp.wechat_accessibility import open_chat_for_contact
+from wechat_mcp.wechat_session import wechat_session
+
+
+def test_delays_shrink_on_success_and_grow_on_failure() -> None:
+    profile = TimingProfile(persist=False)
+    spec = DELAYS["chat_open"]
+    assert profile.delay("chat_open") == spec.default
+
+    for _ in range(200):
+        profile.observe("chat_open", True)
+    assert profile.delay("chat_open") == spec.minimum
+
+    for _ in range(20):
+        profile.observe("chat_open", False)
+    assert profile.delay("chat_open") == spec.maximum
+    counts = profile.to_dict()["delays"]["chat_open"]
+    assert (counts["successes"], counts["failures"]) == (200, 20)
+
+
+def test_adaptation_can_be_disabled_and_scale_applies() -> None:
+    profile = TimingProfile(persist=False, adapt=False, scale=2.0)
+    profile.observe("scroll_step", False)
+    assert profile.delay("scroll_step") == DELAYS["scroll_step"].default * 2.0
+
+
+def test_settle_until_counts_a_late_result_as_too_short() -> None:
+    profile = TimingProfile(persist=False)
+    checks = iter([None, None, "list"])
+    with use_driver(SimulatorDriver()):
+        assert profile.settle_until("search_results", lambda: next(checks)) == "list"
+        assert profile.settle_until("search_results", lambda: None) is None
+    delays = profile.to_dict()["delays"]["search_results"]
+    assert (delays["successes"], delays["failures"]) == (0, 1)
+    assert profile.delay("search_results") > DELAYS["search_results"].default
+
+
+def test_late_search_results_after_an_ax_set_are_waited_for(
+    profile, monkeypatch
+) -> None:
+    entries: list[tuple[str, ...] | None] = []
+
+    def focus_and_type_search(ax_app, text, strategies=None):
+        entries.append(strategies)
+        return TextEntryResult(AX_SET, verified=True, elapsed_ms=1.0)
+
+    checks = iter([None, None, "list"])
+    monkeypatch.setattr(
+        wechat_accessibility, "focus_and_type_search", focus_and_type_search
+    )
+    monkeypatch.setattr(
+        wechat_accessibility, "find_search_list", lambda ax_app: next(checks)
+    )
+    monkeypatch.setattr(
+        text_entry_stats,
+        "record_ineffective",
+        lambda *args: pytest.fail("the AX value set did work"),
+    )
+    with use_driver(SimulatorDriver()):
+        wechat_accessibility.type_search_query(None, "Alice")
+
+    # No paste, and the delay is counted as too short.
+    assert entries == [None]
+    delays = profile.to_dict()["delays"]["search_results"]
+    assert (delays["successes"], delays["failures"]) == (0, 1)
+
+
+def test_opening_a_chat_waits_until_its_title_shows(wechat) -> None:
+    profile = wechat_accessibility.timing_profile
+    open_chat_for_contact(wechat.visible_sessions()[3], ax_app=wechat.app)
+    open_chat_for_contact(wechat.contact_names[450], ax_app=wechat.app)
+
+    delays = profile.to_dict()["delays"]
+    for name in ("session_click", "chat_open"):
+        assert delays[name]["adapts"]
+        assert (delays[name]["successes"], delays[name]["failures"]) == (1, 0)
+    assert not delays["key_settle"]["adapts"]
+
+
+def test_calibration_clamps_and_survives_restart(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("WECHAT_MCP_STATE_DIR", str(tmp_path))
+    TimingProfile().apply_calibration({"scroll": 0.5, "typing": 0.001})
+
+    restored = TimingProfile()
+    assert restored.delay("list_settle") == DELAYS["list_settle"].maximum
+    assert restored.delay("search_results") == DELAYS["search_results"].minimum
+    assert restored.delay("chat_open") == DELAYS["chat_open"].default
+    assert restored.to_dict()["latencies_ms"] == {"scroll": 500.0, "typing": 1.0}
+
+    restored.reset()
+    assert TimingProfile().delay("list_settle") == DELAYS["list_settle"].default
+
+
+@pytest.fixture
+def profile(state_dir) -> TimingProfile:
+    """
+    The timing profile shared by the UI flows and calibration, persisted
+    in an empty temporary state directory.
+    """
+    return calibrate_timing_utils.timing_profile
+
+
+def test_calibration_against_the_simulator(profile) -> None:
+    sim = SimulatedWeChat(contacts=300, groups=20, sessions=40, messages=30)
+    with use_driver(SimulatorDriver(sim)), wechat_session("calibrate"):
+        open_chat_for_contact(sim.sessions[3])
+        result = calibrate_timing(trials=2)
+
+    assert set(result.samples_ms) == {"scroll", "typing", "click"}
+    assert len(result.samples_ms["scroll"]) == 4
+    assert result.skipped == {}
+    assert result.profile["calibrated_at"] is not None
+    # The search is left cleared and the chat where it was.
+    assert sim.search_query == ""
+    assert sim.current == sim.sessions[3]
+
+    with use_driver(SimulatorDriver(sim)), wechat_session("fetch"):
+        assert len(fetch_recent_messages(last_n=10)) == 10
+
+
+def test_calibration_without_an_open_chat_skips_scrolling(profile) -> None:
+    sim = SimulatedWeChat(contacts=300, groups=20, sessions=40, messages=30)
+    sim.open_chat(None)
+    with use_driver(SimulatorDriver(sim)), wechat_session("calibrate"):
+        result = calibrate_timing(trials=1)
+
+    assert "scroll" in result.skipped
+    assert "typing" in result.samples_ms
+    assert profile.delay("scroll_step") == DELAYS["scroll_step"].default
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from wechat_mcp.cancellation import (
+    CancellationToken,
+    OperationCancelled,
+    raise_if_cancelled,
+)
+from wechat_mcp.ui_scheduler import UIPriority, UIScheduler
+
+
+def _start_job(
+    scheduler: UIScheduler, fn, priority: UIPriority = UIPriority.INTERACTIVE
+):
+    """
+    Submit `fn` and return its Future once the worker has started it,
+    so that jobs submitted afterwards are queued behind it rather than
+    racing it for the worker.
+    """
+    started = threading.Event()
+
+    def job() -> None:
+        started.set()
+        fn()
+
+    future = scheduler.submit(job, priority=priority, label=fn.__name__)
+    assert started.wait(5)
+    return future
+
+
+def _block_worker(scheduler: UIScheduler) -> threading.Event:
+    """
+    Occupy the worker with a job that waits on the returned event so
+    that later submissions pile up in the queue.
+    """
+    release = threading.Event()
+
+    def blocker() -> None:
+        release.wait(5)
+
+    _start_job(scheduler, blocker)
+    return release
+
+
+def test_sends_run_before_bulk_jobs() -> None:
+    scheduler = UIScheduler()
+    order: list[str] = []
+    release = _block_worker(scheduler)
+
+    bulk = scheduler.submit(order.append, "bulk", priority=UIPriority.BULK)
+    send = scheduler.submit(order.append, "send", priority=UIPriority.SEND)
+    read = scheduler.submit(order.append, "read", priority=UIPriority.INTERACTIVE)
+    assert scheduler.stats()["queue_depth"] == 3
+
+    release.set()
+    for future in (bulk, send, read):
+        future.result(timeout=5)
+
+    assert order == ["send", "read", "bulk"]
+
+
+def test_clients_are_served_round_robin() -> None:
+    scheduler = UIScheduler()
+    order: list[str] = []
+    release = _block_worker(scheduler)
+
+    futures = [
+        scheduler.submit(order.append, f"a{i}", client_id="a") for i in range(3)
+    ]
+    futures.append(scheduler.submit(order.append, "b0", client_id="b"))
+
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order == ["a0", "b0", "a1", "a2"]
+    stats = scheduler.stats()
+    assert stats["completed_jobs"] == 5
+    assert stats["max_queue_depth"] == 4
+
+
+def test_bulk_job_lets_queued_sends_preempt() -> None:
+    scheduler = UIScheduler()
+    order: list[str] = []
+    queued = threading.Event()
+
+    def batch() -> None:
+        order.append("chat-1")
+        queued.wait(5)
+        assert scheduler.run_preempting_jobs(UIPriority.BULK)
+        order.append("chat-2")
+
+    future = _start_job(scheduler, batch, UIPriority.BULK)
+    send = scheduler.submit(order.append, "send", priority=UIPriority.SEND)
+    queued.set()
+    future.result(timeout=5)
+    send.result(timeout=5)
+
+    assert order == ["chat-1", "send", "chat-2"]
+
+
+def test_submitting_a_job_cancels_idle_jobs() -> None:
+    scheduler = UIScheduler()
+    started = threading.Event()
+    running = CancellationToken()
+    queued = CancellationToken()
+
+    def background() -> None:
+        started.set()
+        for _ in range(500):
+            raise_if_cancelled()
+            time.sleep(0.01)
+
+    # Not _start_job: the job needs its own cancellation token.
+    idle = scheduler.submit(background, priority=UIPriority.IDLE, token=running)
+    assert started.wait(5)
+    assert scheduler.idle_seconds() > 0
+    later = scheduler.submit(
+        raise_if_cancelled, priority=UIPriority.IDLE, token=queued
+    )
+    assert not running.cancelled
+
+    read = scheduler.submit(lambda: scheduler.idle_seconds())
+    assert read.result(timeout=5) == 0.0
+    assert running.cancelled and queued.cancelled
+    with pytest.raises(OperationCancelled):
+        idle.result(timeout=5)
+    with pytest.raises(OperationCancelled):
+        later.result(timeout=5)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import pytest
+
+from wechat_mcp import wechat_accessibility, wechat_session
+from wechat_mcp.driver import RunningApp, use_driver
+from wechat_mcp.simulator import SimulatedWeChat, SimulatorDriver
+
+
+class FakeRunningApp(RunningApp):
+    def __init__(self, pid: int, active: bool) -> None:
+        self.pid = pid
+        self.active = active
+        self.activate_calls = 0
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def activate(self) -> None:
+        self.activate_calls += 1
+        self.active = True
+
+
+class FakeDriver(SimulatorDriver):
+    """
+    The simulator with the WeChat application looked up replaced by
+    `app`.
+    """
+
+    def __init__(self, app: FakeRunningApp) -> None:
+        super().__init__(SimulatedWeChat(sessions=1, messages=1))
+        self.app = app
+        self.created: list[int] = []
+
+    def running_application(self, bundle_id: str) -> RunningApp | None:
+        return self.app
+
+    def application_element(self, pid: int) -> object:
+        self.created.append(pid)
+        return object()
+
+
+@pytest.fixture
+def fake_wechat(monkeypatch):
+    app = FakeRunningApp(pid=4242, active=False)
+    driver = FakeDriver(app)
+    monkeypatch.setattr(wechat_session, "_ax_apps", {})
+    with use_driver(driver):
+        yield app, driver.created
+
+
+def test_one_activation_per_session(fake_wechat) -> None:
+    app, created = fake_wechat
+
+    with wechat_session.wechat_session("fetch") as session:
+        handles = {id(wechat_accessibility.get_wechat_ax_app()) for _ in range(3)}
+        with wechat_session.wechat_session("nested") as nested:
+            assert nested is session
+            wechat_accessibility.get_wechat_ax_app()
+
+    assert len(handles) == 1
+    assert app.activate_calls == 1
+    assert session.activations == 1
+    assert session.app_lookups == 4
+    assert created == [4242]
+
+
+def test_frontmost_wechat_is_not_activated_and_handle_is_reused(fake_wechat) -> None:
+    app, created = fake_wechat
+
+    with wechat_session.wechat_session("first") as first:
+        first_handle = first.ax_app()
+    with wechat_session.wechat_session("second") as second:
+        second_handle = second.ax_app()
+
+    assert app.activate_calls == 1
+    assert second.activations == 0
+    assert second.skipped_activations == 1
+    assert first_handle is second_handle
+    assert created == [4242]
+
+
+def test_restarted_wechat_gets_a_new_handle(fake_wechat) -> None:
+    app, created = fake_wechat
+
+    with wechat_session.wechat_session("before") as session:
+        session.ax_app()
+    app.pid = 5151
+    with wechat_session.wechat_session("after") as session:
+        session.ax_app()
+
+    assert created == [4242, 5151]